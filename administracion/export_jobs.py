@@ -0,0 +1,140 @@
+""" Background exports of the database.
+
+A full export can take longer than the proxy allows a request to last, so the
+administrator requests it and downloads the file once it is ready. Each export
+is built by the run_export management command, in a process of its own, which
+writes the file to PRIVATE_MEDIA_ROOT/exportaciones and reports its progress in
+the Exportacion. The files hold the personal data of the families, so they are
+not served at MEDIA_URL but only by administracion.views.exports_download.
+
+Before building the file, the command computes the fingerprint of the exported
+tables. If an earlier export in the same format has the same fingerprint its
+file is reused, since the tables have not changed since it was built.
+
+An export that is not finished after DURACION_MAXIMA, e.g. because its
+process was killed, is marked as failed by fail_stale_exports.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.jobs import run_command
+from core.storage import private_storage
+from estudios_socioeconomicos.export import table_fingerprint, export_csv_zip, export_xlsx
+from .models import Exportacion
+
+
+GENERADORES = {
+    Exportacion.XLSX: export_xlsx,
+    Exportacion.CSV: export_csv_zip,
+}
+
+CARPETA = 'exportaciones'
+DURACION_MAXIMA = timedelta(hours=3)
+
+
+def start_export(exportacion):
+    """ Starts the process that builds an export, once the current transaction commits.
+
+    """
+    run_command('run_export', exportacion.pk)
+
+
+def _reusable_file(exportacion):
+    """ Returns the file of an earlier export with the same content, or None.
+
+    """
+    anteriores = Exportacion.objects.filter(status=Exportacion.TERMINADA,
+                                            formato=exportacion.formato,
+                                            huella=exportacion.huella) \
+                                    .exclude(pk=exportacion.pk) \
+                                    .exclude(archivo='') \
+                                    .order_by('-fecha_terminacion')
+    for anterior in anteriores:
+        if anterior.archivo.storage.exists(anterior.archivo.name):
+            return anterior.archivo.name
+    return None
+
+
+def _write_file(exportacion, total):
+    """ Writes the export to PRIVATE_MEDIA_ROOT and returns its name relative to it.
+
+    The file is written with a temporary name and renamed once complete,
+    so that an interrupted export never leaves a partial file behind.
+    """
+    nombre = os.path.join(CARPETA, 'JP2_ESTUDIOS_SOCIOECONOMICOS_{}_{}.{}'.format(
+        timezone.now().strftime('%Y%m%d%H%M%S'),
+        uuid.uuid4().hex[:8],
+        'zip' if exportacion.formato == Exportacion.CSV else exportacion.formato))
+    ruta = private_storage.path(nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    escritas = [0, 0]  # Rows written and the last percentage reported.
+
+    def progreso(filas):
+        escritas[0] += filas
+        porcentaje = min(99, escritas[0] * 100 // max(total, 1))
+        if porcentaje != escritas[1]:
+            escritas[1] = porcentaje
+            Exportacion.objects.filter(pk=exportacion.pk).update(progreso=porcentaje)
+
+    try:
+        with open(ruta + '.part', 'wb') as archivo:
+            for datos in GENERADORES[exportacion.formato](progreso=progreso):
+                archivo.write(datos)
+        os.rename(ruta + '.part', ruta)
+    finally:
+        if os.path.exists(ruta + '.part'):
+            os.remove(ruta + '.part')
+    return nombre
+
+
+def fail_stale_exports():
+    """ Marks as failed the exports left unfinished for longer than DURACION_MAXIMA.
+
+    Their process died without reporting it, e.g. it was killed, so they would
+    be shown in progress forever. They can be requested again.
+
+    Returns
+    -------
+    int
+        The number of exports marked as failed.
+    """
+    return Exportacion.objects.filter(
+        status__in=[Exportacion.PENDIENTE, Exportacion.EN_PROCESO],
+        fecha_creacion__lt=timezone.now() - DURACION_MAXIMA
+    ).update(status=Exportacion.ERROR, error='La exportación no terminó a tiempo.')
+
+
+def run_export(id_exportacion):
+    """ Builds an export, reusing the file of an earlier one when the tables did not change.
+
+    Any error is stored in the export before being raised again.
+
+    Returns
+    -------
+    Exportacion
+        The finished export.
+    """
+    exportacion = Exportacion.objects.get(pk=id_exportacion)
+    exportacion.status = Exportacion.EN_PROCESO
+    exportacion.save()
+    try:
+        exportacion.huella, total = table_fingerprint()
+        nombre = _reusable_file(exportacion)
+        if nombre is None:
+            nombre = _write_file(exportacion, total)
+    except Exception as error:
+        exportacion.status = Exportacion.ERROR
+        exportacion.error = str(error)
+        exportacion.save()
+        raise
+
+    exportacion.archivo.name = nombre
+    exportacion.status = Exportacion.TERMINADA
+    exportacion.progreso = 100
+    exportacion.fecha_terminacion = timezone.now()
+    exportacion.save()
+    return exportacion
@@ -159,3 +159,47 @@ class FeedbackForm(forms.ModelForm):
             estudio.status = Estudio.REVISION
         estudio.save()
         return feedback
+
+
+class StudyFilterForm(forms.Form):
+    """ Form with the sorting and filters of the listing of studies.
+
+    It is submitted by GET, along with the cursor of the page, see
+    administracion.views.list_studies.
+    """
+    ORDEN_NUMERO = 'numero'
+    ORDEN_MODIFICACION = 'modificacion'
+    OPCIONES_ORDEN = ((ORDEN_NUMERO, 'No. de Estudio'),
+                      ('-' + ORDEN_NUMERO, 'No. de Estudio (descendente)'),
+                      (ORDEN_MODIFICACION, 'Última modificación'),
+                      ('-' + ORDEN_MODIFICACION, 'Última modificación (descendente)'))
+    CAMPOS_ORDEN = {ORDEN_NUMERO: 'id', ORDEN_MODIFICACION: 'fecha_modificacion'}
+
+    orden = forms.ChoiceField(choices=OPCIONES_ORDEN, required=False,
+                              widget=forms.Select(attrs={'class': 'form-control'}))
+    capturista = forms.ModelChoiceField(
+        queryset=Capturista.objects.select_related('user').order_by('user__first_name'),
+        required=False,
+        empty_label='Todos los capturistas',
+        widget=forms.Select(attrs={'class': 'form-control'}))
+    familia = forms.CharField(required=False, max_length=200,
+                              widget=forms.TextInput(attrs={'class': 'form-control',
+                                                            'placeholder': 'Familia'}))
+
+    def sort_field(self):
+        """ Returns the field the studies are sorted by, and whether in descending order.
+
+        """
+        orden = self.cleaned_data.get('orden') or self.ORDEN_NUMERO
+        return self.CAMPOS_ORDEN[orden.lstrip('-')], orden.startswith('-')
+
+    def filter(self, estudios):
+        """ Returns the studies that match the filters of the form.
+
+        """
+        if self.cleaned_data.get('capturista'):
+            estudios = estudios.filter(capturista=self.cleaned_data['capturista'])
+        if self.cleaned_data.get('familia'):
+            estudios = estudios.filter(
+                familia__nombre_familiar__icontains=self.cleaned_data['familia'])
+        return estudios
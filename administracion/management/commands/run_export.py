@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from administracion.export_jobs import run_export
+
+
+class Command(BaseCommand):
+    """ Builds a background export of the database.
+
+    This command is run in its own process by
+    administracion.export_jobs.start_export, it can also be run by hand to
+    retry an export that failed.
+    """
+    help = 'Builds the export of the database with the given id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('id_exportacion', type=int)
+
+    def handle(self, *args, **options):
+        exportacion = run_export(options['id_exportacion'])
+        self.stdout.write('Exportación terminada: {}'.format(exportacion.archivo.name))
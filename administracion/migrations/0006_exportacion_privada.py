@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 15:17
+from __future__ import unicode_literals
+
+import core.storage
+from django.db import migrations, models
+
+
+def move_files(apps, schema_editor):
+    """ Moves the files of the existing exports out of MEDIA_ROOT.
+
+    """
+    Exportacion = apps.get_model('administracion', 'Exportacion')
+    core.storage.move_to_private(Exportacion.objects.exclude(archivo='')
+                                                    .values_list('archivo', flat=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_exportacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportacion',
+            name='archivo',
+            field=models.FileField(blank=True, storage=core.storage.PrivateStorage(),
+                                   upload_to='exportaciones/'),
+        ),
+        migrations.RunPython(move_files, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core.storage import private_storage
 
 
 class Escuela(models.Model):
@@ -23,3 +28,72 @@ class Colegiatura(models.Model):
 
         """
         return '${:.2f}'.format(self.monto)
+
+
+class Exportacion(models.Model):
+    """ Model for the exports of the database built in the background.
+
+    The export is built by the run_export management command, in a process
+    started by administracion.export_jobs.start_export, which writes the file
+    to PRIVATE_MEDIA_ROOT and reports its progress here.
+
+    Attributes:
+    -----------
+    OPCIONES_FORMATO : tuple(tuple())
+        The formats in which the database can be exported.
+    OPCIONES_STATUS : tuple(tuple())
+        The states of the export.
+    usuario : ForeignKey
+        The administrator who requested the export.
+    formato : CharField
+        The format of the file.
+    status : CharField
+        Whether the export is waiting, being built, finished or failed.
+    progreso : IntegerField
+        The percentage of rows already written.
+    huella : CharField
+        Hash of the state of the exported tables, see
+        estudios_socioeconomicos.export.table_fingerprint. Exports with
+        the same format and huella have the same content.
+    archivo : FileField
+        The finished file, it may be shared with an earlier export.
+    error : TextField
+        The reason why the export failed.
+    """
+    XLSX = 'xlsx'
+    CSV = 'csv'
+    OPCIONES_FORMATO = ((XLSX, 'Excel (xlsx)'),
+                        (CSV, 'CSV (zip)'))
+
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    TERMINADA = 'terminada'
+    ERROR = 'error'
+    OPCIONES_STATUS = ((PENDIENTE, 'Pendiente'),
+                       (EN_PROCESO, 'En proceso'),
+                       (TERMINADA, 'Terminada'),
+                       (ERROR, 'Error'))
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL)
+    formato = models.CharField(max_length=10, choices=OPCIONES_FORMATO, default=XLSX)
+    status = models.CharField(max_length=20, choices=OPCIONES_STATUS, default=PENDIENTE)
+    progreso = models.IntegerField(default=0)
+    huella = models.CharField(max_length=40, blank=True)
+    archivo = models.FileField(upload_to='exportaciones/', storage=private_storage, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_terminacion = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return 'Exportación {formato} del {fecha}'.format(formato=self.get_formato_display(),
+                                                          fecha=self.fecha_creacion)
+
+
+@receiver(post_delete, sender=Exportacion)
+def delete_export_file(sender, instance, **kwargs):
+    """ Deletes the file of an export, unless another export reuses it.
+
+    """
+    if instance.archivo and \
+            not Exportacion.objects.filter(archivo=instance.archivo.name).exists():
+        instance.archivo.delete(save=False)
@@ -0,0 +1,120 @@
+""" Keyset pagination of the listings of the administrador.
+
+Paginating with OFFSET makes the database read and discard every row before
+the requested page, so the further the page the slower it is. Each page is
+instead identified by a cursor with the sort value and primary key of the row
+it starts after (or before, when going back), and only the rows of the page
+are read, following an index on the sort column and the primary key.
+
+Cursors are signed, so a tampered one is ignored and the first page is shown.
+"""
+from django.core import signing
+from django.db.models import Q
+
+
+TAMANO_PAGINA = 50
+
+_SALT = 'administracion.pagination'
+
+
+class KeysetPage(object):
+    """ A page of a keyset paginated queryset.
+
+    Attributes:
+    -----------
+    object_list : list
+        The objects of the page, in the requested order.
+    siguiente : str
+        The cursor of the next page, or None if this is the last one.
+    anterior : str
+        The cursor of the previous page, or None if this is the first one.
+    """
+
+    def __init__(self, object_list, siguiente, anterior):
+        self.object_list = object_list
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def make_cursor(objeto, campo):
+    """ Returns the cursor of the page that starts after or before an object.
+
+    """
+    valor = getattr(objeto, campo)
+    if hasattr(valor, 'isoformat'):
+        valor = valor.isoformat()
+    return signing.dumps([valor, objeto.pk], salt=_SALT)
+
+
+def parse_cursor(cursor):
+    """ Returns the sort value and primary key of a cursor, or None if it is not valid.
+
+    """
+    if not cursor:
+        return None
+    try:
+        valor, pk = signing.loads(cursor, salt=_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return valor, pk
+
+
+def keyset_page(queryset, campo, descendente=False, despues=None, antes=None,
+                tamano=TAMANO_PAGINA):
+    """ Returns a page of a queryset sorted by a field and its primary key.
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        The filtered objects to paginate.
+    campo : str
+        The name of the concrete field the objects are sorted by.
+    descendente : bool
+        Whether the objects are sorted in descending order.
+    despues : str
+        The cursor of the page to return, as KeysetPage.siguiente.
+    antes : str
+        The cursor of the page to return when going back, as KeysetPage.anterior.
+    tamano : int
+        The maximum number of objects of the page.
+
+    Returns
+    -------
+    KeysetPage
+        The page, the first one when no valid cursor is given.
+    """
+    adelante = True
+    cursor = parse_cursor(despues)
+    if cursor is None:
+        cursor = parse_cursor(antes)
+        adelante = cursor is None
+
+    # Going back reads the rows in the opposite order, from the cursor.
+    ascendente = adelante != descendente
+    if cursor is not None:
+        valor, pk = cursor
+        operador = '__gt' if ascendente else '__lt'
+        queryset = queryset.filter(Q(**{campo + operador: valor}) |
+                                   Q(**{campo: valor, 'pk' + operador: pk}))
+    orden = [campo, 'pk'] if ascendente else ['-' + campo, '-pk']
+    objetos = list(queryset.order_by(*orden)[:tamano + 1])
+    hay_mas = len(objetos) > tamano
+    objetos = objetos[:tamano]
+    if not adelante:
+        objetos.reverse()
+
+    siguiente = anterior = None
+    if objetos:
+        if adelante:
+            siguiente = make_cursor(objetos[-1], campo) if hay_mas else None
+            anterior = make_cursor(objetos[0], campo) if cursor is not None else None
+        else:
+            siguiente = make_cursor(objetos[-1], campo)
+            anterior = make_cursor(objetos[0], campo) if hay_mas else None
+    return KeysetPage(objetos, siguiente, anterior)
@@ -1,6 +1,7 @@
 from django import template
 
 from captura.utils import user_can_modify_study
+from perfiles_usuario.utils import is_member
 
 register = template.Library()
 
@@ -15,8 +16,11 @@ def has_group(user, group_name):
 
         Django checks by default on the root of each projet for a
         folder called templatetags to add custom templatetags.
+
+        The groups of the user are read once per request, see
+        perfiles_usuario.utils.user_groups.
     """
-    return user.groups.filter(name=group_name).exists()
+    return is_member(user, [group_name])
 
 
 @register.filter(name='can_modify_study')
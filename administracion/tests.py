@@ -1,13 +1,21 @@
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
 from django.test import TestCase
 from django.test.client import RequestFactory
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User, Group
+from django.utils import timezone
 from perfiles_usuario.utils import ADMINISTRADOR_GROUP, CAPTURISTA_GROUP
 from perfiles_usuario.models import Capturista
 from familias.models import Familia, Integrante, Alumno
 from estudios_socioeconomicos.models import Estudio
 from becas.models import Beca
-from .models import Escuela
+from core.models import MedicionEndpoint
+from .export_jobs import run_export, fail_stale_exports, DURACION_MAXIMA
+from .models import Escuela, Exportacion
 from .forms import UserForm, DeleteUserForm, FeedbackForm
 
 
@@ -44,6 +52,35 @@ class TestAdministracionUrls(TestCase):
         self.assertEqual(200, response.status_code)
         self.assertTemplateUsed(response, 'administracion/search_students.html')
 
+    def test_view_search_students_results(self):
+        """ Test that the search returns the matching students as JSON.
+
+        """
+        escuela = Escuela.objects.create(nombre='Juan Pablo')
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=2,
+                                         estado_civil='soltero',
+                                         localidad='salitre',
+                                         nombre_familiar='Gatos')
+        integrante = Integrante.objects.create(familia=familia,
+                                               nombres='Elver',
+                                               apellidos='Ga',
+                                               nivel_estudios='doctorado',
+                                               fecha_de_nacimiento='1996-02-26')
+        alumno = Alumno.objects.create(integrante=integrante,
+                                       numero_sae='5876',
+                                       escuela=escuela)
+
+        url = reverse('administracion:search_students_results')
+        response = self.client.get(url, {'q': 'gatos'})
+        self.assertEqual(200, response.status_code)
+        datos = response.json()
+        self.assertFalse(datos['siguiente'])
+        self.assertEqual(len(datos['resultados']), 1)
+        self.assertEqual(datos['resultados'][0]['id'], alumno.pk)
+        self.assertEqual(datos['resultados'][0]['escuela'], 'Juan Pablo')
+        self.assertEqual(self.client.get(url, {'q': 'perros'}).json()['resultados'], [])
+        self.assertEqual(400, self.client.get(url, {'pagina': 'uno'}).status_code)
+
     def test_view_detail_student(self):
         """ Test we can access the view for details of a student.
 
@@ -338,3 +375,240 @@ class TestFeedBack(TestCase):
         form.save()
         status = Estudio.objects.get(id=self.study.id).status
         self.assertEqual(status, Estudio.REVISION)
+
+
+class TestExportaciones(TestCase):
+    """ Suite to test the background exports of the database.
+
+    The process that builds an export is only started once the transaction
+    commits, which never happens inside a TestCase, so the tests run the
+    export directly.
+    """
+
+    def setUp(self):
+        thelma = User.objects.create_user(
+            username='thelma', email='juan@pablo.com', password='junipero',
+            first_name='Thelma', last_name='Amlet')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.login(username='thelma', password='junipero')
+        self.thelma = thelma
+
+    def tearDown(self):
+        """ Removes the files written by the exports.
+
+        """
+        for exportacion in Exportacion.objects.all():
+            exportacion.delete()
+
+    def test_run_export(self):
+        """ Test that the export is written to PRIVATE_MEDIA_ROOT and reported as finished.
+
+        """
+        exportacion = Exportacion.objects.create(usuario=self.thelma, formato=Exportacion.CSV)
+        run_export(exportacion.pk)
+        exportacion.refresh_from_db()
+
+        self.assertEqual(exportacion.status, Exportacion.TERMINADA)
+        self.assertEqual(exportacion.progreso, 100)
+        self.assertTrue(exportacion.archivo.name.startswith('exportaciones/'))
+        self.assertTrue(exportacion.archivo.name.endswith('.zip'))
+        self.assertTrue(os.path.isfile(os.path.join(settings.PRIVATE_MEDIA_ROOT,
+                                                    exportacion.archivo.name)))
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT,
+                                                     exportacion.archivo.name)))
+        with self.assertRaises(ValueError):
+            exportacion.archivo.url
+
+    def test_fail_stale_exports(self):
+        """ Test that the exports left unfinished for too long are marked as failed.
+
+        """
+        reciente = Exportacion.objects.create(status=Exportacion.EN_PROCESO)
+        atascada = Exportacion.objects.create(status=Exportacion.EN_PROCESO)
+        Exportacion.objects.filter(pk=atascada.pk).update(
+            fecha_creacion=timezone.now() - DURACION_MAXIMA - timedelta(minutes=1))
+
+        self.assertEqual(fail_stale_exports(), 1)
+        reciente.refresh_from_db()
+        atascada.refresh_from_db()
+        self.assertEqual(reciente.status, Exportacion.EN_PROCESO)
+        self.assertEqual(atascada.status, Exportacion.ERROR)
+
+    def test_export_is_reused(self):
+        """ Test that the file is reused only while the tables do not change.
+
+        """
+        primera = run_export(Exportacion.objects.create(formato=Exportacion.XLSX).pk)
+        segunda = run_export(Exportacion.objects.create(formato=Exportacion.XLSX).pk)
+        self.assertEqual(primera.archivo.name, segunda.archivo.name)
+
+        csv = run_export(Exportacion.objects.create(formato=Exportacion.CSV).pk)
+        self.assertNotEqual(csv.archivo.name, primera.archivo.name)
+
+        escuela = Escuela.objects.all().first()
+        escuela.nombre = 'Otro nombre'
+        escuela.save()
+        tercera = run_export(Exportacion.objects.create(formato=Exportacion.XLSX).pk)
+        self.assertNotEqual(tercera.huella, primera.huella)
+        self.assertNotEqual(tercera.archivo.name, primera.archivo.name)
+
+        primera.delete()
+        self.assertTrue(segunda.archivo.storage.exists(segunda.archivo.name))
+        segunda.delete()
+        self.assertFalse(segunda.archivo.storage.exists(segunda.archivo.name))
+
+    def test_view_exports(self):
+        """ Test that an export can be requested, listed and downloaded.
+
+        """
+        url = reverse('administracion:exports')
+        response = self.client.post(url, {'formato': Exportacion.XLSX})
+        self.assertRedirects(response, url)
+        exportacion = Exportacion.objects.get()
+        self.assertEqual(exportacion.status, Exportacion.PENDIENTE)
+        self.assertEqual(exportacion.usuario, self.thelma)
+
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertTemplateUsed(response, 'administracion/exports.html')
+        self.assertTrue(response.context['en_proceso'])
+
+        descarga = reverse('administracion:exports_download', args=[exportacion.pk])
+        self.assertEqual(404, self.client.get(descarga).status_code)
+        run_export(exportacion.pk)
+        response = self.client.get(descarga)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+        response = self.client.post(url, {'formato': 'pdf'})
+        self.assertEqual(400, response.status_code)
+
+
+class TestListStudies(TestCase):
+    """ Suite to test the paginated listing of studies.
+
+    Attributes:
+    -----------
+    capturistas : list
+        Two capturistas, the studies are assigned to them alternately.
+    estudios : list
+        The approved studies, in the order they were created.
+    """
+
+    def setUp(self):
+        thelma = User.objects.create_user(username='thelma', password='junipero')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.login(username='thelma', password='junipero')
+
+        self.capturistas = [
+            Capturista.objects.create(user=User.objects.create_user(username=nombre))
+            for nombre in ('erikiano', 'vacalalo')]
+        escuela = Escuela.objects.create(nombre='Juan Pablo')
+        self.estudios = []
+        for numero in range(7):
+            familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                             estado_civil='soltero',
+                                             localidad='otro',
+                                             nombre_familiar='Familia {}'.format(numero))
+            integrante = Integrante.objects.create(familia=familia,
+                                                   nombres='Alumno',
+                                                   apellidos=str(numero),
+                                                   nivel_estudios='ninguno',
+                                                   fecha_de_nacimiento='2008-02-26')
+            Alumno.objects.create(integrante=integrante, numero_sae=str(numero), escuela=escuela)
+            Integrante.objects.create(familia=familia,
+                                      nombres='Tutor',
+                                      apellidos=str(numero),
+                                      nivel_estudios='ninguno',
+                                      fecha_de_nacimiento='1980-02-26')
+            self.estudios.append(Estudio.objects.create(capturista=self.capturistas[numero % 2],
+                                                        familia=familia,
+                                                        status=Estudio.APROBADO))
+        self.url = reverse('administracion:main_estudios', args=[Estudio.APROBADO])
+
+    def ids(self, response):
+        return [estudio.id for estudio in response.context['estudios']]
+
+    def test_pages(self):
+        """ Test that following the cursors goes through every study once, and back.
+
+        """
+        with mock.patch('administracion.views.TAMANO_PAGINA', 3):
+            paginas = []
+            response = self.client.get(self.url, {'orden': '-numero'})
+            self.assertIsNone(response.context['anterior_url'])
+            paginas.append(self.ids(response))
+            while response.context['siguiente_url']:
+                response = self.client.get(self.url + response.context['siguiente_url'])
+                paginas.append(self.ids(response))
+            anterior = self.client.get(self.url + response.context['anterior_url'])
+
+        esperados = sorted((estudio.id for estudio in self.estudios), reverse=True)
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual(sum(paginas, []), esperados)
+        self.assertEqual(self.ids(anterior), paginas[1])
+
+    def test_filters(self):
+        """ Test that the studies are filtered by capturista and family name.
+
+        """
+        response = self.client.get(self.url, {'capturista': self.capturistas[1].pk})
+        self.assertEqual(self.ids(response), [estudio.id for estudio in self.estudios[1::2]])
+        response = self.client.get(self.url, {'familia': 'familia 3'})
+        self.assertEqual(self.ids(response), [self.estudios[3].id])
+        self.assertContains(response, 'Alumno 3')
+        self.assertNotContains(response, 'Tutor 3')
+
+        response = self.client.get(self.url, {'despues': 'not a cursor', 'orden': 'otro'})
+        self.assertEqual(self.ids(response), [estudio.id for estudio in self.estudios])
+
+    def test_query_count(self):
+        """ Test that the number of queries does not depend on the number of studies.
+
+        """
+        self.client.get(self.url)  # Loads the session and the groups of the user.
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+        Estudio.objects.create(capturista=self.capturistas[0],
+                               familia=Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                                              estado_civil='soltero',
+                                                              localidad='otro'),
+                               status=Estudio.APROBADO)
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+
+
+class TestSlowestEndpoints(TestCase):
+    """ Suite to test the list of the endpoints measured by core.instrumentation.
+
+    """
+
+    def setUp(self):
+        thelma = User.objects.create_user(username='thelma', password='junipero')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.login(username='thelma', password='junipero')
+
+    def test_slowest_endpoints(self):
+        """ Test that the endpoints are listed by the chosen order.
+
+        """
+        MedicionEndpoint.objects.create(metodo='GET', ruta='lenta', peticiones=2,
+                                        tiempo_total=400, tiempo_maximo=300, consultas=10)
+        MedicionEndpoint.objects.create(metodo='GET', ruta='picos', peticiones=4,
+                                        tiempo_total=400, tiempo_maximo=350, consultas=80)
+        MedicionEndpoint.objects.create(metodo='GET', ruta='nueva')
+
+        url = reverse('administracion:slowest_endpoints')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([medicion.ruta for medicion in response.context['mediciones']],
+                         ['lenta', 'picos'])
+        response = self.client.get(url, {'orden': 'maximo'})
+        self.assertEqual([medicion.ruta for medicion in response.context['mediciones']],
+                         ['picos', 'lenta'])
+        response = self.client.get(url, {'orden': 'consultas'})
+        self.assertEqual(response.context['mediciones'][0].ruta, 'picos')
+        self.assertContains(response, '200.0')
@@ -2,7 +2,8 @@ from django.conf.urls import url
 from .views import admin_users_dashboard, \
                    admin_users_create, admin_users_edit, admin_users_edit_form, \
                    admin_users_delete_modal, admin_users_delete, list_studies, \
-                   search_students, detail_student
+                   search_students, search_students_results, detail_student, \
+                   exports_dashboard, exports_download, slowest_endpoints
 
 app_name = 'administracion'
 
@@ -15,6 +16,11 @@ urlpatterns = [
     url(r'^usuarios/borrar/confirmar/', admin_users_delete, name='users_delete'),
     url(r'^usuarios/', admin_users_dashboard, name='users'),
     url(r'^principal/(?P<status_study>[\w\-]+)/$', list_studies, name='main_estudios'),
+    url(r'^busqueda/resultados/$', search_students_results, name='search_students_results'),
     url(r'^busqueda/', search_students, name='search_students'),
     url(r'^detalle-alumno/(?P<id_alumno>[0-9]+)', detail_student, name='detail_student'),
+    url(r'^respaldos/$', exports_dashboard, name='exports'),
+    url(r'^respaldos/(?P<id_exportacion>[0-9]+)/descargar/$', exports_download,
+        name='exports_download'),
+    url(r'^rendimiento/$', slowest_endpoints, name='slowest_endpoints'),
 ]
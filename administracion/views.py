@@ -1,15 +1,28 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test, login_required
-from django.http import HttpResponse
+from django.db.models import Prefetch, ExpressionWrapper, F, FloatField
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseBadRequest, FileResponse, Http404, \
+    JsonResponse
 
 from perfiles_usuario.utils import is_administrador
+from core.models import MedicionEndpoint
+from core.query_budget import query_budget
+from estudios_socioeconomicos.export import TIPOS_CONTENIDO
 from estudios_socioeconomicos.models import Estudio
 from familias.models import Alumno, Integrante
+from familias.search import search_students as search_students_query
 from becas.models import Beca
 from becas.forms import CartaForm
 from becas.utils import generate_letter, aportacion_por_beca
-from .forms import UserForm, DeleteUserForm
+from .export_jobs import start_export, fail_stale_exports
+from .forms import UserForm, DeleteUserForm, StudyFilterForm
+from .models import Colegiatura, Exportacion
+from .pagination import keyset_page, TAMANO_PAGINA
 
 
 @login_required
@@ -96,31 +109,96 @@ def admin_users_delete(request):
 
 @login_required
 @user_passes_test(is_administrador)
+@query_budget(7)
 def list_studies(request, status_study):
     """ View to list the studies with a specific status according to the button pushed
 
+    The studies are shown by pages, which can be sorted and filtered with
+    StudyFilterForm. Each page is read with keyset pagination, and the
+    students of its families are fetched with a single query, so the time to
+    render a page does not depend on the number of studies.
     """
     total_estudios = Estudio.objects.count()
-    estudios = Estudio.objects.filter(status=status_study)
-    contexto = {'estudios': estudios,
+    form = StudyFilterForm(request.GET)
+    estudios = Estudio.objects.filter(status=status_study) \
+                              .select_related('capturista__user', 'familia') \
+                              .prefetch_related(Prefetch(
+                                  'familia__integrante_familia',
+                                  queryset=Integrante.objects.filter(
+                                      alumno_integrante__isnull=False).order_by('pk'),
+                                  to_attr='alumnos'))
+    campo, descendente = 'id', False
+    if form.is_valid():
+        estudios = form.filter(estudios)
+        campo, descendente = form.sort_field()
+    pagina = keyset_page(estudios, campo, descendente,
+                         despues=request.GET.get('despues'),
+                         antes=request.GET.get('antes'),
+                         tamano=TAMANO_PAGINA)
+
+    parametros = request.GET.copy()
+    parametros.pop('despues', None)
+    parametros.pop('antes', None)
+    urls = {}
+    for nombre, cursor in (('despues', pagina.siguiente), ('antes', pagina.anterior)):
+        if cursor is not None:
+            parametros[nombre] = cursor
+            urls[nombre] = '?' + parametros.urlencode()
+            parametros.pop(nombre)
+
+    contexto = {'estudios': pagina,
                 'estado': status_study,
                 'status_options': Estudio.get_options_status(),
-                'total_estudios': total_estudios}
+                'total_estudios': total_estudios,
+                'filtro_form': form,
+                'siguiente_url': urls.get('despues'),
+                'anterior_url': urls.get('antes')}
     return render(request, 'estudios_socioeconomicos/listado_estudios.html', contexto)
 
 
 @login_required
 @user_passes_test(is_administrador)
 def search_students(request):
-    """ View to list all active students.
+    """ View to search the active students.
+
+    The students are fetched by the page from search_students_results.
+    """
+    return render(request, 'administracion/search_students.html')
+
+
+@login_required
+@user_passes_test(is_administrador)
+@query_budget(4)
+def search_students_results(request):
+    """ View that returns a page of the students that match a query, as JSON.
 
+    GET parameters: q, the text to search, and pagina, the number of the page
+    starting at 1.
     """
-    students = Alumno.objects.filter(activo=True)
-    return render(request, 'administracion/search_students.html', {'students': students})
+    try:
+        pagina = int(request.GET.get('pagina', 1))
+    except ValueError:
+        return HttpResponseBadRequest('Página inválida')
+    alumnos, siguiente = search_students_query(request.GET.get('q', ''), pagina)
+    resultados = []
+    for alumno in alumnos:
+        integrante = alumno.integrante
+        estudio = getattr(integrante.familia, 'estudio', None)
+        resultados.append({'id': alumno.pk,
+                           'estudio': estudio.pk if estudio is not None else None,
+                           'nombres': integrante.nombres,
+                           'apellidos': integrante.apellidos,
+                           'grado': integrante.get_nivel_estudios_display(),
+                           'numero_sae': alumno.numero_sae,
+                           'escuela': alumno.escuela.nombre,
+                           'familia': integrante.familia.nombre_familiar,
+                           'url': reverse('administracion:detail_student', args=[alumno.pk])})
+    return JsonResponse({'resultados': resultados, 'pagina': pagina, 'siguiente': siguiente})
 
 
 @login_required
 @user_passes_test(is_administrador)
+@query_budget(8)
 def detail_student(request, id_alumno):
     """ View to show the complete information of a student, and to
     generate the letter of scholarship in case of POST.
@@ -135,8 +213,9 @@ def detail_student(request, id_alumno):
         'becas': becas
     }
     if request.method == 'GET':
+        colegiatura = Colegiatura.objects.all()[0]
         for beca in becas:
-            beca.aportacion = aportacion_por_beca(beca)
+            beca.aportacion = aportacion_por_beca(beca, colegiatura)
 
         context['form'] = CartaForm(initial={
             'grado': dict(Integrante.OPCIONES_NIVEL_ESTUDIOS)[alumno.integrante.nivel_estudios],
@@ -150,7 +229,7 @@ def detail_student(request, id_alumno):
             filename = 'carta_beca_{}.pdf'.format(alumno)
             response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
             # obtain last scholarship
-            beca_actual = Beca.objects.filter(alumno=alumno).order_by('-fecha_de_asignacion')[0]
+            beca_actual = Beca.objects.get(alumno=alumno, actual=True)
 
             generate_letter(response, nombre=str(alumno.integrante),
                             ciclo=form.cleaned_data['ciclo'],
@@ -162,3 +241,79 @@ def detail_student(request, id_alumno):
         else:
             context['form'] = form
     return render(request, 'administracion/detail_student.html', context)
+
+
+@login_required
+@user_passes_test(is_administrador)
+def exports_dashboard(request):
+    """ View to list the background exports of the database.
+
+    GET: return the exports, the newest first, after marking as failed the
+    ones whose process died
+    POST: create an export in the chosen formato and start building it
+    """
+    if request.method == 'POST':
+        formato = request.POST.get('formato')
+        if formato not in dict(Exportacion.OPCIONES_FORMATO):
+            return HttpResponseBadRequest()
+        exportacion = Exportacion.objects.create(usuario=request.user, formato=formato)
+        start_export(exportacion)
+        return redirect('administracion:exports')
+
+    fail_stale_exports()
+    exportaciones = Exportacion.objects.select_related('usuario').order_by('-fecha_creacion')
+    en_proceso = exportaciones.filter(status__in=[Exportacion.PENDIENTE,
+                                                  Exportacion.EN_PROCESO]).exists()
+    return render(request, 'administracion/exports.html',
+                  {'exportaciones': exportaciones,
+                   'en_proceso': en_proceso,
+                   'opciones_formato': Exportacion.OPCIONES_FORMATO})
+
+
+@login_required
+@user_passes_test(is_administrador)
+def exports_download(request, id_exportacion):
+    """ View to download the file of a finished export.
+
+    The files hold the whole database, so they are stored in PRIVATE_MEDIA_ROOT,
+    which has no URL, and this view is the only way to download them.
+    """
+    exportacion = get_object_or_404(Exportacion, pk=id_exportacion,
+                                    status=Exportacion.TERMINADA)
+    storage = exportacion.archivo.storage
+    if not exportacion.archivo or not storage.exists(exportacion.archivo.name):
+        raise Http404()
+
+    response = FileResponse(storage.open(exportacion.archivo.name, 'rb'),
+                            content_type=TIPOS_CONTENIDO[exportacion.formato])
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        os.path.basename(exportacion.archivo.name))
+    return response
+
+
+@login_required
+@user_passes_test(is_administrador)
+def slowest_endpoints(request):
+    """ View to list the endpoints measured by core.instrumentation, the slowest first.
+
+    The orden GET parameter sorts them by their average time (promedio, the
+    default), their slowest request (maximo) or their average number of
+    queries (consultas).
+    """
+    ordenes = {
+        'promedio': ExpressionWrapper(F('tiempo_total') / F('peticiones'),
+                                      output_field=FloatField()),
+        'maximo': F('tiempo_maximo'),
+        'consultas': ExpressionWrapper(F('consultas') * 1.0 / F('peticiones'),
+                                       output_field=FloatField()),
+    }
+    orden = request.GET.get('orden')
+    if orden not in ordenes:
+        orden = 'promedio'
+    mediciones = MedicionEndpoint.objects.filter(peticiones__gt=0) \
+                                         .annotate(valor_orden=ordenes[orden]) \
+                                         .order_by('-valor_orden', 'ruta')[:TAMANO_PAGINA]
+    return render(request, 'administracion/rendimiento.html',
+                  {'mediciones': mediciones,
+                   'orden': orden,
+                   'muestreo': settings.INSTRUMENTACION_MUESTREO})
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class BecasConfig(AppConfig):
     name = 'becas'
+
+    def ready(self):
+        """ Connects the receivers that keep the current scholarship of each student.
+
+        """
+        from . import signals  # noqa: F401
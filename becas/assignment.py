@@ -0,0 +1,233 @@
+""" Assignment of scholarships to the students of many approved studies at once.
+
+The administrator picks the approved studies and either a percentage for
+every student, or a tabulador: the percentage of the monthly income of each
+family that it should pay, split among its students, as the assignment of a
+single study suggests it in the browser. assignment_preview computes the
+scholarship and aportación of every student without writing anything, and
+assign_scholarships writes the same rows in a single transaction.
+
+Between the preview and its confirmation the incomes of a family or its
+students may change, so the administrator could confirm scholarships that
+were never shown. The preview carries its preview_key, and confirm_assignment
+only writes the scholarships if they still have that key. The key includes
+the current scholarship of each student, so confirming the same preview
+twice, e.g. with a double click, fails the second time.
+"""
+import decimal
+import hashlib
+import json
+import math
+
+from django.db import transaction
+
+from administracion.models import Colegiatura
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Alumno
+from indicadores.models import ResumenFinanciero
+from indicadores.resumen import update_summaries
+from indicadores.snapshots import update_snapshot
+from .current import refresh_current
+from .models import Beca
+
+
+class FilaAsignacion(object):
+    """ The scholarship computed for a student.
+
+    Attributes:
+    -----------
+    estudio : Estudio
+        The approved study of the family of the student.
+    alumno : Alumno
+        The student, with its integrante.
+    ingresos : Decimal
+        The monthly income of the family.
+    porcentaje : int
+        The percentage of the scholarship, 0 if the family pays the whole
+        colegiatura.
+    aportacion : Decimal
+        The monthly amount the family pays for the student.
+    """
+
+    def __init__(self, estudio, alumno, ingresos, porcentaje, aportacion):
+        self.estudio = estudio
+        self.alumno = alumno
+        self.ingresos = ingresos
+        self.porcentaje = porcentaje
+        self.aportacion = aportacion
+
+
+def percentage_from_tabulador(ingresos, tabulador, alumnos, monto):
+    """ Returns the percentage of scholarship of the students of a family.
+
+    The family pays the tabulador percentage of its monthly income, split
+    among its students, and the scholarship covers the rest of the
+    colegiatura of each one.
+
+    Parameters
+    ----------
+    ingresos : Decimal
+        The monthly income of the family.
+    tabulador : int
+        The percentage of the income the family should pay.
+    alumnos : int
+        The number of students of the family.
+    monto : Decimal
+        The monthly colegiatura.
+
+    Returns
+    -------
+    int
+        The percentage, between 0 and 100.
+    """
+    pago = decimal.Decimal(ingresos) * tabulador / 100 / alumnos
+    porcentaje = math.floor((monto - pago) / monto * 100)
+    return max(0, min(100, porcentaje))
+
+
+def _incomes(ids_familia):
+    """ Returns the monthly income of each family, from their financial summaries.
+
+    """
+    ingresos = dict(ResumenFinanciero.objects.filter(familia_id__in=ids_familia)
+                                             .values_list('familia_id', 'ingresos'))
+    faltantes = [id_familia for id_familia in ids_familia if id_familia not in ingresos]
+    if faltantes:
+        update_summaries(faltantes)
+        ingresos.update(ResumenFinanciero.objects.filter(familia_id__in=faltantes)
+                                                 .values_list('familia_id', 'ingresos'))
+    return ingresos
+
+
+def assignment_preview(estudios, porcentaje=None, tabulador=None):
+    """ Computes the scholarship of the active students of many approved studies.
+
+    Either porcentaje or tabulador must be given. Studies that are not
+    approved are ignored.
+
+    Parameters
+    ----------
+    estudios : iterable
+        The ids of the studies.
+    porcentaje : int
+        The percentage of scholarship of every student.
+    tabulador : int
+        The percentage of the income of each family it should pay, see
+        percentage_from_tabulador.
+
+    Returns
+    -------
+    list
+        A FilaAsignacion per student, sorted by study and name.
+    """
+    estudios = {estudio.familia_id: estudio
+                for estudio in Estudio.objects.filter(pk__in=estudios,
+                                                      status=Estudio.APROBADO)
+                                              .select_related('familia')}
+    alumnos = list(Alumno.objects.filter(activo=True,
+                                         integrante__activo=True,
+                                         integrante__familia_id__in=estudios.keys())
+                                 .select_related('integrante')
+                                 .order_by('integrante__familia_id',
+                                           'integrante__apellidos',
+                                           'integrante__nombres',
+                                           'pk'))
+    if not alumnos:
+        return []
+
+    monto = Colegiatura.objects.all()[0].monto
+    ingresos = _incomes(list(estudios.keys()))
+    por_familia = {}
+    for alumno in alumnos:
+        id_familia = alumno.integrante.familia_id
+        por_familia[id_familia] = por_familia.get(id_familia, 0) + 1
+
+    filas = []
+    for alumno in alumnos:
+        id_familia = alumno.integrante.familia_id
+        ingreso = ingresos.get(id_familia, decimal.Decimal(0))
+        if tabulador is not None:
+            calculado = percentage_from_tabulador(ingreso, tabulador,
+                                                  por_familia[id_familia], monto)
+        else:
+            calculado = int(porcentaje)
+        aportacion = (monto - monto * calculado / 100).quantize(decimal.Decimal('0.01'))
+        filas.append(FilaAsignacion(estudios[id_familia], alumno, ingreso,
+                                    calculado, aportacion))
+    return filas
+
+
+class VistaPreviaCambiada(Exception):
+    """ The scholarships to assign are no longer the ones of the confirmed preview.
+
+    """
+
+
+def preview_key(filas):
+    """ Returns the hash of the rows of a preview and of the current scholarships of its students.
+
+    """
+    alumnos = [fila.alumno.pk for fila in filas]
+    actuales = dict(Beca.objects.filter(alumno_id__in=alumnos, actual=True)
+                                .values_list('alumno_id', 'pk'))
+    datos = [(fila.estudio.pk, fila.alumno.pk, str(fila.ingresos), fila.porcentaje,
+              str(fila.aportacion), actuales.get(fila.alumno.pk))
+             for fila in filas]
+    return hashlib.sha256(json.dumps(datos).encode('utf-8')).hexdigest()
+
+
+def confirm_assignment(estudios, clave, **regla):
+    """ Assigns the scholarships of a preview if they are still the ones it showed.
+
+    The studies are locked while the preview is computed again and written,
+    so a second confirmation of the same preview waits for the first one and
+    then finds the current scholarships changed.
+
+    Parameters
+    ----------
+    estudios : iterable
+        The ids of the studies, as given to assignment_preview.
+    clave : str
+        The preview_key of the preview that was shown.
+    regla : dict
+        The porcentaje or tabulador, as given to assignment_preview.
+
+    Raises
+    ------
+    VistaPreviaCambiada
+        If the preview computed now has another key.
+
+    Returns
+    -------
+    list
+        The created scholarships.
+    """
+    with transaction.atomic():
+        list(Estudio.objects.select_for_update().filter(pk__in=estudios).values_list('pk'))
+        filas = assignment_preview(estudios, **regla)
+        if preview_key(filas) != clave:
+            raise VistaPreviaCambiada('La vista previa cambió.')
+        return assign_scholarships(filas)
+
+
+def assign_scholarships(filas):
+    """ Writes the scholarships of a preview in a single transaction.
+
+    Students whose scholarship is 0% get a 0% one too, so that it replaces
+    the scholarship they had before as the current one. The current
+    scholarships and the snapshots of the families are refreshed once, since
+    bulk inserts do not send the signals that would refresh them per
+    scholarship.
+
+    Returns
+    -------
+    list
+        The created scholarships.
+    """
+    becas = [Beca(alumno=fila.alumno, porcentaje=str(fila.porcentaje)) for fila in filas]
+    with transaction.atomic():
+        creadas = Beca.objects.bulk_create(becas)
+        refresh_current({beca.alumno_id for beca in becas})
+        for id_familia in {fila.estudio.familia_id for fila in filas}:
+            update_snapshot(id_familia)
+    return creadas
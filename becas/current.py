@@ -0,0 +1,47 @@
+""" The current scholarship of each student.
+
+A student keeps the history of its scholarships, and the one that applies is
+the latest assigned. Instead of sorting the history of every student each
+time it is needed, the latest scholarship is flagged with Beca.actual, so the
+current scholarships of any number of students are read with a single query.
+
+The receivers in .signals refresh the flag when a scholarship is saved or
+deleted. Code that writes scholarships in bulk calls refresh_current itself.
+"""
+from .models import Beca
+
+
+def refresh_current(ids_alumno):
+    """ Flags the latest scholarship of each student, and only that one, as actual.
+
+    Returns
+    -------
+    set
+        The ids of the current scholarships.
+    """
+    ids_alumno = list(ids_alumno)
+    ultimas = {}
+    becas = Beca.objects.filter(alumno_id__in=ids_alumno) \
+                        .order_by('alumno_id', 'fecha_de_asignacion', 'id') \
+                        .values_list('alumno_id', 'id')
+    for id_alumno, id_beca in becas:
+        ultimas[id_alumno] = id_beca
+    actuales = set(ultimas.values())
+
+    Beca.objects.filter(alumno_id__in=ids_alumno, actual=True) \
+                .exclude(pk__in=actuales) \
+                .update(actual=False)
+    Beca.objects.filter(pk__in=actuales, actual=False).update(actual=True)
+    return actuales
+
+
+def current_scholarships(ids_alumno):
+    """ Returns the current scholarship of each student that has one.
+
+    Returns
+    -------
+    dict
+        The Beca of each student, by the id of the student.
+    """
+    return {beca.alumno_id: beca
+            for beca in Beca.objects.filter(alumno_id__in=ids_alumno, actual=True)}
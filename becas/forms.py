@@ -1,5 +1,10 @@
 from django import forms
 
+from administracion.models import Escuela
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Alumno
+from .models import Beca, LoteCartas
+
 
 class BecaForm(forms.Form):
     """ This form is used to assign a scholarship
@@ -31,6 +36,52 @@ class BecaForm(forms.Form):
             field.widget.attrs['class'] = 'form-control'
 
 
+class AsignacionMasivaForm(forms.Form):
+    """ This form is used to assign scholarships to the students
+    of many approved studies at once, see becas.assignment.
+
+    The scholarship is either the same percentage for every student, or
+    computed from the income of each family with a tabulador.
+    """
+
+    PORCENTAJE = 'porcentaje'
+    TABULADOR = 'tabulador'
+    OPCIONES_MODO = ((PORCENTAJE, 'Mismo porcentaje para todos'),
+                     (TABULADOR, 'Calcular con el tabulador'))
+
+    estudios = forms.ModelMultipleChoiceField(
+        label='Estudios',
+        queryset=Estudio.objects.filter(status=Estudio.APROBADO).select_related('familia'),
+        widget=forms.CheckboxSelectMultiple())
+    modo = forms.ChoiceField(label='Modo', choices=OPCIONES_MODO)
+    porcentaje = forms.ChoiceField(label='Porcentaje', choices=Beca.OPCIONES_PORCENTAJE,
+                                   required=False)
+    tabulador = forms.ChoiceField(label='Tabulador',
+                                  choices=BecaForm.OPCIONES_TABULADOR[:-1],
+                                  required=False)
+
+    def __init__(self, *args, **kwargs):
+        # Add the class form-control to all of the fields but the checkboxes
+        super(AsignacionMasivaForm, self).__init__(*args, **kwargs)
+        for field_name, field in self.fields.items():
+            if field_name != 'estudios':
+                field.widget.attrs['class'] = 'form-control'
+
+    def clean(self):
+        cleaned_data = super(AsignacionMasivaForm, self).clean()
+        modo = cleaned_data.get('modo')
+        if modo and not cleaned_data.get(modo):
+            self.add_error(modo, 'Este campo es obligatorio.')
+        return cleaned_data
+
+    def rule(self):
+        """ Returns the arguments of becas.assignment.assignment_preview.
+
+        """
+        modo = self.cleaned_data['modo']
+        return {modo: int(self.cleaned_data[modo])}
+
+
 class CartaForm(forms.Form):
     """ This form is used to fill in the slots to
     generate the scholarship letter.
@@ -46,3 +97,61 @@ class CartaForm(forms.Form):
         super(CartaForm, self).__init__(*args, **kwargs)
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'
+
+
+class LoteCartasForm(forms.Form):
+    """ This form is used to request the letters of many
+    students at once, see becas.letters.
+
+    The students are the active ones with a scholarship, optionally only
+    those of a ciclo escolar, of a school, or in the list of alumnos.
+    """
+
+    alumnos = forms.ModelMultipleChoiceField(queryset=Alumno.objects.filter(activo=True),
+                                             required=False,
+                                             widget=forms.MultipleHiddenInput())
+    ciclo_escolar = forms.ChoiceField(label='Ciclo Escolar',
+                                      choices=[('', 'Todos')] + Alumno.OPCIONES_CICLOS_ESCOLARES,
+                                      required=False)
+    escuela = forms.ModelChoiceField(label='Escuela', queryset=Escuela.objects.all(),
+                                     empty_label='Todas', required=False)
+    compromiso = forms.CharField(label='Compromiso de la Familia', required=True)
+    a_partir = forms.CharField(label='¿Desde cuándo empieza la aportación?', required=False,
+                               help_text='Si se deja vacío, agosto del ciclo de cada alumno.')
+    formato = forms.ChoiceField(label='Formato', choices=LoteCartas.OPCIONES_FORMATO)
+
+    def __init__(self, *args, **kwargs):
+        # Add the class form-control to all of the fields
+        super(LoteCartasForm, self).__init__(*args, **kwargs)
+        for field_name, field in self.fields.items():
+            field.widget.attrs['class'] = 'form-control'
+
+    def students(self):
+        """ Returns the ids of the students that get a letter.
+
+        """
+        alumnos = Alumno.objects.filter(activo=True, beca__actual=True)
+        if self.cleaned_data.get('alumnos'):
+            alumnos = alumnos.filter(pk__in=[alumno.pk for alumno in self.cleaned_data['alumnos']])
+        if self.cleaned_data.get('ciclo_escolar'):
+            alumnos = alumnos.filter(ciclo_escolar=self.cleaned_data['ciclo_escolar'])
+        if self.cleaned_data.get('escuela'):
+            alumnos = alumnos.filter(escuela=self.cleaned_data['escuela'])
+        return alumnos.order_by().values_list('pk', flat=True)
+
+    def clean(self):
+        cleaned_data = super(LoteCartasForm, self).clean()
+        if not self.errors and not self.students().exists():
+            raise forms.ValidationError('Ningún alumno con beca cumple los filtros.')
+        return cleaned_data
+
+    def save(self, usuario):
+        """ Creates the batch of letters of the selected students.
+
+        """
+        lote = LoteCartas.objects.create(usuario=usuario,
+                                         formato=self.cleaned_data['formato'],
+                                         compromiso=self.cleaned_data['compromiso'],
+                                         a_partir=self.cleaned_data['a_partir'])
+        lote.alumnos.add(*self.students())
+        return lote
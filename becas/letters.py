@@ -0,0 +1,251 @@
+""" Batches of scholarship letters built in the background.
+
+At the start of each ciclo escolar every student with a scholarship gets a
+letter. Instead of generating them one by one from the detail of each
+student, the administrator requests a LoteCartas with the students of a ciclo,
+a school or a list, and downloads a single pdf or a zip once it is ready. The
+letters are rendered by the run_letters management command, in a process of
+its own started by start_batch, which spreads them over a pool of PROCESOS
+worker processes.
+
+The letters hold the names and scholarships of the students, so the batches
+and the letters are stored in PRIVATE_MEDIA_ROOT, see core.storage, and the
+batches are only downloaded through becas.views.letters_download.
+
+Each rendered letter is kept in PRIVATE_MEDIA_ROOT/cartas/cache, named after
+the hash of everything printed on it: the name, grade, ciclo and scholarship
+of the student, the compromiso and a_partir of the batch, the colegiatura and
+the date. A letter whose inputs did not change is taken from there instead of
+being rendered again, e.g. when a batch is requested again after a few
+scholarships were corrected. Since the date is part of the hash, the letters
+are only reused on the day they were rendered, and each batch deletes the
+ones older than CADUCIDAD_CACHE.
+
+The workers only render letters to files, they never query the database, so
+they do not share the connection of the process that started them.
+"""
+import hashlib
+import io
+import json
+import os
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from django.utils import timezone
+from PyPDF2 import PdfFileMerger
+
+from administracion.models import Colegiatura
+from core.jobs import run_command
+from core.storage import private_storage
+from familias.models import Alumno, Integrante
+from .models import Beca, LoteCartas
+from .utils import generate_letter, format_letter_date
+
+
+CARPETA = 'cartas'
+CARPETA_CACHE = os.path.join(CARPETA, 'cache')
+
+CADUCIDAD_CACHE = timedelta(days=1)
+
+PROCESOS = os.cpu_count() or 1
+
+
+def start_batch(lote):
+    """ Starts the process that builds a batch of letters, once the current transaction commits.
+
+    """
+    run_command('run_letters', lote.pk)
+
+
+def letter_inputs(lote, colegiatura, fecha):
+    """ Returns the arguments of generate_letter for each student of a batch.
+
+    Students without a scholarship, or whose current one is 0%, are left
+    out. The percentage of each letter is the one of the current scholarship
+    of the student.
+
+    Returns
+    -------
+    list
+        A pair with each student and the arguments of its letter, sorted by
+        the name of the students.
+    """
+    alumnos = lote.alumnos.select_related('integrante') \
+                          .order_by('integrante__apellidos', 'integrante__nombres', 'pk')
+    becas = dict(Beca.objects.filter(alumno__lotes_cartas=lote, actual=True)
+                             .exclude(porcentaje='0')
+                             .values_list('alumno_id', 'porcentaje'))
+
+    niveles = dict(Integrante.OPCIONES_NIVEL_ESTUDIOS)
+    ciclos = dict(Alumno.OPCIONES_CICLOS_ESCOLARES)
+    cartas = []
+    for alumno in alumnos:
+        if alumno.pk not in becas:
+            continue
+        cartas.append((alumno, {
+            'nombre': str(alumno.integrante),
+            'ciclo': ciclos.get(alumno.ciclo_escolar, alumno.ciclo_escolar),
+            'grado': niveles.get(alumno.integrante.nivel_estudios,
+                                 alumno.integrante.nivel_estudios),
+            'porcentaje': '{}%'.format(becas[alumno.pk]),
+            'compromiso': lote.compromiso,
+            'a_partir': lote.a_partir or 'Agosto {}'.format(int(alumno.ciclo_escolar)),
+            'colegiatura': colegiatura,
+            'fecha': fecha,
+        }))
+    return cartas
+
+
+def letter_key(argumentos):
+    """ Returns the hash of the arguments of a letter, which names it in the cache.
+
+    """
+    datos = dict(argumentos, colegiatura=str(argumentos['colegiatura'].monto))
+    return hashlib.sha1(json.dumps(datos, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def render_letter(argumentos, ruta):
+    """ Renders a letter to a file, this runs in the worker processes.
+
+    The letter is written with a temporary name and renamed once complete,
+    so that the cache never holds a partial letter.
+    """
+    temporal = '{}.{}.part'.format(ruta, os.getpid())
+    try:
+        with open(temporal, 'wb') as archivo:
+            generate_letter(archivo, **argumentos)
+        os.rename(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return ruta
+
+
+def _render_letters(pendientes, procesos, progreso):
+    """ Renders the letters missing from the cache, in parallel if there are many.
+
+    pendientes maps the path of each letter to its arguments, progreso is
+    called after each letter is rendered.
+    """
+    if procesos <= 1 or len(pendientes) <= 1:
+        for ruta, argumentos in pendientes.items():
+            render_letter(argumentos, ruta)
+            progreso()
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(render_letter, argumentos, ruta)
+                   for ruta, argumentos in pendientes.items()]
+        for futuro in as_completed(futuros):
+            futuro.result()
+            progreso()
+
+
+def _write_file(lote, cartas, rutas):
+    """ Joins the letters in the file of the batch and returns its name in private_storage.
+
+    """
+    nombre = os.path.join(CARPETA, 'cartas_beca_{}_{}.{}'.format(
+        timezone.now().strftime('%Y%m%d%H%M%S'), uuid.uuid4().hex[:8], lote.formato))
+    ruta = private_storage.path(nombre)
+
+    try:
+        if lote.formato == LoteCartas.PDF:
+            documento = PdfFileMerger()
+            for ruta_carta in rutas:
+                with open(ruta_carta, 'rb') as carta:
+                    documento.append(io.BytesIO(carta.read()))
+            with open(ruta + '.part', 'wb') as archivo:
+                documento.write(archivo)
+            documento.close()
+        else:
+            with zipfile.ZipFile(ruta + '.part', 'w') as archivo:
+                for (alumno, argumentos), ruta_carta in zip(cartas, rutas):
+                    archivo.write(ruta_carta, 'carta_beca_{}_{}.pdf'.format(alumno.pk, alumno))
+        os.rename(ruta + '.part', ruta)
+    finally:
+        if os.path.exists(ruta + '.part'):
+            os.remove(ruta + '.part')
+    return nombre
+
+
+def prune_cache(caducidad=CADUCIDAD_CACHE):
+    """ Deletes the letters of the cache rendered longer than caducidad ago.
+
+    Their date is no longer today's, so no batch would take them again.
+
+    Returns
+    -------
+    int
+        The number of letters deleted.
+    """
+    carpeta = private_storage.path(CARPETA_CACHE)
+    if not os.path.isdir(carpeta):
+        return 0
+    limite = (timezone.now() - caducidad).timestamp()
+    borradas = 0
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borradas += 1
+        except FileNotFoundError:
+            pass  # Deleted by another batch in the meantime.
+    return borradas
+
+
+def run_batch(id_lote, procesos=PROCESOS):
+    """ Builds the file of a batch of letters, reusing the letters already rendered.
+
+    Any error is stored in the batch before being raised again.
+
+    Returns
+    -------
+    LoteCartas
+        The finished batch.
+    """
+    lote = LoteCartas.objects.get(pk=id_lote)
+    lote.status = LoteCartas.EN_PROCESO
+    lote.save()
+    try:
+        cartas = letter_inputs(lote, Colegiatura.objects.all()[0],
+                               format_letter_date(date.today()))
+        if not cartas:
+            raise ValueError('Ninguno de los alumnos tiene beca.')
+        prune_cache()
+        os.makedirs(private_storage.path(CARPETA_CACHE), exist_ok=True)
+        rutas = [private_storage.path(os.path.join(CARPETA_CACHE,
+                                                   letter_key(argumentos) + '.pdf'))
+                 for alumno, argumentos in cartas]
+        pendientes = {ruta: argumentos for (alumno, argumentos), ruta in zip(cartas, rutas)
+                      if not os.path.exists(ruta)}
+
+        lote.total = len(cartas)
+        lote.reutilizadas = lote.total - len(pendientes)
+        lote.save()
+        listas = [lote.reutilizadas, 0]  # Letters ready and the last percentage reported.
+
+        def progreso():
+            listas[0] += 1
+            porcentaje = min(99, listas[0] * 100 // lote.total)
+            if porcentaje != listas[1]:
+                listas[1] = porcentaje
+                LoteCartas.objects.filter(pk=lote.pk).update(progreso=porcentaje)
+
+        _render_letters(pendientes, procesos, progreso)
+        nombre = _write_file(lote, cartas, rutas)
+    except Exception as error:
+        lote.status = LoteCartas.ERROR
+        lote.error = str(error)
+        lote.save()
+        raise
+
+    lote.archivo.name = nombre
+    lote.status = LoteCartas.TERMINADO
+    lote.progreso = 100
+    lote.fecha_terminacion = timezone.now()
+    lote.save()
+    return lote
@@ -0,0 +1,40 @@
+import io
+import timeit
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from administracion.models import Colegiatura
+from becas.utils import generate_letter, format_letter_date, letter_styles, _parsed_paragraph
+
+
+class Command(BaseCommand):
+    """ Measures the time it takes to render a scholarship letter.
+
+    The letters are rendered in memory, with and without the styles and
+    static paragraphs that becas.utils builds once per process, so that
+    the cost of building them on every letter can be compared.
+    """
+    help = 'Prints the milliseconds it takes to render a scholarship letter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cartas', type=int, default=200,
+                            help='Number of letters rendered for each measure.')
+
+    def handle(self, *args, **options):
+        colegiatura = Colegiatura.objects.all()[0]
+        fecha = format_letter_date(date.today())
+
+        def render():
+            generate_letter(io.BytesIO(), porcentaje='50%', colegiatura=colegiatura, fecha=fecha)
+
+        def render_cold():
+            letter_styles.cache_clear()
+            _parsed_paragraph.cache_clear()
+            render()
+
+        render()
+        for nombre, funcion in (('Sin cache', render_cold), ('Con cache', render)):
+            segundos = timeit.timeit(funcion, number=options['cartas'])
+            self.stdout.write('{}: {:.2f} ms por carta'.format(
+                nombre, segundos * 1000 / options['cartas']))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from becas.letters import run_batch, PROCESOS
+
+
+class Command(BaseCommand):
+    """ Builds a batch of scholarship letters.
+
+    This command is run in its own process by becas.letters.start_batch, it
+    can also be run by hand to retry a batch that failed.
+    """
+    help = 'Builds the batch of scholarship letters with the given id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('id_lote', type=int)
+        parser.add_argument('--procesos', type=int, default=PROCESOS,
+                            help='Number of worker processes that render the letters.')
+
+    def handle(self, *args, **options):
+        lote = run_batch(options['id_lote'], procesos=options['procesos'])
+        self.stdout.write('Cartas terminadas: {} ({} reutilizadas)'.format(
+            lote.archivo.name, lote.reutilizadas))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:22
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0045_busqueda_alumnos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('becas', '0003_auto_20170420_2230'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteCartas',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('pdf', 'Un solo PDF'), ('zip', 'ZIP con un PDF por alumno')], default='pdf', max_length=10)),
+                ('compromiso', models.TextField()),
+                ('a_partir', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('progreso', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('reutilizadas', models.IntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, upload_to='cartas/')),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_terminacion', models.DateTimeField(blank=True, null=True)),
+                ('alumnos', models.ManyToManyField(related_name='lotes_cartas', to='familias.Alumno')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def flag_current(apps, schema_editor):
+    # Flags the latest scholarship of each student, as becas.current does,
+    # with the versioned model.
+    Beca = apps.get_model('becas', 'Beca')
+    becas = Beca.objects.using(schema_editor.connection.alias)
+    ultimas = {}
+    for id_alumno, id_beca in becas.order_by('alumno_id', 'fecha_de_asignacion', 'id') \
+                                   .values_list('alumno_id', 'id'):
+        ultimas[id_alumno] = id_beca
+    ids = list(ultimas.values())
+    for inicio in range(0, len(ids), 500):
+        becas.filter(pk__in=ids[inicio:inicio + 500]).update(actual=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0045_busqueda_alumnos'),
+        ('becas', '0004_lotes_cartas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beca',
+            name='actual',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterIndexTogether(
+            name='beca',
+            index_together=set([('alumno', 'actual')]),
+        ),
+        migrations.RunPython(flag_current, migrations.RunPython.noop),
+    ]
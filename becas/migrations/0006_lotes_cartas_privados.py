@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 15:18
+from __future__ import unicode_literals
+
+import os
+import shutil
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_files(apps, schema_editor):
+    """ Moves the files of the existing batches out of MEDIA_ROOT, and deletes the old cache.
+
+    """
+    LoteCartas = apps.get_model('becas', 'LoteCartas')
+    core.storage.move_to_private(LoteCartas.objects.exclude(archivo='')
+                                                   .values_list('archivo', flat=True))
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, 'cartas', 'cache'), ignore_errors=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('becas', '0005_beca_actual'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lotecartas',
+            name='archivo',
+            field=models.FileField(blank=True, storage=core.storage.PrivateStorage(),
+                                   upload_to='cartas/'),
+        ),
+        migrations.RunPython(move_files, migrations.RunPython.noop),
+    ]
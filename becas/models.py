@@ -1,4 +1,9 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core.storage import private_storage
 from familias.models import Alumno
 
 
@@ -6,6 +11,11 @@ class Beca(models.Model):
     """ Model for becas that are going to be awarded to
     students of the institution.
 
+    Attributes:
+    -----------
+    actual : BooleanField
+        Whether this is the latest scholarship of the student, kept by
+        becas.current.
     """
     OPCIONES_PORCENTAJE = [
         (x, x + '%') for x in map(lambda x: str(x), range(1, 101))
@@ -15,9 +25,93 @@ class Beca(models.Model):
                                   choices=OPCIONES_PORCENTAJE,
                                   default='0')
     fecha_de_asignacion = models.DateTimeField(null=True, blank=True, auto_now_add=True)
+    actual = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        index_together = [('alumno', 'actual')]
 
     def number_percentage(self):
         return int(self.porcentaje);
 
     def __str__(self):
         return '{}%'.format(self.porcentaje)
+
+
+class LoteCartas(models.Model):
+    """ Model for a batch of scholarship letters built in the background.
+
+    The letters of the selected students are rendered by the run_letters
+    management command, in a process started by becas.letters.start_batch,
+    which joins them in a single file in PRIVATE_MEDIA_ROOT and reports its
+    progress here.
+
+    Attributes:
+    -----------
+    OPCIONES_FORMATO : tuple(tuple())
+        The formats in which the letters can be joined.
+    OPCIONES_STATUS : tuple(tuple())
+        The states of the batch.
+    usuario : ForeignKey
+        The administrator who requested the letters.
+    formato : CharField
+        A single pdf with all the letters, or a zip with a pdf per letter.
+    alumnos : ManyToManyField
+        The students whose letters are built. Only those with a scholarship
+        get a letter.
+    compromiso : TextField
+        What the families will do for the scholarship, the same for every letter.
+    a_partir : TextField
+        When the families start paying. If blank, each letter says August of
+        the ciclo escolar of its student.
+    status : CharField
+        Whether the batch is waiting, being built, finished or failed.
+    progreso : IntegerField
+        The percentage of letters already rendered.
+    total : IntegerField
+        The number of letters of the batch.
+    reutilizadas : IntegerField
+        The number of letters taken from the cache instead of being rendered.
+    archivo : FileField
+        The finished file.
+    error : TextField
+        The reason why the batch failed.
+    """
+    PDF = 'pdf'
+    ZIP = 'zip'
+    OPCIONES_FORMATO = ((PDF, 'Un solo PDF'),
+                        (ZIP, 'ZIP con un PDF por alumno'))
+
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    TERMINADO = 'terminado'
+    ERROR = 'error'
+    OPCIONES_STATUS = ((PENDIENTE, 'Pendiente'),
+                       (EN_PROCESO, 'En proceso'),
+                       (TERMINADO, 'Terminado'),
+                       (ERROR, 'Error'))
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL)
+    formato = models.CharField(max_length=10, choices=OPCIONES_FORMATO, default=PDF)
+    alumnos = models.ManyToManyField(Alumno, related_name='lotes_cartas')
+    compromiso = models.TextField()
+    a_partir = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=OPCIONES_STATUS, default=PENDIENTE)
+    progreso = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    reutilizadas = models.IntegerField(default=0)
+    archivo = models.FileField(upload_to='cartas/', storage=private_storage, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_terminacion = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return 'Cartas de beca del {fecha}'.format(fecha=self.fecha_creacion)
+
+
+@receiver(post_delete, sender=LoteCartas)
+def delete_batch_file(sender, instance, **kwargs):
+    """ Deletes the file of a batch of letters.
+
+    """
+    if instance.archivo:
+        instance.archivo.delete(save=False)
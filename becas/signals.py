@@ -0,0 +1,29 @@
+""" Receivers that keep the flag of the current scholarship of each student.
+
+becas is installed before indicadores, so these receivers run before the
+ones that refresh the indicator snapshots, which read the flag.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .current import refresh_current
+from .models import Beca
+
+
+@receiver(post_save, sender=Beca)
+def current_on_save(sender, instance=None, **kwargs):
+    """ Refreshes the current scholarship of a student after one of its scholarships is saved.
+
+    """
+    if kwargs.get('raw'):
+        return
+    instance.actual = instance.pk in refresh_current([instance.alumno_id])
+
+
+@receiver(post_delete, sender=Beca)
+def current_on_delete(sender, instance=None, **kwargs):
+    """ Flags the previous scholarship as current when the current one is deleted.
+
+    """
+    if instance.actual:
+        refresh_current([instance.alumno_id])
@@ -0,0 +1,192 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User, Group
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from perfiles_usuario.models import Capturista
+from perfiles_usuario.utils import ADMINISTRADOR_GROUP
+from administracion.models import Escuela, Colegiatura
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Familia, Integrante, Alumno
+from indicadores.models import Periodo, Transaccion, IntegranteIndicador
+from indicadores.resumen import update_summary
+
+from .assignment import assignment_preview, assign_scholarships, percentage_from_tabulador, \
+                        confirm_assignment, VistaPreviaCambiada
+from .models import Beca
+
+
+class TestAsignacionMasiva(TestCase):
+    """ Suite to test the assignment of scholarships to many studies at once.
+
+    Attributes:
+    -----------
+    estudios : list
+        Two approved studies, of families with a monthly income of 2000
+        and 8000, with one and two students.
+    borrador : Estudio
+        A study that is not approved.
+    """
+
+    def setUp(self):
+        thelma = User.objects.create_user(
+            username='thelma', email='juan@pablo.com', password='junipero',
+            first_name='Thelma', last_name='Amlet')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.login(username='thelma', password='junipero')
+
+        elerik = User.objects.create_user(username='erikiano', password='eugenio420')
+        capturista = Capturista.objects.create(user=elerik)
+        escuela = Escuela.objects.create(nombre='Rolando Calles')
+        periodo = Periodo.objects.create(periodicidad='Mensual', factor=1, multiplica=True)
+        Colegiatura.objects.all().delete()
+        Colegiatura.objects.create(monto=1000)
+
+        self.estudios = []
+        for ingreso, alumnos, status in ((2000, 1, Estudio.APROBADO),
+                                         (8000, 2, Estudio.APROBADO),
+                                         (1000, 1, Estudio.BORRADOR)):
+            familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                             estado_civil='soltero',
+                                             localidad='otro')
+            Transaccion.objects.create(familia=familia, monto=ingreso, periodicidad=periodo,
+                                       observacion='Sueldo', es_ingreso=True)
+            for numero in range(alumnos):
+                integrante = Integrante.objects.create(familia=familia,
+                                                       nombres='Rick {}'.format(numero),
+                                                       apellidos='Astley',
+                                                       nivel_estudios='primaria',
+                                                       fecha_de_nacimiento='2006-02-26')
+                Alumno.objects.create(integrante=integrante, escuela=escuela)
+            self.estudios.append(Estudio.objects.create(capturista=capturista,
+                                                        familia=familia,
+                                                        status=status))
+        self.borrador = self.estudios.pop()
+
+    def test_percentage_from_tabulador(self):
+        """ Test that the family pays the tabulador share of its income.
+
+        """
+        self.assertEqual(percentage_from_tabulador(Decimal(2000), 15, 1, Decimal(1000)), 70)
+        self.assertEqual(percentage_from_tabulador(Decimal(8000), 15, 2, Decimal(1000)), 40)
+        self.assertEqual(percentage_from_tabulador(Decimal(20000), 15, 1, Decimal(1000)), 0)
+        self.assertEqual(percentage_from_tabulador(Decimal(0), 15, 1, Decimal(1000)), 100)
+
+    def test_preview(self):
+        """ Test that the preview computes every student of the approved studies.
+
+        """
+        ids = [estudio.pk for estudio in self.estudios] + [self.borrador.pk]
+        with self.assertNumQueries(4):
+            filas = assignment_preview(ids, tabulador=15)
+        self.assertEqual([(fila.porcentaje, fila.aportacion) for fila in filas],
+                         [(70, Decimal('300.00')), (40, Decimal('600.00')),
+                          (40, Decimal('600.00'))])
+        self.assertFalse(Beca.objects.exists())
+
+        filas = assignment_preview(ids, porcentaje=25)
+        self.assertEqual({fila.porcentaje for fila in filas}, {25})
+
+    def test_assign(self):
+        """ Test that the scholarships are created in bulk and the snapshots refreshed.
+
+        """
+        filas = assignment_preview([estudio.pk for estudio in self.estudios], tabulador=15)
+        filas[0].porcentaje = 0
+        self.assertEqual(len(assign_scholarships(filas)), 3)
+        self.assertEqual(sorted(Beca.objects.values_list('porcentaje', flat=True)),
+                         ['0', '40', '40'])
+        porcentajes = IntegranteIndicador.objects.filter(es_alumno=True) \
+                                                 .values_list('porcentaje_beca', flat=True)
+        self.assertEqual(sorted(porcentajes), [0, 40, 40])
+
+    def test_assign_zero(self):
+        """ Test that a 0% scholarship replaces the current one of the student.
+
+        """
+        alumno = Alumno.objects.get(integrante__familia=self.estudios[0].familia)
+        anterior = Beca.objects.create(alumno=alumno, porcentaje='50')
+        self.assertTrue(Beca.objects.get(pk=anterior.pk).actual)
+
+        filas = assignment_preview([self.estudios[0].pk], tabulador=100)
+        self.assertEqual([fila.porcentaje for fila in filas], [0])
+        assign_scholarships(filas)
+
+        self.assertFalse(Beca.objects.get(pk=anterior.pk).actual)
+        self.assertEqual(Beca.objects.get(alumno=alumno, actual=True).porcentaje, '0')
+        indicador = IntegranteIndicador.objects.get(integrante__alumno_integrante=alumno)
+        self.assertEqual(indicador.porcentaje_beca, 0)
+
+    def test_view(self):
+        """ Test that the view shows a preview and assigns the scholarships once confirmed.
+
+        """
+        url = reverse('becas:asignar_becas')
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertTemplateUsed(response, 'becas/asignar_becas.html')
+
+        data = {'estudios': [estudio.pk for estudio in self.estudios],
+                'modo': 'tabulador',
+                'tabulador': '15'}
+        response = self.client.post(url, data)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(len(response.context['filas']), 3)
+        self.assertFalse(Beca.objects.exists())
+
+        data['confirmar'] = ''
+        data['vista_previa'] = response.context['vista_previa']
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('administracion:main_estudios',
+                                               kwargs={'status_study': Estudio.APROBADO}))
+        self.assertEqual(Beca.objects.count(), 3)
+
+        response = self.client.post(url, data)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.context['cambiada'])
+        self.assertEqual(Beca.objects.count(), 3)
+
+    def test_view_preview_changed(self):
+        """ Test that a preview is not confirmed if the scholarships changed after it was shown.
+
+        """
+        url = reverse('becas:asignar_becas')
+        data = {'estudios': [estudio.pk for estudio in self.estudios],
+                'modo': 'tabulador',
+                'tabulador': '15'}
+        response = self.client.post(url, data)
+        data['confirmar'] = ''
+        data['vista_previa'] = response.context['vista_previa']
+
+        Transaccion.objects.filter(familia=self.estudios[0].familia).update(monto=4000)
+        update_summary(self.estudios[0].familia_id)
+        response = self.client.post(url, data)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.context['cambiada'])
+        self.assertFalse(Beca.objects.exists())
+        self.assertEqual(response.context['filas'][0].porcentaje, 40)
+
+        data['vista_previa'] = response.context['vista_previa']
+        response = self.client.post(url, data)
+        self.assertEqual(Beca.objects.count(), 3)
+
+        with self.assertRaises(VistaPreviaCambiada):
+            confirm_assignment([self.estudios[0].pk], 'otra', porcentaje=20)
+
+    def test_view_invalid(self):
+        """ Test that the rule of the chosen mode is required, and drafts can not be picked.
+
+        """
+        url = reverse('becas:asignar_becas')
+        response = self.client.post(url, {'estudios': [self.estudios[0].pk],
+                                          'modo': 'porcentaje',
+                                          'confirmar': ''})
+        self.assertIn('porcentaje', response.context['form'].errors)
+        response = self.client.post(url, {'estudios': [self.borrador.pk],
+                                          'modo': 'porcentaje',
+                                          'porcentaje': '20',
+                                          'confirmar': ''})
+        self.assertIn('estudios', response.context['form'].errors)
+        self.assertFalse(Beca.objects.exists())
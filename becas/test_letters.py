@@ -0,0 +1,175 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User, Group
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PyPDF2 import PdfFileReader
+
+from perfiles_usuario.utils import ADMINISTRADOR_GROUP
+from administracion.models import Escuela
+from familias.models import Familia, Integrante, Alumno
+
+from .letters import run_batch, prune_cache, CARPETA_CACHE, CADUCIDAD_CACHE
+from .models import Beca, LoteCartas
+
+
+class TestLoteCartas(TestCase):
+    """ Suite to test the batches of scholarship letters.
+
+    The process that builds a batch is only started once the transaction
+    commits, which never happens inside a TestCase, so the tests run the
+    batch directly. The files are written to a temporary PRIVATE_MEDIA_ROOT.
+
+    Attributes:
+    -----------
+    alumnos : list
+        Three students with a scholarship, from two schools.
+    sin_beca : Alumno
+        A student without a scholarship.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings = override_settings(PRIVATE_MEDIA_ROOT=self.media)
+        self.settings.enable()
+
+        thelma = User.objects.create_user(
+            username='thelma', email='juan@pablo.com', password='junipero',
+            first_name='Thelma', last_name='Amlet')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.login(username='thelma', password='junipero')
+        self.thelma = thelma
+
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=3,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        escuelas = [Escuela.objects.create(nombre='Rolando Calles'),
+                    Escuela.objects.create(nombre='Juan Pablo II')]
+        self.alumnos = []
+        for numero, nombre in enumerate(['Rick', 'Elver', 'Thelma', 'Erik']):
+            integrante = Integrante.objects.create(familia=familia,
+                                                   nombres=nombre,
+                                                   apellidos='Astley',
+                                                   nivel_estudios='primaria',
+                                                   fecha_de_nacimiento='2006-02-26')
+            self.alumnos.append(Alumno.objects.create(integrante=integrante,
+                                                      escuela=escuelas[numero % 2]))
+        self.sin_beca = self.alumnos.pop()
+        for alumno in self.alumnos:
+            Beca.objects.create(alumno=alumno, porcentaje='10')
+            Beca.objects.create(alumno=alumno, porcentaje='50')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media)
+
+    def create_batch(self, formato, alumnos):
+        lote = LoteCartas.objects.create(usuario=self.thelma, formato=formato,
+                                         compromiso='Limpiar el salón')
+        lote.alumnos.add(*alumnos)
+        return lote
+
+    def test_run_batch_pdf(self):
+        """ Test that the letters of a batch are merged in a single pdf.
+
+        """
+        lote = self.create_batch(LoteCartas.PDF, self.alumnos + [self.sin_beca])
+        lote = run_batch(lote.pk, procesos=2)
+
+        self.assertEqual(lote.status, LoteCartas.TERMINADO)
+        self.assertEqual(lote.progreso, 100)
+        self.assertEqual(lote.total, 3)
+        self.assertEqual(lote.reutilizadas, 0)
+        self.assertTrue(os.path.isfile(os.path.join(self.media, lote.archivo.name)))
+        with self.assertRaises(ValueError):
+            lote.archivo.url
+        with lote.archivo.storage.open(lote.archivo.name, 'rb') as archivo:
+            documento = PdfFileReader(io.BytesIO(archivo.read()))
+        self.assertEqual(documento.getNumPages(), 3)
+        self.assertIn('50%', documento.getPage(0).extractText())
+
+    def test_run_batch_zip(self):
+        """ Test that a zip has one letter per student, and the cache is reused.
+
+        """
+        primero = run_batch(self.create_batch(LoteCartas.ZIP, self.alumnos).pk, procesos=1)
+        with primero.archivo.storage.open(primero.archivo.name, 'rb') as archivo:
+            nombres = zipfile.ZipFile(io.BytesIO(archivo.read())).namelist()
+        self.assertEqual(len(nombres), 3)
+        self.assertIn('carta_beca_{}_{}.pdf'.format(self.alumnos[0].pk, self.alumnos[0]),
+                      nombres)
+
+        segundo = run_batch(self.create_batch(LoteCartas.PDF, self.alumnos).pk, procesos=1)
+        self.assertEqual(segundo.reutilizadas, 3)
+
+        Beca.objects.create(alumno=self.alumnos[0], porcentaje='70')
+        tercero = run_batch(self.create_batch(LoteCartas.PDF, self.alumnos).pk, procesos=1)
+        self.assertEqual(tercero.reutilizadas, 2)
+
+    def test_prune_cache(self):
+        """ Test that the letters of the cache rendered before the last day are deleted.
+
+        """
+        run_batch(self.create_batch(LoteCartas.PDF, self.alumnos).pk, procesos=1)
+        cache = os.path.join(self.media, CARPETA_CACHE)
+        cartas = sorted(os.listdir(cache))
+        self.assertEqual(len(cartas), 3)
+
+        vieja = (timezone.now() - CADUCIDAD_CACHE - timedelta(minutes=1)).timestamp()
+        os.utime(os.path.join(cache, cartas[0]), (vieja, vieja))
+        self.assertEqual(prune_cache(), 1)
+        self.assertEqual(sorted(os.listdir(cache)), cartas[1:])
+
+    def test_run_batch_without_scholarships(self):
+        """ Test that a batch without students with a scholarship fails with a reason.
+
+        """
+        lote = self.create_batch(LoteCartas.PDF, [self.sin_beca])
+        with self.assertRaises(ValueError):
+            run_batch(lote.pk, procesos=1)
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteCartas.ERROR)
+        self.assertEqual(lote.error, 'Ninguno de los alumnos tiene beca.')
+
+    def test_view_letters(self):
+        """ Test that a batch can be requested, listed and downloaded.
+
+        """
+        url = reverse('becas:letters')
+        response = self.client.post(url, {'escuela': self.alumnos[0].escuela.pk,
+                                          'compromiso': 'Limpiar el salón',
+                                          'formato': LoteCartas.PDF})
+        self.assertRedirects(response, url)
+        lote = LoteCartas.objects.get()
+        self.assertEqual(lote.status, LoteCartas.PENDIENTE)
+        self.assertEqual(set(lote.alumnos.all()), {self.alumnos[0], self.alumnos[2]})
+
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertTemplateUsed(response, 'becas/cartas.html')
+        self.assertTrue(response.context['en_proceso'])
+
+        descarga = reverse('becas:letters_download', args=[lote.pk])
+        self.assertEqual(404, self.client.get(descarga).status_code)
+        run_batch(lote.pk, procesos=1)
+        response = self.client.get(descarga)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_view_letters_invalid(self):
+        """ Test that a batch is not created when no student with a scholarship matches.
+
+        """
+        response = self.client.post(reverse('becas:letters'),
+                                    {'alumnos': [self.sin_beca.pk],
+                                     'compromiso': 'Limpiar el salón',
+                                     'formato': LoteCartas.ZIP})
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(LoteCartas.objects.exists())
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from administracion.models import Escuela
 from familias.models import Familia, Integrante, Alumno
+from .current import current_scholarships, refresh_current
 from .models import Beca
 
 
@@ -22,6 +23,7 @@ class TestBeca(TestCase):
                                                nivel_estudios='doctorado',
                                                fecha_de_nacimiento='1943-03-19')
         alumno = Alumno.objects.create(integrante=integrante, escuela=escuela)
+        self.alumno = alumno
         Beca.objects.create(alumno=alumno,
                             porcentaje='10')
 
@@ -31,3 +33,29 @@ class TestBeca(TestCase):
         """
         beca = Beca.objects.all()[0]
         self.assertEqual(str(beca), '10%')
+
+    def test_current(self):
+        """ Checks that only the latest scholarship of the student is flagged as current.
+
+        """
+        primera = Beca.objects.get()
+        self.assertTrue(primera.actual)
+        segunda = Beca.objects.create(alumno=self.alumno, porcentaje='30')
+        self.assertTrue(segunda.actual)
+        with self.assertNumQueries(1):
+            actuales = current_scholarships([self.alumno.pk])
+        self.assertEqual(actuales, {self.alumno.pk: segunda})
+
+        segunda.delete()
+        self.assertEqual(current_scholarships([self.alumno.pk]), {self.alumno.pk: primera})
+
+    def test_refresh_current(self):
+        """ Checks that the flag is rebuilt for scholarships written without signals.
+
+        """
+        becas = Beca.objects.bulk_create([Beca(alumno=self.alumno, porcentaje='50')])
+        self.assertEqual(current_scholarships([self.alumno.pk])[self.alumno.pk].porcentaje, '10')
+        refresh_current([self.alumno.pk])
+        self.assertEqual(Beca.objects.filter(actual=True).count(), 1)
+        self.assertEqual(current_scholarships([self.alumno.pk])[self.alumno.pk].porcentaje,
+                         becas[0].porcentaje)
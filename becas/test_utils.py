@@ -0,0 +1,55 @@
+import io
+import locale
+from datetime import date
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from administracion.models import Colegiatura
+from .utils import generate_letter, format_letter_date, letter_styles, static_paragraph
+
+
+class TestLetterUtils(TestCase):
+    """ Suite to test the rendering of the scholarship letters.
+
+    """
+
+    def test_format_letter_date(self):
+        """ Test that the date is written in Spanish.
+
+        """
+        self.assertEqual(format_letter_date(date(2017, 5, 2)), 'Martes 02 Mayo del 2017')
+        self.assertEqual(format_letter_date(date(2017, 1, 4)), 'Miércoles 04 Enero del 2017')
+
+    def test_generate_letter_keeps_locale(self):
+        """ Test that a letter is rendered without changing the locale of the process.
+
+        """
+        archivo = io.BytesIO()
+        with mock.patch.object(locale, 'setlocale') as setlocale:
+            generate_letter(archivo, porcentaje='20%')
+        setlocale.assert_not_called()
+        self.assertTrue(archivo.getvalue().startswith(b'%PDF'))
+
+    def test_static_parts_built_once(self):
+        """ Test that the styles and fixed paragraphs are shared, but not their layout.
+
+        """
+        colegiatura = Colegiatura.objects.first()
+        with self.assertNumQueries(0):
+            generate_letter(io.BytesIO(), porcentaje='20%', colegiatura=colegiatura,
+                            fecha='Martes 02 Mayo del 2017')
+        self.assertIs(letter_styles(), letter_styles())
+        primero = static_paragraph('<font size=12>Atentamente</font>', 'Normal')
+        segundo = static_paragraph('<font size=12>Atentamente</font>', 'Normal')
+        self.assertIsNot(primero, segundo)
+        self.assertIs(primero.frags, segundo.frags)
+
+    def test_benchmark_letters(self):
+        """ Test that the benchmark command reports the cost of a letter.
+
+        """
+        salida = io.StringIO()
+        call_command('benchmark_letters', cartas=2, stdout=salida)
+        self.assertIn('ms por carta', salida.getvalue())
@@ -1,5 +1,5 @@
 from django.conf.urls import url
-from .views import estudios, asignar_beca
+from .views import estudios, asignar_beca, asignar_becas, letters_dashboard, letters_download
 
 app_name = 'becas'
 
@@ -7,4 +7,7 @@ app_name = 'becas'
 urlpatterns = [
     url(r'^estudios/', estudios, name='services'),
     url(r'^asignar-beca/(?P<id_estudio>[0-9]+)/', asignar_beca, name='asignar_beca'),
+    url(r'^asignar-becas/$', asignar_becas, name='asignar_becas'),
+    url(r'^cartas/$', letters_dashboard, name='letters'),
+    url(r'^cartas/(?P<id_lote>[0-9]+)/descargar/$', letters_download, name='letters_download'),
 ]
@@ -1,7 +1,7 @@
-import locale
 import string
 import decimal
 from datetime import date
+from functools import lru_cache
 
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
 from reportlab.lib import pagesizes
@@ -12,11 +12,60 @@ from reportlab.lib.units import inch
 from administracion.models import Colegiatura
 
 
+DIAS = ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo')
+MESES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+         'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+
+def format_letter_date(dia):
+    """ Returns the date of a letter, e.g. Martes 02 Mayo del 2017.
+
+    The names are written in Spanish without changing the locale, which is
+    global to the process.
+    """
+    return '{} del {}'.format(
+        string.capwords('{} {:02d} {}'.format(DIAS[dia.weekday()], dia.day, MESES[dia.month - 1])),
+        dia.year)
+
+
+COLUMNAS = [5.2*inch, 1.3*inch]
+
+
+@lru_cache(maxsize=None)
+def letter_styles():
+    """ Returns the styles of the letters, built once per process.
+
+    The stylesheet is only read while rendering, so it is shared by every
+    letter, also between threads.
+    """
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY))
+    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='Right', alignment=TA_RIGHT))
+    return styles
+
+
+@lru_cache(maxsize=None)
+def _parsed_paragraph(texto, estilo):
+    return Paragraph(texto, letter_styles()[estilo])
+
+
+def static_paragraph(texto, estilo):
+    """ Returns a paragraph of the text that is the same in every letter.
+
+    The markup is parsed once per process. Each letter gets a new Paragraph
+    with the parsed fragments, since the layout of a paragraph is stored in
+    it while the letter is built.
+    """
+    parrafo = _parsed_paragraph(texto, estilo)
+    return Paragraph(parrafo.text, parrafo.style, frags=parrafo.frags)
+
+
 def generate_letter(response, nombre='Juan Perez', ciclo='2016-2017',
                     grado='2° Preescolar Nuevo Ingreso', porcentaje='15',
                     compromiso='''La Madre de familia se compromete a realizar aseos
                     de salones.''', a_partir='''Comienza a realizar pago de la aportación
-                    mensual enero 2017'''):
+                    mensual enero 2017''', colegiatura=None, fecha=None):
     """ This function receives an HttpResponse which has pdf as content type,
     and builds the pdf for the letter.
 
@@ -27,6 +76,9 @@ def generate_letter(response, nombre='Juan Perez', ciclo='2016-2017',
     - porcentaje: the percentage of scholarship
     - compromiso: what the family will do for the scholarship
     - a_partir: from when does the family start paying.
+    - colegiatura: the Colegiatura of the letter, the first one if not given.
+    - fecha: the date of the letter as formatted by format_letter_date, today
+      if not given.
 
     Check the default parameters for examples.
     """
@@ -35,29 +87,24 @@ def generate_letter(response, nombre='Juan Perez', ciclo='2016-2017',
                             rightMargin=72, leftMargin=72,
                             topMargin=110, bottomMargin=18)
     letter = []
-    locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-
-    formatted_time = '{} del {}'.format(
-                        string.capwords(date.today().strftime('%A %d %B')),
-                        date.today().strftime('%Y'))
+    if fecha is None:
+        fecha = format_letter_date(date.today())
+    if colegiatura is None:
+        colegiatura = Colegiatura.objects.all()[0]
+    styles = letter_styles()
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY))
-    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
-    styles.add(ParagraphStyle(name='Right', alignment=TA_RIGHT))
-
-    ptext = '<font size=12>%s</font>' % formatted_time
+    ptext = '<font size=12>%s</font>' % fecha
     letter.append(Paragraph(ptext, styles['Right']))
     letter.append(Spacer(1, 12))
 
     letter.append(Spacer(1, 12))
     ptext = '<font size=12><b>Carta de Comunicación de Beca Otorgada</b></font>'
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 12))
 
     letter.append(Spacer(1, 12))
     ptext = '<font size=12><b>Presente</b></font>'
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 35))
 
     ptext = '''<font size=12> Por medio de la presente manifiesto a ustedes
@@ -72,49 +119,47 @@ def generate_letter(response, nombre='Juan Perez', ciclo='2016-2017',
     letter.append(Spacer(1, 12))
 
     ptext = '<font size=12>Dicha beca se integra de la siguiente manera:</font>'
-    letter.append(Paragraph(ptext, styles['Justify']))
+    letter.append(static_paragraph(ptext, 'Justify'))
     letter.append(Spacer(1, 20))
 
-    colwidths = [5.2*inch, 1.3*inch]
     tbl = []
     ptext = '<font size=12>COSTO VALOR DE EDUCACIÓN EN NUESTRO INSTITUTO</font>'
-    tbl.append([Paragraph(ptext, styles['Justify'])])
+    tbl.append([static_paragraph(ptext, 'Justify')])
 
-    colegiatura = Colegiatura.objects.all()[0]
     ptext = '<font size=12>{}</font>'.format(colegiatura)
     tbl[0].append(Paragraph(ptext, styles['Normal']))
 
-    letter.append(Table(tbl, colWidths=colwidths))
+    letter.append(Table(tbl, colWidths=COLUMNAS))
     letter.append(Spacer(1, 15))
 
     tbl = []
     ptext = '<font size=12>PORCENTAJE DE BECA OTORGADO</font>'
-    tbl.append([Paragraph(ptext, styles['Justify'])])
+    tbl.append([static_paragraph(ptext, 'Justify')])
 
     ptext = '<font size=12>{}</font>'.format(porcentaje)
     tbl[0].append(Paragraph(ptext, styles['Normal']))
-    letter.append(Table(tbl, colWidths=colwidths))
+    letter.append(Table(tbl, colWidths=COLUMNAS))
     letter.append(Spacer(1, 12))
 
     tbl = []
     ptext = '<font size=12>APORTACIÓN MENSUAL</font>'
-    tbl.append([Paragraph(ptext, styles['Normal'])])
+    tbl.append([static_paragraph(ptext, 'Normal')])
 
     monto = colegiatura.monto
     aportacion = monto - (monto*decimal.Decimal(porcentaje[:-1])/decimal.Decimal('100.0'))
     ptext = '<font size=12>${}</font>'.format(aportacion)
     tbl[0].append(Paragraph(ptext, styles['Normal']))
-    letter.append(Table(tbl, colWidths=colwidths))
+    letter.append(Table(tbl, colWidths=COLUMNAS))
     letter.append(Spacer(1, 15))
 
     ptext = '''<font size=12>Comité de Becas autoriza, revisa y califica los
             Estudios Socioeconómico. </font>'''
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 30))
 
     ptext = '''<font size=12>Igualmente estoy consciente y acepto las
             condiciones del Reglamento Escolar de la Institución.</font>'''
-    letter.append(Paragraph(ptext, styles['Justify']))
+    letter.append(static_paragraph(ptext, 'Justify'))
     letter.append(Spacer(1, 12))
 
     ptext = '''<font size=12><b>{}</b></font>'''.format(compromiso)
@@ -126,28 +171,29 @@ def generate_letter(response, nombre='Juan Perez', ciclo='2016-2017',
     letter.append(Spacer(1, 23))
 
     ptext = '<font size=12>Atentamente</font>'
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 20))
 
     ptext = '<font size=12>_______________________________</font>'
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 12))
 
     ptext = '<font size=11>Nombre y firma del padre, madre y/o tutor</font>'
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
     letter.append(Spacer(1, 17))
 
     ptext = '''<font size=11>*La aportación-beca está sujeta a cambios y a
             revisión por el Instituto de Educación Integral IAP y el Comité de Becas,
             en caso de encontrar algún dato falso, la escuela cancelará la beca
             otorgada.</font>'''
-    letter.append(Paragraph(ptext, styles['Normal']))
+    letter.append(static_paragraph(ptext, 'Normal'))
 
     doc.build(letter)
 
 
-def aportacion_por_beca(beca):
-    colegiatura = Colegiatura.objects.all()[0]
+def aportacion_por_beca(beca, colegiatura=None):
+    if colegiatura is None:
+        colegiatura = Colegiatura.objects.all()[0]
     porcentaje = beca.porcentaje
 
     aportacion = (100.0 - float(porcentaje)) * float(colegiatura.monto) / 100.0
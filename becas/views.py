@@ -1,15 +1,25 @@
+import os
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import user_passes_test, login_required
+from django.http import FileResponse, Http404
 from django.http.response import HttpResponseBadRequest
 
-from familias.utils import total_egresos_familia, total_ingresos_familia, total_neto_familia
+from indicadores.resumen import summary_context
 from familias.models import Integrante
 from perfiles_usuario.utils import is_administrador
 from estudios_socioeconomicos.models import Estudio, Foto
 from administracion.models import Colegiatura
 
-from .forms import BecaForm
-from .models import Beca
+from .assignment import assignment_preview, assign_scholarships, preview_key, \
+                        confirm_assignment, VistaPreviaCambiada
+from .forms import BecaForm, LoteCartasForm, AsignacionMasivaForm
+from .letters import start_batch
+from .models import LoteCartas
+
+
+TIPOS_CONTENIDO = {LoteCartas.PDF: 'application/pdf',
+                   LoteCartas.ZIP: 'application/zip'}
 
 
 @login_required
@@ -35,31 +45,100 @@ def asignar_beca(request, id_estudio):
     """
     estudio = get_object_or_404(Estudio, pk=id_estudio, status=Estudio.APROBADO)
     fotos = Foto.objects.filter(estudio=id_estudio)
-    integrantes = Integrante.objects.filter(familia__pk=estudio.familia.pk, activo=True)
-    integrantes = filter(lambda x: hasattr(x, 'alumno_integrante'), integrantes)
+    integrantes = Integrante.objects.filter(familia__pk=estudio.familia_id, activo=True) \
+                                    .select_related('alumno_integrante')
+    integrantes = [x for x in integrantes if hasattr(x, 'alumno_integrante')]
     colegiatura = Colegiatura.objects.all()[0]
     context = {
         'estudio': estudio,
-        'total_egresos_familia': total_egresos_familia(estudio.familia.id),
-        'total_ingresos_familia': total_ingresos_familia(estudio.familia.id),
-        'total_neto_familia': total_neto_familia(estudio.familia.id),
         'fotos': fotos,
         'integrantes': integrantes,
         'colegiatura': colegiatura.monto
     }
+    context.update(summary_context(estudio.familia_id))
     if request.method == 'GET':
         context['form'] = BecaForm()
         return render(request, 'becas/asignar_beca.html', context)
     elif request.method == 'POST':
         form = BecaForm(request.POST)
         if form.is_valid():
-            percentage = form.cleaned_data['porcentaje']
             # create scholarships for active students
-            for integrante in integrantes:
-                Beca.objects.create(alumno=integrante.alumno_integrante,
-                                    porcentaje=percentage)
+            assign_scholarships(assignment_preview([estudio.pk],
+                                                   porcentaje=form.cleaned_data['porcentaje']))
             return redirect('estudios_socioeconomicos:focus_mode', id_estudio=id_estudio)
         else:
             context['form'] = form
             return render(request, 'becas/asignar_beca.html', context)
     return HttpResponseBadRequest()
+
+
+@login_required
+@user_passes_test(is_administrador)
+def asignar_becas(request):
+    """ GET: Renders the view where the admin picks the approved studies
+    and the rule to assign their scholarships.
+
+    POST: Validates the form and shows the scholarship and aportación of
+    each student. If the preview is confirmed, creates the scholarships
+    of all of them, only if they are still the ones of the preview. If
+    they changed, e.g. an income was modified meanwhile, the new preview
+    is shown instead.
+    """
+    form = AsignacionMasivaForm(request.POST or None)
+    context = {'form': form}
+    if request.method == 'POST' and form.is_valid():
+        estudios = [estudio.pk for estudio in form.cleaned_data['estudios']]
+        if 'confirmar' in request.POST:
+            try:
+                confirm_assignment(estudios, request.POST.get('vista_previa', ''), **form.rule())
+            except VistaPreviaCambiada:
+                context['cambiada'] = True
+            else:
+                return redirect('administracion:main_estudios', status_study=Estudio.APROBADO)
+        filas = assignment_preview(estudios, **form.rule())
+        context['filas'] = filas
+        context['vista_previa'] = preview_key(filas)
+    return render(request, 'becas/asignar_becas.html', context)
+
+
+@login_required
+@user_passes_test(is_administrador)
+def letters_dashboard(request):
+    """ View to list the batches of scholarship letters.
+
+    GET: return the batches, the newest first, and the form to request one
+    POST: create a batch with the chosen students and start building it
+    """
+    if request.method == 'POST':
+        form = LoteCartasForm(request.POST)
+        if form.is_valid():
+            start_batch(form.save(request.user))
+            return redirect('becas:letters')
+    else:
+        form = LoteCartasForm()
+
+    lotes = LoteCartas.objects.select_related('usuario').order_by('-fecha_creacion')
+    en_proceso = lotes.filter(status__in=[LoteCartas.PENDIENTE,
+                                          LoteCartas.EN_PROCESO]).exists()
+    return render(request, 'becas/cartas.html',
+                  {'lotes': lotes,
+                   'en_proceso': en_proceso,
+                   'form': form})
+
+
+@login_required
+@user_passes_test(is_administrador)
+def letters_download(request, id_lote):
+    """ View to download the file of a finished batch of letters.
+
+    """
+    lote = get_object_or_404(LoteCartas, pk=id_lote, status=LoteCartas.TERMINADO)
+    storage = lote.archivo.storage
+    if not lote.archivo or not storage.exists(lote.archivo.name):
+        raise Http404()
+
+    response = FileResponse(storage.open(lote.archivo.name, 'rb'),
+                            content_type=TIPOS_CONTENIDO[lote.formato])
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        os.path.basename(lote.archivo.name))
+    return response
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from estudios_socioeconomicos.sync import DeltaListSerializer
 from .models import Retroalimentacion
 
 
@@ -17,3 +18,5 @@ class RetroalimentacionSerializer(serializers.ModelSerializer):
             'descripcion')
 
         read_only_fields = ('estudio', 'usuario')
+        list_serializer_class = DeltaListSerializer
+        campos_modificacion = ('fecha',)
@@ -1,8 +1,18 @@
+import hashlib
+import io
 import os
+import shutil
+import tempfile
+from datetime import timedelta
 
+from django.core.management import call_command
+from django.db import connection
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import override_settings, CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
 from rest_framework import status
@@ -11,16 +21,19 @@ from jp2_online.settings.base import MEDIA_ROOT
 from administracion.models import Escuela
 from captura.models import Retroalimentacion
 from estudios_socioeconomicos.models import Pregunta, Subseccion, Seccion, Estudio
-from estudios_socioeconomicos.models import Respuesta, Foto, OpcionRespuesta
+from estudios_socioeconomicos.models import Respuesta, Foto, OpcionRespuesta, Eliminacion
+from estudios_socioeconomicos.models import SubidaFoto
 from estudios_socioeconomicos.load import load_data
-from familias.models import Familia, Comentario, Integrante, Oficio
+from estudios_socioeconomicos.sync import study_versions
+from familias.models import Familia, Comentario, Integrante, Oficio, Alumno
+from familias.serializers import FamiliaSerializer
 from perfiles_usuario.models import Capturista
-from indicadores.models import Ingreso
+from indicadores.models import Ingreso, Transaccion, IntegranteIndicador
 
 
 from .views import APIQuestionsInformation, APIUploadRetrieveStudy
 from .views import APIOficioInformation, APIEscuelaInformation
-from .views import APIUploadRetrieveImages
+from .views import APIUploadRetrieveImages, APIUploadPhotoChunks
 
 
 class TestAPIStudyMetaInformationRetrieval(APITestCase):
@@ -89,6 +102,27 @@ class TestAPIStudyMetaInformationRetrieval(APITestCase):
         self.assertEqual(num_subsecciones, Subseccion.objects.all().count())
         self.assertEqual(num_secciones, Seccion.objects.all().count())
 
+    def test_retrieval_study_meta_information_etag(self):
+        """ Test that the questionnaire is sent with an ETag, and that a client
+            that already has it receives HTTP 304.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse(self.test_url_name))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), Seccion.objects.all().count())
+        etag = response['ETag']
+
+        response = self.client.get(reverse(self.test_url_name), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        pregunta = Pregunta.objects.all().first()
+        pregunta.texto = 'Otra pregunta'
+        pregunta.save()
+        response = self.client.get(reverse(self.test_url_name), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_escuelas_retrieval(self):
         """ Test that an authenticated user can recieve information
             about escuelas through an API endpoint.
@@ -779,6 +813,29 @@ class TestAPIUploadRetrieveStudy(APITestCase):
         self.assertEqual((transaccion['monto']), '200.00')
         self.assertEqual(int(float(transaccion['periodicidad']['factor'])), 1)
 
+    def test_update_approved_snapshot(self):
+        """ Test that editing a member of an approved family refreshes its snapshot.
+
+        The offline application can not update approved studies, so the
+        family is updated with the serializer the endpoint uses.
+        """
+        response = self.create_base_study()
+        estudio = Estudio.objects.get(pk=response.data['id'])
+        estudio.status = Estudio.APROBADO
+        estudio.save()
+        familia = response.data['familia']
+        integrante = familia['integrante_familia'][0]
+        indicador = IntegranteIndicador.objects.get(integrante_id=integrante['id'])
+        self.assertNotEqual(indicador.rol, 'abuelo')
+
+        integrante['rol'] = 'abuelo'
+        serializer = FamiliaSerializer(estudio.familia, data=familia)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.update()
+
+        indicador = IntegranteIndicador.objects.get(integrante_id=integrante['id'])
+        self.assertEqual(indicador.rol, 'abuelo')
+
     def test_add_transacion_ingreso(self):
         """ Test adding a transaction that has ingreso to an integrante.
         """
@@ -867,7 +924,7 @@ class TestAPIUploadRetrieveStudy(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
         file_name = os.path.basename(response.data['upload'])
-        path = os.path.join(os.path.dirname(MEDIA_ROOT), 'media', file_name)
+        path = os.path.join(os.path.dirname(MEDIA_ROOT), 'media', 'contenido', file_name)
         file_exists = os.path.isfile(path)
 
         self.assertTrue(file_exists)
@@ -1120,3 +1177,452 @@ class TestAPIUploadRetrieveStudy(APITestCase):
 
         for integrante in study['familia']['integrante_familia']:
             self.assertNotEqual(integrante['oficio'], None)
+
+    def get_changes(self, since=None):
+        """ Requests the changes to the studies of the capturista since a cursor.
+
+        """
+        view = APIUploadRetrieveStudy.as_view({'get': 'cambios'})
+        params = {} if since is None else {'since': since}
+        request = self.factory.get(reverse('{}-cambios'.format(self.test_url_name)), params)
+        force_authenticate(request, user=self.user, token=self.token)
+        return view(request)
+
+    def test_changes_without_cursor(self):
+        """ Test that the first synchronization sends every study with all its rows.
+
+        """
+        study = self.create_base_study().data
+
+        response = self.get_changes()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('cursor', response.data)
+        self.assertEqual(response.data['eliminados'], [])
+        self.assertEqual(len(response.data['estudios']), 1)
+        estudio = response.data['estudios'][0]
+        self.assertEqual(estudio['id'], study['id'])
+        self.assertEqual(len(estudio['familia']['integrante_familia']),
+                         len(study['familia']['integrante_familia']))
+        self.assertEqual(len(estudio['respuesta_estudio']), len(study['respuesta_estudio']))
+
+    def test_changes_only_modified_rows(self):
+        """ Test that only the modified rows of a study are sent after a cursor.
+
+        """
+        study = self.create_base_study().data
+        desde = timezone.now()
+
+        response = self.get_changes(desde.isoformat())
+        self.assertEqual(response.data['estudios'], [])
+
+        comentario = Comentario.objects.filter(familia_id=study['familia']['id']).first()
+        comentario.texto = 'Memento Mori'
+        comentario.save()
+        alumno = Alumno.objects.filter(integrante__familia_id=study['familia']['id']).first()
+        alumno.numero_sae = '666'
+        alumno.save()
+
+        response = self.get_changes(desde.isoformat())
+        self.assertEqual(len(response.data['estudios']), 1)
+        familia = response.data['estudios'][0]['familia']
+        self.assertEqual([c['texto'] for c in familia['comentario_familia']], ['Memento Mori'])
+        self.assertEqual([i['id'] for i in familia['integrante_familia']],
+                         [alumno.integrante_id])
+        self.assertEqual(familia['transacciones'], [])
+        self.assertEqual(response.data['estudios'][0]['respuesta_estudio'], [])
+
+    def test_changes_deleted_rows(self):
+        """ Test that deleted rows and studies no longer synchronized are reported.
+
+        """
+        study = self.create_base_study().data
+        desde = timezone.now()
+
+        id_respuesta = study['respuesta_estudio'].pop()['id']
+        comentarios = study['familia']['comentario_familia']
+        study['familia']['comentario_familia'] = []
+        with CaptureQueriesContext(connection) as context:
+            response = self.update_existing_study(study, study['id'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tablas = (Respuesta._meta.db_table, Comentario._meta.db_table,
+                  Eliminacion._meta.db_table)
+        escrituras = [query['sql'].split('"')[1] for query in context.captured_queries
+                      if query['sql'].startswith(('DELETE', 'INSERT')) and
+                      query['sql'].split('"')[1] in tablas]
+        self.assertEqual(sorted(escrituras), sorted(tablas + (Eliminacion._meta.db_table,)))
+
+        response = self.get_changes(desde.isoformat())
+        self.assertIn({'modelo': 'respuesta', 'id': id_respuesta, 'estudio': study['id']},
+                      response.data['eliminados'])
+        for comentario in comentarios:
+            self.assertIn({'modelo': 'comentario', 'id': comentario['id'],
+                           'estudio': study['id']},
+                          response.data['eliminados'])
+
+        estudio = Estudio.objects.get(pk=study['id'])
+        estudio.status = Estudio.APROBADO
+        estudio.save()
+
+        response = self.get_changes(desde.isoformat())
+        self.assertEqual(response.data['estudios'], [])
+        self.assertIn({'modelo': 'estudio', 'id': study['id'], 'estudio': study['id']},
+                      response.data['eliminados'])
+
+    def test_delete_study_records_study(self):
+        """ Test that deleting a study records only its own deletion, not that of its answers.
+
+        """
+        study = self.create_base_study().data
+        Eliminacion.objects.all().delete()
+
+        Estudio.objects.get(pk=study['id']).delete()
+        self.assertEqual(list(Eliminacion.objects.values_list('modelo', 'id_objeto')),
+                         [('estudio', study['id'])])
+
+    def test_changes_invalid_cursor(self):
+        """ Test that an invalid cursor is rejected.
+
+        """
+        response = self.get_changes('ayer')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_keeps_unchanged_rows(self):
+        """ Test that sending a study without changes does not rewrite its rows.
+
+        """
+        study = self.create_base_study().data
+        respuestas = list(Respuesta.objects.filter(estudio_id=study['id'])
+                                           .order_by('id').values_list('id', 'fecha_modificacion'))
+        comentarios = list(Comentario.objects.filter(familia_id=study['familia']['id'])
+                                             .order_by('id').values_list('id', flat=True))
+
+        response = self.update_existing_study(study, study['id'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(respuestas,
+                         list(Respuesta.objects.filter(estudio_id=study['id'])
+                                               .order_by('id')
+                                               .values_list('id', 'fecha_modificacion')))
+        self.assertEqual(comentarios,
+                         list(Comentario.objects.filter(familia_id=study['familia']['id'])
+                                                .order_by('id').values_list('id', flat=True)))
+        self.assertFalse(Eliminacion.objects.exists())
+
+    def test_update_answers_in_place(self):
+        """ Test that modified answers are updated instead of replaced.
+
+        """
+        study = self.create_base_study().data
+        primera, segunda = study['respuesta_estudio']
+        primera['respuesta'] = 'Memento Mori'
+        del segunda['id']
+        segunda['respuesta'] = 'Sastres el Desastres'
+
+        response = self.update_existing_study(study, study['id'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Respuesta.objects.get(pk=primera['id']).respuesta, 'Memento Mori')
+        actualizada = Respuesta.objects.get(estudio_id=study['id'], pregunta=segunda['pregunta'])
+        self.assertEqual(actualizada.respuesta, 'Sastres el Desastres')
+        self.assertEqual(Respuesta.objects.filter(estudio_id=study['id']).count(), 2)
+        self.assertFalse(Eliminacion.objects.exists())
+
+    def test_update_nested_rows_in_place(self):
+        """ Test that modified nested rows of the family keep their ids.
+
+        """
+        study = self.create_base_study().data
+        integrante = study['familia']['integrante_familia'][0]
+        integrante['nombres'] = 'Chaos Monkey'
+        transaccion = study['familia']['transacciones'][0]
+        transaccion['observacion'] = 'Memento Mori'
+
+        response = self.update_existing_study(study, study['id'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Integrante.objects.get(pk=integrante['id']).nombres, 'Chaos Monkey')
+        self.assertEqual(Transaccion.objects.get(pk=transaccion['id']).observacion,
+                         'Memento Mori')
+        self.assertEqual(Integrante.objects.filter(familia_id=study['familia']['id']).count(),
+                         len(study['familia']['integrante_familia']))
+
+    def sync_batch(self, elementos):
+        """ Sends a batch of studies and returns the response.
+
+        """
+        view = APIUploadRetrieveStudy.as_view({'post': 'lote'})
+        request = self.factory.post(reverse('captura:estudio-lote'), {'estudios': elementos},
+                                    format='json')
+        force_authenticate(request, user=self.user, token=self.token)
+        return view(request)
+
+    def test_sync_batch(self):
+        """ Test that a batch creates and updates studies, and a failing one does not
+            stop the others.
+        """
+        existente = self.create_base_study().data
+        existente['familia']['nombre_familiar'] = 'los lotes'
+        ajeno = Estudio.objects.create(capturista=self.unauthorized_capturista,
+                                       familia=Familia.objects.create(
+                                           numero_hijos_diferentes_papas=1,
+                                           estado_civil='soltero',
+                                           localidad='otro'))
+        invalido = dict(self.study_data, status=Estudio.APROBADO)
+
+        response = self.sync_batch([
+            {'clave': 'nuevo', 'estudio': self.study_data},
+            {'clave': 'existente', 'estudio': existente},
+            {'clave': 'invalido', 'estudio': invalido},
+            {'clave': 'ajeno', 'estudio': {'id': ajeno.pk}},
+            {'clave': 'nuevo', 'estudio': self.study_data},
+            {'clave': 'otro', 'estudio': self.study_data},
+            {'clave': 'repetido', 'estudio': existente},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultados = response.data['resultados']
+        self.assertEqual(set(resultados), {'nuevo', 'existente', 'invalido', 'ajeno', '4',
+                                           'otro', 'repetido'})
+
+        nuevo = resultados['nuevo']
+        self.assertIsNone(nuevo['errores'])
+        self.assertEqual(nuevo['estudio']['id'], nuevo['id'])
+        self.assertEqual(len(nuevo['estudio']['familia']['integrante_familia']), 3)
+        self.assertEqual(nuevo['version'], study_versions([nuevo['id']])[nuevo['id']])
+        self.assertGreaterEqual(nuevo['version'],
+                                Estudio.objects.get(pk=nuevo['id']).fecha_modificacion)
+
+        self.assertIsNone(resultados['existente']['errores'])
+        self.assertEqual(Familia.objects.get(pk=existente['familia']['id']).nombre_familiar,
+                         'los lotes')
+
+        self.assertEqual(resultados['invalido']['errores'], ['Invalid status'])
+        self.assertIsNone(resultados['invalido']['id'])
+        self.assertIn('id', resultados['ajeno']['errores'])
+        self.assertIn('clave', resultados['4']['errores'])
+        self.assertIsNone(resultados['otro']['errores'])
+        self.assertIn('id', resultados['repetido']['errores'])
+        self.assertEqual(Estudio.objects.filter(capturista=self.capturista).count(), 3)
+
+    def test_sync_batch_conflict(self):
+        """ Test that a study modified in the server after the version of the
+            application is sent back instead of being overwritten.
+        """
+        estudio = self.create_base_study().data
+        version = study_versions([estudio['id']])[estudio['id']]
+        Estudio.objects.filter(pk=estudio['id']).update(
+            fecha_modificacion=version + timedelta(minutes=5))
+        estudio['familia']['nombre_familiar'] = 'los lotes'
+
+        resultado = self.sync_batch([{'clave': 'a', 'version': version.isoformat(),
+                                      'estudio': estudio}]).data['resultados']['a']
+        self.assertIn('version', resultado['errores'])
+        self.assertEqual(resultado['estudio']['familia']['nombre_familiar'],
+                         'los hernandovatos')
+        self.assertEqual(resultado['version'], version + timedelta(minutes=5))
+
+        # A nested row modified in the server is a conflict too.
+        version = resultado['version']
+        Integrante.objects.filter(familia_id=estudio['familia']['id']).update(
+            fecha_modificacion=version + timedelta(minutes=5))
+        resultado = self.sync_batch([{'clave': 'a', 'version': version.isoformat(),
+                                      'estudio': estudio}]).data['resultados']['a']
+        self.assertIn('version', resultado['errores'])
+        self.assertEqual(resultado['version'], version + timedelta(minutes=5))
+
+        resultado = self.sync_batch([{'clave': 'a', 'version': resultado['version'].isoformat(),
+                                      'estudio': estudio}]).data['resultados']['a']
+        self.assertIsNone(resultado['errores'])
+        self.assertEqual(resultado['estudio']['familia']['nombre_familiar'], 'los lotes')
+
+        self.assertEqual(self.sync_batch([{'clave': 'a', 'estudio': {}}] * 51).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_batch_photos(self):
+        """ Test that the photos of a batch are only sent when the server does not store them.
+
+        """
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with override_settings(MEDIA_ROOT=media):
+            otro = self.create_base_study().data
+            conocida = Foto(estudio_id=otro['id'])
+            conocida.upload.save('casa.jpg', ContentFile(b'casa'))
+            fotos = [{'nombre': nombre, 'tamano': len(contenido),
+                      'sha256': hashlib.sha256(contenido).hexdigest()}
+                     for nombre, contenido in (('casa.jpg', b'casa'), ('patio.jpg', b'patio'))]
+
+            resultado = self.sync_batch([{'clave': 'a', 'estudio': self.study_data,
+                                          'fotos': fotos}]).data['resultados']['a']
+            casa, patio = resultado['fotos']
+            foto = Foto.objects.get(pk=casa['foto'])
+            self.assertEqual((foto.estudio_id, foto.contenido), (resultado['id'],
+                                                                 conocida.contenido))
+            self.assertIsNone(patio['foto'])
+            self.assertEqual(patio['recibido'], 0)
+            self.assertTrue(SubidaFoto.objects.filter(pk=patio['subida'],
+                                                      estudio=resultado['id']).exists())
+
+            estudio = dict(resultado['estudio'])
+            resultado = self.sync_batch([{'clave': 'a', 'estudio': estudio,
+                                          'fotos': fotos}]).data['resultados']['a']
+            self.assertEqual(resultado['fotos'][0]['foto'], foto.pk)
+            self.assertEqual(resultado['fotos'][1]['subida'], patio['subida'])
+            self.assertEqual(Foto.objects.filter(estudio=resultado['id']).count(), 1)
+
+
+class TestAPIUploadPhotoChunks(APITestCase):
+    """ Test case for the API endpoint that receives the images of a study in chunks.
+
+        Attributes
+        ----------
+        estudio : Estudio
+            The study of the capturista the image is uploaded to.
+        contenido : bytes
+            The image, sent in chunks of 4 bytes.
+    """
+    def setUp(self):
+        """ Creates the capturista and the study, in a temporary MEDIA_ROOT.
+
+        """
+        self.factory = APIRequestFactory()
+        self.media = tempfile.mkdtemp()
+        configuracion = override_settings(MEDIA_ROOT=self.media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.addCleanup(shutil.rmtree, self.media)
+
+        self.user = User.objects.create_user(username='erikiano', password='vacalalo')
+        capturista = Capturista.objects.create(user=self.user)
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        self.estudio = Estudio.objects.create(capturista=capturista, familia=familia)
+        self.contenido = b'casa de la familia'
+
+    def call(self, metodo, accion, pk=None, **kwargs):
+        """ Calls an action of the view on the study and returns the response.
+
+        """
+        view = APIUploadPhotoChunks.as_view({metodo: accion})
+        if pk is None:
+            url = reverse('captura:subidas-list', kwargs={'id_estudio': self.estudio.pk})
+        else:
+            url = reverse('captura:subidas-detail', kwargs={'id_estudio': self.estudio.pk,
+                                                            'pk': pk})
+        request = getattr(self.factory, metodo)(url, **kwargs)
+        force_authenticate(request, user=self.user)
+        if pk is None:
+            return view(request, id_estudio=self.estudio.pk)
+        return view(request, id_estudio=self.estudio.pk, pk=pk)
+
+    def start(self, sha256=None):
+        """ Starts the upload of the image.
+
+        """
+        datos = {'file_name': 'fachada',
+                 'nombre': 'fachada.jpg',
+                 'tamano': len(self.contenido),
+                 'sha256': sha256 or hashlib.sha256(self.contenido).hexdigest()}
+        return self.call('post', 'create', data=datos, format='json')
+
+    def send(self, pk, inicio, fin, sha256=None):
+        """ Sends the chunk of the image between two offsets.
+
+        """
+        pedazo = self.contenido[inicio:fin]
+        return self.call('patch', 'partial_update', pk, data=pedazo,
+                         content_type='application/octet-stream',
+                         HTTP_UPLOAD_OFFSET=str(inicio),
+                         HTTP_UPLOAD_SHA256=sha256 or hashlib.sha256(pedazo).hexdigest())
+
+    def test_chunked_upload(self):
+        """ Test that an upload is resumed from what was received and creates its Foto.
+
+        """
+        response = self.start()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pk = response.data['id']
+        self.assertEqual(response.data['recibido'], 0)
+
+        response = self.send(pk, 4, 8)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['recibido'], 0)
+
+        self.assertEqual(self.send(pk, 0, 4).data['recibido'], 4)
+        response = self.send(pk, 0, 4)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recibido'], 4)
+
+        response = self.send(pk, 4, 8, sha256='0' * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['recibido'], 4)
+
+        response = self.call('post', 'completar', pk)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(self.call('get', 'retrieve', pk).data['recibido'], 4)
+        for inicio in range(4, len(self.contenido), 4):
+            response = self.send(pk, inicio, inicio + 4)
+        self.assertEqual(response.data['recibido'], len(self.contenido))
+
+        response = self.call('post', 'completar', pk)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        foto = Foto.objects.get(pk=response.data['id'])
+        self.assertEqual(foto.estudio, self.estudio)
+        self.assertEqual(foto.file_name, 'fachada')
+        with open(foto.upload.path, 'rb') as archivo:
+            self.assertEqual(archivo.read(), self.contenido)
+
+        self.assertEqual(self.call('post', 'completar', pk).data['id'], foto.pk)
+        response = self.start()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['foto'], foto.pk)
+        self.assertEqual(Foto.objects.count(), 1)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'contenido')),
+                         [os.path.basename(foto.upload.name)])
+
+    def test_known_content(self):
+        """ Test that an image the server already stores is not sent again.
+
+        """
+        anterior = Foto(estudio=self.estudio)
+        anterior.upload.save('fachada.jpg', ContentFile(self.contenido))
+
+        response = self.start()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['recibido'], len(self.contenido))
+
+        response = self.call('post', 'completar', response.data['id'])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        foto = Foto.objects.get(pk=response.data['id'])
+        self.assertEqual(foto.contenido, anterior.contenido)
+        self.assertEqual(foto.upload.name, anterior.upload.name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'contenido'))), 1)
+
+    def test_corrupted_upload(self):
+        """ Test that an image that does not match its sha256 starts over.
+
+        """
+        pk = self.start(sha256=hashlib.sha256(b'otra casa').hexdigest()).data['id']
+        self.send(pk, 0, len(self.contenido))
+
+        response = self.call('post', 'completar', pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['recibido'], 0)
+        self.assertFalse(Foto.objects.exists())
+
+    def test_non_owner_and_expired_uploads(self):
+        """ Test that other capturistas can not see an upload, and abandoned ones are deleted.
+
+        """
+        pk = self.start().data['id']
+        self.user = User.objects.create_user(username='elbukok', password='vacalalo')
+        Capturista.objects.create(user=self.user)
+        self.assertEqual(self.call('get', 'retrieve', pk).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.start().status_code, status.HTTP_404_NOT_FOUND)
+
+        SubidaFoto.objects.update(fecha_modificacion=timezone.now() - timedelta(days=8))
+        call_command('clean_uploads', stdout=io.StringIO())
+        self.assertFalse(SubidaFoto.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'contenido')), [])
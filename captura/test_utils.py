@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from familias.models import Familia
+from perfiles_usuario.models import Capturista
+from estudios_socioeconomicos.load import load_data
+from estudios_socioeconomicos.models import Estudio, Seccion, Respuesta, OpcionRespuesta
+from estudios_socioeconomicos.schema import get_schema
+from .utils import get_study_info, get_study_info_for_section, create_missing_answers
+
+
+class TestStudyInfo(TestCase):
+    """ Suite to test the functions that build the nested information of a study.
+
+    Attributes:
+    -----------
+    estudio : Estudio
+        The study whose information is built, it has the empty answers created
+        when the study was saved.
+    """
+
+    def setUp(self):
+        """ Loads the questions and creates a study.
+
+        """
+        load_data()
+        user = get_user_model().objects.create_user(username='some_user',
+                                                    password='some_pass')
+        capturista = Capturista.objects.create(user=user)
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=2,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        self.estudio = Estudio.objects.create(capturista=capturista, familia=familia)
+
+    def test_section_structure(self):
+        """ Test that every question of the section carries its answers and options.
+
+        """
+        seccion = Seccion.objects.get(numero=1)
+        subsecciones, respuestas = get_study_info_for_section(self.estudio, seccion)
+
+        numeros = [subseccion['numero'] for subseccion in subsecciones]
+        self.assertEqual(numeros, sorted(numeros))
+        total = 0
+        for subseccion in subsecciones:
+            self.assertEqual(subseccion['seccion_id'], seccion.id)
+            for pregunta in subseccion['preguntas']:
+                self.assertEqual(len(pregunta['respuestas']), 1)
+                self.assertEqual(len(pregunta['opciones_respuesta']),
+                                 OpcionRespuesta.objects.filter(pregunta=pregunta['id']).count())
+                total += 1
+        self.assertEqual(len(respuestas), total)
+        self.assertEqual(total, Respuesta.objects.filter(
+            estudio=self.estudio, pregunta__subseccion__seccion=seccion).count())
+
+    def test_section_query_count(self):
+        """ Test that building and rendering a section takes a fixed number of queries.
+
+        Once the questionnaire is cached, only its version and the answers are
+        queried.
+        """
+        seccion = Seccion.objects.get(numero=1)
+        respuesta = Respuesta.objects.filter(estudio=self.estudio,
+                                             pregunta__opciones_pregunta__isnull=False).first()
+        respuesta.eleccion = respuesta.pregunta.opciones_pregunta.first()
+        respuesta.save()
+
+        get_schema()
+        with self.assertNumQueries(2):
+            subsecciones, respuestas = get_study_info_for_section(self.estudio, seccion)
+            for subseccion in subsecciones:
+                for pregunta in subseccion['preguntas']:
+                    for respuesta in pregunta['respuestas']:
+                        str(respuesta['form'])
+
+    def test_study_query_count(self):
+        """ Test that the information of the whole study takes a fixed number of queries.
+
+        """
+        get_schema()
+        with self.assertNumQueries(2):
+            secciones = get_study_info(self.estudio)
+        self.assertEqual(len(secciones), Seccion.objects.count())
+        html = render_to_string('estudios_socioeconomicos/focus_mode_seccion_cuestionario.html',
+                                {'cuestionario': secciones})
+        self.assertIn(secciones[0]['nombre'], html)
+
+    def test_create_missing_answers(self):
+        """ Test that only the questions of the section without answers get one.
+
+        """
+        seccion = Seccion.objects.get(numero=2)
+        respuestas = Respuesta.objects.filter(estudio=self.estudio,
+                                              pregunta__subseccion__seccion=seccion)
+        total = respuestas.count()
+        respuestas.first().delete()
+
+        self.assertEqual(create_missing_answers(self.estudio, seccion), 1)
+        self.assertEqual(create_missing_answers(self.estudio, seccion), 0)
+        self.assertEqual(respuestas.count(), total)
@@ -9,13 +9,14 @@ from .views import capturista_dashboard, capture_study, add_answer_study, remove
                    update_transaccion_modal, get_form_delete_integrante, delete_integrante, \
                    recover_estudios, estudio_recover_modal, estudio_recover, list_photos, \
                    upload_photo, get_form_delete_foto, delete_foto, save_upload_study, \
-                   create_comentario
+                   create_comentario, APIUploadPhotoChunks
 
 app_name = 'captura'
 
 router = routers.DefaultRouter()
 router.register(r'estudio', APIUploadRetrieveStudy, base_name='estudio')
 router.register(r'imagenes/(?P<id_estudio>[0-9]+)', APIUploadRetrieveImages, base_name='imagenes')
+router.register(r'subidas/(?P<id_estudio>[0-9]+)', APIUploadPhotoChunks, base_name='subidas')
 
 urlpatterns = [
     url(r'^', include(router.urls)),
@@ -1,6 +1,6 @@
-from estudios_socioeconomicos.models import Subseccion, Pregunta, Estudio
-from estudios_socioeconomicos.models import OpcionRespuesta, Respuesta, Seccion
+from estudios_socioeconomicos.models import Estudio, Pregunta, Respuesta
 from estudios_socioeconomicos.forms import RespuestaForm
+from estudios_socioeconomicos.schema import get_schema, as_values
 
 from perfiles_usuario.utils import is_capturista, is_administrador
 """
@@ -42,29 +42,111 @@ def user_can_modify_study(user, estudio):
     return False
 
 
+def create_missing_answers(estudio, seccion):
+    """ Creates an empty answer for each question of the section that has none.
+
+        Used when the setting CREAR_RESPUESTAS_AL_CAPTURAR is True, in which
+        case the answers of a study are created section by section, the first
+        time each one is opened. All of them are inserted with a single query.
+
+        Returns
+        ----------
+        The number of answers created.
+    """
+    preguntas = Pregunta.objects.filter(subseccion__seccion=seccion) \
+                                .exclude(respuesta_pregunta__estudio=estudio) \
+                                .values_list('id', flat=True)
+    respuestas = [Respuesta(estudio=estudio, pregunta_id=id_pregunta)
+                  for id_pregunta in preguntas]
+    Respuesta.objects.bulk_create(respuestas)
+    return len(respuestas)
+
+
 def get_study_info(estudio):
     """ Returns all structured information for a complete study.
 
-        We query each section and get all information for that
-        section using get_study_info_for_section.
+        The questionnaire comes from the cache in
+        estudios_socioeconomicos.schema and the answers of every section
+        are fetched at once by _build_study_tree, so the number of queries
+        does not depend on the number of sections, questions or answers.
     """
-    secciones = Seccion.objects.all().values()
+    esquema = get_schema()
+    subsecciones, respuestas = _build_study_tree(estudio, esquema.secciones)
 
-    for seccion in secciones:
-        seccion_instance = Seccion.objects.get(pk=seccion['id'])
-        subsecciones, respuestas = get_study_info_for_section(estudio, seccion_instance)
-        seccion['subsecciones'] = subsecciones
+    secciones = []
+    for seccion_esquema in esquema.secciones:
+        seccion = as_values(seccion_esquema)
+        seccion['subsecciones'] = [subseccion for subseccion in subsecciones
+                                   if subseccion['seccion_id'] == seccion['id']]
+        secciones.append(seccion)
 
     return secciones
 
 
+def _build_study_tree(estudio, secciones):
+    """ Builds the nested information of the given sections for a study.
+
+        The subsections, questions and options are taken from the cached
+        questionnaire, only the answers are fetched, with a single query.
+        The forms of the answers receive their options and selected choice
+        already loaded.
+
+        Parameters
+        ----------
+        estudio : Estudio
+            The study whose answers are returned.
+        secciones : iterable of estudios_socioeconomicos.schema.SeccionEsquema
+            The sections to build.
+
+        Returns
+        ----------
+        Tuple with the list of subsections, in the order of their numero, and
+        the list of answers, as in get_study_info_for_section.
+    """
+    secciones = list(secciones)
+    respuestas_por_pregunta = {}
+    respuestas = Respuesta.objects.filter(
+        estudio=estudio,
+        pregunta__subseccion__seccion__in=[seccion.id for seccion in secciones]) \
+        .select_related('eleccion') \
+        .order_by('id')
+    for respuesta in respuestas:
+        respuestas_por_pregunta.setdefault(respuesta.pregunta_id, []).append(respuesta)
+
+    subsecciones = []
+    answers_objects = list()
+    for subseccion_esquema in sorted((subseccion for seccion in secciones
+                                      for subseccion in seccion.subsecciones),
+                                     key=lambda subseccion: subseccion.numero):
+        subseccion = as_values(subseccion_esquema)
+        subseccion['preguntas'] = []
+        for pregunta_esquema in subseccion_esquema.preguntas:
+            pregunta = as_values(pregunta_esquema)
+            pregunta['respuestas'] = []
+            for respuesta_obj in respuestas_por_pregunta.get(pregunta['id'], []):
+                answers_objects.append(respuesta_obj)
+                respuesta = {field.attname: getattr(respuesta_obj, field.attname)
+                             for field in Respuesta._meta.concrete_fields}
+                respuesta['form'] = RespuestaForm(
+                    instance=respuesta_obj,  # Prefix allows binding form back to object on POST.
+                    prefix='respuesta-{}'.format(respuesta_obj.id),
+                    pregunta=pregunta['id'],  # Question for queryset involving the Options.
+                    opciones=pregunta_esquema.opciones)
+                pregunta['respuestas'].append(respuesta)
+            pregunta['opciones_respuesta'] = pregunta_esquema.opciones
+            subseccion['preguntas'].append(pregunta)
+        subsecciones.append(subseccion)
+
+    return (subsecciones, answers_objects)
+
+
 def get_study_info_for_section(estudio, seccion):
 
     """ Return structured information for a study's section.
 
-        For each section, we query all subsections that branch out and
-        for each subsection we query all the questions that branch out.
-        After that, for each question we query all the answers that have
+        For each section, we get all subsections that branch out and
+        for each subsection all the questions that branch out.
+        After that, for each question we get all the answers that have
         been created (When a study is generated a trigger automatically
         generates an empty answer for each question).  Finally we create
         a form for each answer and send the complete object back to view
@@ -74,9 +156,10 @@ def get_study_info_for_section(estudio, seccion):
         ----------
         .values() is being used to append new values into the queried data.
         We need to create a nested object that already has the information
-        ordered based on the stored indexes. There might me a way to nest
-        objects using django queries, but we also need to create a form for
-        each answer and nest it to its related question.
+        ordered based on the stored indexes. The questionnaire is cached by
+        estudios_socioeconomicos.schema, only the answers are queried by
+        _build_study_tree, so rendering a section takes the same number of
+        queries regardless of its size.
 
         Returns
         ----------
@@ -87,33 +170,6 @@ def get_study_info_for_section(estudio, seccion):
         that in post we can just iterate the answers and get the form back
         using the prefixes.
     """
-    subsecciones = Subseccion.objects.filter(seccion=seccion).order_by('numero').values()
-    answers_objects = list()
-
-    for subseccion in subsecciones:
-        preguntas = Pregunta.objects.filter(subseccion=subseccion['id']).order_by('orden').values()
-
-        for pregunta in preguntas:
-
-            respuestas = Respuesta.objects.filter(
-                pregunta=pregunta['id'],
-                estudio=estudio).values()
-
-            opciones_respuesta = OpcionRespuesta.objects.filter(pregunta=pregunta['id'])
-
-            for respuesta in respuestas:
-                respuesta_obj = Respuesta.objects.get(pk=respuesta['id'])
-
-                answers_objects.append(respuesta_obj)
-
-                respuesta['form'] = RespuestaForm(
-                    instance=respuesta_obj,  # Prefix allows binding form back to object on POST.
-                    prefix='respuesta-{}'.format(respuesta_obj.id),
-                    pregunta=pregunta['id'])  # Question for queryset involving the Options.
-
-            pregunta['respuestas'] = respuestas
-            pregunta['opciones_respuesta'] = opciones_respuesta
-
-        subseccion['preguntas'] = preguntas
-
-    return (subsecciones, answers_objects)
+    secciones = [seccion_esquema for seccion_esquema in get_schema().secciones
+                 if seccion_esquema.id == seccion.pk]
+    return _build_study_tree(estudio, secciones)
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test, login_required
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse, Http404
 
 from django.http.response import HttpResponseBadRequest
@@ -6,27 +8,38 @@ from django.shortcuts import render, redirect, get_object_or_404, get_list_or_40
 from django.urls import reverse
 
 from rest_framework import generics, permissions, status, viewsets
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
 
 from administracion.models import Escuela
+from core.query_budget import query_budget
 from perfiles_usuario.utils import CAPTURISTA_GROUP, ADMINISTRADOR_GROUP, is_member, \
                                    is_capturista
 from perfiles_usuario.models import Capturista
 from estudios_socioeconomicos.forms import DeleteEstudioForm, RespuestaForm, \
                                            RecoverEstudioForm
 from estudios_socioeconomicos.serializers import SeccionSerializer, EstudioSerializer
-from estudios_socioeconomicos.serializers import FotoSerializer
+from estudios_socioeconomicos.serializers import FotoSerializer, SubidaFotoSerializer
 from estudios_socioeconomicos.forms import FotoForm, DeleteFotoForm
-from estudios_socioeconomicos.models import Respuesta, Pregunta, Seccion, Estudio, Foto
+from estudios_socioeconomicos.models import Respuesta, Pregunta, Seccion, Estudio, Foto, \
+                                            SubidaFoto
+from estudios_socioeconomicos.photos import start_processing
+from estudios_socioeconomicos.batch import LOTE_MAXIMO, sync_batch
+from estudios_socioeconomicos.schema import get_schema
+from estudios_socioeconomicos.uploads import ErrorSubida, DesfaseSubida, start_upload, \
+                                              write_chunk, complete_upload
+from estudios_socioeconomicos.sync import STATUS_SINCRONIZADOS, parse_cursor, new_cursor, \
+                                           changed_studies, deleted_rows, prefetch_studies, \
+                                           record_deletions
 from familias.forms import FamiliaForm, IntegranteForm, IntegranteModelForm, \
                            DeleteIntegranteForm, ComentarioForm
 from familias.models import Familia, Integrante, Oficio, Comentario
-from familias.utils import total_egresos_familia, total_ingresos_familia, \
-                           total_neto_familia
 from familias.serializers import EscuelaSerializer, OficioSerializer
 from indicadores.models import Transaccion, Ingreso
 from indicadores.forms import TransaccionForm, IngresoForm, DeleteTransaccionForm
-from .utils import SECTIONS_FLOW, get_study_info_for_section, user_can_modify_study
+from indicadores.resumen import summary_context
+from .utils import SECTIONS_FLOW, get_study_info_for_section, user_can_modify_study, \
+                   create_missing_answers
 from .models import Retroalimentacion
 
 
@@ -119,12 +132,17 @@ def remove_answer_study(request):
     """
     if request.method == 'POST' and request.is_ajax():
 
-        get_object_or_404(Respuesta, pk=request.POST.get('id_respuesta')).delete()
+        respuesta = get_object_or_404(Respuesta.objects.select_related('estudio'),
+                                      pk=request.POST.get('id_respuesta'))
+        with transaction.atomic():
+            record_deletions(Respuesta, [respuesta.pk], respuesta.estudio)
+            respuesta.delete()
         return HttpResponse(status=status.HTTP_202_ACCEPTED)
 
 
 @login_required
 @user_passes_test(lambda u: is_member(u, [ADMINISTRADOR_GROUP, CAPTURISTA_GROUP]))
+@query_budget(9)
 def capture_study(request, id_estudio, numero_seccion):
     """ View for filling the non statistic parts of a study.
 
@@ -180,6 +198,9 @@ def capture_study(request, id_estudio, numero_seccion):
     if not user_can_modify_study(request.user, estudio):
         raise Http404()
 
+    if settings.CREAR_RESPUESTAS_AL_CAPTURAR:
+        create_missing_answers(estudio, seccion)
+
     (data, respuestas) = get_study_info_for_section(estudio, seccion)
 
     if request.method == 'POST':
@@ -188,7 +209,7 @@ def capture_study(request, id_estudio, numero_seccion):
                 request.POST,
                 instance=respuesta,
                 prefix='respuesta-{}'.format(respuesta.id),
-                pregunta=respuesta.pregunta.id)
+                pregunta=respuesta.pregunta_id)
 
             if form.is_valid():
                 form.save()
@@ -217,6 +238,7 @@ def capture_study(request, id_estudio, numero_seccion):
 
 @login_required
 @user_passes_test(is_capturista)
+@query_budget(5)
 def capturista_dashboard(request):
     """View to render the capturista control dashboard.
 
@@ -229,7 +251,8 @@ def capturista_dashboard(request):
 
     estudios = Estudio.objects.filter(
             status__in=[Estudio.RECHAZADO, Estudio.REVISION, Estudio.BORRADOR],
-            capturista=Capturista.objects.get(user=request.user)).order_by('status')
+            capturista=Capturista.objects.get(user=request.user)) \
+        .select_related('familia').order_by('status')
 
     context['estudios'] = estudios
     context['status_options'] = Estudio.get_options_status()
@@ -404,6 +427,7 @@ def edit_familia(request, id_familia):
 
 @login_required
 @user_passes_test(lambda u: is_member(u, [ADMINISTRADOR_GROUP, CAPTURISTA_GROUP]))
+@query_budget(9)
 def list_integrantes(request, id_familia):
     """ This view allows a capturista to see all the information about the
     integrantes of a specific family, they are displayed inside a table,
@@ -411,7 +435,8 @@ def list_integrantes(request, id_familia):
     """
     context = {}
 
-    integrantes = Integrante.objects.filter(familia__pk=id_familia, activo=True)
+    integrantes = Integrante.objects.filter(familia__pk=id_familia, activo=True) \
+                                    .select_related('oficio')
     familia = Familia.objects.get(pk=id_familia)
 
     if not user_can_modify_study(request.user, familia.estudio):
@@ -617,6 +642,7 @@ def delete_transaccion(request, id_transaccion):
 
 @login_required
 @user_passes_test(lambda u: is_member(u, [ADMINISTRADOR_GROUP, CAPTURISTA_GROUP]))
+@query_budget(11)
 def list_transacciones(request, id_familia):
     """ This view allows a capturista to see all the financial information
     of a specific family, they are displayed inside a table, and this view is
@@ -628,16 +654,17 @@ def list_transacciones(request, id_familia):
     if not user_can_modify_study(request.user, context['familia'].estudio):
         raise Http404()
 
-    context['total_egresos_familia'] = total_egresos_familia(id_familia)
-    context['total_ingresos_familia'] = total_ingresos_familia(id_familia)
-    context['total_neto_familia'] = total_neto_familia(id_familia)
+    context.update(summary_context(id_familia))
     transacciones = Transaccion.objects.filter(es_ingreso=True,
                                                familia=context['familia'],
                                                activo=True)
-    context['ingresos'] = Ingreso.objects.filter(transaccion__in=transacciones)
+    context['ingresos'] = Ingreso.objects.filter(transaccion__in=transacciones) \
+                                         .select_related('transaccion__periodicidad',
+                                                         'tutor__integrante')
     context['egresos'] = Transaccion.objects.filter(es_ingreso=False,
                                                     familia=context['familia'],
-                                                    activo=True)
+                                                    activo=True) \
+                                            .select_related('periodicidad')
     context['create_egreso_form'] = TransaccionForm(initial={'es_ingreso': False,
                                                              'familia': context['familia']})
     context['create_transaccion_form'] = TransaccionForm(initial={'es_ingreso': True,
@@ -699,6 +726,7 @@ def upload_photo(request, id_estudio):
             for f in files:
                 picture = Foto(upload=f, estudio=estudio)
                 picture.save()
+            start_processing()
             return redirect('captura:list_photos', id_estudio=estudio.pk)
         else:
             context['fotos'] = Foto.objects.filter(estudio=estudio)
@@ -782,11 +810,29 @@ class APIQuestionsInformation(generics.ListAPIView):
 
         Returns a JSON object with nested objects in this order:
         Seccion, Subseccion, Preguntas, OpcionRespuesta
+
+        The JSON is rendered once per process and kept by
+        estudios_socioeconomicos.schema until the questionnaire changes.
+        It is sent with an ETag, requests whose If-None-Match header
+        matches it receive HTTP 304 without a body.
     """
     serializer_class = SeccionSerializer
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Seccion.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        esquema = get_schema()
+        etag = '"{}"'.format(esquema.etag)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [valor.strip() for valor in if_none_match.split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = Response(esquema.datos, headers={'ETag': etag})
+        if request.accepted_renderer.format == 'json':
+            response.content = esquema.json  # Already rendered, skips the renderer.
+            response['Content-Type'] = 'application/json'
+        return response
+
 
 class APIOficioInformation(generics.ListAPIView):
     """ API to get all available oficios.
@@ -823,6 +869,7 @@ class APIUploadRetrieveStudy(viewsets.ViewSet):
         to be submitted, retrieved or updated.
     """
 
+    @query_budget(10)
     def list(self, request):
         """ Retrieves all Studies in a given state that belong to
             the Capturista making the Query.
@@ -837,13 +884,93 @@ class APIUploadRetrieveStudy(viewsets.ViewSet):
             Response
                 Response object containing the serializer data
         """
-        queryset = Estudio.objects.filter(
-            status__in=[Estudio.RECHAZADO, Estudio.REVISION, Estudio.BORRADOR])
+        queryset = prefetch_studies(Estudio.objects.filter(
+            status__in=[Estudio.RECHAZADO, Estudio.REVISION, Estudio.BORRADOR]))
         studys = get_list_or_404(queryset, capturista=request.user.capturista)
         serializer = EstudioSerializer(studys, many=True)
 
         return Response(serializer.data)
 
+    @list_route(methods=['get'])
+    def cambios(self, request):
+        """ Retrieves what changed in the Studies of the Capturista
+            since the last synchronization, see estudios_socioeconomicos.sync.
+
+            Without the since parameter every Study in the statuses
+            listed by list is sent, along with the cursor for the next
+            synchronization.
+
+            Parameters
+            ----------
+            since : str
+                The cursor returned by the previous synchronization.
+
+            Raises
+            ------
+            HTTP STATUS 400
+            If since is not a valid cursor.
+
+            Returns
+            -------
+            Response
+                Response object with the cursor for the next synchronization,
+                the modified estudios and the eliminados rows.
+        """
+        capturista = request.user.capturista
+        cursor = new_cursor()
+        since = request.query_params.get('since')
+
+        queryset = Estudio.objects.filter(capturista=capturista)
+        if since is None:
+            desde = None
+            estudios = queryset.filter(status__in=STATUS_SINCRONIZADOS)
+            eliminados = []
+        else:
+            desde = parse_cursor(since)
+            if desde is None:
+                return Response({'since': 'Invalid cursor'}, status.HTTP_400_BAD_REQUEST)
+            modificados = queryset.filter(pk__in=changed_studies(capturista, desde))
+            estudios = modificados.filter(status__in=STATUS_SINCRONIZADOS)
+            eliminados = deleted_rows(capturista, desde,
+                                      modificados.exclude(status__in=STATUS_SINCRONIZADOS))
+
+        serializer = EstudioSerializer(prefetch_studies(estudios.order_by('id')), many=True,
+                                       context={'since': desde})
+        return Response({'cursor': cursor,
+                         'estudios': serializer.data,
+                         'eliminados': eliminados})
+
+    @list_route(methods=['post'])
+    def lote(self, request):
+        """ Creates or updates many Studies of the Capturista at once,
+            see estudios_socioeconomicos.batch.
+
+            A Study that can not be saved does not stop the others, its
+            errors are returned in its result.
+
+            Parameters
+            ----------
+            estudios : list
+                The elements of the batch, each with its clave, estudio and
+                optionally its version and the fotos of the study.
+
+            Raises
+            ------
+            HTTP STATUS 400
+            If estudios is not a list of at most LOTE_MAXIMO elements.
+
+            Returns
+            -------
+            Response
+                Response object with the result of each element by its clave.
+        """
+        elementos = request.data.get('estudios')
+        if not isinstance(elementos, list) or len(elementos) > LOTE_MAXIMO:
+            return Response({'estudios': 'A list of at most {} studies is required'.format(
+                LOTE_MAXIMO)}, status.HTTP_400_BAD_REQUEST)
+
+        return Response({'resultados': sync_batch(request.user.capturista, elementos)})
+
     def create(self, request):
         """ Creates and saves a new Estudio object.
 
@@ -1001,6 +1128,136 @@ class APIUploadRetrieveImages(viewsets.ViewSet):
 
         if serializer.is_valid():
             instance = serializer.create(serializer.validated_data)
+            start_processing()
             return Response(FotoSerializer(instance).data, status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+
+class APIUploadPhotoChunks(viewsets.ViewSet):
+    """ API ViewSet for offline client to upload the images of a study in chunks.
+
+        The upload of an image can be resumed after a dropped connection,
+        see estudios_socioeconomicos.uploads for the protocol.
+    """
+
+    def get_upload(self, request, id_estudio, pk):
+        """ Returns the upload of the study, if the study belongs to the Capturista.
+
+            Raises
+            ------
+            HTTP STATUS 404
+            If the upload does not exist or the capturista does not have
+            access to its study.
+        """
+        queryset = SubidaFoto.objects.filter(estudio__capturista=request.user.capturista,
+                                             estudio=id_estudio)
+        return get_object_or_404(queryset, pk=pk)
+
+    def create(self, request, id_estudio):
+        """ Starts the upload of an image to a study.
+
+            If the study is already receiving, or already has, an image
+            with the same sha256, that upload is returned instead.
+
+            Returns
+            -------
+            On Success
+                Response 201, or 200 for an upload started before
+                    Response object containing the serializer data
+            On Error
+                Response 400
+                    Response object containing the serializer errors
+        """
+        queryset = Estudio.objects.filter(capturista=request.user.capturista)
+        estudio = get_object_or_404(queryset, pk=id_estudio)
+
+        serializer = SubidaFotoSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        datos = serializer.validated_data
+        subida, creada = start_upload(estudio, datos.get('file_name', ''), datos['nombre'],
+                                      datos['tamano'], datos['sha256'])
+        return Response(SubidaFotoSerializer(subida).data,
+                        status.HTTP_201_CREATED if creada else status.HTTP_200_OK)
+
+    def retrieve(self, request, id_estudio, pk):
+        """ Retrieves an upload, its recibido is the offset to resume it from.
+
+            Returns
+            -------
+            Response
+                Response object containing the serializer data
+        """
+        subida = self.get_upload(request, id_estudio, pk)
+        return Response(SubidaFotoSerializer(subida).data)
+
+    def partial_update(self, request, id_estudio, pk):
+        """ Receives a chunk of the image of an upload.
+
+            The body of the request is the raw chunk, which is written as
+            it is read, without being buffered.
+
+            Parameters
+            ----------
+            Upload-Offset : header
+                The offset of the chunk in the image.
+            Upload-Sha256 : header
+                The hex sha256 of the chunk.
+
+            Returns
+            -------
+            On Success
+                Response 200
+                    Response object containing the serializer data
+            On Error
+                Response 409
+                    If the chunk does not start at recibido, along with
+                    the serializer data to resume the upload.
+                Response 400
+                    If the chunk is invalid, along with the serializer data.
+        """
+        subida = self.get_upload(request, id_estudio, pk)
+        try:
+            inicio = int(request.META['HTTP_UPLOAD_OFFSET'])
+            longitud = int(request.META['CONTENT_LENGTH'])
+            sha256 = request.META['HTTP_UPLOAD_SHA256'].lower()
+        except (KeyError, ValueError):
+            return Response({'detail': 'Faltan Upload-Offset, Upload-Sha256 o Content-Length.'},
+                            status.HTTP_400_BAD_REQUEST)
+
+        try:
+            subida = write_chunk(subida, inicio, sha256, request, longitud)
+        except ErrorSubida as error:
+            datos = dict(SubidaFotoSerializer(subida).data, detail=str(error))
+            return Response(datos, status.HTTP_409_CONFLICT if isinstance(error, DesfaseSubida)
+                            else status.HTTP_400_BAD_REQUEST)
+        return Response(SubidaFotoSerializer(subida).data)
+
+    @detail_route(methods=['post'])
+    def completar(self, request, id_estudio, pk):
+        """ Creates the Foto of an upload that received the whole image.
+
+            Returns
+            -------
+            On Success
+                Response 201, or 200 if it was already completed
+                    Response object containing the serializer data of the Foto
+            On Error
+                Response 409
+                    If part of the image was not received yet.
+                Response 400
+                    If the image does not match its sha256, the upload
+                    starts over from 0.
+        """
+        subida = self.get_upload(request, id_estudio, pk)
+        try:
+            foto, creada = complete_upload(subida)
+        except ErrorSubida as error:
+            subida.refresh_from_db()
+            datos = dict(SubidaFotoSerializer(subida).data, detail=str(error))
+            return Response(datos, status.HTTP_409_CONFLICT if isinstance(error, DesfaseSubida)
+                            else status.HTTP_400_BAD_REQUEST)
+        return Response(FotoSerializer(foto).data,
+                        status.HTTP_201_CREATED if creada else status.HTTP_200_OK)
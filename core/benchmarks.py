@@ -0,0 +1,214 @@
+""" Benchmarks of the key pages and APIs of the application.
+
+Each benchmark requests a page with the test client, as the user that would
+open it, and measures how long the response takes, including the streamed
+content, and how many queries it runs, next to the query budget declared by
+the view, see .query_budget. The pages are requested on the data of
+.synthetic, with its administrador and capturistas, so the numbers are
+comparable between runs on the same generated data.
+
+The results can be saved to a json file and compared with a later run, which
+lists the pages whose query count grew, or whose median latency grew more
+than a tolerance, so a regression shows up before it is deployed.
+"""
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from estudios_socioeconomicos.models import Estudio, Seccion
+from familias.models import Alumno
+from .query_budget import view_budget
+from .synthetic import synthetic_users
+
+
+# The views of indicadores, all of them read the indicator snapshots.
+INDICADORES = ('estado_civil', 'breakdown_alumnos', 'estudios_padres', 'edad_padres',
+               'ocupaciones', 'ingreso_mensual', 'localidad', 'sacramentos', 'becas')
+
+
+class Resultado(object):
+    """ The measures of a benchmark.
+
+    Attributes:
+    -----------
+    nombre : str
+        The name of the benchmark.
+    mediana : float
+        The median latency, in milliseconds.
+    maximo : float
+        The highest latency, in milliseconds.
+    consultas : int
+        The number of queries of the last request.
+    presupuesto : int
+        The query budget of the view, None if it does not declare one.
+    """
+
+    def __init__(self, nombre, mediana, maximo, consultas, presupuesto=None):
+        self.nombre = nombre
+        self.mediana = mediana
+        self.maximo = maximo
+        self.consultas = consultas
+        self.presupuesto = presupuesto
+
+    def as_dict(self):
+        return {'mediana': self.mediana, 'maximo': self.maximo, 'consultas': self.consultas}
+
+
+def benchmarks():
+    """ Returns the benchmarks, as their name, user and url.
+
+    Raises
+    ------
+    ValueError
+        If there is no synthetic data to request the pages with.
+    """
+    administrador, capturistas = synthetic_users()
+    if administrador is None or not capturistas:
+        raise ValueError('No hay datos sintéticos, genérelos con generate_synthetic_data.')
+
+    capturista = capturistas[0]
+    aprobado = Estudio.objects.filter(status=Estudio.APROBADO).order_by('pk').first()
+    borrador = Estudio.objects.filter(capturista=capturista, status=Estudio.BORRADOR) \
+                              .order_by('pk').first()
+    seccion = Seccion.objects.order_by('numero').first()
+    alumno = Alumno.objects.filter(activo=True, beca__actual=True).order_by('pk').first()
+    sync = reverse('captura:estudio-list')
+
+    casos = [
+        ('list_studies', administrador,
+         reverse('administracion:main_estudios', args=[Estudio.APROBADO])),
+        ('search_students', administrador,
+         reverse('administracion:search_students_results') + '?q=garcia'),
+        ('download_studies', administrador,
+         reverse('estudios_socioeconomicos:download_studies') + '?formato=csv'),
+        ('capturista_dashboard', capturista.user, reverse('captura:estudios')),
+        ('sync_list', capturista.user, sync),
+        ('sync_cambios', capturista.user, reverse('captura:estudio-cambios')),
+    ]
+    if aprobado is not None:
+        casos.append(('focus_mode', administrador,
+                      reverse('estudios_socioeconomicos:focus_mode', args=[aprobado.pk])))
+    if borrador is not None:
+        if seccion is not None:
+            casos.append(('capture_study', capturista.user,
+                          reverse('captura:contestar_estudio',
+                                  args=[borrador.pk, seccion.numero])))
+        casos.append(('list_integrantes', capturista.user,
+                      reverse('captura:list_integrantes', args=[borrador.familia_id])))
+        casos.append(('list_transacciones', capturista.user,
+                      reverse('captura:list_transacciones', args=[borrador.familia_id])))
+    if alumno is not None:
+        casos.append(('detail_student', administrador,
+                      reverse('administracion:detail_student', args=[alumno.pk])))
+    casos.extend(('indicadores_' + nombre, administrador, reverse('indicadores:' + nombre))
+                 for nombre in INDICADORES)
+    return casos
+
+
+def _request(cliente, url):
+    """ Requests a page and reads all of its content, returns the status code.
+
+    """
+    response = cliente.get(url)
+    if response.streaming:
+        for parte in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response.status_code
+
+
+def run_benchmarks(repeticiones=5, nombres=None):
+    """ Runs the benchmarks.
+
+    Each page is requested once to warm up the caches, and then the given
+    number of times.
+
+    Parameters
+    ----------
+    repeticiones : int
+        The number of timed requests of each page.
+    nombres : list
+        The names of the benchmarks to run, every one if not given.
+
+    Raises
+    ------
+    ValueError
+        If a page does not answer with 200.
+
+    Returns
+    -------
+    list
+        A Resultado per benchmark.
+    """
+    resultados = []
+    clientes = {}
+    with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+        for nombre, usuario, url in benchmarks():
+            if nombres and nombre not in nombres:
+                continue
+            if usuario.pk not in clientes:
+                clientes[usuario.pk] = Client()
+                clientes[usuario.pk].force_login(usuario)
+            cliente = clientes[usuario.pk]
+
+            status = _request(cliente, url)
+            if status != 200:
+                raise ValueError('{} respondió {}'.format(url, status))
+            tiempos = []
+            for _ in range(repeticiones):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    _request(cliente, url)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados.append(Resultado(nombre, statistics.median(tiempos), max(tiempos),
+                                        len(consultas), view_budget(url)))
+    return resultados
+
+
+def save_results(resultados, archivo):
+    """ Writes the results to a json file, to compare them with compare_results.
+
+    """
+    with open(archivo, 'w') as salida:
+        json.dump({resultado.nombre: resultado.as_dict() for resultado in resultados},
+                  salida, indent=2, sort_keys=True)
+
+
+def compare_results(resultados, archivo, tolerancia=20):
+    """ Compares the results with the ones saved in a json file.
+
+    Parameters
+    ----------
+    resultados : list
+        The results of run_benchmarks.
+    archivo : str
+        The file written by save_results.
+    tolerancia : int
+        The percentage the median latency may grow without being reported.
+
+    Returns
+    -------
+    list
+        A message for each regression.
+    """
+    with open(archivo) as entrada:
+        base = json.load(entrada)
+    regresiones = []
+    for resultado in resultados:
+        anterior = base.get(resultado.nombre)
+        if anterior is None:
+            continue
+        if resultado.consultas > anterior['consultas']:
+            regresiones.append('{}: {} consultas, antes {}'.format(
+                resultado.nombre, resultado.consultas, anterior['consultas']))
+        if resultado.mediana > anterior['mediana'] * (100 + tolerancia) / 100:
+            regresiones.append('{}: {:.1f} ms, antes {:.1f} ms'.format(
+                resultado.nombre, resultado.mediana, anterior['mediana']))
+    return regresiones
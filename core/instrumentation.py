@@ -0,0 +1,210 @@
+""" Instrumentation of the requests, to tell where the time of a slow page went.
+
+RequestTimingMiddleware measures a sample of the requests, the fraction
+INSTRUMENTACION_MUESTREO of the settings, so that it can stay on in
+production. For each sampled request it records:
+
+- the wall time, until the view returns its response, the content of a
+  streaming response is not included;
+- the number of queries and the time they took;
+- the queries repeated within the request, grouped by their fingerprint: the
+  sql with its literals replaced by ?, so a query per row of a list shows up
+  as a single fingerprint repeated many times;
+- the time spent rendering templates.
+
+What is left of the wall time is spent in python, e.g. building a pdf with
+ReportLab. The measures are sent back in the Server-Timing header, which the
+developer tools of the browsers show next to the request, written as a json
+line to the core.instrumentation logger, and added to the MedicionEndpoint
+of the url, which administracion lists by average time.
+
+The queries are recorded by the debug cursor of django, which is only turned
+on while a sampled request runs. The templates are timed by wrapping
+Template.render, outside of a sampled request the wrapper only checks that
+there is no measure in progress.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError, IntegrityError
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+from django.template.base import Template
+from django.utils import timezone
+
+from .models import MedicionEndpoint
+
+
+logger = logging.getLogger(__name__)
+
+# The number of repeated fingerprints written to the log line.
+DUPLICADAS_REGISTRADAS = 5
+
+LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+_local = threading.local()
+
+
+class Medicion(object):
+    """ The measures of a request in progress.
+
+    Attributes:
+    -----------
+    plantillas : float
+        The seconds spent rendering templates.
+    profundidad : int
+        The number of templates being rendered, an include renders a template
+        inside another, which is only timed once.
+    """
+
+    def __init__(self):
+        self.plantillas = 0
+        self.profundidad = 0
+
+
+def fingerprint(sql):
+    """ Returns the sql of a query with its literals replaced, and the hash of it.
+
+    """
+    normalizada = LISTAS.sub('(...)', LITERALES.sub('?', sql))
+    return normalizada, hashlib.sha1(normalizada.encode('utf-8')).hexdigest()[:12]
+
+
+def repeated_queries(consultas):
+    """ Groups the queries of a request by fingerprint.
+
+    Returns
+    -------
+    list
+        A dict with the huella, veces and sql of each fingerprint run more
+        than once, the most repeated first.
+    """
+    grupos = {}
+    for consulta in consultas:
+        sql, huella = fingerprint(consulta['sql'])
+        if huella in grupos:
+            grupos[huella]['veces'] += 1
+        else:
+            grupos[huella] = {'huella': huella, 'veces': 1, 'sql': sql}
+    return sorted((grupo for grupo in grupos.values() if grupo['veces'] > 1),
+                  key=lambda grupo: (-grupo['veces'], grupo['huella']))
+
+
+def _instrumented_render(render):
+    def instrumented(self, context):
+        medicion = getattr(_local, 'medicion', None)
+        if medicion is None:
+            return render(self, context)
+        medicion.profundidad += 1
+        inicio = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            medicion.profundidad -= 1
+            if not medicion.profundidad:
+                medicion.plantillas += time.perf_counter() - inicio
+    instrumented.instrumentado = True
+    return instrumented
+
+
+def server_timing(datos):
+    """ Returns the value of the Server-Timing header of the measures of a request.
+
+    """
+    return ', '.join([
+        'total;dur={:.1f}'.format(datos['total_ms']),
+        'sql;dur={:.1f};desc="{} consultas ({} duplicadas)"'.format(
+            datos['sql_ms'], datos['consultas'], datos['duplicadas']),
+        'plantillas;dur={:.1f}'.format(datos['plantillas_ms']),
+        'python;dur={:.1f}'.format(max(0, datos['total_ms'] - datos['sql_ms'] -
+                                       datos['plantillas_ms'])),
+    ])
+
+
+def record_measure(datos):
+    """ Adds the measures of a request to the MedicionEndpoint of its url.
+
+    """
+    totales = {
+        'peticiones': F('peticiones') + 1,
+        'tiempo_total': F('tiempo_total') + datos['total_ms'],
+        'tiempo_maximo': Greatest('tiempo_maximo',
+                                  Value(datos['total_ms'], output_field=FloatField())),
+        'tiempo_sql': F('tiempo_sql') + datos['sql_ms'],
+        'tiempo_plantillas': F('tiempo_plantillas') + datos['plantillas_ms'],
+        'consultas': F('consultas') + datos['consultas'],
+        'duplicadas': F('duplicadas') + datos['duplicadas'],
+        'ultima_peticion': timezone.now(),
+    }
+    mediciones = MedicionEndpoint.objects.filter(metodo=datos['metodo'], ruta=datos['ruta'])
+    if mediciones.update(**totales):
+        return
+    try:
+        with transaction.atomic():
+            MedicionEndpoint.objects.create(metodo=datos['metodo'], ruta=datos['ruta'])
+    except IntegrityError:
+        pass  # Another request created it in the meantime.
+    mediciones.update(**totales)
+
+
+class RequestTimingMiddleware(object):
+    """ Measures a sample of the requests, see the module documentation.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(Template.render, 'instrumentado', False):
+            Template.render = _instrumented_render(Template.render)
+
+    def __call__(self, request):
+        if random.random() >= settings.INSTRUMENTACION_MUESTREO:
+            return self.get_response(request)
+
+        conexiones = list(connections.all())
+        anteriores = [(conexion.force_debug_cursor, len(conexion.queries_log))
+                      for conexion in conexiones]
+        for conexion in conexiones:
+            conexion.force_debug_cursor = True
+        _local.medicion = medicion = Medicion()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - inicio
+            _local.medicion = None
+            consultas = []
+            for conexion, (forzado, primera) in zip(conexiones, anteriores):
+                conexion.force_debug_cursor = forzado
+                consultas.extend(list(conexion.queries_log)[primera:])
+
+        repetidas = repeated_queries(consultas)
+        coincidencia = request.resolver_match
+        datos = {
+            'metodo': request.method,
+            'ruta': coincidencia.view_name if coincidencia is not None else '',
+            'ruta_completa': request.path,
+            'status': response.status_code,
+            'usuario': request.user.pk if hasattr(request, 'user') else None,
+            'total_ms': round(total * 1000, 1),
+            'sql_ms': round(sum(float(consulta['time']) for consulta in consultas) * 1000, 1),
+            'plantillas_ms': round(medicion.plantillas * 1000, 1),
+            'consultas': len(consultas),
+            'duplicadas': sum(grupo['veces'] - 1 for grupo in repetidas),
+            'repetidas': repetidas[:DUPLICADAS_REGISTRADAS],
+        }
+        response['Server-Timing'] = server_timing(datos)
+        logger.info(json.dumps(datos, sort_keys=True))
+        if datos['ruta']:
+            try:
+                record_measure(datos)
+            except DatabaseError:
+                logger.exception('No se pudo guardar la medición de %s', datos['ruta'])
+        return response
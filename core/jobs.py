@@ -0,0 +1,87 @@
+""" Management commands run in the background.
+
+Some work takes longer than a request should last, e.g. the exports of the
+database, the batches of scholarship letters or the copies of the photos.
+The view records what must be done and run_command starts a management
+command that does it in a process of its own, which reports its progress in
+the database.
+
+A command that must not run twice at once, e.g. because it drains a queue,
+holds a lock while it runs, see exclusive, and run_command is given the name
+of that lock so it does not start the command while another process holds it.
+"""
+import fcntl
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+
+def _lock_path(nombre):
+    """ Returns the path of the lock file of the given name, in PRIVATE_MEDIA_ROOT.
+
+    """
+    os.makedirs(settings.PRIVATE_MEDIA_ROOT, exist_ok=True)
+    return os.path.join(settings.PRIVATE_MEDIA_ROOT, '{}.lock'.format(nombre))
+
+
+@contextmanager
+def exclusive(nombre):
+    """ Context manager that holds the lock of the given name, unless another process holds it.
+
+    It never waits for the lock, it yields whether it was acquired. The lock
+    is released by the system when the process that holds it dies, so a
+    killed process never leaves it held.
+    """
+    with open(_lock_path(nombre), 'a') as archivo:
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def is_running(nombre):
+    """ Returns whether a process holds the lock of the given name.
+
+    """
+    with exclusive(nombre) as adquirido:
+        return not adquirido
+
+
+def run_command(*args, unico=None):
+    """ Starts a management command in a process of its own, once the current transaction commits.
+
+    The process runs with the same interpreter and settings as this one, and
+    is detached from it, so it is not killed along with the request.
+
+    Parameters
+    ----------
+    args : str
+        The name of the command and its arguments.
+    unico : str
+        The name of the lock the command holds while it runs. If another
+        process holds it when the transaction commits, the command is not
+        started.
+    """
+    comando = [sys.executable,
+               os.path.join(os.path.dirname(settings.BASE_DIR), 'manage.py')]
+    comando.extend(str(argumento) for argumento in args)
+
+    def start():
+        if unico is not None and is_running(unico):
+            return
+        subprocess.Popen(comando,
+                         stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+
+    transaction.on_commit(start)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import run_benchmarks, save_results, compare_results
+
+
+class Command(BaseCommand):
+    """ Times the key pages and APIs on the synthetic data, see core.benchmarks.
+
+    With --comparar the command fails if a page runs more queries, or is
+    slower beyond the tolerance, than in the results saved by --guardar.
+    """
+    help = 'Prints the latency and number of queries of the key pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*',
+                            help='Names of the benchmarks to run, all of them by default.')
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Number of timed requests of each page.')
+        parser.add_argument('--guardar', help='Json file to save the results to.')
+        parser.add_argument('--comparar', help='Json file with previous results.')
+        parser.add_argument('--tolerancia', type=int, default=20,
+                            help='Percentage the median latency may grow.')
+
+    def handle(self, *args, **options):
+        try:
+            resultados = run_benchmarks(options['repeticiones'], options['nombres'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write('{:<32} {:>10} {:>10} {:>9} {:>11}'.format(
+            'Benchmark', 'Mediana ms', 'Maximo ms', 'Consultas', 'Presupuesto'))
+        for resultado in resultados:
+            self.stdout.write('{:<32} {:>10.1f} {:>10.1f} {:>9} {:>11}'.format(
+                resultado.nombre, resultado.mediana, resultado.maximo, resultado.consultas,
+                '-' if resultado.presupuesto is None else resultado.presupuesto))
+
+        if options['guardar']:
+            save_results(resultados, options['guardar'])
+        if options['comparar']:
+            regresiones = compare_results(resultados, options['comparar'],
+                                          options['tolerancia'])
+            if regresiones:
+                raise CommandError('Regresiones:\n' + '\n'.join(regresiones))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import generate
+
+
+class Command(BaseCommand):
+    """ Fills the database with deterministic synthetic families and studies.
+
+    Meant for a development or staging database, to run the benchmarks of
+    the benchmark_app command with realistic volume, see core.synthetic.
+    """
+    help = 'Generates synthetic families, studies and scholarships.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--familias', type=int, default=1000,
+                            help='Number of families to generate.')
+        parser.add_argument('--semilla', type=int, default=0,
+                            help='Seed of the random data, the same seed gives the same data.')
+        parser.add_argument('--capturistas', type=int, default=5,
+                            help='Number of capturistas the studies are split among.')
+
+    def handle(self, *args, **options):
+        def progreso(familias):
+            self.stdout.write('{} de {} familias'.format(familias, options['familias']))
+
+        try:
+            conteos = generate(familias=options['familias'],
+                               semilla=options['semilla'],
+                               capturistas=options['capturistas'],
+                               progreso=progreso if options['verbosity'] > 1 else None)
+        except ValueError as error:
+            raise CommandError(str(error))
+        for nombre, total in sorted(conteos.items()):
+            self.stdout.write('{}: {}'.format(nombre, total))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicionEndpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=10)),
+                ('ruta', models.CharField(max_length=200)),
+                ('peticiones', models.IntegerField(default=0)),
+                ('tiempo_total', models.FloatField(default=0)),
+                ('tiempo_maximo', models.FloatField(default=0)),
+                ('tiempo_sql', models.FloatField(default=0)),
+                ('tiempo_plantillas', models.FloatField(default=0)),
+                ('consultas', models.IntegerField(default=0)),
+                ('duplicadas', models.IntegerField(default=0)),
+                ('ultima_peticion', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicionendpoint',
+            unique_together=set([('metodo', 'ruta')]),
+        ),
+    ]
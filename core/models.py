@@ -0,0 +1,76 @@
+from django.db import models
+
+
+class MedicionEndpoint(models.Model):
+    """ Totals of the requests to an endpoint measured by core.instrumentation.
+
+    Only the sampled requests are added, so the totals are a sample of the
+    traffic, and the averages are the totals divided by peticiones.
+
+    Attributes:
+    -----------
+    metodo : CharField
+        The HTTP method of the requests.
+    ruta : CharField
+        The name of the url, e.g. captura:contestar_estudio.
+    peticiones : IntegerField
+        The number of sampled requests.
+    tiempo_total : FloatField
+        The milliseconds the requests took, added up.
+    tiempo_maximo : FloatField
+        The milliseconds of the slowest request.
+    tiempo_sql : FloatField
+        The milliseconds spent running queries, added up.
+    tiempo_plantillas : FloatField
+        The milliseconds spent rendering templates, added up.
+    consultas : IntegerField
+        The number of queries, added up.
+    duplicadas : IntegerField
+        The number of queries repeated within their request, added up.
+    ultima_peticion : DateTimeField
+        When the last sampled request was made.
+    """
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=200)
+    peticiones = models.IntegerField(default=0)
+    tiempo_total = models.FloatField(default=0)
+    tiempo_maximo = models.FloatField(default=0)
+    tiempo_sql = models.FloatField(default=0)
+    tiempo_plantillas = models.FloatField(default=0)
+    consultas = models.IntegerField(default=0)
+    duplicadas = models.IntegerField(default=0)
+    ultima_peticion = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('metodo', 'ruta')
+
+    def __str__(self):
+        return '{} {}'.format(self.metodo, self.ruta)
+
+    def average(self, campo):
+        """ Returns the average of a total per request.
+
+        """
+        if not self.peticiones:
+            return 0
+        return getattr(self, campo) / self.peticiones
+
+    @property
+    def tiempo_promedio(self):
+        return self.average('tiempo_total')
+
+    @property
+    def sql_promedio(self):
+        return self.average('tiempo_sql')
+
+    @property
+    def plantillas_promedio(self):
+        return self.average('tiempo_plantillas')
+
+    @property
+    def consultas_promedio(self):
+        return self.average('consultas')
+
+    @property
+    def duplicadas_promedio(self):
+        return self.average('duplicadas')
@@ -0,0 +1,142 @@
+""" Query budgets of the views, enforced by the test suite.
+
+A view declares the most queries it may run with the query_budget decorator,
+next to its code:
+
+    @login_required
+    @query_budget(7)
+    def list_studies(request, status_study):
+        ...
+
+Tests that mix QueryBudgetMixin in their TestCase request a url with
+assertWithinBudget, which fails listing the queries run when the view of the
+url goes over its budget. A budget holds for any volume of data, so
+assertQueriesDoNotScale requests a url before and after adding rows and fails
+when the number of queries grows with them, the sign of a query per row, and
+assertCountsDoNotScale compares the counts of many pages measured on a small
+and a large fixture.
+"""
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.core.urlresolvers import resolve
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def query_budget(consultas):
+    """ Declares the maximum number of queries of a view.
+
+    It can decorate a function view, in any position among login_required
+    and user_passes_test, or a method of a viewset.
+    """
+    def decorator(vista):
+        vista.presupuesto_consultas = consultas
+        return vista
+    return decorator
+
+
+def view_budget(url, metodo='get'):
+    """ Returns the query budget of the view of a url, or None if it does not declare one.
+
+    """
+    vista = resolve(urlsplit(url).path).func
+    acciones = getattr(vista, 'actions', None)
+    if acciones is not None:
+        vista = getattr(vista.cls, acciones.get(metodo, metodo), None)
+    elif hasattr(vista, 'cls'):
+        vista = getattr(vista.cls, metodo, None)
+    return getattr(vista, 'presupuesto_consultas', None)
+
+
+def _describe(consultas):
+    return '\n'.join('{}. {}'.format(numero, consulta['sql'])
+                     for numero, consulta in enumerate(consultas.captured_queries, 1))
+
+
+class QueryBudgetMixin(object):
+    """ Assertions on the number of queries of the views, for a TestCase.
+
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, maximo):
+        """ Fails if the block runs more than the given number of queries.
+
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            yield consultas
+        if len(consultas) > maximo:
+            self.fail('Se ejecutaron {} consultas, el máximo es {}:\n{}'.format(
+                len(consultas), maximo, _describe(consultas)))
+
+    def count_queries(self, url, data=None, client=None):
+        """ Requests a url and returns the response and the number of queries it ran.
+
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            response = (client or self.client).get(url, data or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return response, len(consultas)
+
+    def assertWithinBudget(self, url, data=None, client=None):
+        """ Fails if the view of a url runs more queries than its budget.
+
+        Returns
+        -------
+        HttpResponse
+            The response of the view.
+        """
+        presupuesto = view_budget(url)
+        self.assertIsNotNone(presupuesto,
+                             'La vista de {} no declara su presupuesto de consultas.'.format(url))
+        with self.assertMaxQueries(presupuesto):
+            response = (client or self.client).get(url, data or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def assertCountsDoNotScale(self, pocos, muchos):
+        """ Fails if a count of queries with few rows grew with many rows.
+
+        The message reports how every count scaled, not only the ones that
+        grew.
+
+        Parameters
+        ----------
+        pocos : dict
+            The number of queries of each url or benchmark with few rows.
+        muchos : dict
+            The number of queries of the same keys with many rows.
+        """
+        reporte = ['{}: {} -> {}'.format(nombre, pocos[nombre], muchos[nombre])
+                   for nombre in sorted(pocos) if nombre in muchos]
+        crecieron = [nombre for nombre in sorted(pocos)
+                     if nombre in muchos and muchos[nombre] > pocos[nombre]]
+        if crecieron:
+            self.fail('Las consultas de {} crecen con los datos:\n{}'.format(
+                ', '.join(crecieron), '\n'.join(reporte)))
+
+    def assertQueriesDoNotScale(self, url, crecer, data=None, client=None):
+        """ Fails if the queries of a url grow when rows are added.
+
+        Parameters
+        ----------
+        url : str
+            The url to request.
+        crecer : callable
+            Adds the rows the view shows, between both requests.
+
+        Returns
+        -------
+        tuple
+            The number of queries before and after adding the rows.
+        """
+        antes = self.count_queries(url, data, client)[1]
+        crecer()
+        despues = self.count_queries(url, data, client)[1]
+        self.assertCountsDoNotScale({url: antes}, {url: despues})
+        return antes, despues
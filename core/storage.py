@@ -0,0 +1,53 @@
+""" Storage of the files that must not be served publicly.
+
+MEDIA_ROOT is served by the web server at MEDIA_URL to anyone who knows the
+name of a file. The files that hold personal data of the families, e.g. the
+exports of the database or the letters of the scholarships, are stored in
+PRIVATE_MEDIA_ROOT instead, which has no URL, and are only sent by the views
+that check who asks for them.
+"""
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+@deconstructible
+class PrivateStorage(FileSystemStorage):
+    """ FileSystemStorage in PRIVATE_MEDIA_ROOT, whose files have no URL.
+
+    """
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super(PrivateStorage, self)._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    @property
+    def base_url(self):
+        return None
+
+
+private_storage = PrivateStorage()
+
+
+def move_to_private(nombres):
+    """ Moves files stored in MEDIA_ROOT to the same names in PRIVATE_MEDIA_ROOT.
+
+    Used by the migrations of the fields that were stored in MEDIA_ROOT.
+    Names that are not in MEDIA_ROOT are skipped.
+    """
+    for nombre in set(nombres):
+        origen = os.path.join(settings.MEDIA_ROOT, nombre)
+        if os.path.isfile(origen):
+            destino = private_storage.path(nombre)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            shutil.move(origen, destino)
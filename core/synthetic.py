@@ -0,0 +1,318 @@
+""" Deterministic synthetic data to see how the application behaves with volume.
+
+generate creates families with their integrantes, students, tutors,
+transactions and incomes, a study with every question answered, and the
+scholarships of the approved students. The same seed and number of families
+always produce the same data, so the benchmarks of .benchmarks can be
+compared between runs, as long as the data is generated on a database with
+the same catalogs (questions, schools, occupations and periods), e.g. an
+empty one right after migrate.
+
+The rows are written with bulk_create, which does not send signals, so once
+everything is inserted the data derived from them is rebuilt: the financial
+summaries, the indicator snapshots, the search text and the current
+scholarship of the students.
+
+The studies belong to capturistas created for the data, named after
+PREFIJO, and an administrador with the same prefix is created to browse
+them.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+
+from administracion.models import Escuela
+from becas.current import refresh_current
+from becas.models import Beca
+from estudios_socioeconomicos.models import Estudio, Pregunta, OpcionRespuesta, Respuesta
+from familias.models import Familia, Integrante, Alumno, Tutor, Oficio
+from familias.search import update_search_text
+from indicadores.models import Periodo, Transaccion, Ingreso
+from indicadores.resumen import update_summaries
+from indicadores.snapshots import update_snapshot
+from perfiles_usuario.models import Capturista
+from perfiles_usuario.utils import ADMINISTRADOR_GROUP, CAPTURISTA_GROUP
+
+
+PREFIJO = 'sintetico'
+
+# The families are inserted in chunks, so that memory does not grow with them.
+LOTE = 200
+
+# The number of rows of each lookup of the ids of the inserted rows.
+LOTE_CONSULTA = 500
+
+# The day the ages and dates of the data are computed from.
+HOY = date(2017, 6, 1)
+
+NOMBRES = ('Juan', 'María', 'José', 'Guadalupe', 'Luis', 'Ana', 'Carlos', 'Rosa',
+           'Miguel', 'Elena', 'Pedro', 'Lucía', 'Jorge', 'Sofía', 'Raúl', 'Carmen')
+APELLIDOS = ('Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez',
+             'Rodríguez', 'Sánchez', 'Ramírez', 'Cruz', 'Flores', 'Gómez')
+PALABRAS = ('casa', 'trabajo', 'escuela', 'familia', 'salud', 'comida', 'agua',
+            'renta', 'luz', 'transporte', 'apoyo', 'iglesia', 'vecinos', 'campo')
+
+# The chance of each status of the studies.
+STATUS = ((Estudio.APROBADO, 50), (Estudio.REVISION, 20), (Estudio.BORRADOR, 15),
+          (Estudio.RECHAZADO, 10), (Estudio.ELIMINADO_ADMIN, 5))
+
+
+def synthetic_users():
+    """ Returns the administrador and the capturistas the synthetic studies belong to.
+
+    Returns
+    -------
+    tuple
+        The User of the administrador, or None if the data was not generated,
+        and the list of Capturistas.
+    """
+    administrador = User.objects.filter(username=PREFIJO + '_administrador').first()
+    capturistas = list(Capturista.objects.filter(user__username__startswith=PREFIJO + '_')
+                                         .select_related('user')
+                                         .order_by('pk'))
+    return administrador, capturistas
+
+
+def _create_users(numero):
+    administrador = User.objects.create_user(username=PREFIJO + '_administrador')
+    Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0].user_set.add(administrador)
+    Group.objects.get_or_create(name=CAPTURISTA_GROUP)
+    capturistas = []
+    for indice in range(numero):
+        usuario = User.objects.create_user(username='{}_capturista_{}'.format(PREFIJO, indice))
+        capturistas.append(Capturista.objects.create(user=usuario))
+    return capturistas
+
+
+def _insert(modelo, objetos, clave):
+    """ Inserts objects in bulk and sets their primary key.
+
+    PostgreSQL returns the keys of the inserted rows, other databases do not,
+    so they are read back by a field that is unique among the objects.
+    """
+    modelo.objects.bulk_create(objetos, batch_size=LOTE_CONSULTA)
+    if not objetos or objetos[0].pk is not None:
+        return
+    valores = [getattr(objeto, clave) for objeto in objetos]
+    ids = {}
+    for inicio in range(0, len(valores), LOTE_CONSULTA):
+        filtro = {clave + '__in': valores[inicio:inicio + LOTE_CONSULTA]}
+        ids.update(modelo.objects.filter(**filtro).values_list(clave, 'pk'))
+    for objeto in objetos:
+        objeto.pk = ids[getattr(objeto, clave)]
+
+
+def _weighted(rng, opciones):
+    valor = rng.uniform(0, sum(peso for opcion, peso in opciones))
+    for opcion, peso in opciones:
+        valor -= peso
+        if valor <= 0:
+            return opcion
+    return opciones[-1][0]
+
+
+def _birth_date(rng, minimo, maximo):
+    return HOY - timedelta(days=rng.randint(minimo * 365, maximo * 365))
+
+
+def _text(rng, palabras):
+    return ' '.join(rng.choice(PALABRAS) for _ in range(palabras))
+
+
+class _Catalogos(object):
+    """ The rows of the catalogs the synthetic data points to, in a fixed order.
+
+    """
+
+    def __init__(self):
+        self.escuelas = list(Escuela.objects.order_by('pk'))
+        if not self.escuelas:
+            self.escuelas = [Escuela.objects.create(nombre='Escuela ' + PREFIJO)]
+        self.oficios = list(Oficio.objects.order_by('pk').values_list('pk', flat=True))
+        self.periodos = list(Periodo.objects.order_by('pk'))
+        if not self.periodos:
+            self.periodos = [Periodo.objects.create(periodicidad='Mensual', factor=1,
+                                                    multiplica=True)]
+        self.preguntas = list(Pregunta.objects.order_by('pk').values_list('pk', flat=True))
+        self.opciones = {}
+        for id_opcion, id_pregunta in OpcionRespuesta.objects.order_by('pk') \
+                                                             .values_list('pk', 'pregunta_id'):
+            self.opciones.setdefault(id_pregunta, []).append(id_opcion)
+        self.niveles = [nivel for nivel, nombre in Integrante.OPCIONES_NIVEL_ESTUDIOS]
+        self.ciclos = [ciclo for ciclo, nombre in Alumno.OPCIONES_CICLOS_ESCOLARES
+                       if '2014' <= ciclo <= '2018']
+
+
+def _family_chunk(rng, catalogos, capturistas, primero, numero, conteos):
+    """ Inserts a chunk of families with all of their data.
+
+    Returns
+    -------
+    tuple
+        The ids of the families and of their students.
+    """
+    familias = []
+    for numero_familia in range(primero, primero + numero):
+        apellidos = '{} {}'.format(rng.choice(APELLIDOS), rng.choice(APELLIDOS))
+        familias.append(Familia(
+            numero_hijos_diferentes_papas=rng.randint(1, 3),
+            nombre_familiar='{} {} {:06d}'.format(apellidos, PREFIJO, numero_familia),
+            direccion='Calle {} {}'.format(rng.choice(APELLIDOS), rng.randint(1, 300)),
+            estado_civil=rng.choice(Familia.OPCIONES_ESTADO_CIVIL)[0],
+            localidad=rng.choice(Familia.OPCIONES_LOCALIDAD)[0],
+            banio=rng.choice(Familia.OPCIONES_BANIO)[0],
+            sanitarios=rng.choice(Familia.OPCIONES_SANITARIAS)[0]))
+    _insert(Familia, familias, 'nombre_familiar')
+
+    integrantes = []
+    tutores = []
+    alumnos = []
+    for familia in familias:
+        apellidos = familia.nombre_familiar.rsplit(' ', 2)[0]
+        for indice in range(rng.randint(1, 2)):
+            integrante = Integrante(
+                familia=familia, nombres=rng.choice(NOMBRES), apellidos=apellidos,
+                oficio_id=rng.choice(catalogos.oficios) if catalogos.oficios else None,
+                telefono='442{:07d}'.format(rng.randint(0, 9999999)),
+                offline_id='{}-{}-t{}'.format(PREFIJO, familia.pk, indice),
+                nivel_estudios=rng.choice(catalogos.niveles),
+                fecha_de_nacimiento=_birth_date(rng, 22, 60),
+                rol='tutor')
+            integrantes.append(integrante)
+            tutores.append(integrante)
+        for indice in range(rng.randint(1, 4)):
+            integrante = Integrante(
+                familia=familia, nombres=rng.choice(NOMBRES), apellidos=apellidos,
+                offline_id='{}-{}-a{}'.format(PREFIJO, familia.pk, indice),
+                nivel_estudios=rng.choice(catalogos.niveles[:6]),
+                fecha_de_nacimiento=_birth_date(rng, 3, 18),
+                rol='alumno')
+            integrantes.append(integrante)
+            alumnos.append(integrante)
+        for indice in range(rng.randint(0, 2)):
+            integrantes.append(Integrante(
+                familia=familia, nombres=rng.choice(NOMBRES), apellidos=apellidos,
+                offline_id='{}-{}-o{}'.format(PREFIJO, familia.pk, indice),
+                nivel_estudios=rng.choice(catalogos.niveles),
+                fecha_de_nacimiento=_birth_date(rng, 0, 80),
+                rol=rng.choice(('hermano', 'abuelo', 'tio'))))
+    _insert(Integrante, integrantes, 'offline_id')
+
+    tutores = [Tutor(integrante=integrante, relacion=rng.choice(Tutor.OPCIONES_RELACION)[0])
+               for integrante in tutores]
+    _insert(Tutor, tutores, 'integrante_id')
+    alumnos = [Alumno(integrante=integrante,
+                      numero_sae=str(100000 + integrante.pk),
+                      escuela=rng.choice(catalogos.escuelas),
+                      ciclo_escolar=rng.choice(catalogos.ciclos),
+                      estatus_ingreso=rng.choice(Alumno.OPCIONES_ESTATUS_INGRESO)[0])
+               for integrante in alumnos]
+    _insert(Alumno, alumnos, 'integrante_id')
+
+    tutores_familia = {}
+    for tutor in tutores:
+        tutores_familia.setdefault(tutor.integrante.familia_id, []).append(tutor)
+    transacciones = []
+    for familia in familias:
+        for indice in range(rng.randint(2, 6)):
+            es_ingreso = indice < 2 or rng.random() < 0.3
+            transacciones.append(Transaccion(
+                familia=familia,
+                monto=Decimal(rng.randint(100, 4000 if es_ingreso else 1500)),
+                periodicidad=rng.choice(catalogos.periodos),
+                offline_id='{}-{}-{}'.format(PREFIJO, familia.pk, indice),
+                observacion=_text(rng, 3),
+                es_ingreso=es_ingreso))
+    _insert(Transaccion, transacciones, 'offline_id')
+    ingresos = [Ingreso(transaccion=transaccion,
+                        fecha=HOY - timedelta(days=rng.randint(0, 365)),
+                        tipo=rng.choice(Ingreso.OPCIONES_TIPO)[0],
+                        tutor=rng.choice(tutores_familia[transaccion.familia_id]))
+                for transaccion in transacciones if transaccion.es_ingreso]
+    Ingreso.objects.bulk_create(ingresos, batch_size=LOTE_CONSULTA)
+
+    estudios = [Estudio(capturista=rng.choice(capturistas), familia=familia,
+                        status=_weighted(rng, STATUS))
+                for familia in familias]
+    _insert(Estudio, estudios, 'familia_id')
+    respuestas = []
+    for estudio in estudios:
+        for id_pregunta in catalogos.preguntas:
+            opciones = catalogos.opciones.get(id_pregunta)
+            if opciones:
+                respuestas.append(Respuesta(estudio=estudio, pregunta_id=id_pregunta,
+                                            eleccion_id=rng.choice(opciones)))
+            else:
+                respuestas.append(Respuesta(estudio=estudio, pregunta_id=id_pregunta,
+                                            respuesta=_text(rng, rng.randint(1, 8))))
+        if len(respuestas) >= 10 * LOTE_CONSULTA:
+            Respuesta.objects.bulk_create(respuestas, batch_size=LOTE_CONSULTA)
+            conteos['respuestas'] += len(respuestas)
+            respuestas = []
+    Respuesta.objects.bulk_create(respuestas, batch_size=LOTE_CONSULTA)
+
+    aprobadas = {estudio.familia_id for estudio in estudios
+                 if estudio.status == Estudio.APROBADO}
+    becas = []
+    for alumno in alumnos:
+        if alumno.integrante.familia_id in aprobadas:
+            for indice in range(rng.randint(1, 2)):
+                becas.append(Beca(alumno=alumno, porcentaje=str(rng.randint(1, 20) * 5)))
+    Beca.objects.bulk_create(becas, batch_size=LOTE_CONSULTA)
+
+    conteos['familias'] += len(familias)
+    conteos['integrantes'] += len(integrantes)
+    conteos['alumnos'] += len(alumnos)
+    conteos['transacciones'] += len(transacciones)
+    conteos['respuestas'] += len(respuestas)
+    conteos['becas'] += len(becas)
+    return [familia.pk for familia in familias], [alumno.pk for alumno in alumnos], aprobadas
+
+
+def generate(familias=1000, semilla=0, capturistas=5, progreso=None):
+    """ Generates the synthetic data.
+
+    Parameters
+    ----------
+    familias : int
+        The number of families.
+    semilla : int
+        The seed of the random choices.
+    capturistas : int
+        The number of capturistas the studies are split among.
+    progreso : callable
+        Called with the number of families inserted after each chunk.
+
+    Raises
+    ------
+    ValueError
+        If the database already has synthetic data.
+
+    Returns
+    -------
+    dict
+        The number of rows inserted of each kind.
+    """
+    if synthetic_users()[0] is not None:
+        raise ValueError('La base de datos ya tiene datos sintéticos.')
+    rng = random.Random(semilla)
+    conteos = dict.fromkeys(('familias', 'integrantes', 'alumnos', 'transacciones',
+                             'respuestas', 'becas'), 0)
+
+    with transaction.atomic():
+        capturistas = _create_users(capturistas)
+        catalogos = _Catalogos()
+        for primero in range(0, familias, LOTE):
+            ids_familia, ids_alumno, aprobadas = _family_chunk(
+                rng, catalogos, capturistas, primero, min(LOTE, familias - primero), conteos)
+            update_summaries(ids_familia)
+            refresh_current(ids_alumno)
+            update_search_text(Alumno.objects.filter(pk__in=ids_alumno))
+            for id_familia in sorted(aprobadas):
+                update_snapshot(id_familia)
+            if progreso is not None:
+                progreso(conteos['familias'])
+    return conteos
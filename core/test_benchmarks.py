@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from becas.models import Beca
+from estudios_socioeconomicos.models import Estudio, Seccion, Subseccion, Pregunta, \
+    OpcionRespuesta, Respuesta
+from familias.models import Familia, Alumno
+from indicadores.models import FamiliaIndicador, ResumenFinanciero
+from .benchmarks import run_benchmarks, save_results, compare_results
+from .synthetic import generate
+
+
+class TestSyntheticData(TestCase):
+    """ Suite to test the synthetic data generator and the benchmarks that use it.
+
+    """
+
+    def setUp(self):
+        """ Creates a section of the questionnaire, with an open and a closed question.
+
+        """
+        seccion = Seccion.objects.create(nombre='Vivienda', numero=1)
+        subseccion = Subseccion.objects.create(seccion=seccion, nombre='Casa', numero=1)
+        Pregunta.objects.create(subseccion=subseccion, texto='¿Cómo es la casa?')
+        pregunta = Pregunta.objects.create(subseccion=subseccion, texto='¿Es propia?')
+        OpcionRespuesta.objects.create(pregunta=pregunta, texto='Sí')
+        OpcionRespuesta.objects.create(pregunta=pregunta, texto='No')
+
+    def test_generate(self):
+        """ Test that every study is answered and the derived data is built.
+
+        """
+        conteos = generate(familias=12, semilla=3, capturistas=2)
+        self.assertEqual(conteos['familias'], 12)
+        self.assertEqual(Familia.objects.count(), 12)
+        self.assertEqual(Estudio.objects.count(), 12)
+        self.assertEqual(Respuesta.objects.count(), 24)
+        self.assertEqual(Respuesta.objects.filter(eleccion__isnull=False).count(), 12)
+        self.assertEqual(conteos['respuestas'], Respuesta.objects.count())
+        self.assertEqual(ResumenFinanciero.objects.count(), 12)
+        self.assertEqual(FamiliaIndicador.objects.count(),
+                         Estudio.objects.filter(status=Estudio.APROBADO).count())
+        self.assertFalse(Alumno.objects.filter(texto_busqueda='').exists())
+        self.assertEqual(Beca.objects.filter(actual=True).count(),
+                         Beca.objects.values('alumno').distinct().count())
+
+        with self.assertRaises(ValueError):
+            generate(familias=1)
+
+    def test_generate_is_deterministic(self):
+        """ Test that the same seed gives the same data.
+
+        """
+        def datos():
+            return (list(Familia.objects.order_by('pk')
+                                        .values_list('nombre_familiar', 'localidad')),
+                    list(Estudio.objects.order_by('pk').values_list('status', flat=True)),
+                    list(Beca.objects.order_by('pk').values_list('porcentaje', flat=True)))
+
+        generate(familias=5, semilla=7)
+        primeros = datos()
+        Familia.objects.all().delete()
+        Beca.objects.all().delete()
+        User.objects.filter(username__startswith='sintetico').delete()
+        generate(familias=5, semilla=7)
+        self.assertEqual(datos(), primeros)
+
+    def test_benchmarks(self):
+        """ Test that every page answers on the synthetic data and regressions are reported.
+
+        """
+        with self.assertRaises(CommandError):
+            call_command('benchmark_app', stdout=io.StringIO())
+
+        call_command('generate_synthetic_data', familias=10, stdout=io.StringIO())
+        resultados = run_benchmarks(repeticiones=1)
+        nombres = {resultado.nombre for resultado in resultados}
+        self.assertTrue({'list_studies', 'download_studies', 'sync_cambios', 'focus_mode',
+                         'capture_study', 'indicadores_becas'} <= nombres)
+
+        descriptor, archivo = tempfile.mkstemp(suffix='.json')
+        os.close(descriptor)
+        try:
+            save_results(resultados, archivo)
+            self.assertEqual(compare_results(resultados, archivo), [])
+            with open(archivo) as entrada:
+                base = json.load(entrada)
+            base['list_studies']['consultas'] -= 1
+            with open(archivo, 'w') as salida:
+                json.dump(base, salida)
+            self.assertEqual(len(compare_results(resultados, archivo)), 1)
+
+            salida = io.StringIO()
+            call_command('benchmark_app', 'list_studies', repeticiones=1, stdout=salida)
+            self.assertIn('list_studies', salida.getvalue())
+        finally:
+            os.remove(archivo)
@@ -0,0 +1,78 @@
+import json
+
+from django.contrib.auth.models import User, Group
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from estudios_socioeconomicos.models import Estudio
+from perfiles_usuario.utils import ADMINISTRADOR_GROUP
+from .instrumentation import fingerprint, repeated_queries
+from .models import MedicionEndpoint
+
+
+class TestInstrumentation(TestCase):
+    """ Suite to test the measures of the requests.
+
+    """
+
+    def setUp(self):
+        thelma = User.objects.create_user(username='thelma', password='junipero')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        self.client.force_login(thelma)
+        self.url = reverse('administracion:main_estudios', args=[Estudio.APROBADO])
+
+    def test_fingerprint(self):
+        """ Test that queries that only differ in their literals share a fingerprint.
+
+        """
+        sql, huella = fingerprint("SELECT * FROM t WHERE id = 12 AND nombre = 'O''Hara'")
+        self.assertEqual(sql, 'SELECT * FROM t WHERE id = ? AND nombre = ?')
+        self.assertEqual(huella, fingerprint("SELECT * FROM t WHERE id = 3 AND nombre = 'x'")[1])
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3)')[0],
+                         'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (4)')[0],
+                         'SELECT * FROM t WHERE id IN (...)')
+
+        repetidas = repeated_queries([{'sql': 'SELECT a FROM t WHERE id = 1'},
+                                      {'sql': 'SELECT a FROM t WHERE id = 2'},
+                                      {'sql': 'SELECT b FROM t'},
+                                      {'sql': 'SELECT a FROM t WHERE id = 3'}])
+        self.assertEqual([(grupo['veces'], grupo['sql']) for grupo in repetidas],
+                         [(3, 'SELECT a FROM t WHERE id = ?')])
+
+    @override_settings(INSTRUMENTACION_MUESTREO=0)
+    def test_not_sampled(self):
+        """ Test that requests out of the sample are not measured.
+
+        """
+        response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(MedicionEndpoint.objects.exists())
+
+    @override_settings(INSTRUMENTACION_MUESTREO=1)
+    def test_sampled(self):
+        """ Test that a sampled request is timed, logged and added to its endpoint.
+
+        """
+        with self.assertLogs('core.instrumentation', 'INFO') as registro:
+            response = self.client.get(self.url)
+            self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        partes = [parte.split(';')[0] for parte in response['Server-Timing'].split(', ')]
+        self.assertEqual(partes, ['total', 'sql', 'plantillas', 'python'])
+
+        datos = json.loads(registro.records[0].getMessage())
+        self.assertEqual(datos['ruta'], 'administracion:main_estudios')
+        self.assertEqual(datos['status'], 200)
+        self.assertGreater(datos['consultas'], 0)
+        self.assertGreater(datos['plantillas_ms'], 0)
+        self.assertLessEqual(datos['sql_ms'] + datos['plantillas_ms'], datos['total_ms'])
+
+        medicion = MedicionEndpoint.objects.get()
+        self.assertEqual((medicion.metodo, medicion.ruta), ('GET', 'administracion:main_estudios'))
+        self.assertEqual(medicion.peticiones, 2)
+        self.assertEqual(medicion.consultas, 2 * datos['consultas'])
+        self.assertGreaterEqual(medicion.tiempo_maximo, datos['total_ms'])
@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client
+
+from becas.models import Beca
+from estudios_socioeconomicos.models import Estudio, Seccion, Subseccion, Pregunta
+from familias.models import Familia
+from .benchmarks import benchmarks
+from .query_budget import QueryBudgetMixin, view_budget
+from .synthetic import generate
+
+
+class TestQueryBudget(QueryBudgetMixin, TestCase):
+    """ Suite to test the query budgets of the key views.
+
+    Each view is requested on a small and on a large synthetic fixture, it
+    has to stay within its budget on both, and its number of queries must not
+    grow from one to the other.
+    """
+
+    def setUp(self):
+        """ Creates a section of the questionnaire, so that the studies have answers.
+
+        """
+        seccion = Seccion.objects.create(nombre='Vivienda', numero=1)
+        subseccion = Subseccion.objects.create(seccion=seccion, nombre='Casa', numero=1)
+        Pregunta.objects.create(subseccion=subseccion, texto='¿Cómo es la casa?')
+
+    def measure(self, familias):
+        """ Generates the given number of families and requests every view with a budget.
+
+        The synthetic data is deleted afterwards.
+
+        Returns
+        -------
+        dict
+            The number of queries of each benchmark.
+        """
+        generate(familias=familias, capturistas=1)
+        clientes = {}
+        consultas = {}
+        for nombre, usuario, url in benchmarks():
+            if view_budget(url) is None:
+                continue
+            if usuario.pk not in clientes:
+                clientes[usuario.pk] = Client()
+                clientes[usuario.pk].force_login(usuario)
+            clientes[usuario.pk].get(url)  # Loads the session and the groups of the user.
+            self.assertWithinBudget(url, client=clientes[usuario.pk])
+            consultas[nombre] = self.count_queries(url, client=clientes[usuario.pk])[1]
+
+        Familia.objects.all().delete()
+        Beca.objects.all().delete()
+        User.objects.filter(username__startswith='sintetico').delete()
+        return consultas
+
+    def test_view_budget(self):
+        """ Test that the budget is found behind the decorators of the views.
+
+        """
+        self.assertEqual(view_budget(reverse('administracion:main_estudios',
+                                             args=[Estudio.APROBADO])), 7)
+        self.assertEqual(view_budget(reverse('captura:estudios') + '?pagina=2'), 5)
+        self.assertIsNone(view_budget(reverse('administracion:users')))
+        self.assertEqual(view_budget(reverse('captura:estudio-list')), 10)
+        self.assertIsNone(view_budget(reverse('captura:estudio-cambios')))
+
+    def test_max_queries(self):
+        """ Test that a block over the maximum fails listing its queries.
+
+        """
+        with self.assertMaxQueries(1):
+            Familia.objects.count()
+        with self.assertRaisesRegex(AssertionError, 'familias_familia'):
+            with self.assertMaxQueries(1):
+                Familia.objects.count()
+                Familia.objects.exists()
+
+    def test_counts_do_not_scale(self):
+        """ Test that the report lists how every count scaled.
+
+        """
+        self.assertCountsDoNotScale({'a': 3, 'b': 5}, {'a': 3, 'b': 4})
+        with self.assertRaisesRegex(AssertionError, 'a: 3 -> 3\nb: 5 -> 9'):
+            self.assertCountsDoNotScale({'a': 3, 'b': 5}, {'a': 3, 'b': 9})
+
+    def test_key_views(self):
+        """ Test the budgets of the views on a small and a large fixture.
+
+        """
+        pocos = self.measure(4)
+        muchos = self.measure(24)
+        self.assertTrue({'list_studies', 'focus_mode', 'capture_study', 'capturista_dashboard',
+                         'detail_student', 'indicadores_becas', 'sync_list'} <= set(pocos))
+        self.assertEqual(set(pocos), set(muchos))
+        self.assertCountsDoNotScale(pocos, muchos)
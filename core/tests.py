@@ -1,5 +1,9 @@
+import sys
+from unittest import mock
+
 from django.core.exceptions import ValidationError
 from django.test import TestCase
+from .jobs import run_command
 from .validators import PHONE_REGEX
 
 
@@ -42,3 +46,23 @@ class ValidatorsTest(TestCase):
         self.assertRaises(ValidationError, PHONE_REGEX, 'foo')
         # Random String with country code
         self.assertRaises(ValidationError, PHONE_REGEX, '+52foo')
+
+
+class RunCommandTest(TestCase):
+    """ Suite to test the management commands started in the background.
+
+    """
+
+    def test_run_command(self):
+        """ Test that the command is only started once the transaction commits.
+
+        """
+        with mock.patch('core.jobs.subprocess.Popen') as popen, \
+                mock.patch('core.jobs.transaction.on_commit') as on_commit:
+            run_command('run_export', 7)
+            self.assertFalse(popen.called)
+            on_commit.call_args[0][0]()
+        comando = popen.call_args[0][0]
+        self.assertEqual(comando[0], sys.executable)
+        self.assertTrue(comando[1].endswith('manage.py'))
+        self.assertEqual(comando[2:], ['run_export', '7'])
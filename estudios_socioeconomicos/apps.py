@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class EstudiosSocioeconomicosConfig(AppConfig):
     name = 'estudios_socioeconomicos'
+
+    def ready(self):
+        """ Connects the receivers that invalidate the cached questionnaire,
+        record the deletions sent to the offline application and store the
+        photos by their content.
+
+        """
+        from . import schema  # noqa: F401
+        from . import sync  # noqa: F401
+        from . import contents  # noqa: F401
@@ -0,0 +1,206 @@
+""" Synchronization of many studies of the offline application in a single request.
+
+After a day in the field the application may hold tens of studies, which it
+used to send with a request each to captura.views.APIUploadRetrieveStudy.
+sync_batch receives all of them, each as an element with:
+
+- clave, chosen by the application to find the result of the element;
+- estudio, the data of the study as create and update receive it, with its
+  id when it exists in the server;
+- version, optionally, the version of the study the application last
+  received from a batch, or the cursor of its last synchronization. If any
+  row of the study, nested ones included, was modified or deleted in the
+  server after it, see .sync.study_versions, the element is not applied and
+  the study of the server is sent back instead;
+- fotos, optionally, the manifest of the photos of the study, as the start
+  of an upload of .uploads.
+
+Each element is written in a transaction of its own, so one failing element
+does not roll back the others. The studies are read before, and serialized
+after, with a fixed number of queries for all of them. The result of each
+element has the id, the errores, the version and the serialized estudio, so
+the application learns the ids of the rows it created, and for each photo
+either the Foto that has it or the upload to send it with.
+"""
+import logging
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Estudio, Foto
+from .photos import start_processing
+from .serializers import EstudioSerializer, SubidaFotoSerializer
+from .sync import prefetch_studies, study_versions
+from .uploads import ErrorSubida, complete_upload, start_upload
+
+
+logger = logging.getLogger(__name__)
+
+LOTE_MAXIMO = 50
+
+
+class ElementoLoteSerializer(serializers.Serializer):
+    """ Serializer of an element of a batch, see the module documentation.
+
+    The study is validated on its own by EstudioSerializer.
+    """
+    clave = serializers.CharField(max_length=100)
+    version = serializers.DateTimeField(required=False, allow_null=True)
+    estudio = serializers.DictField()
+    fotos = SubidaFotoSerializer(many=True, required=False)
+
+
+def _id_of(datos):
+    """ Returns the id of the study of an element, None if it is new or not a valid id.
+
+    """
+    try:
+        return int(datos['estudio']['id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _write_study(capturista, datos, existentes, versiones):
+    """ Creates or updates the study of a valid element, in a transaction of its own.
+
+    versiones are the versions of the existing studies before the batch.
+
+    Returns
+    -------
+    tuple
+        The id of the study, and the errores of the element or None.
+    """
+    id_estudio = _id_of(datos)
+    if datos['estudio'].get('id') is not None:
+        instancia = existentes.get(id_estudio)
+        if instancia is None:
+            return None, {'id': ['El estudio no existe.']}
+        version = datos.get('version')
+        if version is not None and versiones.get(instancia.pk, version) > version:
+            return instancia.pk, {'version': ['El estudio fue modificado en el servidor.']}
+    else:
+        instancia = None
+
+    serializer = EstudioSerializer(instancia, data=datos['estudio'])
+    if not serializer.is_valid():
+        return id_estudio, serializer.errors
+    try:
+        with transaction.atomic():
+            if instancia is None:
+                estudio = serializer.create(capturista)
+            else:
+                estudio = serializer.update()
+    except serializers.ValidationError as error:
+        return id_estudio, error.detail
+    except Exception:
+        logger.exception('No se pudo sincronizar el estudio %s', id_estudio)
+        return id_estudio, {'detail': ['Error al guardar el estudio.']}
+    return estudio.pk, None
+
+
+def _sync_photos(estudio, fotos, presentes):
+    """ Returns the state of each photo of the manifest of a study.
+
+    A photo the study has is not sent again, nor one whose content the
+    server stores, which becomes a Foto of the study right away. The copies
+    of those are built once the whole batch is synchronized.
+    """
+    resultados = []
+    for foto in fotos:
+        resultado = {'sha256': foto['sha256'],
+                     'foto': presentes.get((estudio.pk, foto['sha256'])),
+                     'subida': None,
+                     'recibido': foto['tamano'],
+                     'errores': None}
+        if resultado['foto'] is None:
+            subida, _ = start_upload(estudio, foto.get('file_name', ''), foto['nombre'],
+                                     foto['tamano'], foto['sha256'])
+            resultado['subida'] = str(subida.pk)
+            resultado['recibido'] = subida.recibido
+            if subida.recibido == subida.tamano:
+                try:
+                    resultado['foto'] = complete_upload(subida, procesar=False)[0].pk
+                except ErrorSubida as error:
+                    resultado['errores'] = {'detail': [str(error)]}
+                    resultado['recibido'] = 0
+        resultados.append(resultado)
+    return resultados
+
+
+def sync_batch(capturista, elementos):
+    """ Creates or updates the studies of a batch sent by the offline application.
+
+    Parameters
+    ----------
+    capturista : Capturista
+        The capturista sending the batch, who must own the studies updated.
+    elementos : list
+        The elements of the batch, see the module documentation.
+
+    Returns
+    -------
+    dict
+        The result of each element by its clave, or by its position in the
+        batch if it has no valid clave or it is repeated.
+    """
+    validos = []
+    resultados = {}
+    vistos = set()
+    for indice, elemento in enumerate(elementos):
+        serializer = ElementoLoteSerializer(data=elemento)
+        if serializer.is_valid():
+            clave, errores = serializer.validated_data['clave'], None
+        else:
+            clave = elemento.get('clave') if isinstance(elemento, dict) else None
+            errores = serializer.errors
+        if not isinstance(clave, str) or clave in resultados:
+            if errores is None:
+                errores = {'clave': ['La clave está repetida.']}
+            clave = str(indice)
+        id_estudio = _id_of(serializer.validated_data) if errores is None else None
+        if id_estudio is not None and id_estudio in vistos:
+            errores = {'id': ['El estudio está repetido en el lote.']}
+        resultados[clave] = {'id': None, 'errores': errores, 'version': None, 'estudio': None,
+                             'fotos': []}
+        if errores is None:
+            validos.append((clave, serializer.validated_data))
+            vistos.add(id_estudio)
+
+    ids = vistos - {None}
+    existentes = Estudio.objects.filter(capturista=capturista) \
+                                .select_related('familia') \
+                                .prefetch_related('respuesta_estudio') \
+                                .in_bulk(ids)
+    versiones = study_versions(list(existentes))
+
+    escritos = {}
+    for clave, datos in validos:
+        resultado = resultados[clave]
+        resultado['id'], resultado['errores'] = _write_study(capturista, datos, existentes,
+                                                             versiones)
+        if resultado['errores'] is None:
+            escritos[resultado['id']] = datos.get('fotos', [])
+
+    ids = [resultado['id'] for resultado in resultados.values() if resultado['id'] is not None]
+    estudios = prefetch_studies(Estudio.objects.filter(capturista=capturista, pk__in=ids))
+    estudios = {estudio.pk: estudio for estudio in estudios}
+    versiones = study_versions(list(estudios))
+
+    hashes = {foto['sha256'] for fotos in escritos.values() for foto in fotos}
+    presentes = {(id_estudio, sha256): id_foto for id_estudio, sha256, id_foto in
+                 Foto.objects.filter(estudio__in=list(escritos), contenido__sha256__in=hashes)
+                             .values_list('estudio_id', 'contenido__sha256', 'id')}
+
+    for resultado in resultados.values():
+        estudio = estudios.get(resultado['id'])
+        if estudio is None:
+            continue
+        resultado['version'] = versiones.get(estudio.pk, estudio.fecha_modificacion)
+        resultado['estudio'] = EstudioSerializer(estudio).data
+        if estudio.pk in escritos and resultado['errores'] is None:
+            resultado['fotos'] = _sync_photos(estudio, escritos[estudio.pk], presentes)
+
+    if any(foto['subida'] is not None and foto['foto'] is not None
+           for resultado in resultados.values() for foto in resultado['fotos']):
+        start_processing()
+    return resultados
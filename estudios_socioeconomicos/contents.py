@@ -0,0 +1,222 @@
+""" Content addressed storage of the photos of the studies.
+
+The capturistas often upload the same photo more than once, from the web
+form and again from the offline application. The file of each photo is
+stored once, named after its SHA-256 in the contenido/ folder, and recorded
+as a ContenidoFoto that every Foto with that content references:
+
+- a Foto saved with a new file, by the web form or the API, has it hashed by
+  the receivers of this module. If the content was stored before, the Foto
+  takes that file and the new one is not written.
+- the chunked uploads of .uploads write their file straight into contenido/
+  and adopt it once complete, and an upload of known content has nothing to
+  send.
+- when a Foto is deleted, its ContenidoFoto is deleted along with its file
+  only if no other Foto references it.
+
+The smaller copies built by .photos belong to each Foto and are deleted with
+it. The collect_photos management command moves the photos stored before
+this module into contenido/, and deletes what is no longer referenced and
+was left behind, e.g. by a process that died halfway, see collect_contents.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction, IntegrityError
+from django.db.models.signals import pre_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ContenidoFoto, Foto, SubidaFoto
+from .utils import _delete_file
+
+
+CARPETA = 'contenido'
+BLOQUE = 64 * 1024
+
+# What is left unreferenced for less than this may still be about to be
+# referenced, e.g. by an upload in progress.
+GRACIA = timedelta(days=1)
+
+
+def content_name(sha256, nombre):
+    """ Returns the name in the storage of a file with the given hash.
+
+    The extension of the original name is kept, so the file is served with
+    its type.
+    """
+    return '{}/{}{}'.format(CARPETA, sha256, os.path.splitext(nombre)[1].lower())
+
+
+def file_hash(nombre, inicio=0, fin=None):
+    """ Returns the hex SHA-256 of the bytes of a file of the storage between two offsets.
+
+    """
+    sha256 = hashlib.sha256()
+    with default_storage.open(nombre, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = (fin - inicio) if fin is not None else None
+        while restante is None or restante > 0:
+            bloque = archivo.read(BLOQUE if restante is None else min(BLOQUE, restante))
+            if not bloque:
+                break
+            sha256.update(bloque)
+            if restante is not None:
+                restante -= len(bloque)
+    return sha256.hexdigest()
+
+
+def adopt_file(sha256, nombre, tamano):
+    """ Returns the ContenidoFoto of a file of the storage with the given hash.
+
+    If the content was already stored under another name the file is
+    deleted, and the ContenidoFoto of the stored one is returned.
+    """
+    contenido = ContenidoFoto.objects.filter(sha256=sha256).first()
+    if contenido is None:
+        try:
+            with transaction.atomic():
+                contenido = ContenidoFoto(sha256=sha256, tamano=tamano)
+                contenido.archivo.name = nombre
+                contenido.save()
+                return contenido
+        except IntegrityError:
+            # The same content was stored by another request in the meantime.
+            contenido = ContenidoFoto.objects.get(sha256=sha256)
+    if contenido.archivo.name != nombre:
+        default_storage.delete(nombre)
+    return contenido
+
+
+def store_content(archivo, nombre):
+    """ Returns the ContenidoFoto of a file that is not in contenido/ yet.
+
+    The file is only written there if its content was not stored before.
+
+    Parameters
+    ----------
+    archivo : File
+        The file, e.g. an uploaded one.
+    nombre : str
+        Its original name.
+    """
+    sha256 = hashlib.sha256()
+    for bloque in archivo.chunks():
+        sha256.update(bloque)
+    sha256 = sha256.hexdigest()
+
+    contenido = ContenidoFoto.objects.filter(sha256=sha256).first()
+    if contenido is not None:
+        return contenido
+    return adopt_file(sha256, default_storage.save(content_name(sha256, nombre), archivo),
+                      archivo.size)
+
+
+def move_into_store(nombre):
+    """ Returns the ContenidoFoto of a file of the storage stored outside contenido/.
+
+    The file is stored by its content, the original is kept.
+    """
+    with default_storage.open(nombre, 'rb') as archivo:
+        return store_content(archivo, nombre)
+
+
+@receiver(pre_save, sender=Foto)
+def store_upload(sender, instance, raw=False, **kwargs):
+    """ Signal for storing the file of a new Foto by its content.
+
+    """
+    if raw or instance.contenido_id is not None or not instance.upload:
+        return
+    if not instance.upload._committed:
+        contenido = store_content(instance.upload.file, instance.upload.name)
+    elif instance._state.adding:
+        # Saved to the storage before the Foto, e.g. with FieldFile.save.
+        contenido = move_into_store(instance.upload.name)
+        if contenido.archivo.name != instance.upload.name:
+            default_storage.delete(instance.upload.name)
+    else:
+        return
+    instance.contenido = contenido
+    instance.upload = contenido.archivo.name
+
+
+@receiver(post_delete, sender=Foto)
+def delete_files(sender, instance, **kwargs):
+    """ Signal for deleting the copies of a deleted Foto, and its file if no other Foto has it.
+
+    """
+    for copia in (instance.miniatura, instance.web):
+        if copia:
+            _delete_file(copia.path)
+    if instance.contenido_id is not None:
+        for contenido in ContenidoFoto.objects.filter(pk=instance.contenido_id,
+                                                      fotos__isnull=True):
+            contenido.delete()
+    elif instance.upload and not Foto.objects.filter(upload=instance.upload.name).exists():
+        _delete_file(instance.upload.path)  # Stored before this module.
+
+
+@receiver(post_delete, sender=ContenidoFoto)
+def delete_content(sender, instance, **kwargs):
+    """ Signal for deleting the file of a deleted ContenidoFoto.
+
+    """
+    _delete_file(instance.archivo.path)
+
+
+def adopt_legacy_photos():
+    """ Moves the files of the Foto stored before this module into contenido/.
+
+    Returns
+    -------
+    int
+        The number of Foto moved.
+    """
+    adoptadas = 0
+    for foto in Foto.objects.filter(contenido__isnull=True).exclude(upload=''):
+        anterior = foto.upload.name
+        if not default_storage.exists(anterior):
+            continue
+        contenido = move_into_store(anterior)
+        Foto.objects.filter(pk=foto.pk).update(contenido=contenido,
+                                               upload=contenido.archivo.name)
+        if not Foto.objects.filter(upload=anterior).exists():
+            default_storage.delete(anterior)
+        adoptadas += 1
+    return adoptadas
+
+
+def collect_contents(gracia=GRACIA):
+    """ Deletes the stored files that no Foto references anymore.
+
+    Those are the ContenidoFoto without Foto, and the files of contenido/
+    without a ContenidoFoto, left for longer than gracia. The files being
+    received by an upload are kept.
+
+    Returns
+    -------
+    tuple
+        The number of ContenidoFoto and of files without one deleted.
+    """
+    limite = timezone.now() - gracia
+    recibiendo = set(SubidaFoto.objects.filter(foto__isnull=True)
+                                       .values_list('archivo', flat=True))
+
+    huerfanos = ContenidoFoto.objects.filter(fotos__isnull=True, fecha_creacion__lt=limite)
+    contenidos = 0
+    for contenido in huerfanos.exclude(archivo__in=recibiendo):
+        contenido.delete()
+        contenidos += 1
+
+    archivos = 0
+    if default_storage.exists(CARPETA):
+        conocidos = recibiendo.union(ContenidoFoto.objects.values_list('archivo', flat=True))
+        for nombre in default_storage.listdir(CARPETA)[1]:
+            nombre = '{}/{}'.format(CARPETA, nombre)
+            if nombre not in conocidos and default_storage.get_modified_time(nombre) < limite:
+                default_storage.delete(nombre)
+                archivos += 1
+    return contenidos, archivos
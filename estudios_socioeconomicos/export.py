@@ -0,0 +1,309 @@
+""" Streaming export of the database for .views.download_studies.
+
+The whole database used to be dumped into an xls workbook built in memory
+before the first byte was sent. The generators in this module instead yield
+the file while it is being written: each table is read by chunks of
+CHUNK_SIZE rows, ordered by its primary key, and every chunk is compressed
+and sent before the next one is fetched. The memory used does not depend on
+the number of rows.
+
+Two formats are supported, a zip with a csv file per table and an xlsx
+workbook with a sheet per table. Both are zip archives, which are written by
+ZipStream. Sheets and columns are named as django_excel named them, the
+model_name of each table and the sorted attnames of its fields.
+"""
+import csv
+import hashlib
+import io
+import re
+import struct
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from django.db import connection
+
+from administracion.models import Escuela, Colegiatura
+from becas.models import Beca
+from captura.models import Retroalimentacion
+from familias.models import Integrante, Familia, Comentario, Alumno, Tutor, Oficio
+from indicadores.models import Transaccion, Ingreso, Periodo
+from .models import Estudio, Seccion, Subseccion, Pregunta, OpcionRespuesta, Respuesta
+
+
+TABLAS = [
+    Transaccion, Ingreso, Oficio, Periodo,
+    Integrante, Familia, Comentario, Alumno, Tutor,
+    Estudio, Seccion, Subseccion, Pregunta, OpcionRespuesta, Respuesta,
+    Retroalimentacion, Beca, Escuela, Colegiatura
+]
+
+CHUNK_SIZE = 2000
+
+TIPOS_CONTENIDO = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'application/zip',
+}
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class ZipStream(object):
+    """ Writer of a zip archive as a sequence of chunks of bytes.
+
+    The sizes and checksum of each entry are only known after its content
+    was sent, so they are written in a data descriptor after the content
+    instead of in its header. The archive does not use zip64, so neither an
+    entry nor the whole archive can exceed 4 GB.
+
+    Attributes:
+    -----------
+    offset : int
+        The number of bytes written so far.
+    entries : list
+        The information of each written entry required by the central
+        directory.
+    """
+    FLAGS = 0x0808  # Sizes in a data descriptor and utf-8 names.
+
+    def __init__(self):
+        self.offset = 0
+        self.entries = []
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def entry(self, name, chunks):
+        """ Yields the bytes of an entry whose content is the iterable of bytes chunks.
+
+        """
+        nombre = name.encode('utf-8')
+        ahora = datetime.now()
+        fecha = ((ahora.year - 1980) << 9) | (ahora.month << 5) | ahora.day
+        hora = (ahora.hour << 11) | (ahora.minute << 5) | (ahora.second // 2)
+        inicio = self.offset
+
+        yield self._emit(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, self.FLAGS,
+                                     zlib.DEFLATED, hora, fecha, 0, 0, 0, len(nombre), 0) +
+                         nombre)
+
+        compresor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        crc = 0
+        tamano = 0
+        comprimido = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            tamano += len(chunk)
+            datos = compresor.compress(chunk)
+            if datos:
+                comprimido += len(datos)
+                yield self._emit(datos)
+        datos = compresor.flush()
+        comprimido += len(datos)
+        crc &= 0xffffffff
+
+        yield self._emit(datos + struct.pack('<IIII', 0x08074b50, crc, comprimido, tamano))
+        self.entries.append((nombre, hora, fecha, crc, comprimido, tamano, inicio))
+
+    def close(self):
+        """ Returns the central directory, which ends the archive.
+
+        """
+        inicio = self.offset
+        directorio = []
+        for nombre, hora, fecha, crc, comprimido, tamano, posicion in self.entries:
+            directorio.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, self.FLAGS,
+                                          zlib.DEFLATED, hora, fecha, crc, comprimido, tamano,
+                                          len(nombre), 0, 0, 0, 0, 0, posicion) + nombre)
+        directorio = b''.join(directorio)
+        return self._emit(directorio + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0,
+                                                   len(self.entries), len(self.entries),
+                                                   len(directorio), inicio, 0))
+
+
+def table_rows(model, chunk_size=CHUNK_SIZE):
+    """ Yields the rows of a table by chunks, the first chunk is the header.
+
+    Each chunk is fetched with its own query, starting after the last primary
+    key of the previous one, so that only one chunk is held in memory.
+    """
+    columnas = sorted(field.attname for field in model._meta.concrete_fields)
+    pk = model._meta.pk.attname
+    posicion_pk = columnas.index(pk)
+    yield [columnas]
+
+    queryset = model._default_manager.order_by(pk).values_list(*columnas)
+    filas = list(queryset[:chunk_size])
+    while filas:
+        yield filas
+        filas = list(queryset.filter(**{pk + '__gt': filas[-1][posicion_pk]})[:chunk_size])
+
+
+def table_fingerprint(tablas=TABLAS):
+    """ Returns a hash of the state of the tables, and their total number of rows.
+
+    The hash changes whenever a row of the tables is inserted, updated or
+    deleted, so it tells whether an export made before is still current. On
+    PostgreSQL it is built from the number of rows, the highest primary key
+    and the highest xmin of each table, the id of the last transaction that
+    wrote a row, which is computed without sending the rows. Other databases
+    hash the content of every row.
+    """
+    huella = hashlib.sha1()
+    total = 0
+    for model in tablas:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*), MAX({pk}), MAX(xmin::text::bigint) '
+                               'FROM {tabla}'.format(
+                                   pk=connection.ops.quote_name(model._meta.pk.column),
+                                   tabla=connection.ops.quote_name(model._meta.db_table)))
+                estado = cursor.fetchone()
+            total += estado[0]
+        else:
+            estado = []
+            for filas in table_rows(model):
+                estado.append(hashlib.sha1(repr(filas).encode('utf-8')).hexdigest())
+                total += len(filas)
+            total -= 1  # The header.
+        huella.update('{}:{}\n'.format(model._meta.db_table, estado).encode('utf-8'))
+    return huella.hexdigest(), total
+
+
+def _csv_chunks(model, chunk_size, progreso):
+    """ Yields the csv file of a table, encoded in utf-8, by chunks.
+
+    """
+    yield '\ufeff'.encode('utf-8')  # So that spreadsheets detect the encoding.
+    for numero, filas in enumerate(table_rows(model, chunk_size)):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        yield buffer.getvalue().encode('utf-8')
+        if numero and progreso is not None:
+            progreso(len(filas))
+
+
+def export_csv_zip(tablas=TABLAS, chunk_size=CHUNK_SIZE, progreso=None):
+    """ Yields a zip archive with a csv file for each table.
+
+    progreso, if given, is called with the number of rows of each chunk
+    once it was written.
+    """
+    archivo = ZipStream()
+    for model in tablas:
+        for datos in archivo.entry('{}.csv'.format(model._meta.model_name),
+                                   _csv_chunks(model, chunk_size, progreso)):
+            yield datos
+    yield archivo.close()
+
+
+def _column_letter(numero):
+    """ Returns the letters of the column in the given zero based position.
+
+    """
+    letras = ''
+    numero += 1
+    while numero:
+        numero, residuo = divmod(numero - 1, 26)
+        letras = chr(ord('A') + residuo) + letras
+    return letras
+
+
+def _xlsx_cell(referencia, valor):
+    """ Returns the xml of a cell of a sheet, or an empty string if valor is None.
+
+    Numbers and booleans keep their type, anything else is written as text.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return '<c r="{}" t="b"><v>{}</v></c>'.format(referencia, int(valor))
+    if isinstance(valor, (int, float, Decimal)):
+        return '<c r="{}"><v>{}</v></c>'.format(referencia, valor)
+    texto = escape(_CARACTERES_INVALIDOS.sub('', str(valor)))
+    return '<c r="{}" t="inlineStr"><is><t xml:space="preserve">{}</t></is></c>'.format(
+        referencia, texto)
+
+
+def _xlsx_sheet_chunks(model, chunk_size, progreso):
+    """ Yields the xml of the sheet of a table, encoded in utf-8, by chunks.
+
+    """
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+           '<sheetData>').encode('utf-8')
+    numero = 0
+    letras = []
+    for numero_chunk, filas in enumerate(table_rows(model, chunk_size)):
+        xml = []
+        for fila in filas:
+            numero += 1
+            while len(letras) < len(fila):
+                letras.append(_column_letter(len(letras)))
+            xml.append('<row r="{}">'.format(numero))
+            for letra, valor in zip(letras, fila):
+                xml.append(_xlsx_cell('{}{}'.format(letra, numero), valor))
+            xml.append('</row>')
+        yield ''.join(xml).encode('utf-8')
+        if numero_chunk and progreso is not None:
+            progreso(len(filas))
+    yield '</sheetData></worksheet>'.encode('utf-8')
+
+
+def export_xlsx(tablas=TABLAS, chunk_size=CHUNK_SIZE, progreso=None):
+    """ Yields an xlsx workbook with a sheet for each table.
+
+    progreso works as in export_csv_zip.
+    """
+    tipo = 'application/vnd.openxmlformats-officedocument.spreadsheetml.{}+xml'
+    relacion = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/{}'
+    encabezado = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+    tipos = [encabezado,
+             '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">',
+             '<Default Extension="rels" '
+             'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>',
+             '<Default Extension="xml" ContentType="application/xml"/>',
+             '<Override PartName="/xl/workbook.xml" ContentType="{}"/>'.format(
+                 tipo.format('sheet.main'))]
+    hojas = []
+    relaciones = []
+    for numero, model in enumerate(tablas, 1):
+        tipos.append('<Override PartName="/xl/worksheets/sheet{}.xml" ContentType="{}"/>'.format(
+            numero, tipo.format('worksheet')))
+        hojas.append('<sheet name={} sheetId="{}" r:id="rId{}"/>'.format(
+            quoteattr(model._meta.model_name[:31]), numero, numero))
+        relaciones.append('<Relationship Id="rId{}" Type="{}" '
+                          'Target="worksheets/sheet{}.xml"/>'.format(
+                              numero, relacion.format('worksheet'), numero))
+    tipos.append('</Types>')
+
+    partes = [
+        ('[Content_Types].xml', ''.join(tipos)),
+        ('_rels/.rels',
+         encabezado +
+         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+         '<Relationship Id="rId1" Type="{}" Target="xl/workbook.xml"/>'
+         '</Relationships>'.format(relacion.format('officeDocument'))),
+        ('xl/workbook.xml',
+         encabezado +
+         '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+         'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+         '<sheets>{}</sheets></workbook>'.format(''.join(hojas))),
+        ('xl/_rels/workbook.xml.rels',
+         encabezado +
+         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+         '{}</Relationships>'.format(''.join(relaciones))),
+    ]
+
+    archivo = ZipStream()
+    for nombre, contenido in partes:
+        for datos in archivo.entry(nombre, [contenido.encode('utf-8')]):
+            yield datos
+    for numero, model in enumerate(tablas, 1):
+        for datos in archivo.entry('xl/worksheets/sheet{}.xml'.format(numero),
+                                   _xlsx_sheet_chunks(model, chunk_size, progreso)):
+            yield datos
+    yield archivo.close()
@@ -20,11 +20,19 @@ class RespuestaForm(forms.ModelForm):
             predefined answer choices. This custom init recieves the instance
             of the question this RespuestaForm will be answering to query
             the options for that question.
+
+            When the options of the question were already fetched they can be
+            sent in the opciones parameter, so that rendering the form does not
+            query them again.
         """
         pregunta = kwargs.pop('pregunta', None)
+        opciones = kwargs.pop('opciones', None)
         super(RespuestaForm, self).__init__(*args, **kwargs)
         if pregunta:
             self.fields['eleccion'].queryset = OpcionRespuesta.objects.filter(pregunta=pregunta)
+            if opciones is not None:
+                self.fields['eleccion'].widget.choices = [
+                    (opcion.pk, str(opcion)) for opcion in opciones]
 
         if 'instance' in kwargs:
             self.fields['eleccion'].initial = self.instance.eleccion
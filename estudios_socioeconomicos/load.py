@@ -1,6 +1,7 @@
 import pickle
 
 from estudios_socioeconomicos.models import Seccion, Subseccion, Pregunta, OpcionRespuesta
+from estudios_socioeconomicos.schema import schema_batch
 
 
 def parse(name):
@@ -55,27 +56,28 @@ def load_data(name='estudios_socioeconomicos/preguntas.pkl'):
         'Personalidad': 6,
         'Otros Aspectos': 7
     }
-    # delete everything first
-    Pregunta.objects.all().delete()
-    Seccion.objects.all().delete()
-    Subseccion.objects.all().delete()
-    OpcionRespuesta.objects.all().delete()
+    with schema_batch():  # a single version bump for the whole questionnaire
+        # delete everything first
+        Pregunta.objects.all().delete()
+        Seccion.objects.all().delete()
+        Subseccion.objects.all().delete()
+        OpcionRespuesta.objects.all().delete()
 
-    for sec in preguntas.keys():
-        seccion = Seccion.objects.get_or_create(nombre=sec, numero=nums[sec])[0]
-        for i, sub in enumerate(preguntas[sec].keys()):
-            subseccion = Subseccion.objects.get_or_create(
-                                seccion=seccion,
-                                nombre=sub,
-                                numero=i)[0]
-            for p in preguntas[sec][sub]:
-                pregunta = Pregunta.objects.get_or_create(
-                                subseccion=subseccion,
-                                texto=p['texto'],
-                                descripcion=p['descripcion'],
-                                orden=p['numero'],
-                                )[0]
-                for opt in p['opciones']:
-                    OpcionRespuesta.objects.get_or_create(
-                                    pregunta=pregunta,
-                                    texto=opt)
+        for sec in preguntas.keys():
+            seccion = Seccion.objects.get_or_create(nombre=sec, numero=nums[sec])[0]
+            for i, sub in enumerate(preguntas[sec].keys()):
+                subseccion = Subseccion.objects.get_or_create(
+                                    seccion=seccion,
+                                    nombre=sub,
+                                    numero=i)[0]
+                for p in preguntas[sec][sub]:
+                    pregunta = Pregunta.objects.get_or_create(
+                                    subseccion=subseccion,
+                                    texto=p['texto'],
+                                    descripcion=p['descripcion'],
+                                    orden=p['numero'],
+                                    )[0]
+                    for opt in p['opciones']:
+                        OpcionRespuesta.objects.get_or_create(
+                                        pregunta=pregunta,
+                                        texto=opt)
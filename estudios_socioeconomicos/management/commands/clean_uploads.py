@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from estudios_socioeconomicos.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    """ Deletes the uploads of photos abandoned by the offline application.
+
+    See estudios_socioeconomicos.uploads, it is meant to be run periodically,
+    e.g. daily by cron.
+    """
+    help = 'Deletes the incomplete uploads of photos that received no chunk in a while.'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Subidas borradas: {}'.format(delete_expired_uploads()))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from estudios_socioeconomicos.contents import adopt_legacy_photos, collect_contents
+
+
+class Command(BaseCommand):
+    """ Stores the photos of the studies by their content, and deletes the unreferenced files.
+
+    See estudios_socioeconomicos.contents, it is meant to be run periodically,
+    e.g. daily by cron. The first run moves the photos uploaded before the
+    files were stored by their content.
+    """
+    help = 'Moves the old photos into the content store and deletes the unreferenced files.'
+
+    def handle(self, *args, **options):
+        adoptadas = adopt_legacy_photos()
+        contenidos, archivos = collect_contents()
+        self.stdout.write('Fotos movidas: {}, contenidos borrados: {}, '
+                          'archivos sin contenido borrados: {}'.format(adoptadas, contenidos,
+                                                                       archivos))
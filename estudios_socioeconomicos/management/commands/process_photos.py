@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from estudios_socioeconomicos.photos import process_pending
+
+
+class Command(BaseCommand):
+    """ Builds the smaller copies of the photos of the studies.
+
+    This command is run in its own process by
+    estudios_socioeconomicos.photos.start_processing, it can also be run by
+    hand to build the copies of the photos uploaded before they existed, or
+    again for the given photos.
+    """
+    help = 'Builds the copies of the pending photos, or of the photos with the given ids.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids_foto', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        procesadas, errores = process_pending(options['ids_foto'] or None)
+        self.stdout.write('Fotos procesadas: {} ({} con error)'.format(procesadas, errores))
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 13:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0015_auto_20170725_2111'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCuestionario',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32)),
+                ('fecha', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 13:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfiles_usuario', '0002_create_groups'),
+        ('estudios_socioeconomicos', '0016_version_cuestionario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('id_objeto', models.IntegerField()),
+                ('id_estudio', models.IntegerField(db_index=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('capturista', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='perfiles_usuario.Capturista')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='estudio',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='respuesta',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
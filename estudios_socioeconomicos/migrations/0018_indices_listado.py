@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:18
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0017_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='estudio',
+            index_together=set([('status', 'id'), ('status', 'fecha_modificacion', 'id')]),
+        ),
+    ]
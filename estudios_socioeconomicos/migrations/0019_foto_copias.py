@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0018_indices_listado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foto',
+            name='alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='miniatura',
+            field=models.FileField(blank=True, upload_to='fotos/'),
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='status',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('procesada', 'Procesada'), ('error', 'Error')], default='pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='web',
+            field=models.FileField(blank=True, upload_to='fotos/'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0019_foto_copias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaFoto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(blank=True, max_length=300)),
+                ('archivo', models.CharField(max_length=300)),
+                ('tamano', models.PositiveIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('recibido', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True)),
+                ('estudio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='estudios_socioeconomicos.Estudio')),
+                ('foto', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='estudios_socioeconomicos.Foto')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='subidafoto',
+            unique_together=set([('estudio', 'sha256')]),
+        ),
+    ]
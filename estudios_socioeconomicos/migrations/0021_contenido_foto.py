@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0020_subida_foto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenidoFoto',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.FileField(upload_to='contenido/')),
+                ('tamano', models.PositiveIntegerField()),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='foto',
+            name='contenido',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='fotos', to='estudios_socioeconomicos.ContenidoFoto'),
+        ),
+    ]
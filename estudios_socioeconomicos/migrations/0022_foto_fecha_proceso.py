@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 15:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudios_socioeconomicos', '0021_contenido_foto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foto',
+            name='fecha_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
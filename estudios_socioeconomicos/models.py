@@ -1,3 +1,7 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
 from django.dispatch import receiver
 from django.db.models.signals import post_save
@@ -27,6 +31,8 @@ class Estudio(models.Model):
     numero_sae : TextField
         TODO: more information on this field. It appears to be some sort of
         id for studies (refer to the sample study provided by the stakeholder).
+    fecha_modificacion : DateTimeField
+        When the study was last modified, see .sync.
     """
     APROBADO = 'aprobado'
     RECHAZADO = 'rechazado'  # rejected from the POV of the admin
@@ -44,6 +50,12 @@ class Estudio(models.Model):
     capturista = models.ForeignKey(Capturista)
     familia = models.OneToOneField(Familia)
     status = models.TextField(choices=OPCIONES_STATUS, default=BORRADOR)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # The orders in which administracion.views.list_studies paginates
+        # the studies with a status.
+        index_together = [('status', 'id'), ('status', 'fecha_modificacion', 'id')]
 
     def __str__(self):
         return '{familia}'.format(familia=self.familia.__str__())
@@ -63,20 +75,149 @@ class Estudio(models.Model):
         }
 
 
+class ContenidoFoto(models.Model):
+    """ A file of the photos of the studies, stored once however many Foto have it.
+
+    The files are addressed by their content, see .contents. The Foto that
+    share a file reference the same ContenidoFoto, which is deleted along
+    with its file once no Foto references it.
+
+    Attributes:
+    -----------
+    sha256 : CharField
+        The hex SHA-256 of the file.
+    archivo : FileField
+        The file, named after its sha256.
+    tamano : PositiveIntegerField
+        The size of the file in bytes.
+    fecha_creacion : DateTimeField
+        When the file was first stored.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    archivo = models.FileField(upload_to='contenido/')
+    tamano = models.PositiveIntegerField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def referencias(self):
+        """ The number of Foto with this file.
+
+        """
+        return self.fotos.count()
+
+    def __str__(self):
+        return self.archivo.name
+
+
 class Foto(models.Model):
     """ The model that represents an image for a Estudio.
 
+        The uploaded image is kept as it is, in the ContenidoFoto of its
+        content, see .contents. Smaller copies of it are built in the
+        background by .photos, which pages and the API serve instead of the
+        original.
+
         Attributes:
         -----------
         file_name: The name the file should have on sercer.
-        upload: Path to the image
+        upload: Path to the image, the archivo of its contenido.
+        contenido: The stored file of the image, shared with the Foto of the same content.
         is_active: boolean indicating if model is active.
+        miniatura: The copy that fits in MINIATURA pixels, for lists of photos.
+        web: The copy that fits in WEB pixels, to see a photo on its own.
+        ancho, alto: The size of the image in pixels, once upright.
+        status: Whether the copies are pending, being built, built or failed.
+        fecha_proceso: When the copies started being built.
+        error: The reason why the copies could not be built.
     """
+    MINIATURA = 480
+    WEB = 1600
+
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    PROCESADA = 'procesada'
+    ERROR = 'error'
+    OPCIONES_STATUS = ((PENDIENTE, 'Pendiente'),
+                       (EN_PROCESO, 'En proceso'),
+                       (PROCESADA, 'Procesada'),
+                       (ERROR, 'Error'))
+
     estudio = models.ForeignKey(Estudio, on_delete=models.CASCADE)
 
     file_name = models.CharField(max_length=300, blank=True)
     upload = models.FileField(upload_to='')
+    contenido = models.ForeignKey(ContenidoFoto, null=True, blank=True,
+                                  on_delete=models.PROTECT, related_name='fotos')
     is_active = models.BooleanField(default=True)
+    miniatura = models.FileField(upload_to='fotos/', blank=True)
+    web = models.FileField(upload_to='fotos/', blank=True)
+    ancho = models.PositiveIntegerField(null=True, blank=True)
+    alto = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=OPCIONES_STATUS, default=PENDIENTE)
+    fecha_proceso = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    @property
+    def url_miniatura(self):
+        """ The url of the smallest copy built, the original until they are built.
+
+        """
+        return (self.miniatura or self.web or self.upload).url
+
+    @property
+    def url_web(self):
+        """ The url of the copy to see the photo on its own, the original until it is built.
+
+        """
+        return (self.web or self.upload).url
+
+
+class SubidaFoto(models.Model):
+    """ An upload of a Foto sent in chunks by the offline application, see .uploads.
+
+    The chunks are written straight into archivo, which becomes the upload of
+    the Foto once every byte was received and the whole file matches sha256.
+
+    Attributes:
+    -----------
+    id : UUIDField
+        The id of the upload, which the application sends with every chunk.
+    estudio : ForeignKey
+        The study the photo will belong to.
+    file_name : CharField
+        The file_name of the Foto.
+    archivo : CharField
+        The name in the storage of the file being written.
+    tamano : PositiveIntegerField
+        The size of the whole file in bytes.
+    sha256 : CharField
+        The hex SHA-256 of the whole file.
+    recibido : PositiveIntegerField
+        The number of bytes received, the offset of the next chunk.
+    foto : OneToOneField
+        The Foto created once the upload is complete.
+    fecha_creacion : DateTimeField
+        When the upload was started.
+    fecha_modificacion : DateTimeField
+        When the last chunk was received.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    estudio = models.ForeignKey(Estudio, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=300, blank=True)
+    archivo = models.CharField(max_length=300)
+    tamano = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    recibido = models.PositiveIntegerField(default=0)
+    foto = models.OneToOneField(Foto, null=True, blank=True, on_delete=models.CASCADE)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('estudio', 'sha256')
+
+    def __str__(self):
+        return '{archivo}, {recibido} de {tamano} bytes'.format(
+            archivo=self.archivo, recibido=self.recibido, tamano=self.tamano)
 
 
 @receiver(post_save, sender=Estudio)
@@ -103,33 +244,36 @@ def create_answers_for_study(sender, instance=None, created=False, **kwargs):
 
       kwargs['raw']: BooleanField
         A value indicating us if we can skip the trigger.
+
+    Notes:
+    ------
+    All the answers are inserted with a single bulk_create, so creating a study
+    does not take longer as more questions are added. When the setting
+    CREAR_RESPUESTAS_AL_CAPTURAR is True no answer is created here, see
+    captura.utils.create_missing_answers.
     """
     raw = kwargs['raw']
-    if created and not raw:
-        preguntas = Pregunta.objects.all()
-        for pregunta in preguntas:
-            Respuesta.objects.create(estudio=instance, pregunta=pregunta)
+    if created and not raw and not settings.CREAR_RESPUESTAS_AL_CAPTURAR:
+        preguntas = Pregunta.objects.values_list('id', flat=True)
+        Respuesta.objects.bulk_create([Respuesta(estudio=instance, pregunta_id=id_pregunta)
+                                       for id_pregunta in preguntas])
 
 
-@receiver(models.signals.post_delete, sender=Foto)
-def delete_file(sender, instance, *args, **kwargs):
-    """ Signal for delete the photo's file from the filesystem, when the
-    record will be deleted.
+@receiver(models.signals.post_delete, sender=SubidaFoto)
+def delete_incomplete_upload(sender, instance, *args, **kwargs):
+    """ Signal for deleting the partial file of an upload that did not become a Foto.
+
+    An upload of a file that was already stored, see .uploads.start_upload,
+    does not have a file of its own.
 
     Parameters:
     -----------
-      instance : estudios_socioeconomicos.models.Foto
-          The instance of the object whose creation triggered the signal. In this case a
-          Foto.
-      created : BooleanField
-          A value indicating if this instance is being created for the first time. Or if set
-          to false if it is being edited.
-
-      kwargs['raw']: BooleanField
-        A value indicating us if we can skip the trigger.
+      instance : estudios_socioeconomicos.models.SubidaFoto
+          The deleted upload.
     """
-    if instance.upload:
-        _delete_file(instance.upload.path)
+    if (instance.foto_id is None and
+            not ContenidoFoto.objects.filter(archivo=instance.archivo).exists()):
+        _delete_file(default_storage.path(instance.archivo))
 
 
 class Seccion(models.Model):
@@ -212,6 +356,29 @@ class OpcionRespuesta(models.Model):
         return self.texto
 
 
+class VersionCuestionario(models.Model):
+    """ The version of the questionnaire stored in the database.
+
+    A single row is kept. Its version is replaced each time a Seccion,
+    Subseccion, Pregunta or OpcionRespuesta is modified, so that every
+    process can tell whether its cached copy of the questionnaire is
+    still current, see .schema.
+
+    Attributes:
+    -----------
+    version : CharField
+        A random token that identifies the current questionnaire.
+    fecha : DateTimeField
+        When the questionnaire was last modified.
+    """
+    version = models.CharField(max_length=32)
+    fecha = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return 'Cuestionario {version}, {fecha}'.format(version=self.version,
+                                                        fecha=self.fecha)
+
+
 class Respuesta(models.Model):
     """ The model that stores the actual answers.
 
@@ -234,6 +401,8 @@ class Respuesta(models.Model):
         indicates to which one.
     respuesta : TextField
         If the answer needs to have text, it will be stored in this attribute.
+    fecha_modificacion : DateTimeField
+        When the answer was last modified, see .sync.
     """
     estudio = models.ForeignKey(Estudio, related_name='respuesta_estudio')
     pregunta = models.ForeignKey(Pregunta, related_name='respuesta_pregunta')
@@ -241,6 +410,7 @@ class Respuesta(models.Model):
     integrante = models.ForeignKey(Integrante, null=True, blank=True)
 
     respuesta = models.TextField(blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """ String representation of the answer.
@@ -255,3 +425,36 @@ class Respuesta(models.Model):
             return str(self.eleccion)
         else:
             return 'No tiene respuesta.'
+
+
+class Eliminacion(models.Model):
+    """ Record of a row deleted from a study, sent to the offline application.
+
+    A deleted row can not report its own modification, so .sync.record_deletions
+    records its deletion here and the offline application removes its
+    copy the next time it synchronizes.
+
+    Attributes:
+    -----------
+    modelo : CharField
+        The model_name of the deleted row.
+    id_objeto : IntegerField
+        The primary key the deleted row had.
+    id_estudio : IntegerField
+        The study the row belonged to. It is not a ForeignKey since the
+        study itself may be the deleted row.
+    capturista : ForeignKey
+        The capturista of that study.
+    fecha : DateTimeField
+        When the row was deleted.
+    """
+    modelo = models.CharField(max_length=50)
+    id_objeto = models.IntegerField()
+    id_estudio = models.IntegerField(db_index=True)
+    capturista = models.ForeignKey(Capturista, null=True, blank=True, on_delete=models.SET_NULL)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return '{modelo} {id}, {fecha}'.format(modelo=self.modelo,
+                                               id=self.id_objeto,
+                                               fecha=self.fecha)
@@ -0,0 +1,189 @@
+""" Smaller copies of the photos of the studies, built in the background.
+
+The capturistas upload the photos straight from their phones, at full
+resolution, and a page with the photos of a house would send all of them to
+the browser. Each Foto gets two copies instead, built by the process_photos
+management command in a process of its own started by start_processing:
+
+- miniatura, that fits in Foto.MINIATURA pixels, for the lists of photos;
+- web, that fits in Foto.WEB pixels, to see a photo on its own.
+
+The copies are turned upright following the EXIF orientation of the photo and
+saved as jpeg without its EXIF data, which may hold the location of the
+house. The size of the upright photo is stored in the Foto. The uploaded file
+is kept as it is.
+
+A single process builds the pending copies at a time: it holds the lock
+BLOQUEO while it drains them, and start_processing starts none while it is
+held, since that process also builds the photos uploaded meanwhile. The
+command can still be run by hand for given photos, so each Foto is claimed
+by changing its status before its copies are built, and it is only built
+once. A photo left claimed for longer than ATASCADA, by a process that died
+halfway, is claimed again.
+"""
+import io
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from core.jobs import exclusive, run_command
+from .models import Foto
+
+
+CALIDAD = 85
+
+BLOQUEO = 'process_photos'
+ATASCADA = timedelta(minutes=10)
+
+# The transpositions that turn a photo upright, by the value of its EXIF orientation.
+ORIENTACION = 0x0112
+TRANSPOSICIONES = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.ROTATE_90, Image.FLIP_TOP_BOTTOM),
+    6: (Image.ROTATE_270,),
+    7: (Image.ROTATE_270, Image.FLIP_TOP_BOTTOM),
+    8: (Image.ROTATE_90,),
+}
+
+
+def start_processing():
+    """ Starts the process that builds the pending copies, once the current transaction commits.
+
+    Nothing is started if that process is already running.
+    """
+    run_command('process_photos', unico=BLOQUEO)
+
+
+def orientation(imagen):
+    """ Returns the EXIF orientation of an image, 1 (upright) if it has none.
+
+    """
+    try:
+        exif = imagen._getexif() or {}
+    except (AttributeError, IndexError, KeyError, SyntaxError, TypeError, ValueError):
+        exif = {}  # Only jpeg has EXIF, and phones write it in many broken ways.
+    return exif.get(ORIENTACION, 1)
+
+
+def upright(imagen):
+    """ Returns the image turned as its EXIF orientation says, in RGB.
+
+    """
+    for transposicion in TRANSPOSICIONES.get(orientation(imagen), ()):
+        imagen = imagen.transpose(transposicion)
+    return imagen.convert('RGB')
+
+
+def resized_copy(imagen, lado):
+    """ Returns the bytes of a jpeg of the image that fits in a square of the given side.
+
+    The image is not enlarged if it is smaller.
+    """
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)
+    salida = io.BytesIO()
+    copia.save(salida, 'JPEG', quality=CALIDAD, optimize=True)
+    return salida.getvalue()
+
+
+def process_photo(foto):
+    """ Builds the copies of a photo, any error is stored in it before being raised again.
+
+    Jpeg photos are decoded at the smallest scale that is still larger than
+    the web copy, which is much faster than decoding the whole photo.
+    """
+    try:
+        with foto.upload.storage.open(foto.upload.name, 'rb') as archivo:
+            imagen = Image.open(archivo)
+            ancho, alto = imagen.size
+            if orientation(imagen) in (5, 6, 7, 8):
+                ancho, alto = alto, ancho
+            imagen.draft('RGB', (Foto.WEB, Foto.WEB))
+            imagen = upright(imagen)
+        copias = [(foto.miniatura, resized_copy(imagen, Foto.MINIATURA), Foto.MINIATURA),
+                  (foto.web, resized_copy(imagen, Foto.WEB), Foto.WEB)]
+
+        base = os.path.splitext(os.path.basename(foto.upload.name))[0]
+        for campo, contenido, lado in copias:
+            if campo:
+                campo.delete(save=False)  # The copies of an earlier run.
+            campo.save('{}_{}.jpg'.format(base, lado), ContentFile(contenido), save=False)
+    except Exception as error:
+        foto.status = Foto.ERROR
+        foto.error = str(error)
+        foto.save(update_fields=['status', 'error'])
+        raise
+
+    foto.ancho = ancho
+    foto.alto = alto
+    foto.status = Foto.PROCESADA
+    foto.error = ''
+    foto.save(update_fields=['miniatura', 'web', 'ancho', 'alto', 'status', 'error'])
+    return foto
+
+
+def pending_photos():
+    """ Returns the photos whose copies must be built: the pending ones and the stuck ones.
+
+    """
+    return Foto.objects.filter(Q(status=Foto.PENDIENTE) |
+                               Q(status=Foto.EN_PROCESO,
+                                 fecha_proceso__lt=timezone.now() - ATASCADA) |
+                               Q(status=Foto.EN_PROCESO, fecha_proceso__isnull=True))
+
+
+def _process_photos(reclamables, ids_foto):
+    """ Claims and builds the copies of the given photos that are still reclamables.
+
+    """
+    procesadas = errores = 0
+    for id_foto in ids_foto:
+        if not reclamables.filter(pk=id_foto).update(status=Foto.EN_PROCESO,
+                                                     fecha_proceso=timezone.now()):
+            continue  # Another process claimed it.
+        try:
+            process_photo(Foto.objects.get(pk=id_foto))
+        except Exception:
+            errores += 1
+        else:
+            procesadas += 1
+    return procesadas, errores
+
+
+def process_pending(ids_foto=None):
+    """ Builds the copies of the pending photos, or again of the given ones.
+
+    The pending photos are built while holding BLOQUEO, until none is left,
+    including those uploaded meanwhile. Nothing is done if another process
+    holds it. A photo that fails does not stop the others.
+
+    Returns
+    -------
+    tuple
+        The number of photos processed and of photos that failed.
+    """
+    if ids_foto is not None:
+        return _process_photos(Foto.objects.exclude(status=Foto.EN_PROCESO), list(ids_foto))
+
+    procesadas = errores = 0
+    # A photo uploaded just before the lock is released finds it held and
+    # starts no process, so the pending photos are looked for again after
+    # releasing it.
+    while pending_photos().exists():
+        with exclusive(BLOQUEO) as adquirido:
+            if not adquirido:
+                break  # The process that holds it builds them.
+            while True:
+                ids = list(pending_photos().order_by('pk').values_list('pk', flat=True))
+                if not ids:
+                    break
+                resultado = _process_photos(pending_photos(), ids)
+                procesadas += resultado[0]
+                errores += resultado[1]
+    return procesadas, errores
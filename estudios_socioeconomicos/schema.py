@@ -0,0 +1,188 @@
+""" Process wide cache of the questionnaire.
+
+Secciones, subsecciones, preguntas and their options only change when
+.load.load_data is run, yet they are read to render every study and by the
+offline application. Each process keeps an immutable copy of them, along with
+the JSON served by captura.views.APIQuestionsInformation, and rebuilds it only
+when the version stored in VersionCuestionario changes.
+
+The version is replaced by the receivers in this module whenever one of those
+models is saved or deleted through the ORM. Bulk updates do not send signals,
+code that modifies the questionnaire that way must call bump_schema_version.
+"""
+import hashlib
+import threading
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+from .models import Seccion, Subseccion, Pregunta, OpcionRespuesta, VersionCuestionario
+from .serializers import SeccionSerializer
+
+
+SeccionEsquema = namedtuple('SeccionEsquema', ('id', 'nombre', 'numero', 'subsecciones'))
+
+SubseccionEsquema = namedtuple('SubseccionEsquema',
+                               ('id', 'seccion_id', 'nombre', 'numero', 'preguntas'))
+
+PreguntaEsquema = namedtuple('PreguntaEsquema',
+                             ('id', 'subseccion_id', 'texto', 'descripcion', 'orden', 'opciones'))
+
+Esquema = namedtuple('Esquema', ('version', 'secciones', 'datos', 'json', 'etag'))
+
+
+class OpcionEsquema(namedtuple('OpcionEsquema', ('id', 'pregunta_id', 'texto'))):
+    """ Cached copy of an OpcionRespuesta.
+
+    It can take the place of an OpcionRespuesta in the choices of
+    RespuestaForm, since it provides the same pk and string representation.
+    """
+    __slots__ = ()
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.texto
+
+
+_esquema = None
+_lock = threading.Lock()
+_lote = threading.local()
+
+
+def as_values(nodo):
+    """ Returns the fields of a section, subsection or question as .values() would.
+
+    The last field of these nodes holds their children, it is not included so
+    that the result can be nested with other information.
+    """
+    return dict(zip(nodo._fields[:-1], nodo[:-1]))
+
+
+def schema_version():
+    """ Returns the version of the questionnaire stored in the database.
+
+    """
+    return VersionCuestionario.objects.values_list('version', flat=True).first()
+
+
+def bump_schema_version():
+    """ Replaces the version of the questionnaire.
+
+    Every process notices the new version the next time it calls get_schema
+    and rebuilds its copy. Inside schema_batch the bump is deferred until the
+    block finishes.
+    """
+    global _esquema
+    if getattr(_lote, 'activo', False):
+        return
+    version = uuid.uuid4().hex
+    if not VersionCuestionario.objects.update(version=version):
+        VersionCuestionario.objects.create(version=version)
+    _esquema = None
+
+
+@contextmanager
+def schema_batch():
+    """ Context manager that bumps the version only once for all the changes inside it.
+
+    Used by .load.load_data, which otherwise would bump the version once for
+    every object it deletes or creates.
+    """
+    _lote.activo = True
+    try:
+        yield
+    finally:
+        _lote.activo = False
+        bump_schema_version()
+
+
+def _build_schema(version):
+    """ Reads the questionnaire from the database.
+
+    The four levels are fetched with one query each. Subsections are ordered
+    by their numero and questions by their orden, as they are presented in
+    the capture of a study.
+    """
+    secciones = Seccion.objects.order_by('id') \
+                               .prefetch_related('subsecciones__preguntas__opciones_pregunta')
+    datos = SeccionSerializer(secciones, many=True).data
+    contenido = JSONRenderer().render(datos)
+
+    arbol = []
+    for seccion in secciones:
+        subsecciones = []
+        for subseccion in sorted(seccion.subsecciones.all(), key=lambda s: (s.numero, s.id)):
+            preguntas = []
+            for pregunta in sorted(subseccion.preguntas.all(), key=lambda p: (p.orden, p.id)):
+                opciones = tuple(OpcionEsquema(opcion.id, opcion.pregunta_id, opcion.texto)
+                                 for opcion in sorted(pregunta.opciones_pregunta.all(),
+                                                      key=lambda o: o.id))
+                preguntas.append(PreguntaEsquema(pregunta.id,
+                                                 pregunta.subseccion_id,
+                                                 pregunta.texto,
+                                                 pregunta.descripcion,
+                                                 pregunta.orden,
+                                                 opciones))
+            subsecciones.append(SubseccionEsquema(subseccion.id,
+                                                  subseccion.seccion_id,
+                                                  subseccion.nombre,
+                                                  subseccion.numero,
+                                                  tuple(preguntas)))
+        arbol.append(SeccionEsquema(seccion.id, seccion.nombre, seccion.numero,
+                                    tuple(subsecciones)))
+
+    return Esquema(version=version,
+                   secciones=tuple(arbol),
+                   datos=datos,
+                   json=contenido,
+                   etag=hashlib.md5(contenido).hexdigest())
+
+
+def get_schema():
+    """ Returns the cached questionnaire, rebuilding it if its version changed.
+
+    Checking the version takes a single query, the questionnaire itself is
+    only read when it was modified since the last call in this process.
+
+    Returns
+    -------
+    Esquema
+        version : the version the copy was built from.
+        secciones : tuple of SeccionEsquema, nested down to OpcionEsquema.
+        datos : the output of SeccionSerializer, must not be modified.
+        json : datos rendered as JSON.
+        etag : hash of json.
+    """
+    global _esquema
+    version = schema_version()
+    esquema = _esquema
+    if esquema is not None and esquema.version == version:
+        return esquema
+    with _lock:
+        esquema = _esquema
+        if esquema is None or esquema.version != version:
+            esquema = _build_schema(version)
+            _esquema = esquema
+        return esquema
+
+
+@receiver(post_save, sender=Seccion)
+@receiver(post_save, sender=Subseccion)
+@receiver(post_save, sender=Pregunta)
+@receiver(post_save, sender=OpcionRespuesta)
+@receiver(post_delete, sender=Seccion)
+@receiver(post_delete, sender=Subseccion)
+@receiver(post_delete, sender=Pregunta)
+@receiver(post_delete, sender=OpcionRespuesta)
+def schema_changed(sender, **kwargs):
+    """ Bumps the version of the questionnaire when any of its parts changes.
+
+    """
+    bump_schema_version()
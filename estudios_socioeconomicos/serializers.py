@@ -1,4 +1,5 @@
 from django.db.transaction import atomic
+from django.utils import timezone
 from rest_framework import serializers
 
 from familias.serializers import FamiliaSerializer
@@ -6,19 +7,46 @@ from familias.models import Familia
 from captura.serializers import RetroalimentacionSerializer
 
 from .models import Pregunta, Subseccion, Seccion, OpcionRespuesta
-from .models import Estudio, Respuesta, Foto
-from .utils import save_foreign_relationship
+from .models import Estudio, Respuesta, Foto, SubidaFoto
+from .sync import DeltaListSerializer, record_deletions
+from .uploads import TAMANO_MAXIMO
+from .utils import save_foreign_relationship, split_changes, bulk_update
 
 
 class FotoSerializer(serializers.ModelSerializer):
     """ Serializer for using .models.Foto objects
         in REST endpoint
 
-        Saves and image to media/ folder
+        Saves and image to media/ folder. The copies of the image, see
+        .photos, are read only and empty until they are built, the client
+        should show the smallest one that fits and fall back to upload.
     """
     class Meta:
         model = Foto
-        fields = ('id', 'estudio', 'upload', 'file_name')
+        fields = ('id', 'estudio', 'upload', 'file_name',
+                  'miniatura', 'web', 'ancho', 'alto', 'status')
+        read_only_fields = ('miniatura', 'web', 'ancho', 'alto', 'status')
+
+
+class SubidaFotoSerializer(serializers.ModelSerializer):
+    """ Serializer for using .models.SubidaFoto objects
+        in REST endpoint
+
+        The application starts an upload with the name of the file in the
+        device, its size and its hash, and then sends the chunks from
+        recibido on, see .uploads.
+    """
+    nombre = serializers.CharField(max_length=100, write_only=True)
+    tamano = serializers.IntegerField(min_value=1, max_value=TAMANO_MAXIMO)
+    sha256 = serializers.RegexField(r'^[0-9a-f]{64}$')
+
+    class Meta:
+        model = SubidaFoto
+        fields = ('id', 'estudio', 'file_name', 'nombre', 'tamano', 'sha256',
+                  'recibido', 'foto')
+        read_only_fields = ('estudio', 'recibido', 'foto')
+        # The upload of a file the study already has is resumed, see .uploads.start_upload.
+        validators = []
 
 
 class OpcionRespuestaSerializer(serializers.ModelSerializer):
@@ -90,12 +118,15 @@ class RespuestaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Respuesta
         fields = (
+            'id',
             'estudio',
             'pregunta',
             'eleccion',
             'respuesta')
 
         read_only_fields = ('estudio', )
+        extra_kwargs = {'id': {'read_only': False, 'required': False}}
+        list_serializer_class = DeltaListSerializer
 
 
 class EstudioSerializer(serializers.ModelSerializer):
@@ -164,16 +195,74 @@ class EstudioSerializer(serializers.ModelSerializer):
         estudio = Estudio(**self.validated_data)
 
         if estudio.status == Estudio.BORRADOR or estudio.status == Estudio.REVISION:
+            estudio.fecha_modificacion = timezone.now()  # raw saves skip auto_now
             estudio.save_base(raw=True)  # Do not call Trigger (.models)
         else:
             raise serializers.ValidationError('Invalid status')
 
-        for respuesta in respuestas:
-            respuesta['estudio'] = estudio
-            Respuesta.objects.create(**respuesta)
+        for respuesta in respuestas or []:
+            respuesta.pop('id', None)
+        Respuesta.objects.bulk_create([Respuesta(estudio=estudio, **respuesta)
+                                       for respuesta in respuestas or []])
 
         return estudio
 
+    def update_answers(self, respuestas):
+        """ Makes the answers of the study match the ones sent by the offline client.
+
+            The answers are compared against the existing ones, instead of
+            replacing all of them, so that only the modified answers are
+            written. An answer sent with its id updates that answer. An answer
+            without id is matched with an existing answer not sent, first one
+            identical to it and then one of the same question, which is
+            updated. The remaining answers are created with a single query
+            and the existing answers that were not matched are deleted with
+            another, after recording their deletion with a third.
+
+            Returns
+            -------
+            Tuple with the number of answers created, updated and deleted.
+        """
+        existentes = {respuesta.id: respuesta
+                      for respuesta in self.instance.respuesta_estudio.all()}
+
+        filas = []
+        sin_id = []
+        for respuesta in respuestas or []:
+            eleccion = respuesta.get('eleccion')
+            valores = {'pregunta_id': respuesta['pregunta'].id,
+                       'eleccion_id': eleccion.id if eleccion else None,
+                       'respuesta': respuesta.get('respuesta', '')}
+            if respuesta.get('id') in existentes:
+                filas.append((respuesta['id'], valores))
+            else:
+                sin_id.append(valores)
+
+        for llave in (lambda r: (r['pregunta_id'], r['eleccion_id'], r['respuesta']),
+                      lambda r: r['pregunta_id']):
+            usados = {pk for pk, valores in filas}
+            libres = {}
+            for pk in sorted(set(existentes) - usados):
+                libres.setdefault(llave(vars(existentes[pk])), []).append(pk)
+            pendientes = []
+            for valores in sin_id:
+                if libres.get(llave(valores)):
+                    filas.append((libres[llave(valores)].pop(0), valores))
+                else:
+                    pendientes.append(valores)
+            sin_id = pendientes
+
+        nuevas, cambios, sobrantes = split_changes(existentes, filas)
+        nuevas.extend(sin_id)
+
+        Respuesta.objects.bulk_create([Respuesta(estudio=self.instance, **valores)
+                                       for valores in nuevas])
+        bulk_update(Respuesta, cambios)
+        if sobrantes:
+            record_deletions(Respuesta, sobrantes, self.instance)
+            Respuesta.objects.filter(pk__in=sobrantes).delete()
+        return len(nuevas), len(cambios), len(sobrantes)
+
     @atomic
     def update(self):
         """ This function overides the default behaviour for creating
@@ -185,10 +274,10 @@ class EstudioSerializer(serializers.ModelSerializer):
             Updates an Estudio intance and all objects related to it
             when an offline clients submits an update.
 
-            Deletes all existing answers and saves with the new
-            information from the study. This is because offline client
-            can delete, modify or add a given number of answers and will
-            always send the all.
+            The offline client can delete, modify or add any number of
+            answers and always sends all of them, they are compared with
+            the existing ones by update_answers. The study itself is only
+            written when its status changed.
         """
         familia = self.validated_data.pop('familia')
         respuestas = self.validated_data.pop('respuesta_estudio')
@@ -196,15 +285,14 @@ class EstudioSerializer(serializers.ModelSerializer):
         save_foreign_relationship([familia], FamiliaSerializer, Familia)
 
         if self.instance.status == Estudio.REVISION or self.instance.status == Estudio.BORRADOR \
-                or self.instance.status == Estudio.RECHZADO:
-            Estudio.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+                or self.instance.status == Estudio.RECHAZADO:
+            if any(getattr(self.instance, campo) != valor
+                   for campo, valor in self.validated_data.items()):
+                Estudio.objects.filter(pk=self.instance.pk).update(
+                    fecha_modificacion=timezone.now(), **self.validated_data)
         else:
             raise serializers.ValidationError('Invalid change of status')
 
-        Respuesta.objects.filter(estudio=self.instance).delete()
-
-        for respuesta in respuestas:
-            respuesta['estudio'] = self.instance
-            Respuesta.objects.create(**respuesta)
+        self.update_answers(respuestas)
 
         return Estudio.objects.get(pk=self.instance.pk)
@@ -0,0 +1,231 @@
+""" Incremental synchronization of studies with the offline application.
+
+The offline application used to download every study of its capturista, with
+all of their nested rows, each time it synchronized. Instead, each response of
+captura.views.APIUploadRetrieveStudy.cambios carries a cursor, which the
+application sends back as the since parameter of its next request, and only
+what was modified after it is sent:
+
+    - the studies with any modified row, and within each of them only the
+      nested rows modified after the cursor. A nested row is also sent when
+      one of the rows nested in it was modified, e.g. an integrante whose
+      alumno changed.
+    - the rows deleted after the cursor, recorded as Eliminacion by
+      record_deletions. Studies of the capturista that left the statuses
+      synchronized with the application are reported as deleted too.
+
+Every synchronized model has a fecha_modificacion field, set when the row is
+saved. Code that modifies those rows with QuerySet.update must set it too, as
+the serializers of the nested rows do.
+
+The cursor is the time the response started to be built minus MARGEN, so that
+rows written by transactions that had not committed yet are sent again on the
+next synchronization instead of being lost. The application may receive a row
+it already has, which it just overwrites.
+"""
+from datetime import timedelta
+from operator import attrgetter
+
+from django.db.models import Manager, Max, Prefetch, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from familias.models import Integrante
+from indicadores.models import Transaccion, Ingreso
+from .models import Estudio, Eliminacion
+
+
+MARGEN = timedelta(minutes=1)
+
+STATUS_SINCRONIZADOS = (Estudio.RECHAZADO, Estudio.REVISION, Estudio.BORRADOR)
+
+# For each synchronized model, the path from Estudio to it and the field that
+# tells when it was last modified.
+CAMBIOS_ESTUDIO = (
+    ('', 'fecha_modificacion'),
+    ('familia__', 'fecha_modificacion'),
+    ('familia__comentario_familia__', 'fecha_modificacion'),
+    ('familia__integrante_familia__', 'fecha_modificacion'),
+    ('familia__integrante_familia__alumno_integrante__', 'fecha_modificacion'),
+    ('familia__integrante_familia__tutor_integrante__', 'fecha_modificacion'),
+    ('familia__integrante_familia__tutor_integrante__tutor_ingresos__', 'fecha_modificacion'),
+    ('familia__transacciones__', 'fecha_modificacion'),
+    ('respuesta_estudio__', 'fecha_modificacion'),
+    ('retroalimentacion_estudio__', 'fecha'),
+)
+
+
+class DeltaListSerializer(serializers.ListSerializer):
+    """ List serializer of the rows nested in a study.
+
+    When the context of the serialization has a since value, only the rows
+    modified after it are serialized. The child serializer can list in
+    Meta.campos_modificacion the fields, possibly through its own nested rows,
+    that tell when a row was modified, by default fecha_modificacion.
+
+    The rows are serialized in the order of their ids, whether they were
+    prefetched or not, since the database does not keep any order otherwise.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            desde = self.context.get('since')
+            filas = data.all()
+            if desde is not None:
+                campos = getattr(self.child.Meta, 'campos_modificacion', ('fecha_modificacion',))
+                filtro = Q()
+                for campo in campos:
+                    filtro |= Q(**{campo + '__gt': desde})
+                filas = filas.filter(filtro).distinct()
+            data = sorted(filas, key=attrgetter('pk'))
+        return super(DeltaListSerializer, self).to_representation(data)
+
+
+def parse_cursor(cursor):
+    """ Returns the datetime of a cursor, or None if it is not valid.
+
+    """
+    try:
+        desde = parse_datetime(cursor)
+    except ValueError:
+        return None
+    if desde is not None and timezone.is_naive(desde):
+        desde = timezone.make_aware(desde, timezone.utc)
+    return desde
+
+
+def new_cursor():
+    """ Returns the cursor for the changes read from now on.
+
+    Must be called before the changes are read.
+    """
+    return (timezone.now() - MARGEN).isoformat()
+
+
+def changed_studies(capturista, desde):
+    """ Returns the ids of the studies of a capturista with rows modified after desde.
+
+    Each path of CAMBIOS_ESTUDIO is queried on its own, so that the joins of
+    one nested model do not multiply the rows of the others.
+    """
+    estudios = Estudio.objects.filter(capturista=capturista)
+    ids = set()
+    for ruta, campo in CAMBIOS_ESTUDIO:
+        ids.update(estudios.filter(**{ruta + campo + '__gt': desde})
+                           .values_list('id', flat=True).distinct())
+    return ids
+
+
+def study_versions(ids):
+    """ Returns the version of each of the given studies.
+
+    The version of a study is the last time any of its rows was modified,
+    along the paths of CAMBIOS_ESTUDIO, or deleted. A study is among the
+    changed_studies after a time if its version is later than it. Each path
+    is queried once for all the studies.
+
+    Returns
+    -------
+    dict
+        The version of each study by its id.
+    """
+    versiones = {}
+
+    def update(filas):
+        for id_estudio, fecha in filas:
+            if fecha is not None and (id_estudio not in versiones or
+                                      fecha > versiones[id_estudio]):
+                versiones[id_estudio] = fecha
+
+    for ruta, campo in CAMBIOS_ESTUDIO:
+        update(Estudio.objects.filter(pk__in=ids)
+                              .order_by()
+                              .values('id')
+                              .annotate(ultima=Max(ruta + campo))
+                              .values_list('id', 'ultima'))
+    update(Eliminacion.objects.filter(id_estudio__in=ids)
+                              .order_by()
+                              .values('id_estudio')
+                              .annotate(ultima=Max('fecha'))
+                              .values_list('id_estudio', 'ultima'))
+    return versiones
+
+
+def deleted_rows(capturista, desde, estudios):
+    """ Returns the rows of the studies of a capturista deleted after desde.
+
+    estudios are the modified studies that are no longer synchronized, they
+    are reported as deleted.
+
+    Returns
+    -------
+    list
+        A dictionary with the modelo, id and estudio of each deleted row.
+    """
+    propios = Estudio.objects.filter(capturista=capturista).values('id')
+    eliminados = Eliminacion.objects.filter(fecha__gt=desde) \
+                                    .filter(Q(capturista=capturista) | Q(id_estudio__in=propios)) \
+                                    .order_by('id') \
+                                    .values_list('modelo', 'id_objeto', 'id_estudio')
+    filas = [{'modelo': modelo, 'id': id_objeto, 'estudio': id_estudio}
+             for modelo, id_objeto, id_estudio in eliminados]
+    filas.extend({'modelo': Estudio._meta.model_name, 'id': estudio.id, 'estudio': estudio.id}
+                 for estudio in estudios)
+    return filas
+
+
+def prefetch_studies(estudios):
+    """ Returns the queryset of studies with every row serialized for the application.
+
+    The nested rows of all the studies are read with a fixed number of
+    queries, instead of a few per study. When the serialization has a since
+    value, DeltaListSerializer filters the nested rows with queries of its own.
+    """
+    return estudios.select_related('familia').prefetch_related(
+        'respuesta_estudio',
+        'retroalimentacion_estudio',
+        'familia__comentario_familia',
+        Prefetch('familia__integrante_familia',
+                 queryset=Integrante.objects.select_related('oficio',
+                                                            'alumno_integrante__escuela',
+                                                            'tutor_integrante')),
+        Prefetch('familia__integrante_familia__tutor_integrante__tutor_ingresos',
+                 queryset=Ingreso.objects.select_related('transaccion__periodicidad')),
+        Prefetch('familia__transacciones',
+                 queryset=Transaccion.objects.select_related('periodicidad')))
+
+
+def record_deletions(modelo, ids, estudio):
+    """ Records the deletion of rows of a study for the offline application.
+
+    The nested rows of a study have no receivers, so deleting many of them
+    takes a single query. The code that deletes them calls this function in
+    the same transaction, with the primary keys it read before deleting.
+    Rows deleted along with their study need not be recorded, the deletion
+    of the study is recorded by record_study_deletion.
+
+    Parameters
+    ----------
+    modelo : Model
+        The model of the deleted rows.
+    ids : list
+        The primary keys the deleted rows had.
+    estudio : Estudio
+        The study the rows belonged to.
+    """
+    Eliminacion.objects.bulk_create([Eliminacion(modelo=modelo._meta.model_name,
+                                                 id_objeto=pk,
+                                                 id_estudio=estudio.pk,
+                                                 capturista_id=estudio.capturista_id)
+                                     for pk in ids])
+
+
+@receiver(post_delete, sender=Estudio)
+def record_study_deletion(sender, instance=None, **kwargs):
+    """ Records the deletion of a study for the offline application.
+
+    """
+    record_deletions(Estudio, [instance.pk], instance)
@@ -0,0 +1,107 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from familias.models import Familia
+from perfiles_usuario.models import Capturista
+from .models import ContenidoFoto, Estudio, Foto
+
+
+class TestContents(TestCase):
+    """ Suite to test that the files of the photos are stored once per content.
+
+    Attributes:
+    -----------
+    media : str
+        The temporary MEDIA_ROOT of the tests.
+    estudio : Estudio
+        The study the photos belong to.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        configuracion = override_settings(MEDIA_ROOT=self.media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.addCleanup(shutil.rmtree, self.media)
+
+        capturista = Capturista.objects.create(user=User.objects.create_user(username='erikiano'))
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        self.estudio = Estudio.objects.create(capturista=capturista, familia=familia)
+
+    def stored(self):
+        """ Returns the names of the files in the content store.
+
+        """
+        return sorted(os.listdir(os.path.join(self.media, 'contenido')))
+
+    def test_same_content_stored_once(self):
+        """ Test that photos of the same content share a file, deleted with the last of them.
+
+        """
+        primera = Foto.objects.create(estudio=self.estudio,
+                                      upload=SimpleUploadedFile('casa.JPG', b'fachada'))
+        segunda = Foto.objects.create(estudio=self.estudio,
+                                      upload=SimpleUploadedFile('otra.jpg', b'fachada'))
+        otra = Foto.objects.create(estudio=self.estudio,
+                                   upload=SimpleUploadedFile('patio.jpg', b'patio'))
+
+        self.assertEqual(primera.contenido, segunda.contenido)
+        self.assertEqual(primera.upload.name, segunda.upload.name)
+        self.assertEqual(primera.upload.name,
+                         'contenido/{}.jpg'.format(primera.contenido.sha256))
+        self.assertEqual(primera.contenido.referencias, 2)
+        self.assertEqual(len(self.stored()), 2)
+
+        primera.delete()
+        self.assertTrue(os.path.isfile(segunda.upload.path))
+        segunda.delete()
+        self.assertFalse(ContenidoFoto.objects.filter(pk=primera.contenido_id).exists())
+        self.assertEqual(self.stored(), [os.path.basename(otra.upload.name)])
+
+    def test_collect_photos(self):
+        """ Test that old photos are moved into the store, and unreferenced files deleted.
+
+        """
+        with open(os.path.join(self.media, 'vieja.jpg'), 'wb') as archivo:
+            archivo.write(b'fachada')
+        vieja = Foto.objects.create(estudio=self.estudio,
+                                    upload=SimpleUploadedFile('nueva.jpg', b'fachada'))
+        Foto.objects.filter(pk=vieja.pk).update(contenido=None, upload='vieja.jpg')
+
+        huerfano = ContenidoFoto(sha256='0' * 64, tamano=7)
+        huerfano.archivo.save('huerfano.jpg', ContentFile(b'huerfano'), save=False)
+        huerfano.save()
+        reciente = ContenidoFoto(sha256='1' * 64, tamano=7)
+        reciente.archivo.save('reciente.jpg', ContentFile(b'reciente'), save=False)
+        reciente.save()
+        ContenidoFoto.objects.filter(pk=huerfano.pk).update(
+            fecha_creacion=timezone.now() - timedelta(days=2))
+        with open(os.path.join(self.media, 'contenido', 'perdido.jpg'), 'wb') as archivo:
+            archivo.write(b'perdido')
+        antes = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(os.path.join(self.media, 'contenido', 'perdido.jpg'), (antes, antes))
+
+        salida = io.StringIO()
+        call_command('collect_photos', stdout=salida)
+        self.assertIn('Fotos movidas: 1, contenidos borrados: 1, '
+                      'archivos sin contenido borrados: 1', salida.getvalue())
+
+        vieja = Foto.objects.get(pk=vieja.pk)
+        self.assertEqual(vieja.upload.name, vieja.contenido.archivo.name)
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'vieja.jpg')))
+        self.assertEqual(ContenidoFoto.objects.count(), 2)
+        self.assertEqual(self.stored(), sorted([os.path.basename(vieja.upload.name),
+                                                os.path.basename(reciente.archivo.name)]))
@@ -0,0 +1,114 @@
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User, Group
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from familias.models import Familia
+from perfiles_usuario.models import Capturista
+from perfiles_usuario.utils import ADMINISTRADOR_GROUP
+from .export import ZipStream, table_rows, export_csv_zip, export_xlsx
+from .load import load_data
+from .models import Estudio, Respuesta, Pregunta
+
+
+class TestExport(TestCase):
+    """ Suite to test the streaming export of the database.
+
+    Attributes:
+    -----------
+    estudio : Estudio
+        A study with the empty answers for all the loaded questions.
+    """
+
+    def setUp(self):
+        """ Loads the questions, creates a study and logs in an administrator.
+
+        """
+        load_data()
+        thelma = User.objects.create_user(username='thelma', password='junipero')
+        administrators = Group.objects.get_or_create(name=ADMINISTRADOR_GROUP)[0]
+        administrators.user_set.add(thelma)
+        capturista = Capturista.objects.create(
+            user=User.objects.create_user(username='erikiano', password='vacalalo'))
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro',
+                                         nombre_familiar='Pérez, "los de la esquina"')
+        self.estudio = Estudio.objects.create(capturista=capturista, familia=familia)
+        self.client.login(username='thelma', password='junipero')
+
+    def test_zip_stream(self):
+        """ Test that the archive written by ZipStream can be read by zipfile.
+
+        """
+        archivo = ZipStream()
+        contenido = b''.join(archivo.entry('uno.txt', [b'hola ', b'mundo'])) + \
+            b''.join(archivo.entry('dos.txt', [])) + archivo.close()
+
+        with zipfile.ZipFile(io.BytesIO(contenido)) as leido:
+            self.assertIsNone(leido.testzip())
+            self.assertEqual(leido.read('uno.txt'), b'hola mundo')
+            self.assertEqual(leido.read('dos.txt'), b'')
+
+    def test_table_rows_by_chunks(self):
+        """ Test that every row is read once, by chunks of the given size.
+
+        """
+        chunks = list(table_rows(Respuesta, chunk_size=50))
+        self.assertEqual(chunks[0][0][0], 'eleccion_id')
+        self.assertTrue(all(len(chunk) <= 50 for chunk in chunks[1:]))
+        columna = chunks[0][0].index('id')
+        ids = [fila[columna] for chunk in chunks[1:] for fila in chunk]
+        self.assertEqual(ids, list(Respuesta.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_csv_zip(self):
+        """ Test that the zip has a csv per table with all of its rows.
+
+        """
+        contenido = b''.join(export_csv_zip(chunk_size=50))
+        with zipfile.ZipFile(io.BytesIO(contenido)) as leido:
+            self.assertIn('respuesta.csv', leido.namelist())
+            filas = list(csv.reader(io.StringIO(leido.read('respuesta.csv').decode('utf-8-sig'))))
+            familias = list(csv.reader(io.StringIO(leido.read('familia.csv').decode('utf-8-sig'))))
+
+        self.assertEqual(len(filas) - 1, Pregunta.objects.count())
+        columna = familias[0].index('nombre_familiar')
+        self.assertEqual(familias[1][columna], 'Pérez, "los de la esquina"')
+
+    def test_xlsx(self):
+        """ Test that the workbook has a well formed sheet per table.
+
+        """
+        contenido = b''.join(export_xlsx(chunk_size=50))
+        namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        with zipfile.ZipFile(io.BytesIO(contenido)) as leido:
+            libro = ElementTree.fromstring(leido.read('xl/workbook.xml'))
+            hojas = [hoja.get('name') for hoja in libro.iter(namespace + 'sheet')]
+            numero = hojas.index('respuesta') + 1
+            hoja = ElementTree.fromstring(leido.read('xl/worksheets/sheet{}.xml'.format(numero)))
+
+        self.assertEqual(len(hojas), 19)
+        self.assertEqual(len(list(hoja.iter(namespace + 'row'))) - 1, Pregunta.objects.count())
+
+    def test_download_studies(self):
+        """ Test that the view streams the requested format.
+
+        """
+        url = reverse('estudios_socioeconomicos:download_studies')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        response = self.client.get(url, {'formato': 'csv'})
+        self.assertTrue(response.streaming)
+        contenido = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(contenido)) as leido:
+            self.assertIn('estudio.csv', leido.namelist())
+
+        response = self.client.get(url, {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
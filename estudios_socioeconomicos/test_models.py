@@ -1,9 +1,13 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from familias.models import Familia
 from perfiles_usuario.models import Capturista
+from .load import load_data
 from .models import Estudio, Seccion, Pregunta, OpcionRespuesta, Respuesta, Subseccion
+from .utils import bulk_update
 
 
 class EstudioTestCase(TestCase):
@@ -57,6 +61,36 @@ class EstudioTestCase(TestCase):
 
         self.assertEqual(respuestas.count(), preguntas.count())
 
+    def test_anwser_generation_is_batched(self):
+        """ Tests that the answers of a new study are inserted with a single query,
+            regardless of the number of questions.
+        """
+        load_data()
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        with CaptureQueriesContext(connection) as context:
+            estudio = Estudio.objects.create(capturista=self.capturista, familia=familia)
+        inserciones = [query for query in context.captured_queries
+                       if query['sql'].startswith('INSERT') and
+                       Respuesta._meta.db_table in query['sql']]
+
+        self.assertLessEqual(len(inserciones), 1)
+        self.assertEqual(Respuesta.objects.filter(estudio=estudio).count(),
+                         Pregunta.objects.all().count())
+
+    @override_settings(CREAR_RESPUESTAS_AL_CAPTURAR=True)
+    def test_anwser_generation_is_deferred(self):
+        """ Tests that no answers are created along with the study when they
+            are created as the sections are captured.
+        """
+        load_data()
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        estudio = Estudio.objects.create(capturista=self.capturista, familia=familia)
+        self.assertFalse(Respuesta.objects.filter(estudio=estudio).exists())
+
     def test_get_status(self):
         """ Test whether the static method to return a dict with status options works correctly.
 
@@ -286,3 +320,23 @@ class RespuestaTestCase(TestCase):
         respuesta.eleccion = opcion_respuesta_camion
         respuesta.save()
         self.assertEqual(str(respuesta), 'Camión')
+
+    def test_bulk_update(self):
+        """ Test that bulk_update sets different values on each row.
+
+        """
+        opcion = OpcionRespuesta.objects.create(pregunta=self.pregunta, texto='Camión')
+        primera = Respuesta.objects.create(estudio=self.estudio, pregunta=self.pregunta)
+        segunda = Respuesta.objects.create(estudio=self.estudio, pregunta=self.pregunta,
+                                           respuesta='Autobus')
+
+        bulk_update(Respuesta, {primera.id: {'eleccion_id': opcion.id},
+                                segunda.id: {'respuesta': 'Bicicleta'}})
+
+        primera.refresh_from_db()
+        segunda.refresh_from_db()
+        self.assertEqual(primera.eleccion, opcion)
+        self.assertEqual(primera.respuesta, '')
+        self.assertEqual(segunda.eleccion, None)
+        self.assertEqual(segunda.respuesta, 'Bicicleta')
+        self.assertGreater(segunda.fecha_modificacion, self.estudio.fecha_modificacion)
@@ -0,0 +1,143 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from PIL import Image
+
+from core.jobs import exclusive
+from familias.models import Familia
+from perfiles_usuario.models import Capturista
+from .models import Estudio, Foto
+from .photos import process_pending, start_processing, BLOQUEO, ATASCADA
+
+
+def phone_photo(ancho, alto, orientacion):
+    """ Returns a jpeg as phones write it, sideways with the EXIF orientation to turn it.
+
+    """
+    entrada = struct.pack('>HHIHH', 0x0112, 3, 1, orientacion, 0)
+    exif = b'Exif\x00\x00MM\x00\x2a' + struct.pack('>IH', 8, 1) + entrada + b'\x00' * 4
+    salida = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'red').save(salida, 'JPEG', exif=exif)
+    return salida.getvalue()
+
+
+class TestPhotos(TestCase):
+    """ Suite to test the copies of the photos built in the background.
+
+    Attributes:
+    -----------
+    media : str
+        The temporary MEDIA_ROOT and PRIVATE_MEDIA_ROOT of the tests.
+    foto : Foto
+        A photo taken sideways, 3000 pixels wide and 2000 high.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        configuracion = override_settings(MEDIA_ROOT=self.media, PRIVATE_MEDIA_ROOT=self.media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+        capturista = Capturista.objects.create(user=User.objects.create_user(username='erikiano'))
+        familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro')
+        self.estudio = Estudio.objects.create(capturista=capturista, familia=familia)
+        self.foto = Foto(estudio=self.estudio)
+        self.foto.upload.save('casa.jpg', ContentFile(phone_photo(3000, 2000, 6)))
+
+    def tearDown(self):
+        shutil.rmtree(self.media)
+
+    def test_process_photo(self):
+        """ Test that the copies are upright, smaller and without EXIF.
+
+        """
+        self.assertEqual(self.foto.url_miniatura, self.foto.upload.url)
+        self.assertEqual(process_pending(), (1, 0))
+        self.assertEqual(process_pending(), (0, 0))
+
+        foto = Foto.objects.get(pk=self.foto.pk)
+        self.assertEqual(foto.status, Foto.PROCESADA)
+        self.assertEqual((foto.ancho, foto.alto), (2000, 3000))
+        self.assertEqual(foto.url_miniatura, foto.miniatura.url)
+        self.assertEqual(foto.url_web, foto.web.url)
+        for archivo, lado in ((foto.miniatura, Foto.MINIATURA), (foto.web, Foto.WEB)):
+            with Image.open(archivo.path) as copia:
+                # Pillow rounds the short side up or down depending on its version.
+                ancho, alto = copia.size
+                self.assertEqual(alto, lado)
+                self.assertLessEqual(abs(ancho - lado * 2 / 3), 1)
+                self.assertNotIn('exif', copia.info)
+        self.assertTrue(os.path.isfile(foto.upload.path))
+
+    def test_process_again(self):
+        """ Test that building the copies of a photo again replaces its earlier copies.
+
+        """
+        process_pending()
+        anterior = Foto.objects.get(pk=self.foto.pk)
+        call_command('process_photos', str(self.foto.pk), stdout=io.StringIO())
+
+        foto = Foto.objects.get(pk=self.foto.pk)
+        self.assertEqual(foto.status, Foto.PROCESADA)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media, 'fotos'))),
+                         sorted(os.path.basename(copia.name)
+                                for copia in (anterior.miniatura, anterior.web)))
+
+        foto.delete()
+        self.assertEqual(os.listdir(os.path.join(self.media, 'fotos')), [])
+        self.assertFalse(os.path.exists(foto.upload.path))
+
+    def test_process_error(self):
+        """ Test that a file that is not an image is marked, and does not stop the others.
+
+        """
+        roto = Foto(estudio=self.estudio)
+        roto.upload.save('roto.jpg', ContentFile(b'no es una imagen'))
+
+        self.assertEqual(process_pending(), (1, 1))
+        roto = Foto.objects.get(pk=roto.pk)
+        self.assertEqual(roto.status, Foto.ERROR)
+        self.assertTrue(roto.error)
+        self.assertEqual(roto.url_web, roto.upload.url)
+        self.assertEqual(Foto.objects.get(pk=self.foto.pk).status, Foto.PROCESADA)
+
+    def test_reclaim_stuck(self):
+        """ Test that a photo left claimed by a process that died is claimed again.
+
+        """
+        Foto.objects.filter(pk=self.foto.pk).update(status=Foto.EN_PROCESO,
+                                                    fecha_proceso=timezone.now())
+        self.assertEqual(process_pending(), (0, 0))
+
+        Foto.objects.filter(pk=self.foto.pk).update(
+            fecha_proceso=timezone.now() - ATASCADA - timedelta(minutes=1))
+        self.assertEqual(process_pending(), (1, 0))
+        self.assertEqual(Foto.objects.get(pk=self.foto.pk).status, Foto.PROCESADA)
+
+    def test_single_process(self):
+        """ Test that no process is started, nor builds the copies, while another one runs.
+
+        """
+        with exclusive(BLOQUEO) as adquirido:
+            self.assertTrue(adquirido)
+            self.assertEqual(process_pending(), (0, 0))
+            with mock.patch('core.jobs.subprocess.Popen') as popen, \
+                    mock.patch('core.jobs.transaction.on_commit') as on_commit:
+                start_processing()
+                on_commit.call_args[0][0]()
+            self.assertFalse(popen.called)
+        self.assertEqual(Foto.objects.get(pk=self.foto.pk).status, Foto.PENDIENTE)
+        self.assertEqual(process_pending(), (1, 0))
@@ -6,14 +6,16 @@ from rest_framework import status
 
 from administracion.models import Escuela
 from captura.models import Retroalimentacion
+from core.query_budget import QueryBudgetMixin
 from estudios_socioeconomicos.models import Estudio
-from familias.models import Familia, Integrante, Alumno
+from familias.models import Familia, Integrante, Alumno, Tutor
+from indicadores.models import Periodo, Transaccion, Ingreso
 from perfiles_usuario.models import Capturista
 from estudios_socioeconomicos.load import load_data
 from perfiles_usuario.utils import ADMINISTRADOR_GROUP
 
 
-class TestRetroalimentacions(TestCase):
+class TestRetroalimentacions(QueryBudgetMixin, TestCase):
     """ Tests that an administrador can leave feedback and aprove or
         reject a study.
 
@@ -126,6 +128,41 @@ class TestRetroalimentacions(TestCase):
         self.assertEqual(Estudio.objects.get(id=self.estudio.id).status, Estudio.RECHAZADO)
         self.assertEqual(Retroalimentacion.objects.all().first().descripcion, 'nada bien')
 
+    def test_query_budget(self):
+        """ Test that the queries of a rejected study do not grow with its rows.
+
+        """
+        self.client.login(username=self.test_username, password=self.test_password)
+        Estudio.objects.filter(pk=self.estudio.pk).update(status=Estudio.RECHAZADO)
+        periodo = Periodo.objects.create(periodicidad='Semanal', factor=4, multiplica=True)
+        url = reverse(self.test_url, kwargs={'id_estudio': self.estudio.id})
+
+        def crecer():
+            for numero in range(3):
+                integrante = Integrante.objects.create(familia=self.familia,
+                                                       nombres='Tutor',
+                                                       apellidos=str(numero),
+                                                       nivel_estudios='ninguno',
+                                                       fecha_de_nacimiento='1970-02-26')
+                tutor = Tutor.objects.create(integrante=integrante, relacion='padre')
+                Ingreso.objects.create(tutor=tutor,
+                                       fecha='2016-02-02',
+                                       tipo='comprobable',
+                                       transaccion=Transaccion.objects.create(
+                                           familia=self.familia,
+                                           monto=30,
+                                           periodicidad=periodo,
+                                           es_ingreso=True))
+                Transaccion.objects.create(familia=self.familia, monto=10,
+                                           periodicidad=periodo, es_ingreso=False)
+                Retroalimentacion.objects.create(estudio=self.estudio, usuario=self.thelma,
+                                                 descripcion='falta ' + str(numero))
+
+        self.client.get(url)  # Loads the session and the groups of the user.
+        self.assertWithinBudget(url)
+        self.assertQueriesDoNotScale(url, crecer)
+        self.assertWithinBudget(url)
+
 
 class TestFocusMode(TestCase):
     """ Tests that a studiy can be viewed on Focus Mode.
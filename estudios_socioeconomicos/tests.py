@@ -1,6 +1,9 @@
+from django.db import connection
 from django.test import TestCase
-from .models import Pregunta, Seccion, Subseccion, OpcionRespuesta
+from django.test.utils import CaptureQueriesContext
+from .models import Pregunta, Seccion, Subseccion, OpcionRespuesta, VersionCuestionario
 from .load import load_data
+from .schema import get_schema, schema_version
 
 
 class TestLoadPreguntas(TestCase):
@@ -43,3 +46,63 @@ class TestLoadPreguntas(TestCase):
         p = Pregunta.objects.get(texto='El piso es de:')
         opts = OpcionRespuesta.objects.filter(pregunta=p).count()
         self.assertEqual(4, opts)
+
+
+class TestSchemaCache(TestCase):
+    """ Suite to test the cached copy of the questionnaire.
+
+    """
+
+    def setUp(self):
+        load_data()
+
+    def test_schema_structure(self):
+        """ Test that the cached questionnaire has every question and option.
+
+        """
+        esquema = get_schema()
+        preguntas = [pregunta for seccion in esquema.secciones
+                     for subseccion in seccion.subsecciones
+                     for pregunta in subseccion.preguntas]
+        opciones = [opcion for pregunta in preguntas for opcion in pregunta.opciones]
+        self.assertEqual(len(esquema.secciones), Seccion.objects.count())
+        self.assertEqual(len(preguntas), Pregunta.objects.count())
+        self.assertEqual(len(opciones), OpcionRespuesta.objects.count())
+
+    def test_schema_is_reused(self):
+        """ Test that only the version is queried while the questionnaire does not change.
+
+        """
+        esquema = get_schema()
+        with self.assertNumQueries(1):
+            self.assertIs(get_schema(), esquema)
+
+    def test_schema_follows_changes(self):
+        """ Test that saving a question replaces the version and the cached copy.
+
+        """
+        esquema = get_schema()
+        pregunta = Pregunta.objects.get(texto='El piso es de:')
+        pregunta.texto = 'El piso de la vivienda es de:'
+        pregunta.save()
+
+        self.assertNotEqual(schema_version(), esquema.version)
+        nuevo = get_schema()
+        self.assertNotEqual(nuevo.etag, esquema.etag)
+        textos = [pregunta.texto for seccion in nuevo.secciones
+                  for subseccion in seccion.subsecciones
+                  for pregunta in subseccion.preguntas]
+        self.assertIn('El piso de la vivienda es de:', textos)
+
+    def test_load_data_bumps_once(self):
+        """ Test that loading the questionnaire replaces the version a single time.
+
+        """
+        version = schema_version()
+        with CaptureQueriesContext(connection) as context:
+            load_data()
+        tabla = VersionCuestionario._meta.db_table
+        actualizaciones = [query for query in context.captured_queries
+                           if query['sql'].startswith('UPDATE') and tabla in query['sql']]
+        self.assertEqual(len(actualizaciones), 1)
+        self.assertNotEqual(schema_version(), version)
@@ -0,0 +1,225 @@
+""" Resumable uploads of the photos of the studies, sent in chunks.
+
+The offline application used to send each Foto in a single multipart
+request, which on a bad connection had to start over whenever it dropped,
+and which django buffered in a temporary file before the view ran. Instead
+the application may:
+
+1. start an upload with start_upload, giving the size and the SHA-256 of the
+   whole file. The file is created empty in its final place in the storage,
+   named after its content, see .contents. If the content is already stored
+   the upload starts complete, and there is nothing to send.
+2. send the file in chunks with write_chunk, each with its offset and its own
+   SHA-256. A chunk is read from the request in blocks and written straight
+   into the file, and the upload only moves forward once its hash matches.
+   The offset of the next chunk is recibido, which the application asks for
+   after a dropped connection to resume from there.
+3. complete the upload with complete_upload, which checks the hash of the
+   whole file and creates the Foto with that same file, no copy is made.
+   If the same content was stored meanwhile the file is dropped for it.
+
+A chunk that was already received, e.g. sent again because the response was
+lost, is checked against what was written and not written again. Starting the
+upload of a file that the study already has, or is already receiving, returns
+that upload instead of writing the file twice.
+
+The chunks are written in place, so the storage must be on the filesystem, as
+the rest of the photos of the studies expect. Uploads left incomplete for
+CADUCIDAD are deleted by the clean_uploads management command.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+
+from .contents import BLOQUE, adopt_file, content_name, file_hash
+from .models import ContenidoFoto, Foto, SubidaFoto
+from .photos import start_processing
+
+
+TAMANO_MAXIMO = 30 * 1024 * 1024
+CADUCIDAD = timedelta(days=7)
+
+
+class ErrorSubida(Exception):
+    """ A chunk or a completion that can not be accepted by the upload.
+
+    """
+
+
+class DesfaseSubida(ErrorSubida):
+    """ A chunk or a completion that does not match what the upload received.
+
+    The application should ask for the state of the upload and resume from
+    its recibido.
+    """
+
+
+def start_upload(estudio, file_name, nombre, tamano, sha256):
+    """ Starts the upload of a file to a study.
+
+    If the study already has an upload of a file with that hash, complete or
+    not, it is returned instead, so the application can resume it even if
+    it lost its id. If the content is already stored, the upload has it as
+    its file and is received whole.
+
+    Parameters
+    ----------
+    nombre : str
+        The name of the file in the device, used to name it in the storage.
+
+    Returns
+    -------
+    tuple
+        The SubidaFoto and whether it was created.
+    """
+    anterior = SubidaFoto.objects.filter(estudio=estudio, sha256=sha256).first()
+    if anterior is not None:
+        return anterior, False
+
+    contenido = ContenidoFoto.objects.filter(sha256=sha256, tamano=tamano).first()
+    if contenido is not None:
+        archivo, recibido = contenido.archivo.name, tamano
+    else:
+        archivo = default_storage.save(content_name(sha256, nombre), ContentFile(b''))
+        recibido = 0
+    try:
+        with transaction.atomic():
+            return SubidaFoto.objects.create(estudio=estudio,
+                                             file_name=file_name,
+                                             archivo=archivo,
+                                             tamano=tamano,
+                                             sha256=sha256,
+                                             recibido=recibido), True
+    except IntegrityError:
+        # The same file was started by another request in the meantime.
+        if contenido is None:
+            default_storage.delete(archivo)
+        return SubidaFoto.objects.get(estudio=estudio, sha256=sha256), False
+
+
+def write_chunk(subida, inicio, sha256, entrada, longitud):
+    """ Writes a chunk of the file of an upload, read from a stream.
+
+    Parameters
+    ----------
+    inicio : int
+        The offset of the chunk in the file.
+    sha256 : str
+        The hex SHA-256 of the chunk.
+    entrada : file-like
+        The stream the chunk is read from, e.g. the request.
+    longitud : int
+        The size of the chunk in bytes.
+
+    Raises
+    ------
+    DesfaseSubida
+        If the chunk does not start at recibido, or it was already received
+        with other bytes.
+    ErrorSubida
+        If the chunk is out of the file, incomplete or does not match its hash.
+
+    Returns
+    -------
+    SubidaFoto
+        The upload, with the offset of the next chunk.
+    """
+    fin = inicio + longitud
+    if inicio < 0 or longitud <= 0 or fin > subida.tamano:
+        raise ErrorSubida('El pedazo está fuera del archivo.')
+
+    if fin <= subida.recibido:
+        # Sent again, the bytes already written are only checked.
+        if file_hash(subida.archivo, inicio, fin) != sha256:
+            raise DesfaseSubida('El pedazo no coincide con lo recibido.')
+        return subida
+    if inicio != subida.recibido:
+        raise DesfaseSubida('El siguiente pedazo empieza en {}.'.format(subida.recibido))
+
+    calculado = hashlib.sha256()
+    escritos = 0
+    with open(default_storage.path(subida.archivo), 'r+b') as archivo:
+        archivo.seek(inicio)
+        while escritos < longitud:
+            bloque = entrada.read(min(BLOQUE, longitud - escritos))
+            if not bloque:
+                break
+            calculado.update(bloque)
+            archivo.write(bloque)
+            escritos += len(bloque)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+    # The bytes past recibido are not part of the file yet, a chunk that fails
+    # here is written over by the next one.
+    if escritos != longitud:
+        raise ErrorSubida('El pedazo llegó incompleto.')
+    if calculado.hexdigest() != sha256:
+        raise ErrorSubida('El pedazo no coincide con su sha256.')
+
+    SubidaFoto.objects.filter(pk=subida.pk, recibido=inicio).update(
+        recibido=fin, fecha_modificacion=timezone.now())
+    subida.refresh_from_db()
+    return subida
+
+
+def complete_upload(subida, procesar=True):
+    """ Creates the Foto of an upload that received its whole file.
+
+    Completing an upload again returns its Foto. Unless procesar is False,
+    e.g. when the caller completes many uploads, the process that builds the
+    copies of the photos is started.
+
+    Raises
+    ------
+    DesfaseSubida
+        If part of the file was not received yet.
+    ErrorSubida
+        If the file does not match its hash, the upload starts over.
+
+    Returns
+    -------
+    tuple
+        The Foto and whether it was created.
+    """
+    if subida.foto_id is not None:
+        return subida.foto, False
+    if subida.recibido != subida.tamano:
+        raise DesfaseSubida('Faltan {} bytes.'.format(subida.tamano - subida.recibido))
+    if file_hash(subida.archivo) != subida.sha256:
+        SubidaFoto.objects.filter(pk=subida.pk).update(recibido=0,
+                                                       fecha_modificacion=timezone.now())
+        raise ErrorSubida('El archivo no coincide con su sha256, debe enviarse de nuevo.')
+
+    with transaction.atomic():
+        subida = SubidaFoto.objects.select_for_update().get(pk=subida.pk)
+        if subida.foto_id is not None:
+            return subida.foto, False
+        contenido = adopt_file(subida.sha256, subida.archivo, subida.tamano)
+        foto = Foto(estudio_id=subida.estudio_id, file_name=subida.file_name,
+                    contenido=contenido)
+        foto.upload.name = contenido.archivo.name
+        foto.save()
+        subida.foto = foto
+        subida.save(update_fields=['foto', 'fecha_modificacion'])
+        if procesar:
+            start_processing()
+    return foto, True
+
+
+def delete_expired_uploads():
+    """ Deletes the uploads that received no chunk for CADUCIDAD, along with their files.
+
+    Returns
+    -------
+    int
+        The number of uploads deleted.
+    """
+    caducadas = SubidaFoto.objects.filter(
+        foto__isnull=True, fecha_modificacion__lt=timezone.now() - CADUCIDAD)
+    return caducadas.delete()[1].get(SubidaFoto._meta.label, 0)
@@ -1,5 +1,13 @@
 import os
 
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Case, When, Value, F
+from django.utils import timezone
+
+
+# Parameters per bulk_update query, below the limit of SQLite.
+BULK_UPDATE_PARAMETROS = 900
+
 
 def _delete_file(path):
     """ Deletes file from filesystem.
@@ -69,3 +77,102 @@ def save_foreign_relationship(objects, serializer_class, model_class, foreign_in
                     updated_objects.append(serializer.create(foreign_instance))  # Create
 
     return updated_objects
+
+
+def model_values(datos, campos):
+    """ Returns the values of the given fields present in the validated data of a serializer.
+
+    """
+    return {campo: datos[campo] for campo in campos if campo in datos}
+
+
+def changed_values(instance, valores):
+    """ Returns the values, by attname, that differ from the ones of the instance.
+
+    """
+    return {campo: valor for campo, valor in valores.items()
+            if getattr(instance, campo) != valor}
+
+
+def split_changes(existentes, filas):
+    """ Compares the incoming rows of a nested relation against the current ones.
+
+        Parameters
+        -----------
+        existentes: dict
+            The current instances of the relation by their id.
+
+        filas: []
+            Pairs with the id sent for each incoming row, or None, and a
+            dictionary with its values by attname.
+
+        Returns
+        --------
+        The values of the rows without id, a dictionary with the modified
+        values of each instance by its id, and the set of the ids of the
+        instances that were not received. Rows with an id that is not in
+        existentes are ignored.
+    """
+    nuevas = []
+    cambios = {}
+    recibidos = set()
+    for pk, valores in filas:
+        if not pk:
+            nuevas.append(valores)
+        elif pk in existentes:
+            recibidos.add(pk)
+            modificados = changed_values(existentes[pk], valores)
+            if modificados:
+                cambios[pk] = modificados
+    return nuevas, cambios, set(existentes) - recibidos
+
+
+def bulk_update(model_class, cambios):
+    """ Updates different values on many rows with a few queries.
+
+        Django does not provide bulk updates in this version, each modified
+        field is set with a CASE over the ids of the rows that modify it, in
+        a single UPDATE for as many rows as BULK_UPDATE_PARAMETROS allows.
+        Since QuerySet.update does not set auto_now fields, fecha_modificacion
+        is set when the model has it.
+
+        Parameters
+        -----------
+        model_class:
+            django.db.models.Model class of the rows.
+
+        cambios: dict
+            The values to set on each row, by attname, by the id of the row.
+    """
+    try:
+        model_class._meta.get_field('fecha_modificacion')
+        extra = {'fecha_modificacion': timezone.now()}
+    except FieldDoesNotExist:
+        extra = {}
+
+    lote = []
+    parametros = 0
+    for pk in sorted(cambios):
+        lote.append(pk)
+        parametros += 1 + 2 * len(cambios[pk])
+        if parametros >= BULK_UPDATE_PARAMETROS:
+            _update_batch(model_class, cambios, lote, extra)
+            lote = []
+            parametros = 0
+    if lote:
+        _update_batch(model_class, cambios, lote, extra)
+
+
+def _update_batch(model_class, cambios, lote, extra):
+    """ Runs the UPDATE of bulk_update for the rows in lote.
+
+    """
+    casos = {}
+    for pk in lote:
+        for campo, valor in cambios[pk].items():
+            field = model_class._meta.get_field(campo)
+            casos.setdefault(field, []).append(
+                When(pk=pk, then=Value(valor, output_field=field)))
+    valores = {field.name: Case(*when, default=F(field.attname), output_field=field)
+               for field, when in casos.items()}
+    model_class.objects.filter(pk__in=lote).update(**dict(extra, **valores))
@@ -1,20 +1,24 @@
+from django.http import StreamingHttpResponse, HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 
 import django_excel as excel
 
 from administracion.forms import FeedbackForm
-from administracion.models import Escuela, Colegiatura
-from becas.models import Beca
 from captura.utils import get_study_info
 from captura.models import Retroalimentacion
+from core.query_budget import query_budget
 from perfiles_usuario.utils import is_capturista, is_member, ADMINISTRADOR_GROUP,\
     CAPTURISTA_GROUP, is_administrador
-from familias.models import Integrante, Familia, Comentario, Alumno, Tutor, Oficio
-from familias.utils import total_egresos_familia, total_ingresos_familia, total_neto_familia
-from indicadores.models import Transaccion, Ingreso, Periodo
+from familias.models import Integrante, Comentario
+from indicadores.resumen import summary_context
+from indicadores.models import Transaccion, Ingreso
 
-from .models import Estudio, Foto, Seccion, Subseccion, Pregunta, OpcionRespuesta, Respuesta
+from .export import TABLAS, TIPOS_CONTENIDO, export_csv_zip, export_xlsx
+from .models import Estudio, Foto
+
+
+NOMBRE_DESCARGA = 'JP2_ESTUDIOS_SOCIOECONOMICOS'
 
 
 @login_required
@@ -23,21 +27,40 @@ def download_studies(request):
     """ View for an administrator to make a database dump into an excell
         sheet. Each table will be emptied to a page inside the excell
         document.
-    """
-    return excel.make_response_from_tables(
-        [
-            Transaccion, Ingreso, Oficio, Periodo,
-            Integrante, Familia, Comentario, Alumno, Tutor,
-            Estudio, Seccion, Subseccion, Pregunta, OpcionRespuesta, Respuesta,
-            Retroalimentacion, Beca, Escuela, Colegiatura
 
-        ],
-        'xls',
-        file_name="JP2_ESTUDIOS_SOCIOECONOMICOS")
+        The format is chosen with the formato GET parameter:
+
+        xlsx (default): a workbook with a sheet per table.
+        csv: a zip with a csv file per table.
+        xls: the workbook built in memory by django_excel.
+
+        The xlsx and csv files are streamed while they are written, see
+        .export, so the memory used does not grow with the database.
+    """
+    formato = request.GET.get('formato', 'xlsx')
+    if formato == 'xls':
+        return excel.make_response_from_tables(
+            TABLAS,
+            'xls',
+            file_name=NOMBRE_DESCARGA)
+
+    if formato == 'csv':
+        response = StreamingHttpResponse(export_csv_zip(), content_type=TIPOS_CONTENIDO['csv'])
+        extension = 'zip'
+    elif formato == 'xlsx':
+        response = StreamingHttpResponse(export_xlsx(), content_type=TIPOS_CONTENIDO['xlsx'])
+        extension = 'xlsx'
+    else:
+        return HttpResponseBadRequest()
+
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+        NOMBRE_DESCARGA, extension)
+    return response
 
 
 @login_required
 @user_passes_test(lambda u: is_member(u, [ADMINISTRADOR_GROUP, CAPTURISTA_GROUP]))
+@query_budget(16)
 def focus_mode(request, id_estudio):
     """ View to see the detail information about a family and their study.
     """
@@ -50,19 +73,23 @@ def focus_mode(request, id_estudio):
             Estudio.objects.filter(pk=id_estudio),
             capturista=request.user.capturista)
 
-    integrantes = Integrante.objects.filter(familia=estudio.familia, activo=True).select_related()
+    integrantes = Integrante.objects.filter(familia=estudio.familia, activo=True) \
+                                    .select_related('oficio',
+                                                    'alumno_integrante__escuela',
+                                                    'tutor_integrante')
     fotos = Foto.objects.filter(estudio=id_estudio)
     context['estudio'] = estudio
     context['integrantes'] = integrantes
     context['fotos'] = fotos
     context['comentarios'] = Comentario.objects.filter(familia=estudio.familia)
-    context['total_egresos_familia'] = total_egresos_familia(estudio.familia.id)
-    context['total_ingresos_familia'] = total_ingresos_familia(estudio.familia.id)
-    context['total_neto_familia'] = total_neto_familia(estudio.familia.id)
+    context.update(summary_context(estudio.familia_id))
 
     transacciones = Transaccion.objects.filter(es_ingreso=True, familia=estudio.familia)
-    context['ingresos'] = Ingreso.objects.filter(transaccion__in=transacciones)
-    context['egresos'] = Transaccion.objects.filter(es_ingreso=False, familia=estudio.familia)
+    context['ingresos'] = Ingreso.objects.filter(transaccion__in=transacciones) \
+                                         .select_related('transaccion__periodicidad',
+                                                         'tutor__integrante')
+    context['egresos'] = Transaccion.objects.filter(es_ingreso=False, familia=estudio.familia) \
+                                            .select_related('periodicidad')
     context['cuestionario'] = get_study_info(estudio)
     context['status_options'] = Estudio.get_options_status()
 
@@ -72,7 +99,8 @@ def focus_mode(request, id_estudio):
         context['feedback_form'] = feedback_form
 
     if estudio.status == Estudio.RECHAZADO:
-        context['retroalimentacion'] = Retroalimentacion.objects.filter(estudio=estudio)
+        context['retroalimentacion'] = Retroalimentacion.objects.filter(estudio=estudio) \
+                                                                .select_related('usuario')
 
     return render(
         request,
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class FamiliasConfig(AppConfig):
     name = 'familias'
+
+    def ready(self):
+        """ Connects the receivers that keep the search text of the students current.
+
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:20
+from __future__ import unicode_literals
+
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+INDICE = 'familias_alumno_texto_busqueda_trgm'
+
+# Copies of familias.search.CAMPOS_BUSQUEDA and familias.search.search_text
+# as they were when the field was added, so that later changes to them do not
+# change this migration.
+CAMPOS_BUSQUEDA = ('integrante__nombres',
+                   'integrante__apellidos',
+                   'numero_sae',
+                   'escuela__nombre',
+                   'integrante__familia__nombre_familiar')
+
+
+def search_text(valores):
+    texto = unicodedata.normalize('NFKD', ' '.join(valor or '' for valor in valores))
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.lower().split())
+
+
+def fill_search_text(apps, schema_editor):
+    Alumno = apps.get_model('familias', 'Alumno')
+    alumnos = Alumno.objects.using(schema_editor.connection.alias)
+    for fila in alumnos.values_list('pk', *CAMPOS_BUSQUEDA):
+        alumnos.filter(pk=fila[0]).update(texto_busqueda=search_text(fila[1:]))
+
+
+def create_trigram_index(apps, schema_editor):
+    # Only PostgreSQL has trigram indexes, the search works without it.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE INDEX {} ON familias_alumno '
+                          'USING gin (texto_busqueda gin_trgm_ops)'.format(INDICE))
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS {}'.format(INDICE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0044_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alumno',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        # Creating the extension requires a superuser, or an owner of the
+        # database on PostgreSQL 13 and later, see HOWTOUSE.md.
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -90,6 +90,8 @@ class Familia(models.Model):
         This field stores the information related to the shower instalation in a house.
     sanitarios : CharField
         This field stores the information related to the W.C instalation in a house.
+    fecha_modificacion : DateTimeField
+        When the family was last modified, see estudios_socioeconomicos.sync.
 
     TODO:
     -----
@@ -150,6 +152,7 @@ class Familia(models.Model):
                                   choices=OPCIONES_SANITARIAS,
                                   verbose_name='Tipo de instalación sanitaria',
                                   blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """ Prints the apellido of one of the students of the family,
@@ -175,6 +178,8 @@ class Comentario(models.Model):
         This stores the data about the date of creation of an instantce of this class.
     texto : TextField
         This stores the actual comment that is made about the family's situation.
+    fecha_modificacion : DateTimeField
+        When the comment was last modified, see estudios_socioeconomicos.sync.
 
     TODO:
     -----
@@ -184,6 +189,7 @@ class Comentario(models.Model):
     familia = models.ForeignKey(Familia, related_name='comentario_familia')
     fecha = models.DateTimeField(null=True, blank=True, auto_now_add=True)
     texto = models.TextField()
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """ Prints the texto attribute of this class.
@@ -222,6 +228,8 @@ class Integrante(models.Model):
     activo: BooleanField
         This attribute stores information about the involvment of a family member
         with the family itself.
+    fecha_modificacion : DateTimeField
+        When the family member was last modified, see estudios_socioeconomicos.sync.
 
     TODO:
     -----
@@ -287,6 +295,7 @@ class Integrante(models.Model):
     escuela = models.CharField(max_length=200, blank=True)
     activo = models.BooleanField(default=True)
     rol = models.CharField(max_length=150, verbose_name='Relación en la familia')
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def age(self):
         """ Returns the age of an instance of integrante
@@ -328,6 +337,11 @@ class Alumno(models.Model):
     entry_status : CharField
         This field stores the information about whether the studen is new or is
         re-entry
+    fecha_modificacion : DateTimeField
+        When the student was last modified, see estudios_socioeconomicos.sync.
+    texto_busqueda : TextField
+        The normalized names, numero_sae, school and family name of the student,
+        indexed for the search of students, see .search.
 
     TODO: activate the ManyToOne with Escuela once the model is declared in the
     administracion app.
@@ -354,6 +368,8 @@ class Alumno(models.Model):
     estatus_ingreso = models.CharField(max_length=10,
                                        choices=OPCIONES_ESTATUS_INGRESO,
                                        default=OPCION_REINGRESO)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+    texto_busqueda = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         """ Returns the name of the student
@@ -377,6 +393,8 @@ class Tutor(models.Model):
         This directly extends the Integrante model, in order to have access to all
         the other information that is stored about all of the family members.
     relacion : TextField
+    fecha_modificacion : DateTimeField
+        When the tutor was last modified, see estudios_socioeconomicos.sync.
     """
     OPCION_RELACION_MADRE = 'madre'
     OPCION_RELACION_PADRE = 'padre'
@@ -387,6 +405,7 @@ class Tutor(models.Model):
 
     integrante = models.OneToOneField(Integrante, related_name='tutor_integrante')
     relacion = models.CharField(max_length=75, choices=OPCIONES_RELACION)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """ Return the name of the tutor.
@@ -0,0 +1,119 @@
+""" Server side search of students.
+
+The search page of the administrador used to render every active student and
+filter them in the browser. Instead, each Alumno stores in texto_busqueda the
+normalized text it is found by: the nombres and apellidos of its Integrante,
+its numero_sae, the name of its school and the name of its family. The
+receivers in .signals keep it current.
+
+On PostgreSQL the column has a trigram index (pg_trgm, see the migration that
+added it), which answers the substring filters of search_students without
+reading the whole table, and the matches are ranked by their trigram
+similarity to the query. Other databases, like the one of the tests, run the
+same filters without the index and rank the matches that start with the query
+first.
+"""
+import unicodedata
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField
+
+from .models import Alumno
+
+
+TAMANO_PAGINA = 25
+
+# The fields texto_busqueda is built from, from Alumno.
+CAMPOS_BUSQUEDA = ('integrante__nombres',
+                   'integrante__apellidos',
+                   'numero_sae',
+                   'escuela__nombre',
+                   'integrante__familia__nombre_familiar')
+
+
+def normalize(texto):
+    """ Returns a text in lowercase, without accents and with single spaces.
+
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.lower().split())
+
+
+def search_text(valores):
+    """ Returns the texto_busqueda of a student from the values of CAMPOS_BUSQUEDA.
+
+    """
+    return normalize(' '.join(valor or '' for valor in valores))
+
+
+def update_search_text(alumnos):
+    """ Refreshes the texto_busqueda of the students of a queryset.
+
+    The rows are written with QuerySet.update, only when their text changed,
+    so that fecha_modificacion is kept and the offline application does not
+    download the students again.
+
+    Returns
+    -------
+    int
+        The number of students whose text changed.
+    """
+    total = 0
+    for fila in alumnos.values_list('pk', 'texto_busqueda', *CAMPOS_BUSQUEDA):
+        texto = search_text(fila[2:])
+        if texto != fila[1]:
+            Alumno.objects.filter(pk=fila[0]).update(texto_busqueda=texto)
+            total += 1
+    return total
+
+
+def search_students(consulta, pagina=1, tamano=TAMANO_PAGINA):
+    """ Returns a page of the active students that match a query, best matches first.
+
+    A student matches when its texto_busqueda contains every word of the
+    query. A numero_sae equal to the query is always ranked first. Without a
+    query, every active student is returned by apellidos.
+
+    Parameters
+    ----------
+    consulta : str
+        The text to search.
+    pagina : int
+        The number of the page, starting at 1.
+    tamano : int
+        The number of students per page.
+
+    Returns
+    -------
+    tuple
+        The list of students of the page, with their integrante, family,
+        study and school, and whether there are more pages.
+    """
+    consulta = normalize(consulta)
+    alumnos = Alumno.objects.filter(activo=True) \
+                            .select_related('integrante__familia__estudio', 'escuela')
+    for palabra in consulta.split():
+        alumnos = alumnos.filter(texto_busqueda__contains=palabra)
+
+    orden = []
+    if consulta:
+        alumnos = alumnos.annotate(exacto=Case(When(numero_sae__iexact=consulta, then=Value(1)),
+                                               default=Value(0),
+                                               output_field=IntegerField()))
+        orden.append('-exacto')
+        if connection.vendor == 'postgresql':
+            alumnos = alumnos.annotate(similitud=TrigramSimilarity('texto_busqueda', consulta))
+            orden.append('-similitud')
+        else:
+            alumnos = alumnos.annotate(prefijo=Case(
+                When(texto_busqueda__startswith=consulta, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()))
+            orden.append('-prefijo')
+    orden.extend(['integrante__apellidos', 'integrante__nombres', 'pk'])
+
+    inicio = (max(pagina, 1) - 1) * tamano
+    resultados = list(alumnos.order_by(*orden)[inicio:inicio + tamano + 1])
+    return resultados[:tamano], len(resultados) > tamano
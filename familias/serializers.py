@@ -1,12 +1,24 @@
+from collections import defaultdict
+
+from django.utils import timezone
 from rest_framework import serializers
 
-from estudios_socioeconomicos.utils import save_foreign_relationship
+from estudios_socioeconomicos.sync import DeltaListSerializer, record_deletions
+from estudios_socioeconomicos.utils import save_foreign_relationship, model_values, \
+                                           changed_values, split_changes, bulk_update
 from administracion.models import Escuela
 from administracion.serializers import EscuelaSerializer
-from indicadores.serializers import TransaccionSerializer, IngresoSerializer
-from indicadores.models import Transaccion, Ingreso
+from indicadores.serializers import TransaccionSerializer, IngresoSerializer, transaccion_values
+from indicadores.models import Transaccion, Ingreso, Periodo
+from indicadores.resumen import update_summary
+from indicadores.snapshots import update_snapshot
 
 from .models import Familia, Comentario, Integrante, Alumno, Tutor, Oficio
+from .search import update_search_text
+
+
+# The nested models whose changes are copied to the snapshot of the family.
+MODELOS_SNAPSHOT = (Integrante, Alumno, Tutor, Transaccion, Ingreso)
 
 
 class OficioSerializer(serializers.ModelSerializer):
@@ -25,11 +37,13 @@ class ComentarioSerializer(serializers.ModelSerializer):
         through a REST endpoint for the offline application
         to submit information.
     """
+    CAMPOS = ('fecha', 'texto')
 
     class Meta:
         model = Comentario
         fields = ('id', 'fecha', 'texto')
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
+        list_serializer_class = DeltaListSerializer
 
     def create(self, family):
         """ This function overides the default behaviour for creating
@@ -53,7 +67,8 @@ class ComentarioSerializer(serializers.ModelSerializer):
             -------
             Updated Instance of Comentario model.
         """
-        Comentario.objects.filter(pk=self.instance.id).update(**self.validated_data)
+        Comentario.objects.filter(pk=self.instance.id).update(fecha_modificacion=timezone.now(),
+                                                              **self.validated_data)
         return Comentario.objects.get(pk=self.instance.id)
 
 
@@ -64,6 +79,8 @@ class AlumnoSerializer(serializers.ModelSerializer):
     """
     escuela = EscuelaSerializer()
 
+    CAMPOS = ('activo', 'numero_sae')
+
     class Meta:
         model = Alumno
         fields = ('id', 'activo', 'escuela', 'numero_sae')
@@ -96,7 +113,8 @@ class AlumnoSerializer(serializers.ModelSerializer):
         """
         escuela = Escuela.objects.filter(nombre=self.validated_data['escuela']['nombre'])
         self.validated_data['escuela'] = escuela[0]
-        Alumno.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+        Alumno.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                          **self.validated_data)
         return Alumno.objects.get(pk=self.instance.pk)
 
 
@@ -107,6 +125,8 @@ class TutorSerializer(serializers.ModelSerializer):
     """
     tutor_ingresos = IngresoSerializer(many=True, allow_null=True)
 
+    CAMPOS = ('relacion',)
+
     class Meta:
         model = Tutor
         fields = ('id', 'relacion', 'tutor_ingresos')
@@ -145,7 +165,8 @@ class TutorSerializer(serializers.ModelSerializer):
         """
         ingresos = self.validated_data.pop('tutor_ingresos', None)
         save_foreign_relationship(ingresos, IngresoSerializer, Ingreso, self.instance)
-        Tutor.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+        Tutor.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                         **self.validated_data)
         return Tutor.objects.get(pk=self.instance.pk)
 
 
@@ -164,6 +185,21 @@ class IntegranteSerializer(serializers.ModelSerializer):
     tutor_integrante = TutorSerializer(allow_null=True)
     oficio = OficioSerializer(allow_null=True)
 
+    CAMPOS = (
+        'nombres',
+        'apellidos',
+        'telefono',
+        'correo',
+        'historial_terapia',
+        'rol',
+        'offline_id',
+        'sacramentos_faltantes',
+        'especificacion_oficio',
+        'especificacion_estudio',
+        'nivel_estudios',
+        'fecha_de_nacimiento',
+        'activo')
+
     class Meta:
         model = Integrante
         fields = (
@@ -186,6 +222,13 @@ class IntegranteSerializer(serializers.ModelSerializer):
             'activo')
 
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
+        list_serializer_class = DeltaListSerializer
+        campos_modificacion = (
+            'fecha_modificacion',
+            'alumno_integrante__fecha_modificacion',
+            'tutor_integrante__fecha_modificacion',
+            'tutor_integrante__tutor_ingresos__fecha_modificacion',
+            'tutor_integrante__tutor_ingresos__transaccion__fecha_modificacion')
 
     def create(self, family):
         """ This function overides the default behaviour for creating
@@ -241,7 +284,8 @@ class IntegranteSerializer(serializers.ModelSerializer):
         save_foreign_relationship([alumno], AlumnoSerializer, Alumno, self.instance)
         save_foreign_relationship([tutor], TutorSerializer, Tutor, self.instance)
 
-        Integrante.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+        Integrante.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                              **self.validated_data)
         return Integrante.objects.filter(pk=self.instance.pk)
 
 
@@ -310,12 +354,12 @@ class FamiliaSerializer(serializers.ModelSerializer):
 
             Updates a familia object and all other objects that
             depend on it. Since the offline client will submit a
-            complete JSON of the study each time.
-
-            When an offline client submits an update of a study,
-            new information can be created. save_foreign_relationship
-            looks for the id in the object. If there is no data it will
-            create the object.
+            complete JSON of the study each time, the nested objects
+            are compared against the existing ones and only what
+            changed is written: the modified objects of each model
+            with a single bulk_update, and the objects without id are
+            created. Objects with an id that does not belong to the
+            family are ignored.
 
             Integrantes and Transacciones has a non-destructive way of disactivating.
             This is donde by changing the is_active field.
@@ -327,14 +371,131 @@ class FamiliaSerializer(serializers.ModelSerializer):
         comentarios = self.validated_data.pop('comentario_familia')
         transacciones = self.validated_data.pop('transacciones')
 
-        Comentario.objects.filter(
-            familia=self.instance).exclude(
-                id__in=[comment.get('id') for comment in comentarios]).delete()
+        cambios = defaultdict(dict)
+        periodos = {periodo.id: periodo for periodo in Periodo.objects.all()}
+
+        self.update_comentarios([c for c in comentarios or [] if c], cambios)
+        self.update_integrantes([i for i in integrantes or [] if i], periodos, cambios)
+        self.update_transacciones([t for t in transacciones or [] if t], periodos, cambios)
+
+        for model_class, cambios_modelo in cambios.items():
+            bulk_update(model_class, cambios_modelo)
+        if Transaccion in cambios or Ingreso in cambios:
+            # bulk_update does not send the signals that refresh the summary.
+            update_summary(self.instance.pk)
+
+        familia_modificada = changed_values(self.instance, self.validated_data)
+        if familia_modificada:
+            Familia.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                               **self.validated_data)
+        if familia_modificada or Integrante in cambios or Alumno in cambios:
+            update_search_text(Alumno.objects.filter(integrante__familia=self.instance))
+        if familia_modificada or any(modelo in cambios for modelo in MODELOS_SNAPSHOT):
+            # Neither does QuerySet.update refresh the snapshot of the indicators.
+            update_snapshot(self.instance.pk)
 
-        save_foreign_relationship(integrantes, IntegranteSerializer, Integrante, self.instance)
-        save_foreign_relationship(comentarios, ComentarioSerializer, Comentario, self.instance)
-        save_foreign_relationship(transacciones, TransaccionSerializer, Transaccion, self.instance)
+        return Familia.objects.get(pk=self.instance.pk)  # Returns updated instance
 
-        Familia.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+    def update_comentarios(self, comentarios, cambios):
+        """ Creates, deletes and adds to cambios the changes of the comentarios of the family.
 
-        return Familia.objects.get(pk=self.instance.pk)  # Returns updated instance
+            The comentarios not sent are deleted with a single query, and their
+            deletion is recorded with another.
+        """
+        existentes = {comentario.id: comentario
+                      for comentario in self.instance.comentario_familia.all()}
+        nuevos, cambios[Comentario], sobrantes = split_changes(
+            existentes,
+            [(comentario.get('id'), model_values(comentario, ComentarioSerializer.CAMPOS))
+             for comentario in comentarios])
+
+        if sobrantes:
+            record_deletions(Comentario, sobrantes, self.instance.estudio)
+            Comentario.objects.filter(pk__in=sobrantes).delete()
+        Comentario.objects.bulk_create([Comentario(familia=self.instance, **valores)
+                                        for valores in nuevos])
+
+    def update_integrantes(self, integrantes, periodos, cambios):
+        """ Creates and adds to cambios the changes of the integrantes of the family,
+            along with their alumno, tutor and ingresos.
+
+            The existing integrantes and their nested objects are
+            read with three queries.
+        """
+        existentes = {integrante.id: integrante for integrante in
+                      self.instance.integrante_familia
+                          .select_related('alumno_integrante', 'tutor_integrante')
+                          .prefetch_related('tutor_integrante__tutor_ingresos__transaccion')}
+        nombres = {integrante['alumno_integrante']['escuela']['nombre']
+                   for integrante in integrantes if integrante.get('alumno_integrante')}
+        escuelas = dict(Escuela.objects.filter(nombre__in=nombres)
+                                       .order_by('-id').values_list('nombre', 'id'))
+
+        for datos in integrantes:
+            integrante = existentes.get(datos.get('id'))
+            if integrante is None:
+                continue
+
+            valores = model_values(datos, IntegranteSerializer.CAMPOS)
+            if 'oficio' in datos:
+                valores['oficio_id'] = datos['oficio']['id'] if datos['oficio'] else None
+            _add_changes(cambios, integrante, valores)
+
+            alumno = datos.get('alumno_integrante')
+            if alumno and hasattr(integrante, 'alumno_integrante'):
+                valores = model_values(alumno, AlumnoSerializer.CAMPOS)
+                valores['escuela_id'] = escuelas[alumno['escuela']['nombre']]
+                _add_changes(cambios, integrante.alumno_integrante, valores)
+            elif alumno:
+                save_foreign_relationship([alumno], AlumnoSerializer, Alumno, integrante)
+
+            tutor = datos.get('tutor_integrante')
+            if tutor and hasattr(integrante, 'tutor_integrante'):
+                self.update_ingresos(integrante.tutor_integrante, tutor.get('tutor_ingresos'),
+                                     periodos, cambios)
+                _add_changes(cambios, integrante.tutor_integrante,
+                             model_values(tutor, TutorSerializer.CAMPOS))
+            elif tutor:
+                save_foreign_relationship([tutor], TutorSerializer, Tutor, integrante)
+
+        save_foreign_relationship([datos for datos in integrantes if not datos.get('id')],
+                                  IntegranteSerializer, Integrante, self.instance)
+
+    def update_ingresos(self, tutor, ingresos, periodos, cambios):
+        """ Creates and adds to cambios the changes of the ingresos of a tutor.
+
+        """
+        existentes = {ingreso.id: ingreso for ingreso in tutor.tutor_ingresos.all()}
+        for datos in ingresos or []:
+            ingreso = existentes.get(datos.get('id'))
+            if ingreso is not None:
+                _add_changes(cambios, ingreso, model_values(datos, IngresoSerializer.CAMPOS))
+                if datos.get('transaccion'):
+                    _add_changes(cambios, ingreso.transaccion,
+                                 transaccion_values(datos['transaccion'], periodos))
+
+        save_foreign_relationship([datos for datos in ingresos or [] if not datos.get('id')],
+                                  IngresoSerializer, Ingreso, tutor)
+
+    def update_transacciones(self, transacciones, periodos, cambios):
+        """ Creates and adds to cambios the changes of the transacciones of the family.
+
+        """
+        existentes = {transaccion.id: transaccion
+                      for transaccion in self.instance.transacciones.all()}
+        for datos in transacciones:
+            transaccion = existentes.get(datos.get('id'))
+            if transaccion is not None:
+                _add_changes(cambios, transaccion, transaccion_values(datos, periodos))
+
+        save_foreign_relationship([datos for datos in transacciones if not datos.get('id')],
+                                  TransaccionSerializer, Transaccion, self.instance)
+
+
+def _add_changes(cambios, instance, valores):
+    """ Adds to cambios the values that differ from the ones of the instance.
+
+    """
+    modificados = changed_values(instance, valores)
+    if modificados:
+        cambios[type(instance)].setdefault(instance.pk, {}).update(modificados)
@@ -0,0 +1,27 @@
+""" Receivers that keep the search text of the students current, see .search.
+
+Changes made with QuerySet.update do not send signals, so the code that
+updates these models in bulk refreshes the text itself, as
+.serializers.FamiliaSerializer does.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from administracion.models import Escuela
+from .models import Familia, Integrante, Alumno
+from .search import update_search_text
+
+
+@receiver(post_save, sender=Alumno)
+@receiver(post_save, sender=Integrante)
+@receiver(post_save, sender=Familia)
+@receiver(post_save, sender=Escuela)
+def search_text_on_save(sender, instance=None, **kwargs):
+    """ Refreshes the search text of the students related to the saved instance.
+
+    """
+    if kwargs.get('raw'):
+        return
+    filtros = {Alumno: 'pk', Integrante: 'integrante', Familia: 'integrante__familia',
+               Escuela: 'escuela'}
+    update_search_text(Alumno.objects.filter(**{filtros[sender]: instance.pk}))
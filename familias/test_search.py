@@ -0,0 +1,91 @@
+from django.test import TestCase
+
+from administracion.models import Escuela
+from .models import Familia, Integrante, Alumno
+from .search import normalize, search_students
+
+
+class TestSearchStudents(TestCase):
+    """ Suite to test the search of students.
+
+    Attributes:
+    -----------
+    escuela : Escuela
+        The school of the students.
+    alumnos : dict
+        The students by their nombres.
+    """
+
+    def setUp(self):
+        """ Creates three students of two families.
+
+        """
+        self.escuela = Escuela.objects.create(nombre='Juan Pablo')
+        lopez = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                       estado_civil='soltero',
+                                       localidad='otro',
+                                       nombre_familiar='Los López')
+        ramirez = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                         estado_civil='soltero',
+                                         localidad='otro',
+                                         nombre_familiar='Ramírez')
+        self.alumnos = {}
+        for familia, nombres, apellidos, numero_sae in ((lopez, 'José', 'López Pérez', '100'),
+                                                        (lopez, 'Ana', 'López Pérez', '1000'),
+                                                        (ramirez, 'Joselyn', 'Ramírez', '200')):
+            integrante = Integrante.objects.create(familia=familia,
+                                                   nombres=nombres,
+                                                   apellidos=apellidos,
+                                                   nivel_estudios='ninguno',
+                                                   fecha_de_nacimiento='2008-02-26')
+            self.alumnos[nombres] = Alumno.objects.create(integrante=integrante,
+                                                          numero_sae=numero_sae,
+                                                          escuela=self.escuela)
+
+    def ids(self, consulta):
+        return [alumno.pk for alumno in search_students(consulta)[0]]
+
+    def test_normalize(self):
+        """ Test that accents, case and extra spaces are removed.
+
+        """
+        self.assertEqual(normalize('  José   LÓPEZ\tÑandú '), 'jose lopez nandu')
+
+    def test_search_text(self):
+        """ Test that the text is built on save and follows the related rows.
+
+        """
+        alumno = Alumno.objects.get(pk=self.alumnos['José'].pk)
+        self.assertEqual(alumno.texto_busqueda, 'jose lopez perez 100 juan pablo los lopez')
+
+        self.escuela.nombre = 'Colegio'
+        self.escuela.save()
+        integrante = alumno.integrante
+        integrante.nombres = 'Pepe'
+        integrante.save()
+        alumno.refresh_from_db()
+        self.assertEqual(alumno.texto_busqueda, 'pepe lopez perez 100 colegio los lopez')
+
+    def test_search(self):
+        """ Test that every word must match, without accents, best matches first.
+
+        """
+        self.assertEqual(self.ids('jose'), [self.alumnos['José'].pk, self.alumnos['Joselyn'].pk])
+        self.assertEqual(self.ids('JOSÉ lópez'), [self.alumnos['José'].pk])
+        self.assertEqual(self.ids('ramirez'), [self.alumnos['Joselyn'].pk])
+        self.assertEqual(self.ids('juan pablo ana'), [self.alumnos['Ana'].pk])
+        self.assertEqual(self.ids('1000'), [self.alumnos['Ana'].pk])
+        self.assertEqual(self.ids('100')[0], self.alumnos['José'].pk)
+        self.assertEqual(self.ids('nadie'), [])
+
+    def test_pages(self):
+        """ Test that the students are paginated, and inactive ones are left out.
+
+        """
+        Alumno.objects.filter(pk=self.alumnos['Joselyn'].pk).update(activo=False)
+        primera, siguiente = search_students('', pagina=1, tamano=1)
+        self.assertTrue(siguiente)
+        segunda, siguiente = search_students('', pagina=2, tamano=1)
+        self.assertFalse(siguiente)
+        self.assertEqual([alumno.pk for alumno in primera + segunda],
+                         [self.alumnos['Ana'].pk, self.alumnos['José'].pk])
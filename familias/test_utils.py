@@ -1,7 +1,8 @@
 from django.test import TestCase
 from indicadores.models import Transaccion, Ingreso, Periodo
 from .models import Familia, Integrante, Tutor
-from .utils import total_egresos_familia, total_ingresos_familia, total_neto_familia
+from .utils import total_egresos_familia, total_ingresos_familia, total_neto_familia, \
+                   monthly_totals, monthly_totals_by_family
 
 
 class TestFormsTransacciones(TestCase):
@@ -72,3 +73,32 @@ class TestFormsTransacciones(TestCase):
         """
         total_ingresos = total_neto_familia(self.familia1.id)
         self.assertEqual('40.00', total_ingresos)
+
+    def test_monthly_totals_single_query(self):
+        """ Test that the three totals are computed with a single query, dividing
+        by the factor of the periods that do not multiply, and skipping the
+        inactive transactions.
+        """
+        mensual = Periodo.objects.create(periodicidad='Bimestral', factor=2, multiplica=False)
+        Transaccion.objects.create(familia=self.familia1, monto=50, periodicidad=mensual,
+                                   observacion='Beca', es_ingreso=True)
+        Transaccion.objects.create(familia=self.familia1, monto=1000, periodicidad=mensual,
+                                   observacion='Baja', es_ingreso=True, activo=False)
+        with self.assertNumQueries(1):
+            totales = monthly_totals(self.familia1.id)
+        self.assertEqual(totales['ingresos'], 185)
+        self.assertEqual(totales['egresos'], -120)
+        self.assertEqual(totales['neto'], 65)
+
+    def test_monthly_totals_by_family(self):
+        """ Test that the totals of many families are computed with a single query.
+
+        """
+        familia2 = Familia.objects.create(nombre_familiar='Sin transacciones',
+                                          numero_hijos_diferentes_papas=0,
+                                          estado_civil='soltero',
+                                          localidad='salitre')
+        with self.assertNumQueries(1):
+            totales = monthly_totals_by_family([self.familia1.id, familia2.id])
+        self.assertEqual(totales[self.familia1.id], monthly_totals(self.familia1.id))
+        self.assertEqual(totales[familia2.id], {'ingresos': 0, 'egresos': 0, 'neto': 0})
@@ -1,7 +1,88 @@
 import decimal
+
+from django.db.models import Case, When, F, Sum, Value, DecimalField
 from django.shortcuts import get_object_or_404
+
 from indicadores.models import Transaccion
-from .models import Familia, Integrante
+from .models import Integrante
+
+
+# Output of the monthly values computed by the database, wide enough for any
+# Transaccion.monto multiplied by a Periodo.factor.
+_VALOR = DecimalField(max_digits=30, decimal_places=10)
+
+
+def _monthly_sum(es_ingreso):
+    """ Returns the aggregate of the monthly value of the incomes or the expenses.
+
+    The monthly value is computed as Transaccion.obtener_valor_mensual does,
+    the amount is multiplied or divided by the factor of its Periodo.
+    """
+    mensual = Case(When(periodicidad__multiplica=True,
+                        then=F('monto') * F('periodicidad__factor')),
+                   default=F('monto') / F('periodicidad__factor'),
+                   output_field=_VALOR)
+    return Sum(Case(When(es_ingreso=es_ingreso, then=mensual),
+                    default=Value(0),
+                    output_field=_VALOR))
+
+
+def _totals(ingresos, egresos):
+    """ Returns the dictionary of totals of monthly_totals.
+
+    """
+    ingresos = ingresos or decimal.Decimal('0')
+    egresos = -(egresos or decimal.Decimal('0'))
+    return {'ingresos': ingresos, 'egresos': egresos, 'neto': ingresos + egresos}
+
+
+def monthly_totals(id_familia):
+    """ Returns the monthly incomes, expenses and net income of a family.
+
+    The three totals are computed by the database with a single query over the
+    active transactions of the family.
+
+    Parameters
+    ----------
+    id_familia : int
+        The id of the family.
+
+    Returns
+    -------
+    dict
+        ingresos, egresos and neto as Decimal. egresos is negative, as the
+        values returned by Transaccion.obtener_valor_mensual for expenses.
+    """
+    totales = Transaccion.objects.filter(familia_id=id_familia, activo=True) \
+                                 .aggregate(ingresos=_monthly_sum(True),
+                                            egresos=_monthly_sum(False))
+    return _totals(totales['ingresos'], totales['egresos'])
+
+
+def monthly_totals_by_family(ids_familia):
+    """ Returns the totals of monthly_totals of many families with a single query.
+
+    Parameters
+    ----------
+    ids_familia : iterable of int
+        The ids of the families.
+
+    Returns
+    -------
+    dict
+        The totals of each family by its id. Families without active
+        transactions have zero totals.
+    """
+    ids_familia = list(ids_familia)
+    resultado = {id_familia: _totals(None, None) for id_familia in ids_familia}
+    filas = Transaccion.objects.filter(familia_id__in=ids_familia, activo=True) \
+                               .order_by() \
+                               .values('familia_id') \
+                               .annotate(ingresos=_monthly_sum(True),
+                                         egresos=_monthly_sum(False))
+    for fila in filas:
+        resultado[fila['familia_id']] = _totals(fila['ingresos'], fila['egresos'])
+    return resultado
 
 
 def total_egresos_familia(id_familia):
@@ -9,89 +90,63 @@ def total_egresos_familia(id_familia):
     family has per month.
 
     """
-    familia = get_object_or_404(Familia, pk=id_familia)
-    transacciones = Transaccion.objects.filter(familia=familia,
-                                               activo=True,
-                                               es_ingreso=False)
-    total = decimal.Decimal('0')
-    for transaccion in transacciones:
-        total = total + transaccion.obtener_valor_mensual()
-
-    return '{:.2f}'.format(total)
+    return '{:.2f}'.format(monthly_totals(id_familia)['egresos'])
 
 
 def total_ingresos_familia(id_familia):
     """ Return the total monthly earnings of a family.
 
     """
-    familia = get_object_or_404(Familia, pk=id_familia)
-    transacciones = Transaccion.objects.filter(familia=familia,
-                                               activo=True,
-                                               es_ingreso=True)
-    total = decimal.Decimal('0')
-    for transaccion in transacciones:
-        total = total + transaccion.obtener_valor_mensual()
-
-    return '{:.2f}'.format(total)
+    return '{:.2f}'.format(monthly_totals(id_familia)['ingresos'])
 
 
 def total_neto_familia(id_familia):
     """ Returns the net total income of a family.
 
     """
-    familia = get_object_or_404(Familia, pk=id_familia)
-    transacciones = Transaccion.objects.filter(familia=familia,
-                                               activo=True)
-    total = decimal.Decimal('0')
-    for transaccion in transacciones:
-        total = total + transaccion.obtener_valor_mensual()
+    return '{:.2f}'.format(monthly_totals(id_familia)['neto'])
 
-    return '{:.2f}'.format(total)
 
 def unformatted_total_ingresos_familia(id_familia):
     """ Return the total monthly earnings of a family.
 
     """
-    familia = get_object_or_404(Familia, pk=id_familia)
-    transacciones = Transaccion.objects.filter(familia=familia,
-                                               activo=True,
-                                               es_ingreso=True)
-    total = decimal.Decimal('0')
-    for transaccion in transacciones:
-        total = total + transaccion.obtener_valor_mensual()
+    return monthly_totals(id_familia)['ingresos']
+
+
+EDUCACION_SIMPLIFICADA = {
+    'ninguno': 'none',
+    'kinder_1': 'kinder',
+    'kinder_2': 'kinder',
+    'kinder_3': 'kinder',
+    '1_grado': 'primaria',
+    '2_grado': 'primaria',
+    '3_grado': 'primaria',
+    '4_grado': 'primaria',
+    '5_grado': 'primaria',
+    '6_grado': 'primaria',
+    '7_grado': 'secundaria',
+    '8_grado': 'secundaria',
+    '9_grado': 'secundaria',
+    '10_grado': 'preparatoria',
+    '11_grado': 'preparatoria',
+    '12_grado': 'preparatoria',
+    'universidad': 'universidad',
+    'maestria': 'post-universitario',
+    'doctorado': 'post-universitario',
+}
+
+
+def simplify_education(nivel_estudios):
+    """ Returns the simplified education for a value of Integrante.nivel_estudios
+
+    """
+    return EDUCACION_SIMPLIFICADA.get(nivel_estudios, 'unmatched')
 
-    return total
 
 def education(id_integrante):
     """ Returns the simplified education of a family member
 
     """
     integrante = get_object_or_404(Integrante, pk=id_integrante)
-    if integrante.nivel_estudios == 'ninguno':
-        return 'none'
-    elif (integrante.nivel_estudios == 'kinder_1' or 
-          integrante.nivel_estudios == 'kinder_2' or
-          integrante.nivel_estudios == 'kinder_3'):
-        return 'kinder'
-    elif (integrante.nivel_estudios == '1_grado' or
-          integrante.nivel_estudios == '2_grado' or
-          integrante.nivel_estudios == '3_grado' or
-          integrante.nivel_estudios == '4_grado' or
-          integrante.nivel_estudios == '5_grado' or
-          integrante.nivel_estudios == '6_grado'):
-        return 'primaria'
-    elif (integrante.nivel_estudios == '7_grado' or
-          integrante.nivel_estudios == '8_grado' or
-          integrante.nivel_estudios == '9_grado'):
-        return 'secundaria'
-    elif (integrante.nivel_estudios == '10_grado' or
-          integrante.nivel_estudios == '11_grado' or
-          integrante.nivel_estudios == '12_grado'):
-        return 'preparatoria'
-    elif integrante.nivel_estudios == 'universidad':
-        return 'universidad'
-    elif (integrante.nivel_estudios == 'maestria' or
-          integrante.nivel_estudios == 'doctorado'):
-        return 'post-universitario'
-    else:
-        return 'unmatched'
+    return simplify_education(integrante.nivel_estudios)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class IndicadoresConfig(AppConfig):
     name = 'indicadores'
+
+    def ready(self):
+        """ Connects the receivers that keep the indicator snapshots current.
+
+        """
+        from . import signals  # noqa: F401
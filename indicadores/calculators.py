@@ -1,5 +1,189 @@
 from collections import OrderedDict
-from familias.models import Familia, Alumno, Integrante
+from datetime import datetime
+
+from django.db.models import Count
+
+from familias.models import Familia, Alumno, Integrante, Oficio
+from .models import FamiliaIndicador, IntegranteIndicador
+
+
+RANGOS_EDAD = (
+    (10, 15, '10 - 15 años'),
+    (15, 20, '15 - 20 años'),
+    (20, 25, '20 - 25 años'),
+    (25, 30, '25 - 30 años'),
+    (30, 35, '30 - 35 años'),
+    (35, 40, '35 - 40 años'),
+    (40, 45, '40 - 45 años'),
+    (45, 50, '45 - 50 años'),
+    (50, 55, '50 - 55 años'),
+    (55, 60, '55 - 60 años'),
+    (60, None, '+60 años'))
+
+RANGOS_INGRESO = (
+    (0, 2000, '$0 - $1999'),
+    (2000, 4000, '$2000 - $3999'),
+    (4000, 6000, '$4000 - $5999'),
+    (6000, 8000, '$6000 - $7999'),
+    (8000, 10000, '$8000 - $9999'),
+    (10000, 12000, '$10000 - $11999'),
+    (12000, 14000, '$12000 - $13999'),
+    (14000, 16000, '$14000 - $15999'),
+    (16000, 18000, '$16000 - $17999'),
+    (18000, 20000, '$18000 - $19999'),
+    (20000, None, '+20000'))
+
+RANGOS_BECA = (
+    (0, 1, '0%'),
+    (1, 10, '1% - 9%'),
+    (10, 20, '10% - 19%'),
+    (20, 30, '%20 - %29'),
+    (30, 40, '%30 - %39'),
+    (40, 50, '%40 - %49'),
+    (50, 60, '%50 - %59'),
+    (60, 70, '%60 - %69'),
+    (70, 80, '%70 - %79'),
+    (80, 90, '%80 - %89'),
+    (90, 101, '%90 - %100'))
+
+NIVELES_EDUCACION = OrderedDict((
+    ('none', 'No Tiene'),
+    ('kinder', 'Kinder'),
+    ('primaria', 'Primaria'),
+    ('secundaria', 'Secundaria'),
+    ('preparatoria', 'Preparatoria'),
+    ('universidad', 'Universidad'),
+    ('post-universitario', 'Post-universitario')))
+
+GRADOS_ALUMNOS = OrderedDict((
+    (Integrante.OPCION_ESTUDIOS_PREESCOLAR_1, '1ro de Kinder'),
+    (Integrante.OPCION_ESTUDIOS_PREESCOLAR_2, '2do de Kinder'),
+    (Integrante.OPCION_ESTUDIOS_PREESCOLAR_3, '3ro de Kinder'),
+    (Integrante.OPCION_ESTUDIOS_1, '1ro de Primaria'),
+    (Integrante.OPCION_ESTUDIOS_2, '2do de Primaria'),
+    (Integrante.OPCION_ESTUDIOS_3, '3ro de Primaria'),
+    (Integrante.OPCION_ESTUDIOS_4, '4to de Primaria'),
+    (Integrante.OPCION_ESTUDIOS_5, '5to de Primaria'),
+    (Integrante.OPCION_ESTUDIOS_6, '6to de Primaria')))
+
+NOMBRES_LOCALIDAD = dict(Familia.OPCIONES_LOCALIDAD)
+
+
+class Breakdown(object):
+    """ Accumulator for an indicator split by localidad.
+
+    Every dashboard in this app presents the same shape of data: one
+    chart per localidad plus a chart with the totals of all the
+    localidades. This class receives each observation once and updates
+    both structures at the same time, so the views never need a second
+    pass over the data to build the unified total.
+
+    Attributes:
+    -----------
+    labels : list of str
+        The labels of the chart, every label starts in zero so that
+        empty categories are still presented.
+    data : dict
+        Counter of each label for every localidad, keyed by the human
+        readable name of the localidad.
+    unified_total : dict
+        Counter of each label across all the localidades.
+    """
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.data = {}
+        for localidad in Familia.OPCIONES_LOCALIDAD:
+            self.data[localidad[1]] = dict.fromkeys(self.labels, 0)
+        self.unified_total = dict.fromkeys(self.labels, 0)
+
+    def add(self, localidad, label, amount=1):
+        """ Registers amount observations of label for the given localidad.
+
+        Observations with a label that does not belong to the chart are
+        ignored, the same happens with unknown localidades, which are only
+        counted in the unified total.
+        """
+        if label not in self.unified_total:
+            return
+        nombre_localidad = NOMBRES_LOCALIDAD.get(localidad)
+        if nombre_localidad is not None:
+            self.data[nombre_localidad][label] += amount
+        self.unified_total[label] += amount
+
+    def context(self):
+        """ Returns the data and unified_total keys expected by the templates.
+
+        Both dictionaries are sorted by their keys, as the views have always
+        presented them.
+        """
+        data = OrderedDict()
+        for localidad in sorted(self.data.keys()):
+            data[localidad] = _ordered(self.data[localidad])
+        return {'data': data,
+                'unified_total': _ordered(self.unified_total)}
+
+
+def _ordered(results):
+    """ Sorts a dictionary by its keys.
+
+    """
+    return OrderedDict(sorted(results.items(), key=lambda t: t[0]))
+
+
+def _bucket(value, ranges):
+    """ Returns the label of the range in which value falls, or None.
+
+    The ranges are tuples of (lower bound, upper bound, label), the lower
+    bound is inclusive and the upper bound is exclusive. An upper bound
+    of None has no limit.
+    """
+    for lower, upper, label in ranges:
+        if value >= lower and (upper is None or value < upper):
+            return label
+    return None
+
+
+def _age(fecha_de_nacimiento, today):
+    """ Age in years, computed the same way as Integrante.age.
+
+    """
+    return int((today - fecha_de_nacimiento).days / 365.25)
+
+
+def count_by_localidad(queryset, field, options, localidad_field='localidad'):
+    """ Counts the rows of queryset grouped by localidad and field.
+
+    A single GROUP BY query is executed, the per localidad breakdown and
+    the unified total are built from its rows. The querysets are expected
+    to be over the snapshot tables, which store the localidad of each row.
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        The rows to count.
+    field : str
+        The field whose values are counted.
+    options : iterable of tuple
+        Pairs of (value, label) in the style of the choices of a model
+        field. Values of field that do not appear in options are ignored.
+    localidad_field : str
+        The lookup used to obtain the localidad of each row.
+
+    Returns:
+    --------
+    Breakdown
+        The accumulated results.
+    """
+    options = list(options)
+    labels = dict(options)
+    breakdown = Breakdown(label for value, label in options)
+    rows = queryset.order_by().values(localidad_field, field).annotate(total=Count('pk'))
+    for row in rows:
+        if row[field] in labels:
+            breakdown.add(row[localidad_field], labels[row[field]], row['total'])
+    return breakdown
+
 
 def estado_civil_counter():
     """ Prepare the dataset necessary to present
@@ -7,34 +191,99 @@ def estado_civil_counter():
     families.
 
     """
-    all_results = {}
-    for localidad_option in Familia.OPCIONES_LOCALIDAD:
-        results_localidad = {}
-        for option in Familia.OPCIONES_ESTADO_CIVIL:
-            results_localidad[option[1]] = Familia.objects.filter(estado_civil=option[0],
-                                                       estudio__status__contains='aprobado',
-                                                       localidad=localidad_option[0]).count()
-            ordered_results = OrderedDict(sorted(results_localidad.items(), key=lambda t: t[0]))
-        all_results[localidad_option[1]] = ordered_results
-        all_ordered_results = OrderedDict(sorted(all_results.items(), key=lambda t: t[0]))
-    return all_ordered_results
+    return count_by_localidad(FamiliaIndicador.objects.all(),
+                              'estado_civil',
+                              Familia.OPCIONES_ESTADO_CIVIL)
 
-def numero_de_alumnos():
-    """ Prepare the dataset necessary to present
-    a bar chart for the civil status of all the active
-    families.
+
+def localidad_counter():
+    """ Returns the number of approved families in each localidad.
+
+    """
+    results = dict.fromkeys(NOMBRES_LOCALIDAD.values(), 0)
+    rows = FamiliaIndicador.objects.order_by().values('localidad').annotate(total=Count('pk'))
+    for row in rows:
+        if row['localidad'] in NOMBRES_LOCALIDAD:
+            results[NOMBRES_LOCALIDAD[row['localidad']]] = row['total']
+    return _ordered(results)
+
+
+def ocupaciones_counter():
+    """ Counts the tutors of the approved families by their oficio.
+
+    """
+    oficios = Oficio.objects.values_list('id', 'nombre')
+    return count_by_localidad(IntegranteIndicador.objects.filter(rol='tutor'),
+                              'oficio',
+                              oficios)
+
+
+def estudios_padres_counter():
+    """ Counts the tutors of the approved families by their level of education.
+
+    The level of education is simplified when the snapshot is built, see
+    familias.utils.simplify_education.
+    """
+    return count_by_localidad(IntegranteIndicador.objects.filter(es_tutor=True),
+                              'educacion',
+                              NIVELES_EDUCACION.items())
+
+
+def edad_padres_counter():
+    """ Counts the tutors of the approved families by their age.
+
+    The ages are computed from a single scan over the dates of birth.
+    """
+    breakdown = Breakdown(label for lower, upper, label in RANGOS_EDAD)
+    today = datetime.now().date()
+    rows = IntegranteIndicador.objects.filter(es_tutor=True) \
+                                      .values_list('localidad', 'fecha_de_nacimiento')
+    for localidad, fecha_de_nacimiento in rows.iterator():
+        breakdown.add(localidad, _bucket(_age(fecha_de_nacimiento, today), RANGOS_EDAD))
+    return breakdown
+
+
+def ingreso_mensual_counter():
+    """ Counts the approved families by their total monthly income.
+
+    """
+    breakdown = Breakdown(label for lower, upper, label in RANGOS_INGRESO)
+    rows = FamiliaIndicador.objects.values_list('localidad', 'ingreso_mensual')
+    for localidad, ingreso_mensual in rows.iterator():
+        breakdown.add(localidad, _bucket(ingreso_mensual, RANGOS_INGRESO))
+    return breakdown
+
+
+def becas_counter():
+    """ Counts the students of the approved families by their current scholarship.
+
+    Students that have not been awarded a scholarship are not counted.
+    """
+    breakdown = Breakdown(label for lower, upper, label in RANGOS_BECA)
+    rows = IntegranteIndicador.objects.filter(es_alumno=True, porcentaje_beca__isnull=False) \
+                                      .order_by() \
+                                      .values('localidad', 'porcentaje_beca') \
+                                      .annotate(total=Count('pk'))
+    for row in rows:
+        breakdown.add(row['localidad'],
+                      _bucket(row['porcentaje_beca'], RANGOS_BECA),
+                      row['total'])
+    return breakdown
+
+
+def alumnos_por_grado():
+    """ Returns the number of active students in each grade, and their total.
 
     """
-    all_results = {}
-    for localidad_option in Familia.OPCIONES_LOCALIDAD:
-        results_localidad = {}
-        for option in Integrante.OPCIONES_NIVEL_ESTUDIOS:
-            if option[0] < '7' and option[1] == '_':
-                results_localidad[option[1]] = Alumno.objects.filter(integrante__nivel_estudios__contains=option[0],
-                                                           estudio__status__contains='aprobado',
-                                                           localidad=localidad_option[0],
-                                                           activo=True).count()
-            ordered_results = OrderedDict(sorted(results_localidad.items(), key=lambda t: t[0]))
-        all_results[localidad_option[1]] = ordered_results
-        all_ordered_results = OrderedDict(sorted(all_results.items(), key=lambda t: t[0]))
-    return all_ordered_results
\ No newline at end of file
+    results = dict.fromkeys(GRADOS_ALUMNOS.values(), 0)
+    total = 0
+    rows = Alumno.objects.filter(integrante__activo=True) \
+                         .order_by() \
+                         .values('integrante__nivel_estudios') \
+                         .annotate(total=Count('pk'))
+    for row in rows:
+        total += row['total']
+        label = GRADOS_ALUMNOS.get(row['integrante__nivel_estudios'])
+        if label is not None:
+            results[label] = row['total']
+    return total, _ordered(results)
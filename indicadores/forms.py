@@ -52,7 +52,7 @@ class IngresoForm(ModelForm):
         super(IngresoForm, self).__init__(*args, **kwargs)
         # Get only the tutores that are part of the family.
         integrantes = Integrante.objects.filter(familia=id_familia).values_list('id', flat=True)
-        tutores = Tutor.objects.filter(integrante__in=integrantes)
+        tutores = Tutor.objects.filter(integrante__in=integrantes).select_related('integrante')
         self.fields['tutor'].queryset = tutores
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from indicadores.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    """ Rebuilds the snapshots read by the indicators from the source tables.
+
+    The snapshots are kept current by the receivers in indicadores.signals,
+    this command is meant to populate them for the first time, or after the
+    data was modified without triggering signals (e.g. QuerySet.update).
+    """
+    help = 'Rebuilds the snapshots of all the families with an approved study.'
+
+    def handle(self, *args, **options):
+        total = rebuild_snapshots()
+        self.stdout.write('Se actualizaron {} familias.'.format(total))
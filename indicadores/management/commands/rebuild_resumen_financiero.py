@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from indicadores.resumen import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """ Rebuilds the financial summary of every family from its transactions.
+
+    The summaries are kept current by the receivers in indicadores.signals,
+    this command is meant to populate them for the first time, or after the
+    transactions were modified without triggering signals (e.g. QuerySet.update).
+    """
+    help = 'Rebuilds the financial summary of all the families.'
+
+    def handle(self, *args, **options):
+        total = rebuild_summaries()
+        self.stdout.write('Se actualizaron {} familias.'.format(total))
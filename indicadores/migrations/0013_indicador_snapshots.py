@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 13:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0043_auto_20170727_1637'),
+        ('indicadores', '0012_auto_20170429_2310'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FamiliaIndicador',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('localidad', models.CharField(choices=[('poblado_jurica', 'Poblado Juríca'), ('nabo', 'Nabo'), ('salitre', 'Salitre'), ('la_campana', 'La Campana'), ('otro', 'Otro')], max_length=100)),
+                ('estado_civil', models.CharField(choices=[('soltero', 'Soltero'), ('viudo', 'Viudo'), ('union_libre', 'Unión Libre'), ('casado_civil', 'Casado-Civil'), ('casado_iglesia', 'Casado-Iglesia'), ('vuelto_a_casar', 'Divorciado Vuelto a Casar')], max_length=100)),
+                ('ingreso_mensual', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('familia', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indicador', to='familias.Familia')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IntegranteIndicador',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('localidad', models.CharField(choices=[('poblado_jurica', 'Poblado Juríca'), ('nabo', 'Nabo'), ('salitre', 'Salitre'), ('la_campana', 'La Campana'), ('otro', 'Otro')], max_length=100)),
+                ('rol', models.CharField(max_length=150)),
+                ('es_tutor', models.BooleanField(default=False)),
+                ('es_alumno', models.BooleanField(default=False)),
+                ('educacion', models.CharField(max_length=50)),
+                ('fecha_de_nacimiento', models.DateField()),
+                ('porcentaje_beca', models.IntegerField(blank=True, null=True)),
+                ('familia_indicador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='integrantes', to='indicadores.FamiliaIndicador')),
+                ('integrante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indicador', to='familias.Integrante')),
+                ('oficio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='familias.Oficio')),
+            ],
+        ),
+    ]
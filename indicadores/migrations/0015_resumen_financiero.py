@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0044_sincronizacion'),
+        ('indicadores', '0014_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenFinanciero',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('egresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('neto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ingresos_comprobables', models.PositiveIntegerField(default=0)),
+                ('ingresos_no_comprobables', models.PositiveIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('familia', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_financiero', to='familias.Familia')),
+            ],
+        ),
+    ]
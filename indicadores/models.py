@@ -1,6 +1,6 @@
 import decimal
 from django.db import models
-from familias.models import Familia, Tutor
+from familias.models import Familia, Integrante, Oficio, Tutor
 
 
 class Periodo(models.Model):
@@ -65,6 +65,8 @@ class Transaccion(models.Model):
     es_ingreso : BooleanField
         This field indicates whether a certain transaction is an income
         or an expense.
+    fecha_modificacion : DateTimeField
+        When the transaction was last modified, see estudios_socioeconomicos.sync.
     """
     familia = models.ForeignKey(Familia, related_name='transacciones')
     activo = models.BooleanField(default=True)
@@ -73,6 +75,7 @@ class Transaccion(models.Model):
     offline_id = models.TextField(blank=True)
     observacion = models.TextField()
     es_ingreso = models.BooleanField()
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def obtener_valor_de_transaccion(self):
         """ If a transaction is an expense, returns a negative value
@@ -128,6 +131,8 @@ class Ingreso(models.Model):
     tutor : ForeignKey
         This field indicates the parent to which an income can be attributed. It can
         be null in case no parent, is related to the income.
+    fecha_modificacion : DateTimeField
+        When the income was last modified, see estudios_socioeconomicos.sync.
     """
     OPCION_NO_COMPROBABLE = 'no comprobable'
     OPCION_COMPROBABLE = 'comprobable'
@@ -138,9 +143,137 @@ class Ingreso(models.Model):
     offline_id = models.TextField(blank=True)
     tipo = models.CharField(max_length=100, choices=OPCIONES_TIPO)
     tutor = models.ForeignKey(Tutor, null=True, blank=True, related_name='tutor_ingresos')
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """ This function returns the __str__ method of the parent transaction.
 
         """
         return '{}'.format(self.transaccion)
+
+
+class ResumenFinanciero(models.Model):
+    """ Stored summary of the monthly incomes and expenses of a family.
+
+    The financial screens of a study show these totals, and the indicators
+    bucket the families by their income. Instead of adding the transactions of
+    the family each time, the totals are stored here and kept current while its
+    transactions, their incomes and the periods change (see .signals and
+    .resumen).
+
+    Attributes:
+    -----------
+    familia : OneToOneField
+        The family this summary describes.
+    ingresos : DecimalField[14,2]
+        The monthly value of the active incomes of the family.
+    egresos : DecimalField[14,2]
+        The monthly value of the active expenses of the family, it is negative
+        as the values returned by Transaccion.obtener_valor_mensual.
+    neto : DecimalField[14,2]
+        The monthly net income of the family, ingresos plus egresos.
+    ingresos_comprobables : PositiveIntegerField
+        The number of active incomes of the family that can be proved.
+    ingresos_no_comprobables : PositiveIntegerField
+        The number of active incomes of the family that cannot be proved.
+    fecha_actualizacion : DateTimeField
+        The last time the summary was refreshed.
+    """
+    familia = models.OneToOneField(Familia, related_name='resumen_financiero')
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    egresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    neto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ingresos_comprobables = models.PositiveIntegerField(default=0)
+    ingresos_no_comprobables = models.PositiveIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """ Returns the name of the family this summary describes.
+
+        """
+        return '{}'.format(self.familia)
+
+
+class FamiliaIndicador(models.Model):
+    """ Denormalized snapshot of an approved family used by the indicators.
+
+    The dashboards of this app are computed over the families whose study
+    has been approved. Instead of walking the families, their members,
+    transactions and scholarships on every request, the values needed by
+    the indicators are stored in this table when a study is approved, and
+    kept current while its data changes (see .signals).
+
+    Attributes:
+    -----------
+    familia : OneToOneField
+        The family this snapshot describes.
+    localidad : CharField
+        Copy of the localidad of the family.
+    estado_civil : CharField
+        Copy of the estado_civil of the family.
+    ingreso_mensual : DecimalField[14,2]
+        The total monthly income of the family, from its active transactions.
+    fecha_actualizacion : DateTimeField
+        The last time the snapshot was refreshed.
+    """
+    familia = models.OneToOneField(Familia, related_name='indicador')
+    localidad = models.CharField(max_length=100, choices=Familia.OPCIONES_LOCALIDAD)
+    estado_civil = models.CharField(max_length=100, choices=Familia.OPCIONES_ESTADO_CIVIL)
+    ingreso_mensual = models.DecimalField(max_digits=14, decimal_places=2)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """ Returns the name of the family this snapshot describes.
+
+        """
+        return '{}'.format(self.familia)
+
+
+class IntegranteIndicador(models.Model):
+    """ Denormalized snapshot of an active member of an approved family.
+
+    The localidad of the family is copied in each row, so that the
+    indicators about members can be grouped without joins.
+
+    Attributes:
+    -----------
+    familia_indicador : ForeignKey
+        The snapshot of the family this member belongs to.
+    integrante : OneToOneField
+        The family member this snapshot describes.
+    localidad : CharField
+        Copy of the localidad of the family.
+    rol : CharField
+        Copy of the rol of the member.
+    es_tutor : BooleanField
+        Whether the member has a Tutor profile.
+    es_alumno : BooleanField
+        Whether the member has an Alumno profile.
+    oficio : ForeignKey
+        Copy of the oficio of the member.
+    educacion : CharField
+        The simplified level of education, see familias.utils.simplify_education.
+    fecha_de_nacimiento : DateField
+        Copy of the date of birth, ages are computed when the indicator is shown.
+    porcentaje_beca : IntegerField
+        The percentage of the current scholarship of a student, null if the
+        member is not a student or has not been awarded one.
+    """
+    familia_indicador = models.ForeignKey(FamiliaIndicador,
+                                          related_name='integrantes',
+                                          on_delete=models.CASCADE)
+    integrante = models.OneToOneField(Integrante, related_name='indicador')
+    localidad = models.CharField(max_length=100, choices=Familia.OPCIONES_LOCALIDAD)
+    rol = models.CharField(max_length=150)
+    es_tutor = models.BooleanField(default=False)
+    es_alumno = models.BooleanField(default=False)
+    oficio = models.ForeignKey(Oficio, null=True, blank=True, on_delete=models.SET_NULL)
+    educacion = models.CharField(max_length=50)
+    fecha_de_nacimiento = models.DateField()
+    porcentaje_beca = models.IntegerField(null=True, blank=True)
+
+    def __str__(self):
+        """ Returns the name of the member this snapshot describes.
+
+        """
+        return '{}'.format(self.integrante)
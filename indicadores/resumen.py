@@ -0,0 +1,138 @@
+""" Maintenance of the stored financial summary of each family.
+
+The ResumenFinanciero of a family holds the totals shown by the financial
+screens of its study and read by the indicators. It is refreshed by the
+receivers in .signals whenever a transaction, an income or a period changes,
+by familias.serializers.FamiliaSerializer after it updates the transactions
+sent by the offline application, and by the rebuild_resumen_financiero
+management command. The summary of a family that does not have one yet is
+built the first time it is read.
+"""
+from django.db.models import Count
+from django.db.transaction import atomic
+
+from familias.models import Familia
+from familias.utils import monthly_totals, monthly_totals_by_family
+from .models import Ingreso, ResumenFinanciero
+
+
+REBUILD_CHUNK = 500
+
+
+def income_counts(ids_familia):
+    """ Returns the number of proved and unproved active incomes of each family.
+
+    Returns
+    -------
+    dict
+        A pair with the number of comprobable and no comprobable incomes by the
+        id of each family with active incomes.
+    """
+    conteos = {}
+    filas = Ingreso.objects.filter(transaccion__familia_id__in=ids_familia,
+                                   transaccion__activo=True,
+                                   transaccion__es_ingreso=True) \
+                           .order_by() \
+                           .values_list('transaccion__familia_id', 'tipo') \
+                           .annotate(total=Count('pk'))
+    for id_familia, tipo, total in filas:
+        conteo = conteos.setdefault(id_familia, [0, 0])
+        conteo[0 if tipo == Ingreso.OPCION_COMPROBABLE else 1] += total
+    return {id_familia: tuple(conteo) for id_familia, conteo in conteos.items()}
+
+
+def _summary_values(totales, conteo):
+    """ Returns the fields of a ResumenFinanciero from the totals and counts of a family.
+
+    """
+    return {'ingresos': totales['ingresos'],
+            'egresos': totales['egresos'],
+            'neto': totales['neto'],
+            'ingresos_comprobables': conteo[0],
+            'ingresos_no_comprobables': conteo[1]}
+
+
+def update_summary(id_familia, crear=True):
+    """ Refreshes the summary of a family from its transactions.
+
+    Parameters
+    ----------
+    id_familia : int
+        The id of the family.
+    crear : bool
+        Whether the summary is created when the family does not have one.
+        Receivers of deletions do not create it, since the family may be
+        being deleted along with its transactions.
+
+    Returns
+    -------
+    ResumenFinanciero
+        The refreshed summary, or None if it was not created.
+    """
+    valores = _summary_values(monthly_totals(id_familia),
+                              income_counts([id_familia]).get(id_familia, (0, 0)))
+    if crear:
+        return ResumenFinanciero.objects.update_or_create(familia_id=id_familia,
+                                                          defaults=valores)[0]
+    resumen = ResumenFinanciero.objects.filter(familia_id=id_familia).first()
+    if resumen is not None:
+        for campo, valor in valores.items():
+            setattr(resumen, campo, valor)
+        resumen.save()
+    return resumen
+
+
+@atomic
+def update_summaries(ids_familia):
+    """ Rebuilds the summaries of many families with a fixed number of queries.
+
+    Returns
+    -------
+    int
+        The number of summaries that were built.
+    """
+    ids_familia = list(ids_familia)
+    totales = monthly_totals_by_family(ids_familia)
+    conteos = income_counts(ids_familia)
+    ResumenFinanciero.objects.filter(familia_id__in=ids_familia).delete()
+    ResumenFinanciero.objects.bulk_create(
+        ResumenFinanciero(familia_id=id_familia,
+                          **_summary_values(totales[id_familia],
+                                            conteos.get(id_familia, (0, 0))))
+        for id_familia in ids_familia)
+    return len(ids_familia)
+
+
+def rebuild_summaries():
+    """ Rebuilds the summaries of every family.
+
+    Returns
+    -------
+    int
+        The number of summaries that were built.
+    """
+    ids_familia = list(Familia.objects.order_by('pk').values_list('pk', flat=True))
+    total = 0
+    for inicio in range(0, len(ids_familia), REBUILD_CHUNK):
+        total += update_summaries(ids_familia[inicio:inicio + REBUILD_CHUNK])
+    return total
+
+
+def get_summary(id_familia):
+    """ Returns the summary of a family, building it if it does not exist.
+
+    """
+    resumen = ResumenFinanciero.objects.filter(familia_id=id_familia).first()
+    if resumen is None:
+        resumen = update_summary(id_familia)
+    return resumen
+
+
+def summary_context(id_familia):
+    """ Returns the formatted totals of a family used by tabla_economic_status.html.
+
+    """
+    resumen = get_summary(id_familia)
+    return {'total_egresos_familia': '{:.2f}'.format(resumen.egresos),
+            'total_ingresos_familia': '{:.2f}'.format(resumen.ingresos),
+            'total_neto_familia': '{:.2f}'.format(resumen.neto)}
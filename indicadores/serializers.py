@@ -1,6 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
 
-from estudios_socioeconomicos.utils import save_foreign_relationship
+from estudios_socioeconomicos.sync import DeltaListSerializer
+from estudios_socioeconomicos.utils import save_foreign_relationship, model_values
 
 from .models import Periodo, Transaccion, Ingreso
 
@@ -30,6 +32,31 @@ class PeriodoSerializer(serializers.ModelSerializer):
         return Periodo.objects.get(pk=self.instance.pk)
 
 
+def periodo_id(periodicidad, periodos):
+    """ Returns the id of the Periodo sent in the validated data of a Transaccion.
+
+        The Periodo is saved through PeriodoSerializer, as
+        TransaccionSerializer does, only when it is new or its
+        values differ from the ones in periodos, a dictionary
+        with every Periodo by its id.
+    """
+    actual = periodos.get(periodicidad.get('id'))
+    if actual is not None and all(getattr(actual, campo) == valor
+                                  for campo, valor in periodicidad.items()):
+        return actual.id
+    return save_foreign_relationship([periodicidad], PeriodoSerializer, Periodo)[0].id
+
+
+def transaccion_values(transaccion, periodos):
+    """ Returns the values of a Transaccion by attname from the validated data
+        of TransaccionSerializer, see periodo_id.
+    """
+    valores = model_values(transaccion, TransaccionSerializer.CAMPOS)
+    if transaccion.get('periodicidad'):
+        valores['periodicidad_id'] = periodo_id(transaccion['periodicidad'], periodos)
+    return valores
+
+
 class TransaccionSerializer(serializers.ModelSerializer):
     """ Serializer to represent a .models.Transaccion instance
         through a REST endpoint for the offline application
@@ -37,6 +64,8 @@ class TransaccionSerializer(serializers.ModelSerializer):
     """
     periodicidad = PeriodoSerializer()
 
+    CAMPOS = ('activo', 'monto', 'observacion', 'es_ingreso', 'offline_id')
+
     class Meta:
         model = Transaccion
         fields = (
@@ -49,6 +78,7 @@ class TransaccionSerializer(serializers.ModelSerializer):
             'offline_id')
 
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
+        list_serializer_class = DeltaListSerializer
 
     def create(self, familia):
         """ This function overides the default behaviour for creating
@@ -92,7 +122,8 @@ class TransaccionSerializer(serializers.ModelSerializer):
             PeriodoSerializer,
             Periodo)[0]
 
-        Transaccion.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+        Transaccion.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                               **self.validated_data)
         return Transaccion.objects.get(pk=self.instance.pk)
 
 
@@ -103,6 +134,8 @@ class IngresoSerializer(serializers.ModelSerializer):
     """
     transaccion = TransaccionSerializer()
 
+    CAMPOS = ('fecha', 'tipo', 'offline_id')
+
     class Meta:
         model = Ingreso
         fields = (
@@ -113,6 +146,8 @@ class IngresoSerializer(serializers.ModelSerializer):
             'offline_id')
 
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
+        list_serializer_class = DeltaListSerializer
+        campos_modificacion = ('fecha_modificacion', 'transaccion__fecha_modificacion')
 
     def create(self, tutor):
         """ This function overides the default behaviour for creating
@@ -148,5 +183,6 @@ class IngresoSerializer(serializers.ModelSerializer):
             Transaccion,
             self.instance.tutor.integrante.familia)
 
-        Ingreso.objects.filter(pk=self.instance.pk).update(**self.validated_data)
+        Ingreso.objects.filter(pk=self.instance.pk).update(fecha_modificacion=timezone.now(),
+                                                           **self.validated_data)
         return Ingreso.objects.get(pk=self.instance.pk)
@@ -0,0 +1,150 @@
+""" Receivers that keep the summaries of .resumen and the snapshots of .snapshots up to date.
+
+Every change to a transaction, an income or a period refreshes the financial
+summaries of the families involved. Deleting a period deletes its
+transactions, whose receivers refresh the summaries.
+
+Every change to the data of a family with an approved study refreshes its
+snapshot. Deletions are processed once the transaction is committed, so that
+cascades that delete a whole family do not rebuild the snapshot halfway.
+
+The snapshots read the income of the family from its summary, so the
+receivers of the summaries are connected first.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from becas.models import Beca
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Familia, Integrante, Alumno, Tutor
+from .models import Transaccion, Ingreso, Periodo
+from .resumen import update_summary, update_summaries
+from .snapshots import update_snapshot, delete_snapshot
+
+
+def _refresh_if_approved(id_familia):
+    """ Refreshes the snapshot of a family only if its study is approved.
+
+    """
+    if Estudio.objects.filter(familia_id=id_familia, status=Estudio.APROBADO).exists():
+        update_snapshot(id_familia)
+
+
+def _familia_of(sender, instance):
+    """ Returns the id of the family an instance of the tracked models belongs to.
+
+    """
+    if sender is Familia:
+        return instance.pk
+    if sender in (Integrante, Transaccion):
+        return instance.familia_id
+    if sender in (Alumno, Tutor):
+        return Integrante.objects.filter(pk=instance.integrante_id) \
+                                 .values_list('familia_id', flat=True).first()
+    if sender is Ingreso:
+        return Transaccion.objects.filter(pk=instance.transaccion_id) \
+                                  .values_list('familia_id', flat=True).first()
+    if sender is Beca:
+        return Integrante.objects.filter(alumno_integrante=instance.alumno_id) \
+                                 .values_list('familia_id', flat=True).first()
+    return None
+
+
+@receiver(post_save, sender=Transaccion)
+@receiver(post_save, sender=Ingreso)
+def summary_on_save(sender, instance=None, **kwargs):
+    """ Refreshes the financial summary of the family whose transactions were modified.
+
+    """
+    if kwargs.get('raw'):
+        return
+    id_familia = _familia_of(sender, instance)
+    if id_familia is not None:
+        update_summary(id_familia)
+
+
+@receiver(post_delete, sender=Transaccion)
+@receiver(post_delete, sender=Ingreso)
+def summary_on_delete(sender, instance=None, **kwargs):
+    """ Refreshes the financial summary of a family after a transaction is deleted.
+
+    The summary is not created if it does not exist, as the family may be
+    being deleted.
+    """
+    id_familia = _familia_of(sender, instance)
+    if id_familia is not None:
+        update_summary(id_familia, crear=False)
+
+
+@receiver(post_save, sender=Periodo)
+def summary_on_periodo_change(sender, instance=None, **kwargs):
+    """ Refreshes the financial summaries of the families with transactions in a Periodo.
+
+    """
+    if kwargs.get('raw') or kwargs.get('created'):
+        return
+    update_summaries(Transaccion.objects.filter(periodicidad=instance)
+                                        .order_by()
+                                        .values_list('familia_id', flat=True)
+                                        .distinct())
+
+
+@receiver(post_save, sender=Estudio)
+def snapshot_on_status_change(sender, instance=None, **kwargs):
+    """ Creates the snapshot of a family when its study is approved.
+
+    Any other status removes the snapshot, e.g. when an approved study is
+    deleted by the administrador.
+    """
+    if kwargs.get('raw'):
+        return
+    if instance.status == Estudio.APROBADO:
+        update_snapshot(instance.familia_id)
+    else:
+        delete_snapshot(instance.familia_id)
+
+
+@receiver(post_save, sender=Familia)
+@receiver(post_save, sender=Integrante)
+@receiver(post_save, sender=Alumno)
+@receiver(post_save, sender=Tutor)
+@receiver(post_save, sender=Transaccion)
+@receiver(post_save, sender=Beca)
+def snapshot_on_save(sender, instance=None, **kwargs):
+    """ Refreshes the snapshot of the family whose data was modified.
+
+    """
+    if kwargs.get('raw'):
+        return
+    id_familia = _familia_of(sender, instance)
+    if id_familia is not None:
+        _refresh_if_approved(id_familia)
+
+
+@receiver(post_delete, sender=Integrante)
+@receiver(post_delete, sender=Alumno)
+@receiver(post_delete, sender=Tutor)
+@receiver(post_delete, sender=Transaccion)
+@receiver(post_delete, sender=Beca)
+def snapshot_on_delete(sender, instance=None, **kwargs):
+    """ Refreshes the snapshot of a family after some of its data is deleted.
+
+    """
+    id_familia = _familia_of(sender, instance)
+    if id_familia is not None:
+        transaction.on_commit(lambda: _refresh_if_approved(id_familia))
+
+
+@receiver(post_save, sender=Periodo)
+def snapshot_on_periodo_change(sender, instance=None, **kwargs):
+    """ Refreshes the snapshots of the families with transactions in a Periodo.
+
+    """
+    if kwargs.get('raw') or kwargs.get('created'):
+        return
+    familias = Transaccion.objects.filter(periodicidad=instance,
+                                          familia__estudio__status=Estudio.APROBADO) \
+                                  .values_list('familia_id', flat=True).distinct()
+    for id_familia in familias:
+        update_snapshot(id_familia)
@@ -0,0 +1,99 @@
+""" Maintenance of the denormalized tables read by the indicators.
+
+The functions in this module build the FamiliaIndicador and IntegranteIndicador
+rows of a family from the source tables. They are called by the receivers in
+.signals whenever the data of a family with an approved study changes, and by the
+rebuild_indicadores management command.
+"""
+from django.db.models import Q
+from django.db.transaction import atomic
+
+from becas.current import current_scholarships
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Familia, Integrante
+from familias.utils import simplify_education
+from .models import FamiliaIndicador, IntegranteIndicador
+from .resumen import get_summary
+
+
+def delete_snapshot(id_familia):
+    """ Removes the snapshot of a family, along with the ones of its members.
+
+    """
+    FamiliaIndicador.objects.filter(familia_id=id_familia).delete()
+
+
+@atomic
+def update_snapshot(id_familia):
+    """ Creates or refreshes the snapshot of a family.
+
+    If the family does not have an approved study its snapshot is removed
+    instead, so that it is no longer counted by the indicators.
+
+    Returns
+    -------
+    FamiliaIndicador
+        The refreshed snapshot, or None if the family is not approved.
+    """
+    familia = Familia.objects.filter(pk=id_familia, estudio__status=Estudio.APROBADO).first()
+    if familia is None:
+        delete_snapshot(id_familia)
+        return None
+
+    ingreso_mensual = get_summary(familia.pk).ingresos
+
+    snapshot, created = FamiliaIndicador.objects.update_or_create(
+        familia=familia,
+        defaults={'localidad': familia.localidad,
+                  'estado_civil': familia.estado_civil,
+                  'ingreso_mensual': ingreso_mensual})
+
+    integrantes = list(Integrante.objects.filter(familia=familia, activo=True)
+                                         .select_related('tutor_integrante',
+                                                         'alumno_integrante'))
+    alumnos = [integrante.alumno_integrante.pk for integrante in integrantes
+               if hasattr(integrante, 'alumno_integrante')]
+    becas = {}
+    if alumnos:
+        becas = {id_alumno: beca.number_percentage()
+                 for id_alumno, beca in current_scholarships(alumnos).items()}
+
+    IntegranteIndicador.objects.filter(Q(familia_indicador=snapshot) |
+                                       Q(integrante__in=integrantes)).delete()
+    rows = []
+    for integrante in integrantes:
+        es_alumno = hasattr(integrante, 'alumno_integrante')
+        rows.append(IntegranteIndicador(
+            familia_indicador=snapshot,
+            integrante=integrante,
+            localidad=familia.localidad,
+            rol=integrante.rol,
+            es_tutor=hasattr(integrante, 'tutor_integrante'),
+            es_alumno=es_alumno,
+            oficio_id=integrante.oficio_id,
+            educacion=simplify_education(integrante.nivel_estudios),
+            fecha_de_nacimiento=integrante.fecha_de_nacimiento,
+            porcentaje_beca=becas.get(integrante.alumno_integrante.pk) if es_alumno else None))
+    IntegranteIndicador.objects.bulk_create(rows)
+
+    return snapshot
+
+
+def rebuild_snapshots():
+    """ Rebuilds the snapshots of every family.
+
+    Snapshots of families that are no longer approved are removed.
+
+    Returns
+    -------
+    int
+        The number of snapshots that were built.
+    """
+    FamiliaIndicador.objects.exclude(familia__estudio__status=Estudio.APROBADO).delete()
+    aprobadas = Familia.objects.filter(estudio__status=Estudio.APROBADO) \
+                               .values_list('id', flat=True)
+    total = 0
+    for id_familia in aprobadas.iterator():
+        update_snapshot(id_familia)
+        total += 1
+    return total
@@ -0,0 +1,176 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from administracion.models import Escuela
+from becas.models import Beca
+from estudios_socioeconomicos.models import Estudio
+from familias.models import Familia, Integrante, Tutor, Alumno
+from perfiles_usuario.models import Capturista
+from .calculators import estado_civil_counter, estudios_padres_counter, ingreso_mensual_counter, \
+                         becas_counter, localidad_counter
+from .models import Periodo, Transaccion, FamiliaIndicador, IntegranteIndicador
+from .snapshots import rebuild_snapshots
+
+
+class TestCalculators(TestCase):
+    """ Unit test suite for the aggregation functions in .calculators
+
+    The calculators read the snapshots maintained by .signals, so these tests
+    also cover that the snapshots follow the source tables.
+    """
+
+    def setUp(self):
+        """ Creates two approved families and one in draft.
+
+        The draft family must never be counted by the indicators.
+        """
+        user = User.objects.create_user(username='erikiano', password='vacalalo')
+        capturista = Capturista.objects.create(user=user)
+        escuela = Escuela.objects.create(nombre='Juan Pablo')
+        self.periodo = Periodo.objects.create(periodicidad='Mensual',
+                                              factor=1,
+                                              multiplica=True)
+
+        self.familia_nabo = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                                   estado_civil='soltero',
+                                                   localidad='nabo')
+        self.familia_salitre = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                                      estado_civil='soltero',
+                                                      localidad='salitre')
+        familia_borrador = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                                  estado_civil='viudo',
+                                                  localidad='nabo')
+        Estudio.objects.create(capturista=capturista,
+                               familia=self.familia_nabo,
+                               status=Estudio.APROBADO)
+        Estudio.objects.create(capturista=capturista,
+                               familia=self.familia_salitre,
+                               status=Estudio.APROBADO)
+        Estudio.objects.create(capturista=capturista,
+                               familia=familia_borrador,
+                               status=Estudio.BORRADOR)
+
+        tutor = Integrante.objects.create(familia=self.familia_nabo,
+                                          nombres='Rick',
+                                          apellidos='Astley',
+                                          nivel_estudios='universidad',
+                                          fecha_de_nacimiento='1966-02-26',
+                                          rol='tutor')
+        Tutor.objects.create(integrante=tutor, relacion='padre')
+        integrante_alumno = Integrante.objects.create(familia=self.familia_nabo,
+                                                      nombres='Never',
+                                                      apellidos='Gonna',
+                                                      nivel_estudios='1_grado',
+                                                      fecha_de_nacimiento='2010-02-26',
+                                                      rol='alumno')
+        self.alumno = Alumno.objects.create(integrante=integrante_alumno,
+                                            numero_sae='5',
+                                            escuela=escuela)
+
+        Transaccion.objects.create(familia=self.familia_nabo,
+                                   monto=3000,
+                                   periodicidad=self.periodo,
+                                   observacion='Sueldo',
+                                   es_ingreso=True)
+        Transaccion.objects.create(familia=self.familia_nabo,
+                                   monto=1500,
+                                   periodicidad=self.periodo,
+                                   observacion='Extra',
+                                   es_ingreso=True)
+
+    def test_estado_civil(self):
+        """ Test that the breakdown and the unified total come from the same data.
+
+        """
+        context = estado_civil_counter().context()
+        self.assertEqual(context['data']['Nabo']['Soltero'], 1)
+        self.assertEqual(context['data']['Salitre']['Soltero'], 1)
+        self.assertEqual(context['data']['Nabo']['Viudo'], 0)
+        self.assertEqual(context['unified_total']['Soltero'], 2)
+        self.assertEqual(context['unified_total']['Viudo'], 0)
+
+    def test_estudios_padres(self):
+        """ Test that only tutors are counted by their simplified education.
+
+        """
+        context = estudios_padres_counter().context()
+        self.assertEqual(context['data']['Nabo']['Universidad'], 1)
+        self.assertEqual(context['unified_total']['Universidad'], 1)
+        self.assertEqual(context['unified_total']['Primaria'], 0)
+
+    def test_ingreso_mensual(self):
+        """ Test that the incomes are added per family before being bucketed.
+
+        Families without incomes are counted in the lowest range.
+        """
+        context = ingreso_mensual_counter().context()
+        self.assertEqual(context['data']['Nabo']['$4000 - $5999'], 1)
+        self.assertEqual(context['data']['Salitre']['$0 - $1999'], 1)
+        self.assertEqual(context['unified_total']['$2000 - $3999'], 0)
+
+    def test_becas(self):
+        """ Test that only the latest scholarship of each student is counted.
+
+        """
+        Beca.objects.create(alumno=self.alumno, porcentaje='15')
+        Beca.objects.create(alumno=self.alumno, porcentaje='50')
+        context = becas_counter().context()
+        self.assertEqual(context['data']['Nabo']['%50 - %59'], 1)
+        self.assertEqual(context['unified_total']['10% - 19%'], 0)
+        self.assertEqual(sum(context['unified_total'].values()), 1)
+
+    def test_localidad(self):
+        """ Test the number of approved families per localidad.
+
+        """
+        results = localidad_counter()
+        self.assertEqual(results['Nabo'], 1)
+        self.assertEqual(results['Salitre'], 1)
+        self.assertEqual(results['Otro'], 0)
+
+    def test_snapshot_follows_study_status(self):
+        """ Test that only families with an approved study have a snapshot.
+
+        """
+        self.assertTrue(FamiliaIndicador.objects.filter(familia=self.familia_nabo).exists())
+        estudio = self.familia_nabo.estudio
+        estudio.status = Estudio.ELIMINADO_ADMIN
+        estudio.save()
+        self.assertFalse(FamiliaIndicador.objects.filter(familia=self.familia_nabo).exists())
+        self.assertEqual(IntegranteIndicador.objects.filter(localidad='nabo').count(), 0)
+
+        estudio.status = Estudio.APROBADO
+        estudio.save()
+        snapshot = FamiliaIndicador.objects.get(familia=self.familia_nabo)
+        self.assertEqual(snapshot.ingreso_mensual, 4500)
+        self.assertEqual(snapshot.integrantes.count(), 2)
+
+    def test_snapshot_follows_transactions(self):
+        """ Test that the snapshot is refreshed when the incomes of the family change.
+
+        """
+        Transaccion.objects.create(familia=self.familia_salitre,
+                                   monto=2500,
+                                   periodicidad=self.periodo,
+                                   observacion='Sueldo',
+                                   es_ingreso=True)
+        snapshot = FamiliaIndicador.objects.get(familia=self.familia_salitre)
+        self.assertEqual(snapshot.ingreso_mensual, 2500)
+
+    def test_rebuild_snapshots(self):
+        """ Test that the snapshots can be rebuilt from scratch.
+
+        """
+        FamiliaIndicador.objects.all().delete()
+        self.assertEqual(rebuild_snapshots(), 2)
+        self.assertEqual(FamiliaIndicador.objects.count(), 2)
+        self.assertEqual(IntegranteIndicador.objects.count(), 2)
+
+    def test_query_count(self):
+        """ Test that the number of queries does not depend on the number of families.
+
+        """
+        with self.assertNumQueries(1):
+            estado_civil_counter()
+        with self.assertNumQueries(1):
+            ingreso_mensual_counter()
@@ -0,0 +1,120 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from familias.models import Familia, Integrante, Tutor
+from .models import Periodo, Transaccion, Ingreso, ResumenFinanciero
+from .resumen import rebuild_summaries, summary_context
+
+
+class TestResumenFinanciero(TestCase):
+    """ Suite to test that the financial summary of a family is kept current.
+
+    Attributes:
+    -----------
+    familia : Familia
+        The family whose summary is tested.
+    periodo : Periodo
+        A weekly period, which multiplies the amounts by 4.
+    sueldo : Transaccion
+        A comprobable income of 1000 per week.
+    """
+
+    def setUp(self):
+        """ Creates a family with an income and an expense.
+
+        """
+        self.familia = Familia.objects.create(numero_hijos_diferentes_papas=1,
+                                              estado_civil='soltero',
+                                              localidad='salitre')
+        integrante = Integrante.objects.create(familia=self.familia,
+                                               nombres='Elver',
+                                               apellidos='Ga',
+                                               nivel_estudios='ninguno',
+                                               fecha_de_nacimiento='1996-02-26')
+        tutor = Tutor.objects.create(integrante=integrante, relacion='padre')
+        self.periodo = Periodo.objects.create(periodicidad='Semanal', factor=4, multiplica=True)
+        self.sueldo = Transaccion.objects.create(familia=self.familia,
+                                                 monto=1000,
+                                                 periodicidad=self.periodo,
+                                                 observacion='Sueldo',
+                                                 es_ingreso=True)
+        Ingreso.objects.create(transaccion=self.sueldo,
+                               fecha='2016-02-02',
+                               tipo=Ingreso.OPCION_COMPROBABLE,
+                               tutor=tutor)
+        Transaccion.objects.create(familia=self.familia,
+                                   monto=250,
+                                   periodicidad=self.periodo,
+                                   observacion='Renta',
+                                   es_ingreso=False)
+
+    def test_summary_follows_transactions(self):
+        """ Test that saving and deleting transactions and incomes refreshes the summary.
+
+        """
+        resumen = ResumenFinanciero.objects.get(familia=self.familia)
+        self.assertEqual(resumen.ingresos, 4000)
+        self.assertEqual(resumen.egresos, -1000)
+        self.assertEqual(resumen.neto, 3000)
+        self.assertEqual(resumen.ingresos_comprobables, 1)
+        self.assertEqual(resumen.ingresos_no_comprobables, 0)
+
+        ingreso = self.sueldo.ingreso
+        ingreso.tipo = Ingreso.OPCION_NO_COMPROBABLE
+        ingreso.save()
+        self.sueldo.monto = 500
+        self.sueldo.save()
+        resumen.refresh_from_db()
+        self.assertEqual(resumen.ingresos, 2000)
+        self.assertEqual(resumen.ingresos_comprobables, 0)
+        self.assertEqual(resumen.ingresos_no_comprobables, 1)
+
+        self.sueldo.delete()
+        resumen.refresh_from_db()
+        self.assertEqual(resumen.ingresos, 0)
+        self.assertEqual(resumen.neto, -1000)
+        self.assertEqual(resumen.ingresos_no_comprobables, 0)
+
+    def test_summary_follows_periodo(self):
+        """ Test that changing the factor of a period refreshes the summaries using it.
+
+        """
+        self.periodo.factor = 2
+        self.periodo.save()
+        resumen = ResumenFinanciero.objects.get(familia=self.familia)
+        self.assertEqual(resumen.ingresos, 2000)
+        self.assertEqual(resumen.neto, 1500)
+
+    def test_summary_deleted_with_family(self):
+        """ Test that deleting a family does not leave its summary behind.
+
+        """
+        self.familia.delete()
+        self.assertFalse(ResumenFinanciero.objects.exists())
+
+    def test_summary_context(self):
+        """ Test that the financial screens read the stored summary with one query.
+
+        """
+        with self.assertNumQueries(1):
+            context = summary_context(self.familia.id)
+        self.assertEqual(context, {'total_egresos_familia': '-1000.00',
+                                   'total_ingresos_familia': '4000.00',
+                                   'total_neto_familia': '3000.00'})
+
+    def test_rebuild(self):
+        """ Test that the summaries are rebuilt, also for families without transactions.
+
+        """
+        Transaccion.objects.filter(pk=self.sueldo.pk).update(monto=10)
+        Familia.objects.create(numero_hijos_diferentes_papas=0,
+                               estado_civil='soltero',
+                               localidad='otro')
+        self.assertEqual(rebuild_summaries(), 2)
+        self.assertEqual(ResumenFinanciero.objects.get(familia=self.familia).ingresos, 40)
+
+        ResumenFinanciero.objects.all().delete()
+        call_command('rebuild_resumen_financiero', stdout=io.StringIO())
+        self.assertEqual(ResumenFinanciero.objects.count(), 2)
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.instrumentation.RequestTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -158,6 +159,34 @@ CORS_ORIGIN_ALLOW_ALL = True
 FILE_UPLOAD_HANDLERS = ("django_excel.ExcelMemoryFileUploadHandler",
                         "django_excel.TemporaryExcelFileUploadHandler")
 
+# ESTUDIOS SOCIOECONOMICOS
+# When True the empty answers of a new study are not created along with it,
+# captura.views.capture_study creates the ones of each section the first
+# time it is opened. Sections that were never opened have no answers.
+CREAR_RESPUESTAS_AL_CAPTURAR = False
+
+# INSTRUMENTACION
+# The fraction of the requests measured by core.instrumentation, between 0
+# (none) and 1 (every request).
+INSTRUMENTACION_MUESTREO = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.10/topics/i18n/
 
@@ -185,6 +214,10 @@ STATIC_URL = '/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'media')
+# Files with personal data that are only downloaded through the views that
+# check who asks for them, see core.storage. Must not be served by the web
+# server, unlike MEDIA_ROOT.
+PRIVATE_MEDIA_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'privado')
 LOGIN_URL = 'tosp_auth:login'
 
 EMAIL_HOST = 'smtp.sendgrid.net'
@@ -3,3 +3,5 @@ from .base import *
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
+
+INSTRUMENTACION_MUESTREO = 1
@@ -4,6 +4,9 @@ from .base import *
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# Measure one request out of twenty, see core.instrumentation.
+INSTRUMENTACION_MUESTREO = 0.05
+
 ALLOWED_HOSTS = [
     '138.197.197.47',
     'junipero.erikiado.com',
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class PerfilesUsuarioConfig(AppConfig):
     name = 'perfiles_usuario'
+
+    def ready(self):
+        """ Connects the receivers that discard the cached groups of users.
+
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,20 @@
+""" Receivers that keep the groups cached by .utils.user_groups current.
+
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .utils import forget_user_groups
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def groups_changed(sender, instance=None, **kwargs):
+    """ Discards the cached groups of a user when they are added, removed or cleared.
+
+    Changes made from the side of the group, e.g. group.user_set.add(user),
+    can not reach the user instances loaded in memory, which are not used
+    beyond the request that loaded them anyway.
+    """
+    if isinstance(instance, get_user_model()):
+        forget_user_groups(instance)
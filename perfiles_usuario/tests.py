@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
+from administracion.forms import UserForm
 from .utils import is_member, is_administrador, is_capturista, is_directivo, is_servicios_escolares
 from .utils import ADMINISTRADOR_GROUP, CAPTURISTA_GROUP, \
                 DIRECTIVO_GROUP, SERVICIOS_ESCOLARES_GROUP
@@ -158,3 +159,45 @@ class PermisosTestCase(TestCase):
         self.user.groups.add(self.servicios_group)
         self.user.groups.add(self.directivo_group)
         self.assertFalse(is_member(self.user, [ADMINISTRADOR_GROUP, CAPTURISTA_GROUP]))
+
+    def test_groups_read_once(self):
+        """ Test that the groups of a user are read once for any number of checks.
+
+        """
+        self.user.groups.add(self.directivo_group)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_directivo(self.user))
+            self.assertFalse(is_administrador(self.user))
+            self.assertTrue(is_member(self.user, [ADMINISTRADOR_GROUP, DIRECTIVO_GROUP]))
+
+    def test_groups_cache_invalidation(self):
+        """ Test that modifying the groups of a user discards its cached groups.
+
+        """
+        self.assertFalse(is_administrador(self.user))
+        self.user.groups.add(self.administrador_group)
+        self.assertTrue(is_administrador(self.user))
+        self.user.groups.remove(self.administrador_group)
+        self.assertFalse(is_administrador(self.user))
+        self.user.groups.add(self.directivo_group)
+        self.user.groups.clear()
+        self.assertFalse(is_directivo(self.user))
+
+    def test_groups_cache_user_form(self):
+        """ Test that changing the role of a user with UserForm is seen by the checks.
+
+        """
+        self.user.groups.add(self.directivo_group)
+        self.assertTrue(is_directivo(self.user))
+
+        form = UserForm({'username': 'some_user',
+                         'first_name': 'some',
+                         'last_name': 'user',
+                         'email': 'temporary@gmail.com',
+                         'rol_usuario': ADMINISTRADOR_GROUP},
+                        instance=self.user)
+        self.assertTrue(form.is_valid())
+        form.save()
+
+        self.assertFalse(is_directivo(self.user))
+        self.assertTrue(is_administrador(self.user))
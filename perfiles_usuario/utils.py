@@ -7,12 +7,50 @@ CAPTURISTA_GROUP = 'Capturista'
 DIRECTIVO_GROUP = 'Directivo'
 SERVICIOS_ESCOLARES_GROUP = 'Servicios Escolares'
 
+# Attribute of a user instance that holds the names of its groups.
+_GRUPOS = '_nombres_grupos'
+
+
+def user_groups(user):
+    """ Returns the names of the groups a user belongs to.
+
+    The groups are read with a single query the first time they are needed and
+    kept in the user instance. The authentication middleware loads request.user
+    again on every request, so the groups are read at most once per request no
+    matter how many permission checks the views and templates make.
+
+    Parameters
+    ----------
+    user : django.contrib.auth.models.User
+        The user whose groups are returned.
+
+    Returns
+    ---------
+    frozenset of str
+        The names of the groups.
+    """
+    grupos = getattr(user, _GRUPOS, None)
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list('name', flat=True))
+        setattr(user, _GRUPOS, grupos)
+    return grupos
+
+
+def forget_user_groups(user):
+    """ Discards the groups cached by user_groups in a user instance.
+
+    It is called by perfiles_usuario.signals whenever the groups of a user are
+    modified through user.groups.
+    """
+    if hasattr(user, _GRUPOS):
+        delattr(user, _GRUPOS)
+
 
 def is_member(user, groups):
     """ Test if a user belongs to any of the groups provided.
 
     This function is meant to be used by the user_passes_test decorator to control access
-    to views.
+    to views. The groups of the user are read once, see user_groups.
 
     Parameters
     ----------
@@ -26,7 +64,7 @@ def is_member(user, groups):
     bool
         True if the user belongs to any of the groups. False otherwise
     """
-    return any(map(lambda g: user.groups.filter(name=g).exists(), groups))
+    return not user_groups(user).isdisjoint(groups)
 
 
 def is_administrador(user):